@@ -2,11 +2,19 @@
 API routes for transactions dashboard
 """
 import uuid
+import hmac
 import os
+import functools
 import math
+import threading
+import contextvars
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from typing import Optional, Any
-from fastapi import APIRouter, UploadFile, File, Query, HTTPException
+from fastapi import APIRouter, UploadFile, File, Query, HTTPException, Header
 import json as _json
+import anyio.to_thread
 import datetime as _dt
 from pydantic import BaseModel, field_validator
 from fastapi.responses import FileResponse, StreamingResponse
@@ -16,17 +24,24 @@ from io import BytesIO
 
 from ..services.data_loader import load_transaction_file
 from ..services.data_processor import (
-    process_data, clean_dataframe,
+    process_data, clean_dataframe, apply_ai_categories,
     apply_unconditional_overrides, apply_ai_tool_override, derive_subcategory,
     apply_issuer_category, normalize_merchant, apply_trip_window_heuristic,
     compute_txn_keys, txn_fingerprint, locked_mask, apply_category_migration,
+    aggregate_merchants, catalog_hits, merchant_keys,
 )
 from ..core.constants import (
     CREDIT_CARD_PAYMENT_KEYWORDS, KEYWORD_TO_CATEGORY, EXACT_WORD_KEYWORDS,
     CATEGORY_ICONS, SUBCATEGORY_ICONS, get_subcategory_catalog,
     AI_CATEGORY, AI_SUBCATEGORY, AI_SUBCATEGORIZE_SKIP, migrate_category,
 )
-from ..services.ai_categorizer import categorize_transactions, audit_merchants, suggest_subcategories
+from ..services.ai_categorizer import (
+    categorize_transactions, audit_merchants, suggest_subcategories, cached_categories, _base_desc,
+)
+from ..services import (
+    ai_events, ai_jobs, ai_metrics, analytics_executor, local_classifier, merchant_kb, merchant_resolver,
+    streaming_ingest, worker_pools,
+)
 from ..services.chart_generator import (
     create_donut_chart,
     create_monthly_bars,
@@ -34,15 +49,69 @@ from ..services.chart_generator import (
     create_trend_chart
 )
 from ..services.export_service import export_to_excel
-from ..utils.validators import detect_amount_column, find_column
+from ..utils.validators import detect_transaction_columns
 
 router = APIRouter()
 
+
+def _offload(pool: worker_pools.WorkerPool):
+    """Serve a sync (pandas) handler from `pool` instead of the event loop —
+    see worker_pools. A full pool queue is a 503."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        async def handler(*args, **kwargs):
+            try:
+                return await pool.run(fn, *args, **kwargs)
+            except worker_pools.PoolFull:
+                raise HTTPException(status_code=503, detail="Server busy, try again shortly",
+                                    headers={"Retry-After": "1"})
+        return handler
+    return wrap
+
 # Background-AI progress per session, read by GET /ai-progress so the UI can
 # show a live "categorizing… n/m" meter. In-memory like `sessions` (wiped on
 # cold start — the meter simply restarts with the next background run).
 AI_PROGRESS: dict[str, dict] = {}
 
+# Per-session write locks. The AI endpoints write into a session from worker
+# threads (categorize results landing while per-category subcategory workers
+# apply theirs) while the manual edit endpoints write into it from the event
+# loop; every read-modify-write of the frame holds the session's lock, never a
+# Claude call.
+class _SessionLock:
+    """A session's RLock. AI writes modify the frame in place rather than
+    reassigning sessions[sid]; a holder that wrote calls wrote(), and
+    releasing the lock then marks the session written (see _Sessions).
+    Read-only uses leave the generation alone."""
+
+    def __init__(self, session_id: str):
+        self._session_id = session_id
+        self._lock = threading.RLock()
+        self._dirty = False
+
+    def __enter__(self):
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc):
+        if self._dirty:
+            self._dirty = False
+            sessions.touch(self._session_id)
+        return self._lock.__exit__(*exc)
+
+    def wrote(self) -> None:
+        """Record an in-place write; the caller holds the lock."""
+        self._dirty = True
+
+
+SESSION_LOCKS: dict[str, _SessionLock] = {}
+_SESSION_LOCKS_GUARD = threading.Lock()
+
+
+def _session_lock(session_id: str) -> _SessionLock:
+    with _SESSION_LOCKS_GUARD:
+        return SESSION_LOCKS.setdefault(session_id, _SessionLock(session_id))
+
+
 # User-created categories per session (the dynamic part of the taxonomy).
 # Passed into /restore-session by the frontend (from Supabase user_categories)
 # and honored everywhere a category is validated. In-memory like `sessions`.
@@ -57,115 +126,276 @@ def _valid_categories(session_id: Optional[str] = None) -> set:
     return valid
 
 
+def _set_progress(session_id: str, stage: str, done: int = 0, total: int = 0, detail: str = "") -> None:
+    """Update the session's AI meter and push it to /ai-events subscribers."""
+    progress = {"stage": stage, "done": done, "total": total, "detail": detail}
+    AI_PROGRESS[session_id] = progress
+    ai_events.publish(session_id, "progress", progress)
+
+
 @router.get("/ai-progress")
 async def get_ai_progress(sessionId: str = Query(...)):
     """Live progress of the background AI chain (categorize → subcategorize).
 
-    Stages: idle | categorizing | categorized | subcategorizing | done.
-    done/total count merchants (categorize) or categories (subcategorize)."""
+    Stages: idle | categorizing | categorized | subcategorizing | auditing | done.
+    done/total count merchants (categorize) or categories (subcategorize).
+    Kept as the polling fallback for clients without /ai-events."""
     return AI_PROGRESS.get(sessionId) or {"stage": "idle", "done": 0, "total": 0, "detail": ""}
 
 
+@router.get("/ai-events")
+async def get_ai_events(
+    sessionId: str = Query(...),
+    last_event_id: Optional[str] = Header(default=None, alias="Last-Event-ID"),
+):
+    """Server-Sent Events for the session's AI runs — replaces /ai-progress polling.
+
+    Events (data is JSON):
+      progress        {stage, done, total, detail} — every meter change
+      categorized     {assignments: [{merchant, category}]} — per AI batch
+      subcategorized  {category, assignments: [{merchant, category, subcategory, count, total}]}
+    A fresh connection starts with the current progress; a reconnect
+    (Last-Event-ID, sent by EventSource automatically) replays what it missed.
+    """
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_id = None
+    snapshot = AI_PROGRESS.get(sessionId) or {"stage": "idle", "done": 0, "total": 0, "detail": ""}
+    return StreamingResponse(
+        ai_events.stream(sessionId, last_id, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/internal/metrics")
+async def get_internal_metrics(
+    recent: int = Query(50, ge=0, le=ai_metrics.RECENT_CALLS),
+    token: Optional[str] = Header(default=None, alias="X-Metrics-Token"),
+):
+    """Operational metrics: per-call AI records aggregated into counters and
+    histograms (latency, tokens, batch size) per phase, model and session,
+    plus result-cache hit rates; and queue depth / wait / run time per worker
+    pool, including the AnyIO threadpool the sync AI endpoints run on.
+    Internal — not used by the dashboard UI: off (404) unless
+    INTERNAL_METRICS_TOKEN is set, and then only with that token in the
+    X-Metrics-Token header. Sessions appear as hashes (ai_metrics.session_ref)."""
+    expected = os.environ.get('INTERNAL_METRICS_TOKEN', '')
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8')):
+        raise HTTPException(status_code=403, detail="Invalid metrics token")
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    pools = worker_pools.snapshot()
+    pools["ai-requests"] = {
+        "workers": int(limiter.total_tokens), "running": limiter.borrowed_tokens,
+        "queued": limiter.statistics().tasks_waiting,
+    }
+    return {"ai": ai_metrics.snapshot(recent), "pools": pools}
+
+
 @router.get("/test")
 async def test():
     return {"status": "ok"}
 
+_GENERATIONS = itertools.count(1)
+
+
+class _Sessions(dict):
+    """Session frames by id. Every write gives the session a new generation,
+    which keys its shared-memory copy for the analytics worker processes
+    (analytics_executor); deleting a session drops that copy, its AI event
+    channel, its local-classifier corpus and its write lock."""
+
+    def __init__(self):
+        super().__init__()
+        self._generations: dict[str, int] = {}
+
+    def __setitem__(self, session_id: str, df: pd.DataFrame) -> None:
+        super().__setitem__(session_id, df)
+        self.touch(session_id)
+
+    def __delitem__(self, session_id: str) -> None:
+        super().__delitem__(session_id)
+        self._generations.pop(session_id, None)
+        analytics_executor.forget(session_id)
+        ai_events.drop(session_id)
+        local_classifier.forget(session_id)
+        with _SESSION_LOCKS_GUARD:
+            SESSION_LOCKS.pop(session_id, None)
+
+    def clear(self) -> None:
+        for session_id in list(self):
+            del self[session_id]
+
+    def touch(self, session_id: str) -> None:
+        """Mark the session's frame as modified in place."""
+        if session_id in self:
+            self._generations[session_id] = next(_GENERATIONS)
+
+    def generation(self, session_id: str) -> int:
+        return self._generations[session_id]
+
+
 # In-memory storage for sessions (in production, use Redis or database)
-sessions: dict[str, pd.DataFrame] = {}
+sessions: dict[str, pd.DataFrame] = _Sessions()
 
-# Directory for uploaded files
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+def _analytics(fn, session_id: str, *args):
+    """fn(session frame, *args), in an analytics worker process when
+    ANALYTICS_PROCESSES is set (see analytics_executor)."""
+    # Generation first: a write landing in between only republishes early.
+    generation = sessions.generation(session_id)
+    return analytics_executor.run(fn, session_id, generation, sessions[session_id], *args)
 
-@router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """Upload and process transaction file"""
-    file_path = None
-    try:
-        # Save file temporarily
-        file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{file.filename}")
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Load and process file (ensure file is closed before processing)
-        df_raw = load_transaction_file(file_path)
-        df_clean = clean_dataframe(df_raw)
-        
-        # Detect columns
-        date_col = find_column(df_clean, ['תאריך עסקה', 'תאריך', 'date', 'Date'])
-        amount_col = detect_amount_column(df_clean)
-        desc_col = find_column(df_clean, ['שם בית העסק', 'שם בית עסק', 'תיאור', 'תיאור התנועה', 'description', 'merchant'])
-        cat_col = find_column(df_clean, ['קטגוריה', 'category', 'Category'])
-        billing_date_col = find_column(df_clean, ['תאריך חיוב', 'תאריך_חיוב', 'Billing Date', 'billing date', 'תאריך חיוב:', 'יום ערך'])
-
-        if not date_col or not amount_col or not desc_col:
-            # Clean up before raising error
-            if file_path and os.path.exists(file_path):
-                try:
-                    import time
-                    time.sleep(0.1)  # Small delay to ensure file is closed
-                    os.remove(file_path)
-                except:
-                    pass
-            raise HTTPException(
-                status_code=400,
-                detail=f"Required columns not found. Found columns: {list(df_clean.columns)}"
-            )
+def _process_upload(source, filename: str, categorize: bool = True) -> pd.DataFrame:
+    """Parse, clean and process one uploaded file (runs on the heavy pool).
 
-        # Process data
-        df = process_data(df_clean, date_col, amount_col, desc_col, cat_col, billing_date_col)
-        
+    Large CSVs are streamed in chunks (see streaming_ingest)."""
+    if streaming_ingest.should_stream(source, filename):
+        try:
+            df = streaming_ingest.ingest_csv(source, categorize=categorize)
+        except streaming_ingest.MissingColumns as e:
+            raise HTTPException(status_code=400, detail=str(e))
         if df.empty:
-            # Clean up before raising error
-            if file_path and os.path.exists(file_path):
-                try:
-                    import time
-                    time.sleep(0.1)
-                    os.remove(file_path)
-                except:
-                    pass
             raise HTTPException(status_code=400, detail="No valid transactions found")
-        
-        # Create session
-        session_id = str(uuid.uuid4())
-        sessions[session_id] = df
-        
-        # Clean up temp file (with delay to ensure pandas closed it)
-        if file_path and os.path.exists(file_path):
-            try:
-                import time
-                time.sleep(0.2)  # Wait for pandas to fully close the file
-                os.remove(file_path)
-            except PermissionError:
-                # If still locked, try again after a longer delay
-                import time
-                time.sleep(0.5)
-                try:
-                    os.remove(file_path)
-                except:
-                    pass  # Ignore if still can't delete
-        
-        return {
-            "success": True,
-            "message": f"Loaded {len(df)} transactions",
-            "session_id": session_id,
-            "transaction_count": len(df)
-        }
+        return df
+
+    df_raw = load_transaction_file(source, filename)
+    df_clean = clean_dataframe(df_raw)
+
+    # Detect columns
+    date_col, amount_col, desc_col, cat_col, billing_date_col = detect_transaction_columns(df_clean)
+
+    if not date_col or not amount_col or not desc_col:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Required columns not found. Found columns: {list(df_clean.columns)}"
+        )
+
+    # Process data
+    df = process_data(df_clean, date_col, amount_col, desc_col, cat_col, billing_date_col, categorize=categorize)
+    if df.empty:
+        raise HTTPException(status_code=400, detail="No valid transactions found")
+    return df
+
+
+@router.post("/upload")
+async def upload_file(file: UploadFile = File(...)):
+    """Upload and process transaction file.
+
+    The file is parsed straight from the upload's spooled body (kept in
+    memory, rolled over to a temp file past 1 MB by Starlette) — no copy in
+    uploads/, nothing to delete afterwards. Parsing and processing run on
+    the heavy worker pool, so a large file doesn't stall every other request.
+    """
+    try:
+        df = await worker_pools.HEAVY.run(_process_upload, file.file, file.filename or '')
     except HTTPException:
         raise
+    except worker_pools.PoolFull:
+        raise HTTPException(status_code=503, detail="Server busy, try again shortly",
+                            headers={"Retry-After": "1"})
     except Exception as e:
         import traceback
-        import time
         error_detail = f"{str(e)}\n{traceback.format_exc()}"
-        if file_path and os.path.exists(file_path):
-            try:
-                time.sleep(0.2)  # Wait before trying to delete
-                os.remove(file_path)
-            except:
-                pass
         raise HTTPException(status_code=500, detail=error_detail)
+    finally:
+        await file.close()
+
+    # Create session
+    session_id = str(uuid.uuid4())
+    sessions[session_id] = df
+
+    return {
+        "success": True,
+        "message": f"Loaded {len(df)} transactions",
+        "session_id": session_id,
+        "transaction_count": len(df)
+    }
+
+
+class _BatchFileError(Exception):
+    """A file of a batch upload was rejected (picklable, unlike HTTPException)."""
+
+
+def _parse_batch_file(content: bytes, filename: str) -> pd.DataFrame:
+    """One file of a batch upload, processed without the AI pass and tagged
+    with _source_file. Runs in an analytics worker process when
+    ANALYTICS_PROCESSES is set."""
+    try:
+        df = _process_upload(BytesIO(content), filename, categorize=False)
+    except HTTPException as e:
+        raise _BatchFileError(f"{filename}: {e.detail}") from None
+    df['_source_file'] = filename
+    return df
+
+
+def _process_batch(files: list[tuple[bytes, str]]) -> tuple[pd.DataFrame, int]:
+    """Parse the files in parallel, merge them and categorize once.
+
+    Returns (frame, cross-file duplicates dropped). Statements that overlap
+    (e.g. an export re-downloaded with the next month's) list the same
+    transactions twice; a row is dropped when an earlier file already holds
+    its fingerprint as many times. Repeats inside one file — two identical
+    coffees on the same day — are kept.
+    """
+    frames = analytics_executor.starmap(_parse_batch_file, files)
+    keys = [compute_txn_keys(f) for f in frames]
+    occurrence = pd.concat([k.groupby(k).cumcount() for k in keys], ignore_index=True)
+    df = pd.concat(frames, ignore_index=True)
+    dup = pd.DataFrame({'key': pd.concat(keys, ignore_index=True), 'n': occurrence}).duplicated()
+    df = df[~dup.to_numpy()].reset_index(drop=True)
+    df['id'] = df.index.astype(int)
+
+    apply_ai_categories(df)
+    derive_subcategory(df)
+    return df, int(dup.sum())
+
+
+@router.post("/upload/batch")
+async def upload_files(files: list[UploadFile] = File(...)):
+    """Upload several statement files (e.g. a year of monthly exports) into
+    one session.
+
+    Files are parsed in parallel — across the analytics worker processes
+    when ANALYTICS_PROCESSES is set — each row tagged with its _source_file.
+    Transactions repeated across files are dropped by fingerprint, and the
+    AI categorizes the combined set once instead of once per file. A file
+    that can't be parsed fails the whole batch with a 400 naming it.
+    """
+    try:
+        contents = [(await f.read(), f.filename or '') for f in files]
+    finally:
+        for f in files:
+            await f.close()
+
+    try:
+        df, duplicates_removed = await worker_pools.HEAVY.run(_process_batch, contents)
+    except _BatchFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except worker_pools.PoolFull:
+        raise HTTPException(status_code=503, detail="Server busy, try again shortly",
+                            headers={"Retry-After": "1"})
+    except Exception as e:
+        import traceback
+        error_detail = f"{str(e)}\n{traceback.format_exc()}"
+        raise HTTPException(status_code=500, detail=error_detail)
+
+    session_id = str(uuid.uuid4())
+    sessions[session_id] = df
+    counts = df['_source_file'].value_counts()
+
+    return {
+        "success": True,
+        "message": f"Loaded {len(df)} transactions from {len(files)} files",
+        "session_id": session_id,
+        "transaction_count": len(df),
+        "duplicates_removed": duplicates_removed,
+        "files": [{"name": name, "count": int(counts.get(name, 0))}
+                  for name in dict.fromkeys(name for _, name in contents)],
+    }
 
 
 class CategoryRule(BaseModel):
@@ -175,6 +405,9 @@ class CategoryRule(BaseModel):
     merchant: str
     category: str
     subcategory: Optional[str] = None
+    # 'user' for a rule the user made; 'ai' for an AI answer the dashboard
+    # saved automatically; None on rules saved before the distinction.
+    source: Optional[str] = None
 
 
 class TransactionOverride(BaseModel):
@@ -205,6 +438,9 @@ class RestoreSessionRequest(BaseModel):
     # User-created categories (Supabase user_categories) — the dynamic part
     # of the taxonomy. Treated as valid alongside CATEGORY_ICONS everywhere.
     custom_categories: list[str] = []
+    # Opaque per-user id; the user's rules then vote in the merchant
+    # knowledge base (stored hashed). No voter, no votes.
+    voter: Optional[str] = None
 
     @field_validator('transactions', mode='before')
     @classmethod
@@ -280,13 +516,15 @@ class RenameCategoryRequest(BaseModel):
 
 
 @router.post("/restore-session")
-async def restore_session(body: RestoreSessionRequest):
+@_offload(worker_pools.HEAVY)
+def restore_session(body: RestoreSessionRequest):
     """Restore a backend session from saved transaction JSON data."""
     if not body.transactions:
         raise HTTPException(status_code=400, detail="No transactions provided")
 
     try:
         df = pd.DataFrame(body.transactions)
+        session_id = str(uuid.uuid4())
 
         # Parse date column
         if 'תאריך' in df.columns:
@@ -331,6 +569,22 @@ async def restore_session(body: RestoreSessionRequest):
             str(c).strip() for c in (body.custom_categories or []) if str(c).strip()
         }
         valid_cats = set(CATEGORY_ICONS) | custom_cats
+
+        # This restore's pins (see "Single-transaction overrides" below),
+        # fingerprint → (category, subcategory).
+        overrides_by_key = {}
+        for o in body.transaction_overrides:
+            if not (o.txn_key and o.category):
+                continue
+            # Pins saved under the old taxonomy are translated too.
+            pin_cat, migrated_sub = migrate_category(o.category, o.subcategory)
+            pin_sub = o.subcategory
+            if migrated_sub is not None:
+                pin_sub = migrated_sub or None
+            if pin_cat not in valid_cats:
+                continue
+            overrides_by_key[o.txn_key] = (pin_cat, pin_sub)
+
         if 'קטגוריה' in df.columns and 'תיאור' in df.columns:
             # Old-taxonomy snapshots (pre-2026-07 category names) are migrated
             # in place FIRST — otherwise the hygiene pass below would wipe them
@@ -420,8 +674,21 @@ async def restore_session(body: RestoreSessionRequest):
                 # Match rules on the canonical merchant key, not the raw
                 # descriptor: a rule saved from "רהיטים (תשלום 3/12)" must hit
                 # every installment, and "PAYPAL *SPOTIFY" must hit the bare
-                # variant too.
-                desc_norm = df['תיאור'].astype(str).map(normalize_merchant)
+                # variant too. Beyond that a rule covers its merchant entity
+                # (other branches, cities, spellings — merchant_resolver),
+                # except where a closer rule exists: exact key, then the
+                # branch-stripped key, then the entity.
+                descs = df['תיאור'].astype(str)
+                rule_merchants = [r.merchant for r in body.category_rules if r.merchant]
+                desc_norm = merchant_keys(descs)
+                desc_canon = descs.map({d: merchant_resolver.canonical_key(d) for d in pd.unique(descs)})
+                entity_of = merchant_resolver.resolve([*pd.unique(descs), *rule_merchants])
+                desc_entity = descs.map(entity_of)
+                has_exact = desc_norm.isin({normalize_merchant(m) for m in rule_merchants})
+                has_canon = has_exact | desc_canon.isin(
+                    {merchant_resolver.canonical_key(m) for m in rule_merchants})
+                rule_labels: list[tuple[str, str]] = []
+                rule_votes: list[tuple[str, str, Optional[str]]] = []
                 for r in body.category_rules:
                     if not r.merchant:
                         continue
@@ -439,7 +706,15 @@ async def restore_session(body: RestoreSessionRequest):
                     # categorizer.
                     if rule_cat and rule_cat not in valid_cats:
                         continue
-                    rmask = desc_norm == normalize_merchant(r.merchant)
+                    if rule_cat:
+                        rule_labels.append((r.merchant, rule_cat))
+                        if rule_cat in CATEGORY_ICONS and r.source == 'user':
+                            rule_votes.append((r.merchant, rule_cat, rule_sub))
+                    rmask = (
+                        (desc_norm == normalize_merchant(r.merchant))
+                        | (~has_exact & (desc_canon == merchant_resolver.canonical_key(r.merchant)))
+                        | (~has_canon & (desc_entity == entity_of[r.merchant]))
+                    )
                     if not rmask.any():
                         continue
                     if rule_cat:
@@ -456,6 +731,13 @@ async def restore_session(body: RestoreSessionRequest):
                         if rule_cat:
                             sub_mask = rmask & (df['קטגוריה'].astype(str) == rule_cat)
                         df.loc[sub_mask, 'קטגוריה_משנה'] = rule_sub
+                # Rules (past AI resolutions included) are this session's
+                # own corpus for the local classifier; catalog categories only.
+                local_classifier.learn(rule_labels, valid=CATEGORY_ICONS, scope=session_id)
+                # ...and this user's votes in the shared merchant knowledge
+                # base — from the rules they made, not AI answers the
+                # dashboard saved for them.
+                merchant_kb.record_rules(body.voter, rule_votes)
 
             # AI-tool spend is unconditional — re-assert it AFTER rules so a
             # stale rule (e.g. Claude → 'חשמל ומחשבים' from before the category
@@ -467,6 +749,27 @@ async def restore_session(body: RestoreSessionRequest):
             # The frontend calls POST /ai-categorize right after this restore
             # returns; results are applied to the live session and persisted
             # as rules client-side, so each merchant is resolved only once.
+            # Merchants the AI already resolved (warm or durable cache) are a
+            # dict lookup away, so those are applied here, and returned for
+            # persistence like any other AI resolution. Pinned rows are
+            # skipped by THIS restore's pins, not the snapshot's stale
+            # _locked column.
+            df['_locked'] = (compute_txn_keys(df).isin(overrides_by_key)
+                             if overrides_by_key else False)
+            cached_mask, cached_descs, _ = _ai_misc_targets(df)
+            if cached_mask.any():
+                cached_idx = df.index[cached_mask]
+                shared: set[str] = set()  # knowledge-base verdicts: applied, not returned
+                for local_i, cat in cached_categories(cached_descs, local=shared).items():
+                    if cat not in valid_cats:
+                        continue
+                    df.at[cached_idx[local_i], 'קטגוריה'] = cat
+                    if _base_desc(cached_descs[local_i]) in shared:
+                        continue
+                    ai_categorized.append({
+                        "merchant": str(df.at[cached_idx[local_i], 'תיאור']),
+                        "category": cat,
+                    })
 
             # Derive subcategories from the finalized category (after overrides,
             # keyword pass, user rules and AI). Rule/manual subcategories set
@@ -547,32 +850,19 @@ async def restore_session(body: RestoreSessionRequest):
         # catalog, merchant rules AND the AI — and the _locked flag keeps
         # every later pass (rules, audit, subcategorizer) off these rows.
         # A snapshot may carry a stale baked _locked column; reset it —
-        # the overrides list is the only source of truth.
+        # the overrides list (parsed above) is the only source of truth.
         df['_locked'] = False
-        if body.transaction_overrides:
+        if overrides_by_key:
             if 'קטגוריה_משנה' not in df.columns:
                 df['קטגוריה_משנה'] = ''
-            overrides_by_key = {}
-            for o in body.transaction_overrides:
-                if not (o.txn_key and o.category):
-                    continue
-                # Pins saved under the old taxonomy are translated too.
-                pin_cat, migrated_sub = migrate_category(o.category, o.subcategory)
-                pin_sub = o.subcategory
-                if migrated_sub is not None:
-                    pin_sub = migrated_sub or None
-                if pin_cat not in valid_cats:
-                    continue
-                overrides_by_key[o.txn_key] = (pin_cat, pin_sub)
-            if overrides_by_key:
-                keys = compute_txn_keys(df)
-                for idx in df.index[keys.isin(overrides_by_key)]:
-                    pin_cat, pin_sub = overrides_by_key[keys.at[idx]]
-                    df.at[idx, 'קטגוריה'] = pin_cat
-                    # The pipeline-derived subcategory belonged to the
-                    # pipeline's category; keep only the pinned one.
-                    df.at[idx, 'קטגוריה_משנה'] = pin_sub or ''
-                    df.at[idx, '_locked'] = True
+            keys = compute_txn_keys(df)
+            for idx in df.index[keys.isin(overrides_by_key)]:
+                pin_cat, pin_sub = overrides_by_key[keys.at[idx]]
+                df.at[idx, 'קטגוריה'] = pin_cat
+                # The pipeline-derived subcategory belonged to the
+                # pipeline's category; keep only the pinned one.
+                df.at[idx, 'קטגוריה_משנה'] = pin_sub or ''
+                df.at[idx, '_locked'] = True
 
         # ── Per-transaction notes (Supabase transaction_notes) ──────────
         # Matched by the same fingerprint as pins; notes never affect
@@ -587,7 +877,6 @@ async def restore_session(body: RestoreSessionRequest):
                 for idx in df.index[keys.isin(notes_by_key)]:
                     df.at[idx, 'הערות'] = notes_by_key[keys.at[idx]]
 
-        session_id = str(uuid.uuid4())
         sessions[session_id] = df
         if custom_cats:
             SESSION_CUSTOM_CATS[session_id] = custom_cats
@@ -621,31 +910,32 @@ async def update_transaction_note(body: UpdateTransactionNoteRequest):
     if body.session_id not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    df = sessions[body.session_id]
+    with _session_lock(body.session_id):
+        df = sessions[body.session_id]
 
-    if 'id' not in df.columns:
-        raise HTTPException(status_code=400, detail="Session does not support transaction updates")
+        if 'id' not in df.columns:
+            raise HTTPException(status_code=400, detail="Session does not support transaction updates")
 
-    mask = df['id'] == body.transaction_id
-    if not mask.any():
-        raise HTTPException(status_code=404, detail="Transaction not found")
+        mask = df['id'] == body.transaction_id
+        if not mask.any():
+            raise HTTPException(status_code=404, detail="Transaction not found")
 
-    # Normalize empty/whitespace-only strings to None
-    value = body.notes.strip() if body.notes is not None else None
-    if value == "":
-        value = None
+        # Normalize empty/whitespace-only strings to None
+        value = body.notes.strip() if body.notes is not None else None
+        if value == "":
+            value = None
 
-    if 'הערות' not in df.columns:
-        df['הערות'] = None
+        if 'הערות' not in df.columns:
+            df['הערות'] = None
 
-    df.loc[mask, 'הערות'] = value
-    sessions[body.session_id] = df
+        df.loc[mask, 'הערות'] = value
+        sessions[body.session_id] = df
 
-    # The fingerprint lets the frontend persist the note in Supabase
-    # (transaction_notes) so it survives restores and cold starts.
-    row = df.loc[mask].iloc[0]
-    txn_key = txn_fingerprint(row.get('תאריך'), row.get('סכום'), row.get('תיאור'))
-    return {"success": True, "txn_key": txn_key, "notes": value}
+        # The fingerprint lets the frontend persist the note in Supabase
+        # (transaction_notes) so it survives restores and cold starts.
+        row = df.loc[mask].iloc[0]
+        txn_key = txn_fingerprint(row.get('תאריך'), row.get('סכום'), row.get('תיאור'))
+        return {"success": True, "txn_key": txn_key, "notes": value}
 
 
 @router.post("/transactions/category")
@@ -657,64 +947,64 @@ async def update_transaction_category(body: UpdateTransactionCategoryRequest):
     if body.session_id not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    df = sessions[body.session_id]
-    if 'id' not in df.columns:
-        raise HTTPException(status_code=400, detail="Session does not support transaction updates")
-
-    new_category = (body.category or '').strip()
-    if not new_category:
-        raise HTTPException(status_code=400, detail="Category cannot be empty")
-    # A name outside the catalog is a user-created category (the dynamic
-    # taxonomy): remember it for this session so rules/merchant edits and the
-    # next hygiene pass treat it as valid. The frontend persists it to
-    # Supabase user_categories so it survives restores.
-    if new_category not in CATEGORY_ICONS:
-        SESSION_CUSTOM_CATS.setdefault(body.session_id, set()).add(new_category)
-
-    mask = df['id'] == body.transaction_id
-    if not mask.any():
-        raise HTTPException(status_code=404, detail="Transaction not found")
-
-    if '_locked' not in df.columns:
-        df['_locked'] = False
-    if 'קטגוריה_משנה' not in df.columns:
-        df['קטגוריה_משנה'] = ''
+    with _session_lock(body.session_id):
+        df = sessions[body.session_id]
+        if 'id' not in df.columns:
+            raise HTTPException(status_code=400, detail="Session does not support transaction updates")
+
+        new_category = (body.category or '').strip()
+        if not new_category:
+            raise HTTPException(status_code=400, detail="Category cannot be empty")
+        # A name outside the catalog is a user-created category (the dynamic
+        # taxonomy): remember it for this session so rules/merchant edits and the
+        # next hygiene pass treat it as valid. The frontend persists it to
+        # Supabase user_categories so it survives restores.
+        if new_category not in CATEGORY_ICONS:
+            SESSION_CUSTOM_CATS.setdefault(body.session_id, set()).add(new_category)
+
+        mask = df['id'] == body.transaction_id
+        if not mask.any():
+            raise HTTPException(status_code=404, detail="Transaction not found")
+
+        if '_locked' not in df.columns:
+            df['_locked'] = False
+        if 'קטגוריה_משנה' not in df.columns:
+            df['קטגוריה_משנה'] = ''
+
+        row = df.loc[mask].iloc[0]
+        merchant = str(row['תיאור']) if 'תיאור' in df.columns else None
+        txn_key = txn_fingerprint(row.get('תאריך'), row.get('סכום'), row.get('תיאור'))
+
+        if body.only_this:
+            # "אל תשנה עסקאות דומות": this row only, pinned. The old subcategory
+            # belonged to the old category (restore clears it the same way).
+            df.loc[mask, 'קטגוריה'] = new_category
+            df.loc[mask, '_locked'] = True
+            df.loc[mask, 'קטגוריה_משנה'] = ''
+            affected = int(mask.sum())
+        else:
+            # Normal edit = a merchant rule: apply it to EVERY transaction of the
+            # same canonical merchant RIGHT NOW (not just on the next restore),
+            # skipping pinned rows. The clicked row is explicitly unpinned first
+            # (the user reverted it to merchant-rule behavior).
+            df.loc[mask, '_locked'] = False
+            merchant_mask = _merchant_mask(df, [merchant])
+            apply_mask = (merchant_mask | mask) & ~locked_mask(df)
+            changed = apply_mask & (df['קטגוריה'].astype(str) != new_category)
+            df.loc[apply_mask, 'קטגוריה'] = new_category
+            # Old subcategories belonged to the old category — re-derive.
+            df.loc[changed, 'קטגוריה_משנה'] = ''
+            derive_subcategory(df)
+            affected = int(apply_mask.sum())
 
-    row = df.loc[mask].iloc[0]
-    merchant = str(row['תיאור']) if 'תיאור' in df.columns else None
-    txn_key = txn_fingerprint(row.get('תאריך'), row.get('סכום'), row.get('תיאור'))
+        sessions[body.session_id] = df
 
-    if body.only_this:
-        # "אל תשנה עסקאות דומות": this row only, pinned. The old subcategory
-        # belonged to the old category (restore clears it the same way).
-        df.loc[mask, 'קטגוריה'] = new_category
-        df.loc[mask, '_locked'] = True
-        df.loc[mask, 'קטגוריה_משנה'] = ''
-        affected = int(mask.sum())
-    else:
-        # Normal edit = a merchant rule: apply it to EVERY transaction of the
-        # same canonical merchant RIGHT NOW (not just on the next restore),
-        # skipping pinned rows. The clicked row is explicitly unpinned first
-        # (the user reverted it to merchant-rule behavior).
-        df.loc[mask, '_locked'] = False
-        key = normalize_merchant(merchant)
-        merchant_mask = df['תיאור'].astype(str).map(normalize_merchant) == key
-        apply_mask = (merchant_mask | mask) & ~locked_mask(df)
-        changed = apply_mask & (df['קטגוריה'].astype(str) != new_category)
-        df.loc[apply_mask, 'קטגוריה'] = new_category
-        # Old subcategories belonged to the old category — re-derive.
-        df.loc[changed, 'קטגוריה_משנה'] = ''
-        derive_subcategory(df)
-        affected = int(apply_mask.sum())
-
-    sessions[body.session_id] = df
-
-    # Tell the caller what the row's description is, so the frontend can
-    # save a merchant→category rule without a separate round-trip — and the
-    # row's stable fingerprint for persisting a single-transaction override.
-    return {"success": True, "merchant": merchant, "category": new_category,
-            "txn_key": txn_key, "locked": bool(body.only_this),
-            "affected_count": affected}
+        # Tell the caller what the row's description is, so the frontend can
+        # save a merchant→category rule without a separate round-trip — and the
+        # row's stable fingerprint for persisting a single-transaction override.
+        return {"success": True, "merchant": merchant, "category": new_category,
+                "txn_key": txn_key, "locked": bool(body.only_this),
+                "affected_count": affected}
 
 
 @router.post("/transactions/category-bulk")
@@ -733,60 +1023,60 @@ async def bulk_update_category(body: BulkUpdateCategoryRequest):
     """
     if body.session_id not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
-    df = sessions[body.session_id]
-    if 'id' not in df.columns:
-        raise HTTPException(status_code=400, detail="Session does not support transaction updates")
-
-    new_category = (body.category or '').strip()
-    if not new_category:
-        raise HTTPException(status_code=400, detail="Category cannot be empty")
-    if new_category not in CATEGORY_ICONS:
-        SESSION_CUSTOM_CATS.setdefault(body.session_id, set()).add(new_category)
-    new_sub = (body.subcategory or '').strip()
-
-    ids = [int(i) for i in (body.transaction_ids or [])]
-    sel_mask = df['id'].isin(ids)
-    if not sel_mask.any():
-        raise HTTPException(status_code=404, detail="Transactions not found")
-
-    if '_locked' not in df.columns:
-        df['_locked'] = False
-    if 'קטגוריה_משנה' not in df.columns:
-        df['קטגוריה_משנה'] = ''
+    with _session_lock(body.session_id):
+        df = sessions[body.session_id]
+        if 'id' not in df.columns:
+            raise HTTPException(status_code=400, detail="Session does not support transaction updates")
+
+        new_category = (body.category or '').strip()
+        if not new_category:
+            raise HTTPException(status_code=400, detail="Category cannot be empty")
+        if new_category not in CATEGORY_ICONS:
+            SESSION_CUSTOM_CATS.setdefault(body.session_id, set()).add(new_category)
+        new_sub = (body.subcategory or '').strip()
+
+        ids = [int(i) for i in (body.transaction_ids or [])]
+        sel_mask = df['id'].isin(ids)
+        if not sel_mask.any():
+            raise HTTPException(status_code=404, detail="Transactions not found")
+
+        if '_locked' not in df.columns:
+            df['_locked'] = False
+        if 'קטגוריה_משנה' not in df.columns:
+            df['קטגוריה_משנה'] = ''
+
+        # Per-row info for Supabase persistence, computed BEFORE mutation.
+        items = [
+            {
+                "id": int(row['id']),
+                "merchant": str(row.get('תיאור', '')),
+                "txn_key": txn_fingerprint(row.get('תאריך'), row.get('סכום'), row.get('תיאור')),
+            }
+            for _, row in df.loc[sel_mask].iterrows()
+        ]
 
-    # Per-row info for Supabase persistence, computed BEFORE mutation.
-    items = [
-        {
-            "id": int(row['id']),
-            "merchant": str(row.get('תיאור', '')),
-            "txn_key": txn_fingerprint(row.get('תאריך'), row.get('סכום'), row.get('תיאור')),
-        }
-        for _, row in df.loc[sel_mask].iterrows()
-    ]
+        if body.only_this:
+            df.loc[sel_mask, 'קטגוריה'] = new_category
+            df.loc[sel_mask, 'קטגוריה_משנה'] = new_sub
+            df.loc[sel_mask, '_locked'] = True
+            affected = int(sel_mask.sum())
+        else:
+            df.loc[sel_mask, '_locked'] = False
+            merchant_mask = _merchant_mask(df, [it["merchant"] for it in items])
+            apply_mask = (merchant_mask | sel_mask) & ~locked_mask(df)
+            changed = apply_mask & (df['קטגוריה'].astype(str) != new_category)
+            df.loc[apply_mask, 'קטגוריה'] = new_category
+            df.loc[changed, 'קטגוריה_משנה'] = ''
+            derive_subcategory(df)
+            # The explicit bulk subcategory is the user's word — applied AFTER the
+            # seeded derivation, like the single-row subcategory editor.
+            if new_sub:
+                df.loc[apply_mask, 'קטגוריה_משנה'] = new_sub
+            affected = int(apply_mask.sum())
 
-    if body.only_this:
-        df.loc[sel_mask, 'קטגוריה'] = new_category
-        df.loc[sel_mask, 'קטגוריה_משנה'] = new_sub
-        df.loc[sel_mask, '_locked'] = True
-        affected = int(sel_mask.sum())
-    else:
-        df.loc[sel_mask, '_locked'] = False
-        keys = {normalize_merchant(it["merchant"]) for it in items if it["merchant"]}
-        merchant_mask = df['תיאור'].astype(str).map(normalize_merchant).isin(keys)
-        apply_mask = (merchant_mask | sel_mask) & ~locked_mask(df)
-        changed = apply_mask & (df['קטגוריה'].astype(str) != new_category)
-        df.loc[apply_mask, 'קטגוריה'] = new_category
-        df.loc[changed, 'קטגוריה_משנה'] = ''
-        derive_subcategory(df)
-        # The explicit bulk subcategory is the user's word — applied AFTER the
-        # seeded derivation, like the single-row subcategory editor.
-        if new_sub:
-            df.loc[apply_mask, 'קטגוריה_משנה'] = new_sub
-        affected = int(apply_mask.sum())
-
-    sessions[body.session_id] = df
-    return {"success": True, "category": new_category, "subcategory": new_sub,
-            "items": items, "affected_count": affected}
+        sessions[body.session_id] = df
+        return {"success": True, "category": new_category, "subcategory": new_sub,
+                "items": items, "affected_count": affected}
 
 
 @router.post("/transactions/subcategory")
@@ -799,47 +1089,47 @@ async def update_transaction_subcategory(body: UpdateTransactionSubcategoryReque
     if body.session_id not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    df = sessions[body.session_id]
-    if 'id' not in df.columns:
-        raise HTTPException(status_code=400, detail="Session does not support transaction updates")
-
-    mask = df['id'] == body.transaction_id
-    if not mask.any():
-        raise HTTPException(status_code=404, detail="Transaction not found")
-
-    new_subcategory = (body.subcategory or '').strip()
-    if 'קטגוריה_משנה' not in df.columns:
-        df['קטגוריה_משנה'] = ''
-    if '_locked' not in df.columns:
-        df['_locked'] = False
-
-    row = df.loc[mask].iloc[0]
-    merchant = str(row['תיאור']) if 'תיאור' in df.columns else None
-    category = str(row['קטגוריה']) if 'קטגוריה' in df.columns else None
-    txn_key = txn_fingerprint(row.get('תאריך'), row.get('סכום'), row.get('תיאור'))
-
-    if body.only_this:
-        df.loc[mask, 'קטגוריה_משנה'] = new_subcategory
-        df.loc[mask, '_locked'] = True
-    else:
-        # Normal edit = a merchant subrule: apply it NOW to every unpinned
-        # transaction of the same merchant within the same category (the same
-        # scoping the rule gets on restore).
-        key = normalize_merchant(merchant)
-        merchant_mask = df['תיאור'].astype(str).map(normalize_merchant) == key
-        scope = merchant_mask & (df['קטגוריה'].astype(str) == (category or ''))
-        df.loc[(scope | mask) & ~locked_mask(df), 'קטגוריה_משנה'] = new_subcategory
+    with _session_lock(body.session_id):
+        df = sessions[body.session_id]
+        if 'id' not in df.columns:
+            raise HTTPException(status_code=400, detail="Session does not support transaction updates")
+
+        mask = df['id'] == body.transaction_id
+        if not mask.any():
+            raise HTTPException(status_code=404, detail="Transaction not found")
+
+        new_subcategory = (body.subcategory or '').strip()
+        if 'קטגוריה_משנה' not in df.columns:
+            df['קטגוריה_משנה'] = ''
+        if '_locked' not in df.columns:
+            df['_locked'] = False
+
+        row = df.loc[mask].iloc[0]
+        merchant = str(row['תיאור']) if 'תיאור' in df.columns else None
+        category = str(row['קטגוריה']) if 'קטגוריה' in df.columns else None
+        txn_key = txn_fingerprint(row.get('תאריך'), row.get('סכום'), row.get('תיאור'))
+
+        if body.only_this:
+            df.loc[mask, 'קטגוריה_משנה'] = new_subcategory
+            df.loc[mask, '_locked'] = True
+        else:
+            # Normal edit = a merchant subrule: apply it NOW to every unpinned
+            # transaction of the same merchant within the same category (the same
+            # scoping the rule gets on restore).
+            merchant_mask = _merchant_mask(df, [merchant])
+            scope = merchant_mask & (df['קטגוריה'].astype(str) == (category or ''))
+            df.loc[(scope | mask) & ~locked_mask(df), 'קטגוריה_משנה'] = new_subcategory
 
-    sessions[body.session_id] = df
+        sessions[body.session_id] = df
 
-    return {
-        "success": True,
-        "merchant": merchant,
-        "category": category,
-        "subcategory": new_subcategory,
-        "txn_key": txn_key,
-        "locked": bool(body.only_this or (locked_mask(df).loc[mask]).any()),
-    }
+        return {
+            "success": True,
+            "merchant": merchant,
+            "category": category,
+            "subcategory": new_subcategory,
+            "txn_key": txn_key,
+            "locked": bool(body.only_this or (locked_mask(df).loc[mask]).any()),
+        }
 
 
 @router.get("/categories/catalog")
@@ -892,32 +1182,34 @@ async def rename_category(body: RenameCategoryRequest):
     if not old_category or not new_category:
         raise HTTPException(status_code=400, detail="Category names cannot be empty")
 
-    df = sessions[body.session_id]
-    if 'קטגוריה' not in df.columns:
-        raise HTTPException(status_code=400, detail="Session does not have categories")
+    with _session_lock(body.session_id):
+        df = sessions[body.session_id]
+        if 'קטגוריה' not in df.columns:
+            raise HTTPException(status_code=400, detail="Session does not have categories")
 
-    mask = df['קטגוריה'].astype(str) == old_category
-    if not mask.any():
-        raise HTTPException(status_code=404, detail="Category not found")
+        mask = df['קטגוריה'].astype(str) == old_category
+        if not mask.any():
+            raise HTTPException(status_code=404, detail="Category not found")
 
-    merchants: list[str] = []
-    if 'תיאור' in df.columns:
-        merchants = sorted({str(v) for v in df.loc[mask, 'תיאור'].dropna().tolist() if str(v).strip()})
+        merchants: list[str] = []
+        if 'תיאור' in df.columns:
+            merchants = sorted({str(v) for v in df.loc[mask, 'תיאור'].dropna().tolist() if str(v).strip()})
 
-    df.loc[mask, 'קטגוריה'] = new_category
-    sessions[body.session_id] = df
+        df.loc[mask, 'קטגוריה'] = new_category
+        sessions[body.session_id] = df
 
-    return {
-        "success": True,
-        "old_category": old_category,
-        "new_category": new_category,
-        "affected_count": int(mask.sum()),
-        "merchants": merchants,
-    }
+        return {
+            "success": True,
+            "old_category": old_category,
+            "new_category": new_category,
+            "affected_count": int(mask.sum()),
+            "merchants": merchants,
+        }
 
 
 @router.get("/transactions")
-async def get_transactions(
+@_offload(worker_pools.INTERACTIVE)
+def get_transactions(
     sessionId: str = Query(...),
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
@@ -1038,7 +1330,8 @@ async def get_transactions(
 
 
 @router.get("/session-files")
-async def get_session_files(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_session_files(sessionId: str = Query(...)):
     """List source files in the current session with per-file stats."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1078,24 +1371,25 @@ async def delete_session_file(sessionId: str = Query(...), file_name: str = Quer
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    df = sessions[sessionId]
-    if '_source_file' not in df.columns:
-        raise HTTPException(status_code=400, detail="No source file tracking in this session")
+    with _session_lock(sessionId):
+        df = sessions[sessionId]
+        if '_source_file' not in df.columns:
+            raise HTTPException(status_code=400, detail="No source file tracking in this session")
 
-    before = len(df)
-    df = df[df['_source_file'] != file_name].reset_index(drop=True)
-    removed = before - len(df)
+        before = len(df)
+        df = df[df['_source_file'] != file_name].reset_index(drop=True)
+        removed = before - len(df)
 
-    if removed == 0:
-        raise HTTPException(status_code=404, detail=f"File '{file_name}' not found in session")
+        if removed == 0:
+            raise HTTPException(status_code=404, detail=f"File '{file_name}' not found in session")
 
-    sessions[sessionId] = df
-    return {
-        "success": True,
-        "removed": removed,
-        "remaining": len(df),
-        "message": f"הוסרו {removed} עסקאות מקובץ {file_name}",
-    }
+        sessions[sessionId] = df
+        return {
+            "success": True,
+            "removed": removed,
+            "remaining": len(df),
+            "message": f"הוסרו {removed} עסקאות מקובץ {file_name}",
+        }
 
 
 @router.delete("/session")
@@ -1107,7 +1401,8 @@ async def delete_session(sessionId: str = Query(...)):
 
 
 @router.get("/session-info")
-async def get_session_info(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_session_info(sessionId: str = Query(...)):
     """Get detailed metadata about the current session data."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1182,7 +1477,8 @@ async def get_session_info(sessionId: str = Query(...)):
 
 
 @router.get("/owners")
-async def get_owners(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_owners(sessionId: str = Query(...)):
     """Distinct owners present in the session, for the per-person filter."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1199,7 +1495,8 @@ class ScopeSessionRequest(BaseModel):
 
 
 @router.post("/session/scope")
-async def scope_session(body: ScopeSessionRequest):
+@_offload(worker_pools.HEAVY)
+def scope_session(body: ScopeSessionRequest):
     """Return a session id whose data is filtered to a single owner (_owner).
 
     The dashboard's per-person filter calls this and then passes the returned id
@@ -1228,6 +1525,25 @@ class AICategorizeRequest(BaseModel):
     session_id: str
 
 
+def _ai_misc_targets(df) -> tuple[pd.Series, list, Optional[list]]:
+    """The rows the AI categorizer should look at: שונות, not pinned.
+
+    Returns (mask, descriptions, issuer hints). Pinned rows ("אל תשנה עסקאות
+    דומות") are never sent to the AI. The card-company sector (ענף_מקור) is a
+    useful hint — passed alongside each description when the column exists.
+    """
+    misc_mask = (df['קטגוריה'] == 'שונות') & ~locked_mask(df)
+    misc_descs = df.loc[misc_mask, 'תיאור'].tolist()
+    misc_issuers = None
+    if 'ענף_מקור' in df.columns:
+        misc_issuers = [
+            None if (v is None or str(v).strip() == '' or str(v).lower() in ('nan', 'none'))
+            else str(v).strip()
+            for v in df.loc[misc_mask, 'ענף_מקור'].tolist()
+        ]
+    return misc_mask, misc_descs, misc_issuers
+
+
 @router.post("/ai-categorize")
 def ai_categorize(body: AICategorizeRequest):
     """Run the AI fallback (Claude + web search) on the session's remaining
@@ -1245,38 +1561,66 @@ def ai_categorize(body: AICategorizeRequest):
 
     ai_categorized: list[dict] = []
     if 'קטגוריה' in df.columns and 'תיאור' in df.columns:
-        # Pinned rows ("אל תשנה עסקאות דומות") are never sent to the AI.
-        misc_mask = (df['קטגוריה'] == 'שונות') & ~locked_mask(df)
+        misc_mask, misc_descs, misc_issuers = _ai_misc_targets(df)
         if misc_mask.any():
-            misc_descs = df.loc[misc_mask, 'תיאור'].tolist()
-            # Card-company sector (ענף_מקור) is a useful hint for the AI —
-            # pass it alongside each description when the column exists.
-            misc_issuers = None
-            if 'ענף_מקור' in df.columns:
-                misc_issuers = [
-                    None if (v is None or str(v).strip() == '' or str(v).lower() in ('nan', 'none'))
-                    else str(v).strip()
-                    for v in df.loc[misc_mask, 'ענף_מקור'].tolist()
-                ]
             sid = body.session_id
 
             def _progress(done, total):
-                AI_PROGRESS[sid] = {"stage": "categorizing", "done": done, "total": total, "detail": ""}
+                _set_progress(sid, "categorizing", done, total)
 
-            AI_PROGRESS[sid] = {"stage": "categorizing", "done": 0, "total": 0, "detail": ""}
-            ai_map = categorize_transactions(misc_descs, misc_issuers, on_progress=_progress) or {}
             misc_idx = df.index[misc_mask].tolist()
-            for local_i, cat in ai_map.items():
-                if 0 <= local_i < len(misc_idx):
-                    df.at[misc_idx[local_i], 'קטגוריה'] = cat
-                    ai_categorized.append({
-                        "merchant": str(df.at[misc_idx[local_i], 'תיאור']),
-                        "category": cat,
-                    })
-            if ai_categorized:
-                derive_subcategory(df)
+            misc_bases = pd.Series([_base_desc(d) for d in misc_descs], index=misc_idx, dtype=object)
+            lock = _session_lock(sid)
+            # Rows an answer actually moved out of שונות (row → category);
+            # rows edited or pinned during the run are not in it.
+            assigned: dict[int, str] = {}
+
+            def _resolved(resolved: dict) -> None:
+                # Each merchant lands in the live session the moment its
+                # answer parses; subcategories are derived once at the end.
+                applied: dict[str, str] = {}
+                with lock:
+                    if sessions.get(sid) is not df:
+                        return
+                    hit = misc_bases[misc_bases.isin(resolved.keys())]
+                    open_rows = ((df.loc[hit.index, 'קטגוריה'].astype(str) == 'שונות')
+                                 & ~locked_mask(df.loc[hit.index]))
+                    for idx in hit.index[open_rows]:
+                        df.at[idx, 'קטגוריה'] = resolved[hit.at[idx]]
+                        assigned[idx] = resolved[hit.at[idx]]
+                        applied.setdefault(str(df.at[idx, 'תיאור']), resolved[hit.at[idx]])
+                    if applied:
+                        lock.wrote()
+                if applied:
+                    ai_events.publish(sid, "categorized", {"assignments": [
+                        {"merchant": m, "category": c} for m, c in applied.items()
+                    ]})
+
+            _set_progress(sid, "categorizing")
+            guessed: set[str] = set()
+            with ai_metrics.session_scope(sid):
+                categorize_transactions(
+                    misc_descs, misc_issuers, on_progress=_progress, on_resolved=_resolved,
+                    session_id=sid, local=guessed,
+                )
+            with lock:
+                # The session was replaced (a restore) or deleted meanwhile:
+                # nothing here landed in it.
+                if sessions.get(sid) is not df:
+                    return {"success": False, "ai_categorized": []}
+                # Rows edited since their answer landed are the user's now.
+                # Local classifier guesses and knowledge-base verdicts are
+                # applied, not saved as rules.
+                ai_categorized = [
+                    {"merchant": str(df.at[idx, 'תיאור']), "category": cat}
+                    for idx, cat in assigned.items()
+                    if df.at[idx, 'קטגוריה'] == cat and misc_bases.at[idx] not in guessed
+                ]
+                if assigned:
+                    derive_subcategory(df)
+                    lock.wrote()
 
-    AI_PROGRESS[body.session_id] = {"stage": "categorized", "done": 0, "total": 0, "detail": ""}
+    _set_progress(body.session_id, "categorized")
     return {"success": True, "ai_categorized": ai_categorized}
 
 
@@ -1284,6 +1628,14 @@ class AIAuditRequest(BaseModel):
     session_id: str
     limit: int = 60
     exclude_merchants: list[str] = []
+    # "interactive" (default) | "batch": Message Batches API, returns a job.
+    mode: str = "interactive"
+
+
+def _via_batch(mode: str) -> bool:
+    if mode not in ("interactive", "batch"):
+        raise HTTPException(status_code=400, detail="mode must be 'interactive' or 'batch'")
+    return mode == "batch"
 
 
 @router.post("/ai-audit")
@@ -1297,7 +1649,12 @@ def ai_audit(body: AIAuditRequest):
     merchant rule via /merchants/category + the client-side rule upsert.
     Sync (non-async) on purpose, like /ai-categorize: the Anthropic call
     blocks, so FastAPI runs it in its threadpool.
+
+    mode="batch" sends the audit through the Message Batches API instead:
+    the response is {job_id} at once and the usual body becomes the job's
+    result (GET /ai-jobs/{job_id}, or the "job" event on /ai-events).
     """
+    via_batch = _via_batch(body.mode)
     df = sessions.get(body.session_id)
     if df is None:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1313,49 +1670,27 @@ def ai_audit(body: AIAuditRequest):
         return {"success": True, "proposals": [], "audited_count": 0,
                 "audited_merchants": [], "remaining": 0}
 
-    excluded = {normalize_merchant(m) for m in (body.exclude_merchants or [])}
-
-    # Group by canonical merchant: representative raw name (most frequent),
+    # One audit item per merchant entity (branches and spellings of one
+    # business share a verdict); excluding a merchant excludes its entity.
+    names = expenses['תיאור'].astype(str).str.strip()
+    keys, excluded = merchant_resolver.entities_of(names, body.exclude_merchants or [])
+    # Unconditional overrides can't be changed by a rule — auditing them
+    # would only produce dead proposals. AI tools are pinned to
+    # טכנולוגיה/AI by apply_ai_tool_override, so skip AI-subcategory rows.
+    ai_tool = (expenses['קטגוריה'].astype(str) == AI_CATEGORY) & (
+        expenses['קטגוריה_משנה'].astype(str).str.strip() == AI_SUBCATEGORY
+        if 'קטגוריה_משנה' in expenses.columns else False
+    )
+    # The keyword catalog governs these merchants on every restore; a rule
+    # can't move them, so verifying them would waste web searches.
+    in_catalog = catalog_hits(expenses['תיאור'].astype(str).str.strip())
+    keep = ~keys.isin(excluded) & ~ai_tool & ~in_catalog
+    expenses, keys = expenses[keep], keys[keep]
+    ai_metrics.count_entities('audit', merchant_resolver.folded(names[keep], keys))
+
+    # Group by merchant entity: representative raw name (most frequent),
     # current category (most frequent), volume, issuer sector when present.
-    merchants: dict[str, dict] = {}
-    has_issuer = 'ענף_מקור' in expenses.columns
-    for _, row in expenses.iterrows():
-        raw = str(row.get('תיאור', '')).strip()
-        key = normalize_merchant(raw)
-        if not key or key in excluded:
-            continue
-        cat = str(row.get('קטגוריה', 'שונות'))
-        # Unconditional overrides can't be changed by a rule — auditing them
-        # would only produce dead proposals. AI tools are pinned to
-        # טכנולוגיה/AI by apply_ai_tool_override, so skip AI-subcategory rows.
-        if cat == AI_CATEGORY and str(row.get('קטגוריה_משנה', '')).strip() == AI_SUBCATEGORY:
-            continue
-        # The keyword catalog governs these merchants on every restore; a rule
-        # can't move them, so verifying them would waste web searches.
-        if any(kw in raw.lower() for kw in KEYWORD_TO_CATEGORY):
-            continue
-        m = merchants.setdefault(key, {
-            "merchant": raw, "current": cat, "count": 0, "total": 0.0,
-            "issuer": None, "_names": {}, "_cats": {},
-        })
-        m["count"] += 1
-        try:
-            m["total"] += abs(float(row.get('סכום', 0) or 0))
-        except (TypeError, ValueError):
-            pass
-        m["_names"][raw] = m["_names"].get(raw, 0) + 1
-        m["_cats"][cat] = m["_cats"].get(cat, 0) + 1
-        if has_issuer and not m["issuer"]:
-            issuer = row.get('ענף_מקור')
-            if issuer is not None and str(issuer).strip() and str(issuer).lower() not in ('nan', 'none'):
-                m["issuer"] = str(issuer).strip()
-
-    items = []
-    for m in merchants.values():
-        m["merchant"] = max(m["_names"], key=m["_names"].get)
-        m["current"] = max(m["_cats"], key=m["_cats"].get)
-        del m["_names"], m["_cats"]
-        items.append(m)
+    items = aggregate_merchants(expenses, keys=keys).to_dict('records')
 
     # Biggest spend first — the merchants where a wrong category distorts the
     # charts most. `limit` caps the Claude batch; run again for the next slice.
@@ -1364,14 +1699,26 @@ def ai_audit(body: AIAuditRequest):
     items = items[: max(1, min(int(body.limit or 60), 200))]
 
     sid = body.session_id
+    if via_batch:
+        job = ai_jobs.submit("audit", sid, lambda: _audit_result(sid, items, total_eligible, True))
+        return {"success": True, "job_id": job["id"], "status": job["status"]}
+    return _audit_result(sid, items, total_eligible)
 
+
+def _audit_result(sid: str, items: list[dict], total_eligible: int, via_batch: bool = False) -> dict:
+    """Run the audit over the prepared merchant summaries → /ai-audit body."""
     def _audit_progress(done, total):
-        AI_PROGRESS[sid] = {"stage": "auditing", "done": done, "total": total, "detail": ""}
+        _set_progress(sid, "auditing", done, total)
 
-    verdicts = audit_merchants(items, on_progress=_audit_progress)
+    # Interactive calls keep the plain signature; only jobs pass the transport.
+    transport = {"via_batch": True} if via_batch else {}
+    with ai_metrics.session_scope(sid):
+        verdicts = audit_merchants(items, on_progress=_audit_progress, **transport)
     if verdicts is None:
         raise HTTPException(status_code=503, detail="AI is not configured (ANTHROPIC_API_KEY)")
 
+    names = pd.Series([str(it["merchant"]) for it in items], dtype=object)
+    hit_by_name = dict(zip(names, catalog_hits(names)))
     proposals = []
     # Merchants whose current category the web check CONFIRMED — the client
     # pins these as rules so each merchant is verified once, ever.
@@ -1385,8 +1732,7 @@ def ai_audit(body: AIAuditRequest):
             if v["category"] == it["current"] and it["current"] != 'שונות':
                 verified.append({"merchant": it["merchant"], "category": it["current"]})
             continue
-        merchant_lower = str(it["merchant"]).lower()
-        catalog_hit = any(kw in merchant_lower for kw in KEYWORD_TO_CATEGORY)
+        catalog_hit = bool(hit_by_name.get(str(it["merchant"]), False))
         proposals.append({
             "merchant": it["merchant"],
             "current_category": it["current"],
@@ -1437,36 +1783,36 @@ async def update_merchant_category(body: UpdateMerchantCategoryRequest):
     if new_category not in _valid_categories(body.session_id):
         raise HTTPException(status_code=400, detail="Unknown category")
 
-    df = sessions[body.session_id]
-    if 'תיאור' not in df.columns:
-        raise HTTPException(status_code=400, detail="Session has no descriptions")
-
-    key = normalize_merchant(body.merchant)
-    mask = df['תיאור'].astype(str).map(normalize_merchant) == key
-    if not mask.any():
-        raise HTTPException(status_code=404, detail="Merchant not found")
-
-    # A merchant-wide edit never touches rows pinned by "אל תשנה עסקאות
-    # דומות" — that's the entire point of the pin (e.g. ביט transfers,
-    # each classified differently).
-    mask = mask & ~locked_mask(df)
-    if not mask.any():
-        return {"success": True, "merchant": body.merchant,
-                "category": new_category, "affected_count": 0}
-
-    df.loc[mask, 'קטגוריה'] = new_category
-    # The old subcategory belonged to the old category; re-derive from scratch.
-    if 'קטגוריה_משנה' in df.columns:
-        df.loc[mask, 'קטגוריה_משנה'] = ''
-        derive_subcategory(df)
-    sessions[body.session_id] = df
+    with _session_lock(body.session_id):
+        df = sessions[body.session_id]
+        if 'תיאור' not in df.columns:
+            raise HTTPException(status_code=400, detail="Session has no descriptions")
 
-    return {
-        "success": True,
-        "merchant": body.merchant,
-        "category": new_category,
-        "affected_count": int(mask.sum()),
-    }
+        mask = _merchant_mask(df, [body.merchant])
+        if not mask.any():
+            raise HTTPException(status_code=404, detail="Merchant not found")
+
+        # A merchant-wide edit never touches rows pinned by "אל תשנה עסקאות
+        # דומות" — that's the entire point of the pin (e.g. ביט transfers,
+        # each classified differently).
+        mask = mask & ~locked_mask(df)
+        if not mask.any():
+            return {"success": True, "merchant": body.merchant,
+                    "category": new_category, "affected_count": 0}
+
+        df.loc[mask, 'קטגוריה'] = new_category
+        # The old subcategory belonged to the old category; re-derive from scratch.
+        if 'קטגוריה_משנה' in df.columns:
+            df.loc[mask, 'קטגוריה_משנה'] = ''
+            derive_subcategory(df)
+        sessions[body.session_id] = df
+
+        return {
+            "success": True,
+            "merchant": body.merchant,
+            "category": new_category,
+            "affected_count": int(mask.sum()),
+        }
 
 
 class AISubcategorizeRequest(BaseModel):
@@ -1478,9 +1824,18 @@ class AISubcategorizeRequest(BaseModel):
 class AISubcategorizeAllRequest(BaseModel):
     session_id: str
     limit_per_category: int = 80
+    mode: str = "interactive"  # as AIAuditRequest.mode
+
 
+def _merchant_mask(df: pd.DataFrame, merchants: list) -> pd.Series:
+    """Rows of these merchants' entities — what a rule saved from them
+    covers on the next restore, applied to the live session now."""
+    ids, targets = merchant_resolver.entities_of(df['תיאור'], merchants)
+    return ids.isin(targets)
 
-def _ai_subcategorize_category(df, category: str, limit: int) -> tuple[list[dict], int]:
+
+def _ai_subcategorize_category(df, category: str, limit: int, lock=None,
+                               via_batch: bool = False) -> tuple[list[dict], int]:
     """AI subcategory split for one category, applied to df in place.
 
     Groups the category's rows that still have no קטגוריה_משנה by canonical
@@ -1488,71 +1843,77 @@ def _ai_subcategorize_category(df, category: str, limit: int) -> tuple[list[dict
     merchants web-searched — never guessed), fills ONLY empty subcategories so
     manual assignments survive. Returns (assignments, remaining_merchants).
     Raises HTTPException(503) when AI isn't configured.
+
+    `lock` (the session lock) is held while df is read and written, but not
+    during the AI call — the pipeline runs several categories concurrently.
     """
-    sub_series = df['קטגוריה_משנה'].fillna('').astype(str).str.strip()
-    cat_mask = df['קטגוריה'].astype(str) == category
-    # Pinned rows ("אל תשנה עסקאות דומות") keep whatever the user chose,
-    # including an intentionally empty subcategory.
-    target = cat_mask & (sub_series == '') & ~locked_mask(df)
-    if not target.any():
-        return [], 0
-
-    # Group by canonical merchant: representative raw name (most frequent) + volume.
-    merchants: dict[str, dict] = {}
-    for _, row in df[target].iterrows():
-        raw = str(row.get('תיאור', '')).strip()
-        key = normalize_merchant(raw)
-        if not key:
-            continue
-        m = merchants.setdefault(key, {"merchant": raw, "count": 0, "total": 0.0, "_names": {}})
-        m["count"] += 1
-        try:
-            m["total"] += abs(float(row.get('סכום', 0) or 0))
-        except (TypeError, ValueError):
-            pass
-        m["_names"][raw] = m["_names"].get(raw, 0) + 1
-
-    items = []
-    for key, m in merchants.items():
-        m["merchant"] = max(m["_names"], key=m["_names"].get)
-        del m["_names"]
-        m["_key"] = key
-        items.append(m)
+    guard = lock if lock is not None else nullcontext()
+    with guard:
+        sub_series = df['קטגוריה_משנה'].fillna('').astype(str).str.strip()
+        cat_mask = df['קטגוריה'].astype(str) == category
+        # Pinned rows ("אל תשנה עסקאות דומות") keep whatever the user chose,
+        # including an intentionally empty subcategory.
+        target = cat_mask & (sub_series == '') & ~locked_mask(df)
+        if not target.any():
+            return [], 0
+
+        # Group by merchant entity: representative raw name (most frequent) + volume.
+        desc_norm = merchant_resolver.entity_ids(df['תיאור'])
+        merchants = aggregate_merchants(df[target], keys=desc_norm[target])
+        ai_metrics.count_entities(
+            'subcategorize', merchant_resolver.folded(df.loc[target, 'תיאור'].astype(str), merchants.index))
+
+        # Existing names for consistency: the seeded catalog for this parent plus
+        # whatever is already in use on the category's rows.
+        existing = list(dict.fromkeys(
+            get_subcategory_catalog().get(category, [])
+            + sorted({s for s in sub_series[cat_mask] if s})
+        ))
+
+    items = [
+        {"merchant": m["merchant"], "count": int(m["count"]), "total": float(m["total"]), "_key": key}
+        for key, m in merchants.iterrows()
+    ]
     items.sort(key=lambda m: m["total"], reverse=True)
     total_eligible = len(items)
     items = items[: max(1, min(int(limit or 80), 200))]
 
-    # Existing names for consistency: the seeded catalog for this parent plus
-    # whatever is already in use on the category's rows.
-    existing = list(dict.fromkeys(
-        get_subcategory_catalog().get(category, [])
-        + sorted({s for s in sub_series[cat_mask] if s})
-    ))
+    assignments: dict[int, dict] = {}  # item index → assignment
+
+    def _land(i: int, sub: str) -> None:
+        # Fill only rows that are still in this category and still empty,
+        # re-read under the lock: a manual assignment made while the AI call
+        # was in flight survives.
+        if not sub or not (0 <= i < len(items)) or i in assignments:
+            return
+        it = items[i]
+        with guard:
+            apply_mask = (
+                target.reindex(df.index, fill_value=False)
+                & (df['קטגוריה'].astype(str) == category)
+                & (df['קטגוריה_משנה'].fillna('').astype(str).str.strip() == '')
+                & (desc_norm.reindex(df.index) == it["_key"])
+            )
+            df.loc[apply_mask, 'קטגוריה_משנה'] = sub
+            if lock is not None:
+                lock.wrote()
+            assignments[i] = {
+                "merchant": it["merchant"],
+                "category": category,
+                "subcategory": sub,
+                "count": it["count"],
+                "total": round(_sanitize(float(it["total"])), 2),
+            }
 
-    suggestions = suggest_subcategories(category, items, existing)
+    transport = {"via_batch": True} if via_batch else {}
+    # Each merchant lands the moment its answer parses; the final pass
+    # below only catches what the stream didn't deliver.
+    suggestions = suggest_subcategories(category, items, existing, on_resolved=_land, **transport)
     if suggestions is None:
         raise HTTPException(status_code=503, detail="AI is not configured (ANTHROPIC_API_KEY)")
-
-    desc_norm = df['תיאור'].astype(str).map(normalize_merchant)
-    assignments = []
     for s in suggestions:
-        i = s["index"]
-        sub = s["subcategory"]
-        if not sub or not (0 <= i < len(items)):
-            continue
-        it = items[i]
-        # Fill only rows still empty, so a manual assignment made while the AI
-        # call was in flight survives.
-        apply_mask = target & (desc_norm == it["_key"])
-        df.loc[apply_mask, 'קטגוריה_משנה'] = sub
-        assignments.append({
-            "merchant": it["merchant"],
-            "category": category,
-            "subcategory": sub,
-            "count": it["count"],
-            "total": round(_sanitize(float(it["total"])), 2),
-        })
-    return assignments, max(0, total_eligible - len(items))
+        _land(s["index"], s["subcategory"])
+    return list(assignments.values()), max(0, total_eligible - len(items))
 
 
 @router.post("/ai-subcategorize")
@@ -1570,11 +1931,17 @@ def ai_subcategorize(body: AISubcategorizeRequest):
         raise HTTPException(status_code=400, detail="Category cannot be empty")
     if 'קטגוריה' not in df.columns or 'תיאור' not in df.columns:
         return {"success": True, "assignments": [], "remaining": 0}
-    if 'קטגוריה_משנה' not in df.columns:
-        df['קטגוריה_משנה'] = ''
-
-    assignments, remaining = _ai_subcategorize_category(df, category, body.limit)
-    sessions[body.session_id] = df
+    lock = _session_lock(body.session_id)
+    with lock:
+        if 'קטגוריה_משנה' not in df.columns:
+            df['קטגוריה_משנה'] = ''
+            lock.wrote()
+
+    with ai_metrics.session_scope(body.session_id):
+        assignments, remaining = _ai_subcategorize_category(df, category, body.limit, lock=lock)
+    if assignments:
+        ai_events.publish(body.session_id, "subcategorized",
+                          {"category": category, "assignments": assignments})
     return {"success": True, "assignments": assignments, "remaining": remaining}
 
 
@@ -1585,40 +1952,279 @@ def ai_subcategorize_all(body: AISubcategorizeAllRequest):
     frontend in the background after restore (chained after /ai-categorize),
     so subcategories appear without the user pressing anything; results are
     persisted client-side as merchant rules, and per-merchant caching keeps
-    repeat loads cheap. Sync (non-async) on purpose — threadpool."""
+    repeat loads cheap. Sync (non-async) on purpose — threadpool.
+
+    mode="batch" runs it as a background job over the Message Batches API
+    (one batch per category, categories in parallel) and returns {job_id};
+    assignments are applied to the session and published as they land."""
+    via_batch = _via_batch(body.mode)
     df = sessions.get(body.session_id)
     if df is None:
         raise HTTPException(status_code=404, detail="Session not found")
     if 'קטגוריה' not in df.columns or 'תיאור' not in df.columns:
         return {"success": True, "assignments": [], "remaining": 0}
-    if 'קטגוריה_משנה' not in df.columns:
-        df['קטגוריה_משנה'] = ''
-
-    sub_series = df['קטגוריה_משנה'].fillna('').astype(str).str.strip()
-    pending = df.loc[sub_series == '', 'קטגוריה'].astype(str)
+    lock = _session_lock(body.session_id)
+    with lock:
+        if 'קטגוריה_משנה' not in df.columns:
+            df['קטגוריה_משנה'] = ''
+            lock.wrote()
+        sub_series = df['קטגוריה_משנה'].fillna('').astype(str).str.strip()
+        pending = df.loc[sub_series == '', 'קטגוריה'].astype(str)
     # שונות has no parent to refine; פארם is split per-transaction (the
     # תרופות/טיפוח distinction depends on the basket, not the merchant).
     categories = sorted({c for c in pending if c and c not in AI_SUBCATEGORIZE_SKIP})
 
+    if via_batch:
+        job = ai_jobs.submit("subcategorize_all", body.session_id, lambda: _subcategorize_all_batched(
+            body.session_id, df, categories, body.limit_per_category))
+        return {"success": True, "job_id": job["id"], "status": job["status"]}
+
     all_assignments: list[dict] = []
     remaining_total = 0
     for i, category in enumerate(categories):
-        AI_PROGRESS[body.session_id] = {
-            "stage": "subcategorizing", "done": i, "total": len(categories), "detail": category,
-        }
-        assignments, remaining = _ai_subcategorize_category(df, category, body.limit_per_category)
+        _set_progress(body.session_id, "subcategorizing", i, len(categories), category)
+        with ai_metrics.session_scope(body.session_id):
+            assignments, remaining = _ai_subcategorize_category(
+                df, category, body.limit_per_category, lock=lock)
+        if assignments:
+            ai_events.publish(body.session_id, "subcategorized",
+                              {"category": category, "assignments": assignments})
         all_assignments.extend(assignments)
         remaining_total += remaining
 
-    sessions[body.session_id] = df
-    AI_PROGRESS[body.session_id] = {
-        "stage": "done", "done": len(categories), "total": len(categories), "detail": "",
-    }
+    _set_progress(body.session_id, "done", len(categories), len(categories))
     return {"success": True, "assignments": all_assignments, "remaining": remaining_total}
 
 
+def _subcategorize_all_batched(sid: str, df, categories: list[str], limit: int) -> dict:
+    """Job body of /ai-subcategorize-all in batch mode.
+
+    Every category waits on its own message batch, so they run side by side;
+    df is read and written under the session lock, like the pipeline does.
+    """
+    lock = _session_lock(sid)
+    all_assignments: list[dict] = []
+    remaining_total = 0
+    done = 0
+    _set_progress(sid, "subcategorizing", 0, len(categories))
+
+    def _one(category: str) -> tuple[str, list[dict], int]:
+        assignments, remaining = _ai_subcategorize_category(df, category, limit, lock=lock, via_batch=True)
+        return category, assignments, remaining
+
+    with ai_metrics.session_scope(sid), ThreadPoolExecutor(
+            max_workers=max(1, min(len(categories), 8)), thread_name_prefix="ai-batch-subcat") as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _one, c) for c in categories]
+        for future in futures:
+            category, assignments, remaining = future.result()
+            done += 1
+            _set_progress(sid, "subcategorizing", done, len(categories), category)
+            if assignments:
+                ai_events.publish(sid, "subcategorized", {"category": category, "assignments": assignments})
+            all_assignments.extend(assignments)
+            remaining_total += remaining
+
+    _set_progress(sid, "done", len(categories), len(categories))
+    return {"success": True, "assignments": all_assignments, "remaining": remaining_total}
+
+
+@router.get("/ai-jobs/{job_id}")
+async def get_ai_job(job_id: str):
+    """Status of a background AI job (batch-mode audit / subcategorize-all);
+    `result` holds the endpoint's usual response body once status is done."""
+    job = ai_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+class AIPipelineRequest(BaseModel):
+    session_id: str
+    limit_per_category: int = 80
+
+
+class _CategoryQueue:
+    """Runs `work(category)` on a pool, at most one run per category at a time.
+
+    A category kicked while its run is in flight is marked dirty and re-run
+    once the current run finishes — new merchants that landed mid-run get
+    their turn without two workers ever racing on the same category.
+    """
+
+    def __init__(self, pool: ThreadPoolExecutor, work):
+        self._pool = pool
+        self._work = work
+        self._guard = threading.Lock()
+        self._running: set[str] = set()
+        self._dirty: set[str] = set()
+        self.futures: list = []
+
+    def kick(self, category: str) -> None:
+        with self._guard:
+            if category in self._running:
+                self._dirty.add(category)
+                return
+            self._running.add(category)
+            # Run in the caller's context so AI metrics stay attributed
+            # to the session that kicked the category.
+            self.futures.append(self._pool.submit(
+                contextvars.copy_context().run, self._loop, category))
+
+    def _loop(self, category: str) -> None:
+        while True:
+            self._work(category)
+            with self._guard:
+                if category not in self._dirty:
+                    self._running.discard(category)
+                    return
+                self._dirty.discard(category)
+
+
+@router.post("/ai-pipeline")
+def ai_pipeline(body: AIPipelineRequest):
+    """Categorize → subcategorize as ONE pipelined server-side run.
+
+    Replaces the client's /ai-categorize then /ai-subcategorize-all chain:
+    - categories that already have unsubcategorized rows start subcategorizing
+      immediately (categorization only ever moves שונות rows, so their
+      merchants are final from the start);
+    - every categorize batch is applied to the live session the moment it
+      lands, and each category it touched is (re)queued for subcategorizing;
+    - categories run in parallel on AI_PIPELINE_WORKERS threads (default 4).
+    Time to a fully labelled dashboard ≈ the slowest stage, not the sum.
+    Sync (non-async) on purpose, like the other AI endpoints — threadpool.
+    """
+    df = sessions.get(body.session_id)
+    if df is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if 'קטגוריה' not in df.columns or 'תיאור' not in df.columns:
+        return {"success": True, "ai_categorized": [], "assignments": [], "remaining": 0}
+
+    sid = body.session_id
+    lock = _session_lock(sid)
+    with lock:
+        if 'קטגוריה_משנה' not in df.columns:
+            df['קטגוריה_משנה'] = ''
+            lock.wrote()
+        sub_series = df['קטגוריה_משנה'].fillna('').astype(str).str.strip()
+        pending = df.loc[sub_series == '', 'קטגוריה'].astype(str)
+        initial = sorted({c for c in pending if c and c not in AI_SUBCATEGORIZE_SKIP})
+        misc_mask, misc_descs, misc_issuers = _ai_misc_targets(df)
+        misc_idx = df.index[misc_mask].tolist()
+        misc_bases = pd.Series([_base_desc(d) for d in misc_descs], index=misc_idx, dtype=object)
+
+    all_assignments: list[dict] = []
+    remaining_total = {"n": 0}
+    touched: set[str] = set(initial)
+    finished: set[str] = set()
+    state = {"stage": "categorizing" if misc_idx else "subcategorizing", "done": 0, "total": 0}
+    results_guard = threading.Lock()
+
+    def _publish_progress():
+        if state["stage"] == "categorizing":
+            _set_progress(sid, "categorizing", state["done"], state["total"])
+        else:
+            _set_progress(sid, "subcategorizing", len(finished), len(touched))
+
+    def _subcategorize(category: str) -> None:
+        try:
+            assignments, remaining = _ai_subcategorize_category(
+                df, category, body.limit_per_category, lock=lock)
+        except HTTPException:
+            # AI not configured — nothing to add; categorize reports the same.
+            assignments, remaining = [], 0
+        if assignments:
+            ai_events.publish(sid, "subcategorized", {"category": category, "assignments": assignments})
+        with results_guard:
+            all_assignments.extend(assignments)
+            remaining_total["n"] += remaining
+            finished.add(category)
+            _publish_progress()
+
+    def _on_resolved(resolved: dict) -> None:
+        # Publish a categorize batch straight into the live session.
+        landed: set[str] = set()
+        applied: dict[str, str] = {}
+        with lock:
+            hit = misc_bases[misc_bases.isin(resolved.keys())]
+            if hit.empty:
+                return
+            still_misc = hit.index[df.loc[hit.index, 'קטגוריה'].astype(str) == 'שונות']
+            for idx in still_misc:
+                cat = resolved[hit.at[idx]]
+                df.at[idx, 'קטגוריה'] = cat
+                landed.add(cat)
+                assigned[idx] = cat
+                applied.setdefault(str(df.at[idx, 'תיאור']), cat)
+            if landed:
+                derive_subcategory(df)
+                lock.wrote()
+        if applied:
+            ai_events.publish(sid, "categorized", {"assignments": [
+                {"merchant": m, "category": c} for m, c in applied.items()
+            ]})
+        for cat in sorted(landed - AI_SUBCATEGORIZE_SKIP):
+            with results_guard:
+                touched.add(cat)
+            queue.kick(cat)
+
+    def _on_progress(done, total):
+        state["done"], state["total"] = done, total
+        _publish_progress()
+
+    workers = max(1, int(os.environ.get('AI_PIPELINE_WORKERS', '4')))
+    # Rows a categorize batch actually moved out of שונות (row → category);
+    # pinned rows and rows edited during the run are not in it.
+    assigned: dict[int, str] = {}
+    guessed: set[str] = set()   # bases the local classifier / knowledge base answered
+    _publish_progress()
+    with (
+        ai_metrics.session_scope(sid),
+        ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-pipeline") as pool,
+    ):
+        queue = _CategoryQueue(pool, _subcategorize)
+        for category in initial:
+            queue.kick(category)
+        if misc_idx:
+            categorize_transactions(
+                misc_descs, misc_issuers, on_progress=_on_progress, on_resolved=_on_resolved,
+                session_id=sid, local=guessed,
+            )
+        with results_guard:
+            state["stage"] = "subcategorizing"
+            _publish_progress()
+        # Categorize is done, so no new categories get queued; a dirty
+        # category re-runs inside its own future. Drain them all.
+        seen = 0
+        while seen < len(queue.futures):
+            queue.futures[seen].result()
+            seen += 1
+
+    with lock:
+        # Local classifier guesses and knowledge-base verdicts are applied,
+        # not returned to be saved as rules.
+        ai_categorized = [
+            {"merchant": str(df.at[idx, 'תיאור']), "category": cat}
+            for idx, cat in assigned.items() if misc_bases.at[idx] not in guessed
+        ]
+        # The run wrote into `df` in place; publish it only if it is still the
+        # session's frame — not if the session was replaced (a restore) or
+        # deleted meanwhile.
+        if sessions.get(sid) is not df:
+            return {"success": False, "ai_categorized": [], "assignments": [], "remaining": 0}
+        sessions[sid] = df
+    _set_progress(sid, "done", len(touched), len(touched))
+    return {
+        "success": True,
+        "ai_categorized": ai_categorized,
+        "assignments": all_assignments,
+        "remaining": remaining_total["n"],
+    }
+
+
 @router.get("/metrics")
-async def get_metrics(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_metrics(sessionId: str = Query(...)):
     """Get metrics data"""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1656,7 +2262,8 @@ async def get_metrics(sessionId: str = Query(...)):
 
 
 @router.get("/categories")
-async def get_categories(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_categories(sessionId: str = Query(...)):
     """Get list of unique categories"""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1670,7 +2277,8 @@ async def get_categories(sessionId: str = Query(...)):
 
 
 @router.get("/charts/donut")
-async def get_donut_chart(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_donut_chart(sessionId: str = Query(...)):
     """Get donut chart data"""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1681,7 +2289,8 @@ async def get_donut_chart(sessionId: str = Query(...)):
 
 
 @router.get("/charts/monthly")
-async def get_monthly_chart(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_monthly_chart(sessionId: str = Query(...)):
     """Get monthly chart data"""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1692,7 +2301,8 @@ async def get_monthly_chart(sessionId: str = Query(...)):
 
 
 @router.get("/charts/weekday")
-async def get_weekday_chart(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_weekday_chart(sessionId: str = Query(...)):
     """Get weekday chart data"""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1703,7 +2313,8 @@ async def get_weekday_chart(sessionId: str = Query(...)):
 
 
 @router.get("/charts/trend")
-async def get_trend_chart(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_trend_chart(sessionId: str = Query(...)):
     """Get trend chart data"""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1714,7 +2325,8 @@ async def get_trend_chart(sessionId: str = Query(...)):
 
 
 @router.get("/export")
-async def export_transactions(
+@_offload(worker_pools.HEAVY)
+def export_transactions(
     sessionId: str = Query(...),
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
@@ -1723,9 +2335,17 @@ async def export_transactions(
     """Export transactions to Excel"""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    df = sessions[sessionId].copy()
-    
+
+    content = _analytics(_export_xlsx, sessionId, start_date, end_date, category)
+    return StreamingResponse(
+        BytesIO(content),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": "attachment; filename=transactions.xlsx"}
+    )
+
+
+def _export_xlsx(df: pd.DataFrame, start_date: Optional[str], end_date: Optional[str],
+                 category: Optional[str]) -> bytes:
     # Apply filters
     if start_date:
         df = df[df['תאריך'] >= pd.to_datetime(start_date)]
@@ -1733,15 +2353,9 @@ async def export_transactions(
         df = df[df['תאריך'] <= pd.to_datetime(end_date)]
     if category:
         df = df[df['קטגוריה'] == category]
-    
+
     # Export
-    excel_buffer = export_to_excel(df)
-    
-    return StreamingResponse(
-        BytesIO(excel_buffer.getvalue()),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=transactions.xlsx"}
-    )
+    return export_to_excel(df.copy()).getvalue()
 
 
 # ---------------------------------------------------------------------------
@@ -1814,7 +2428,8 @@ def _to_json_safe(val):
 
 
 @router.get("/charts/v2/donut")
-async def get_donut_v2(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_donut_v2(sessionId: str = Query(...)):
     """Return raw category breakdown (top 10 + 'אחר')."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -1847,7 +2462,8 @@ async def get_donut_v2(sessionId: str = Query(...)):
 
 
 @router.get("/charts/v2/income-sources")
-async def get_income_sources(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_income_sources(sessionId: str = Query(...)):
     """Income (positive amounts) grouped by source — i.e. where it came from
     (the payer/description), top 10 + 'אחר'. Respects the scoped session, so the
     per-person filter applies automatically."""
@@ -1882,7 +2498,8 @@ async def get_income_sources(sessionId: str = Query(...)):
 
 
 @router.get("/charts/v2/category-snapshot")
-async def get_category_snapshot(
+@_offload(worker_pools.INTERACTIVE)
+def get_category_snapshot(
     sessionId: str = Query(...),
     month_from: str = Query(default=None),
     month_to: str = Query(default=None),
@@ -1892,7 +2509,10 @@ async def get_category_snapshot(
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    df = sessions[sessionId]
+    return _analytics(_category_snapshot, sessionId, month_from, month_to, date_type)
+
+
+def _category_snapshot(df: pd.DataFrame, month_from: Optional[str], month_to: Optional[str], date_type: str) -> dict:
     expenses = df[df['סכום'] < 0].copy()
 
     # Determine which month column to use based on date_type
@@ -2035,7 +2655,8 @@ async def get_category_snapshot(
 
 
 @router.get("/charts/v2/category-transactions")
-async def get_category_transactions(
+@_offload(worker_pools.INTERACTIVE)
+def get_category_transactions(
     sessionId: str = Query(...),
     month: str = Query(""),
     month_from: str = Query(""),
@@ -2108,7 +2729,8 @@ async def get_category_transactions(
 
 
 @router.get("/charts/v2/category-merchants")
-async def get_category_merchants(
+@_offload(worker_pools.INTERACTIVE)
+def get_category_merchants(
     sessionId: str = Query(...),
     month: str = Query(...),
     category: str = Query(...),
@@ -2152,7 +2774,8 @@ async def get_category_merchants(
 
 
 @router.get("/charts/v2/merchant-transactions")
-async def get_merchant_transactions(
+@_offload(worker_pools.INTERACTIVE)
+def get_merchant_transactions(
     sessionId: str = Query(...),
     month: str = Query(...),
     category: str = Query(...),
@@ -2197,7 +2820,8 @@ async def get_merchant_transactions(
 
 
 @router.get("/charts/v2/monthly")
-async def get_monthly_v2(sessionId: str = Query(...), date_type: str = Query("transaction")):
+@_offload(worker_pools.INTERACTIVE)
+def get_monthly_v2(sessionId: str = Query(...), date_type: str = Query("transaction")):
     """Return raw monthly expense totals."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -2221,7 +2845,8 @@ async def get_monthly_v2(sessionId: str = Query(...), date_type: str = Query("tr
 
 
 @router.get("/charts/v2/weekday")
-async def get_weekday_v2(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_weekday_v2(sessionId: str = Query(...)):
     """Return raw weekday expense totals with Hebrew day names."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -2259,7 +2884,8 @@ async def get_weekday_v2(sessionId: str = Query(...)):
 
 
 @router.get("/charts/v2/trend")
-async def get_trend_v2(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_trend_v2(sessionId: str = Query(...)):
     """Return cumulative balance over time."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -2283,7 +2909,8 @@ async def get_trend_v2(sessionId: str = Query(...)):
 
 
 @router.get("/insights")
-async def get_insights(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_insights(sessionId: str = Query(...)):
     """Return smart insights derived from transaction data."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -2361,7 +2988,8 @@ async def get_insights(sessionId: str = Query(...)):
 
 
 @router.get("/merchants")
-async def get_merchants(
+@_offload(worker_pools.INTERACTIVE)
+def get_merchants(
     sessionId: str = Query(...),
     n: int = Query(default=8, ge=1),
 ):
@@ -2375,32 +3003,29 @@ async def get_merchants(
     if expenses.empty:
         return {"merchants": []}
 
+    # One row per merchant entity (branches and spellings of one business),
+    # named after its most frequent description.
     merchant_agg = (
-        expenses
-        .groupby('תיאור')
-        .agg(
-            total=('סכום_מוחלט', 'sum'),
-            count=('סכום_מוחלט', 'size'),
-            average=('סכום_מוחלט', 'mean'),
-        )
-        .sort_values('total', ascending=False)
+        aggregate_merchants(expenses, keys=merchant_resolver.entity_ids(expenses['תיאור']))
+        .sort_values('total', ascending=False, kind='stable')
         .head(n)
     )
 
     merchants = [
         {
-            "name": str(name),
+            "name": str(row['merchant']),
             "total": round(_sanitize(row['total']), 2),
             "count": int(row['count']),
-            "average": round(_sanitize(row['average']), 2),
+            "average": round(_sanitize(row['total'] / row['count']), 2),
         }
-        for name, row in merchant_agg.iterrows()
+        for _, row in merchant_agg.iterrows()
     ]
     return {"merchants": merchants}
 
 
 @router.get("/trend-stats")
-async def get_trend_stats(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_trend_stats(sessionId: str = Query(...)):
     """Return trend statistics and month-over-month changes."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -2458,7 +3083,8 @@ async def get_trend_stats(sessionId: str = Query(...)):
 
 
 @router.get("/charts/v2/heatmap")
-async def get_heatmap_v2(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_heatmap_v2(sessionId: str = Query(...)):
     """Return category x month matrix for heatmap visualization."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -2490,7 +3116,8 @@ async def get_heatmap_v2(sessionId: str = Query(...)):
 
 
 @router.get("/charts/v2/month-overview")
-async def get_month_overview(
+@_offload(worker_pools.INTERACTIVE)
+def get_month_overview(
     sessionId: str = Query(...),
     month: str = Query(...),
     date_type: str = Query("transaction"),
@@ -2543,7 +3170,8 @@ async def get_month_overview(
 
 
 @router.get("/charts/v2/industry-monthly")
-async def get_industry_monthly(
+@_offload(worker_pools.INTERACTIVE)
+def get_industry_monthly(
     sessionId: str = Query(...),
     date_type: str = Query("transaction"),
     top_n: int = Query(default=8, ge=1, le=20),
@@ -2602,7 +3230,8 @@ async def get_industry_monthly(
 
 
 @router.get("/charts/v2/category-monthly-comparison")
-async def get_category_monthly_comparison(
+@_offload(worker_pools.INTERACTIVE)
+def get_category_monthly_comparison(
     sessionId: str = Query(...),
     date_type: str = Query("transaction"),
 ):
@@ -2690,12 +3319,16 @@ async def get_category_monthly_comparison(
 # ---------------------------------------------------------------------------
 
 @router.get("/analytics/recurring")
-async def get_recurring_transactions(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_recurring_transactions(sessionId: str = Query(...)):
     """Detect recurring/subscription transactions."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    df = sessions[sessionId]
+    return _analytics(_recurring, sessionId)
+
+
+def _recurring(df: pd.DataFrame) -> dict:
     if df.empty:
         return {"recurring": []}
 
@@ -2768,7 +3401,8 @@ async def get_recurring_transactions(sessionId: str = Query(...)):
 
 
 @router.get("/analytics/forecast")
-async def get_spending_forecast(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_spending_forecast(sessionId: str = Query(...)):
     """Linear forecast of next month's spending."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -2838,7 +3472,8 @@ async def get_spending_forecast(sessionId: str = Query(...)):
 
 
 @router.get("/analytics/weekly-summary")
-async def get_weekly_summary(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_weekly_summary(sessionId: str = Query(...)):
     """This week vs last week comparison."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -2904,7 +3539,8 @@ async def get_weekly_summary(sessionId: str = Query(...)):
 
 
 @router.get("/analytics/spending-velocity")
-async def get_spending_velocity(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_spending_velocity(sessionId: str = Query(...)):
     """Daily spending rate and rolling averages."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -2945,7 +3581,8 @@ async def get_spending_velocity(sessionId: str = Query(...)):
 
 
 @router.get("/analytics/anomalies")
-async def get_anomalies(sessionId: str = Query(...)):
+@_offload(worker_pools.INTERACTIVE)
+def get_anomalies(sessionId: str = Query(...)):
     """Find transactions beyond 2 standard deviations from category mean."""
     if sessionId not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -2993,7 +3630,8 @@ async def get_anomalies(sessionId: str = Query(...)):
 
 
 @router.get("/search")
-async def search_transactions(
+@_offload(worker_pools.INTERACTIVE)
+def search_transactions(
     sessionId: str = Query(...),
     q: str = Query(..., min_length=1),
     limit: int = Query(default=20, le=50),
@@ -0,0 +1,58 @@
+"""
+Message Batches API transport for the throughput AI jobs (audit sweep,
+subcategorize-all).
+
+Instead of one interactive messages.create per chunk, every chunk of a round
+becomes one request of a single Message Batch: half the token price, and the
+batch queue is not bound by the interactive rate limits. The batch is polled
+until it ends (AI_BATCH_POLL_SECONDS, give up after AI_BATCH_TIMEOUT_SECONDS);
+results come back keyed by custom_id. Requests that errored, expired or were
+canceled come back as None — the caller treats them like a failed call.
+
+Blocking by design: callers run inside ai_jobs workers, never on a request
+thread.
+"""
+import logging
+import os
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_sleep = time.sleep
+
+
+def run(client, requests: dict[str, dict]) -> dict[str, Optional[object]]:
+    """Submit {custom_id: messages.create kwargs} as one batch; wait; collect.
+
+    Returns {custom_id: Message or None}. Raises if the batch can't be
+    submitted or doesn't end within the timeout (it is canceled then).
+    """
+    if not requests:
+        return {}
+    poll = max(0.0, float(os.environ.get('AI_BATCH_POLL_SECONDS', '30')))
+    timeout = float(os.environ.get('AI_BATCH_TIMEOUT_SECONDS', str(24 * 3600)))
+
+    batch = client.messages.batches.create(requests=[
+        {"custom_id": custom_id, "params": params} for custom_id, params in requests.items()
+    ])
+    logger.info("Submitted message batch %s (%d requests)", batch.id, len(requests))
+    deadline = time.monotonic() + timeout
+    while batch.processing_status != 'ended':
+        if time.monotonic() >= deadline:
+            try:
+                client.messages.batches.cancel(batch.id)
+            except Exception as e:
+                logger.warning(f"Could not cancel message batch {batch.id}: {e}")
+            raise TimeoutError(f"message batch {batch.id} did not end within {timeout:.0f}s")
+        _sleep(poll)
+        batch = client.messages.batches.retrieve(batch.id)
+
+    out: dict[str, Optional[object]] = {custom_id: None for custom_id in requests}
+    for entry in client.messages.batches.results(batch.id):
+        result = entry.result
+        if result.type == 'succeeded':
+            out[entry.custom_id] = result.message
+        else:
+            logger.warning("Message batch %s: request %s %s", batch.id, entry.custom_id, result.type)
+    return out
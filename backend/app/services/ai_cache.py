@@ -0,0 +1,80 @@
+"""
+Durable merchant→category cache behind the AI categorizer's per-process
+_CACHE, so a restarted backend still knows every merchant Claude resolved.
+
+Opt-in: set AI_CACHE_FILE to a JSON file path. The file maps base merchant
+(installment suffix stripped) → category and is loaded once, lazily; every
+store rewrites it atomically (temp file + rename). Only real resolutions are
+kept — a miss ('שונות') is worth retrying after a restart, so it stays in
+the per-process cache only. Without AI_CACHE_FILE every call is a no-op.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+_LOCK = threading.Lock()
+_LOADED: dict[str, dict[str, str]] = {}  # file path → its entries
+
+
+def _path() -> Optional[str]:
+    return os.environ.get('AI_CACHE_FILE') or None
+
+
+def _entries(path: str) -> dict[str, str]:
+    """The file's entries, read on first use (caller holds _LOCK)."""
+    entries = _LOADED.get(path)
+    if entries is None:
+        entries = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                entries = {str(k): str(v) for k, v in data.items() if k and v}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"AI cache file {path} unreadable, starting empty: {e}")
+        _LOADED[path] = entries
+    return entries
+
+
+def lookup(bases: Iterable[str]) -> dict[str, str]:
+    """{base: category} for the given base merchants the durable cache knows."""
+    path = _path()
+    if path is None:
+        return {}
+    with _LOCK:
+        entries = _entries(path)
+        return {b: entries[b] for b in bases if b in entries}
+
+
+def store(resolved: dict[str, str]) -> None:
+    """Add real resolutions (never 'שונות') and rewrite the file."""
+    path = _path()
+    fresh = {b: c for b, c in resolved.items() if b and c and c != 'שונות'}
+    if path is None or not fresh:
+        return
+    with _LOCK:
+        entries = _entries(path)
+        if all(entries.get(b) == c for b, c in fresh.items()):
+            return
+        entries.update(fresh)
+        try:
+            directory = os.path.dirname(os.path.abspath(path))
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix='.ai-cache-', suffix='.json')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write AI cache file {path}: {e}")
+
+
+def reset() -> None:
+    """Forget loaded files (tests); the next lookup re-reads from disk."""
+    with _LOCK:
+        _LOADED.clear()
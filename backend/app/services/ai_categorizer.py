@@ -18,9 +18,15 @@ keyword-based matching, in two phases:
 import os
 import re
 import json
+import time
+import random
 import logging
+import threading
+from collections import deque
 from typing import Optional
 
+from . import ai_batches, ai_cache, ai_metrics, local_classifier, merchant_kb, merchant_resolver
+
 logger = logging.getLogger(__name__)
 
 # Categories the AI can assign (must match CATEGORY_ICONS keys in constants.py)
@@ -64,6 +70,14 @@ _CATEGORY_MENU = """הקטגוריות האפשריות:
 - הוראות קבע — הוראות קבע
 - שונות — רק אם אי אפשר לקבוע קטגוריה אחרת"""
 
+# Web-search phases also say what they found about each business
+# ("evidence"). It is kept per merchant and shown to later phases, which may
+# decide from it instead of searching the same merchant again.
+_EVIDENCE_FIELD = "מה העסק לפי החיפוש, במשפט קצר"
+_EVIDENCE_RULE = ('בית עסק שמצורף לו "מידע מחיפוש קודם" כבר נבדק באינטרנט — '
+                  'מותר לקבוע לפי המידע הזה בלי לחפש שוב.')
+_EVIDENCE_HINT = ' (מידע מחיפוש קודם: {})'
+
 PHASE1_SYSTEM = f"""אתה מערכת לסיווג עסקאות בנקאיות ישראליות.
 
 {_CATEGORY_MENU}
@@ -72,8 +86,9 @@ PHASE1_SYSTEM = f"""אתה מערכת לסיווג עסקאות בנקאיות 
 1. סווג עסק רק אם אתה מזהה אותו בוודאות — רשת/מותג מוכר, או שהתיאור עצמו אומר מה סוג העסק (למשל מכיל "מסעדת", "פיצה", "מוסך", "בית מרקחת").
 2. אסור לנחש לפי צליל השם. אם אינך בטוח מהו העסק — החזר עבורו {{"index": N, "unknown": true}} ואל תסווג אותו.
 3. עדיף לסמן unknown מאשר לסווג לא נכון. סימון unknown אינו כישלון — עסקים כאלה ייבדקו באינטרנט בשלב נפרד.
-4. החזר תמיד JSON תקין בלבד (כבלוק הטקסט האחרון בתשובה), מערך עם רשומה לכל אינדקס:
-   [{{"index": 0, "category": "שם קטגוריה"}}, {{"index": 1, "unknown": true}}, ...]"""
+4. {_EVIDENCE_RULE}
+5. החזר תמיד JSON תקין בלבד (כבלוק הטקסט האחרון בתשובה), מערך עם רשומה לכל אינדקס:
+   [{{"index": 0, "category": "שם קטגוריה", "confidence": 0.95}}, {{"index": 1, "unknown": true}}, ...]"""
 
 PHASE2_SYSTEM = f"""אתה מערכת לסיווג עסקאות בנקאיות ישראליות. העסקים ברשימה כבר זוהו כלא-מוכרים — אסור לסווג אותם מהשם בלבד.
 
@@ -85,7 +100,8 @@ PHASE2_SYSTEM = f"""אתה מערכת לסיווג עסקאות בנקאיות 
 3. עסק שנמצא בחו"ל (מלון, מסעדה, חנות או אטרקציה — שים לב לקיצורי ערים כמו BKK, SENTOSA, HAEUNDAE) הוא הוצאת טיול → "טיסות ותיירות", לא קטגוריית סוג העסק. שירותים מקוונים שמחויבים מחו"ל אינם תיירות — סווג לפי מהות השירות.
 4. שים לב לקיצורים נפוצים בעסקאות ישראליות; אפשר לנקות קידומות טכניות מהשם לפני החיפוש.
 5. החזר תמיד JSON תקין בלבד (כבלוק הטקסט האחרון בתשובה), בפורמט:
-   [{{"index": 0, "category": "שם הקטגוריה"}}, ...]"""
+   [{{"index": 0, "category": "שם הקטגוריה", "confidence": 0.9, "evidence": "{_EVIDENCE_FIELD}"}}, ...]
+   confidence: 0–1, כמה החיפוש מבסס את הסיווג."""
 
 PHASE1_USER_TEMPLATE = """סווג את העסקים הבאים. סווג רק את אלה שאתה מזהה בוודאות; את כל השאר סמן unknown. החזר מערך JSON בלבד.
 
@@ -115,14 +131,15 @@ AUDIT_SYSTEM = f"""אתה מערכת לאימות סיווג עסקאות בנק
 1. עבור כל בית עסק אתה חייב לבצע חיפוש אינטרנט לפני שאתה קובע (למשל: "<שם העסק> ישראל"). אסור לאשר או לפסול סיווג לפי צליל השם בלבד.
 2. קבע לפי מה שמצאת בחיפוש. אם גם אחרי חיפוש אינך בטוח — החזר את הסיווג הנוכחי עם confidence נמוך. אל תמציא קטגוריות חדשות.
 3. הענף לפי חברת האשראי (אם צוין) הוא רמז, לא הכרעה.
-4. החזר תמיד JSON תקין בלבד (כבלוק הטקסט האחרון בתשובה)."""
+4. {_EVIDENCE_RULE}
+5. החזר תמיד JSON תקין בלבד (כבלוק הטקסט האחרון בתשובה)."""
 
 AUDIT_PROMPT_TEMPLATE = """בדוק את הסיווג הנוכחי של בתי העסק הבאים (סיכום לכל בית עסק: שם, הסיווג הנוכחי, הענף לפי חברת האשראי אם ידוע, מספר עסקאות וסכום כולל בש"ח).
 
 לכל בית עסק: אם הסיווג הנוכחי נכון — החזר אותו כמו שהוא. אם הוא שגוי — החזר את הקטגוריה הנכונה מהרשימה. אל תמציא קטגוריות חדשות. אם אינך בטוח, החזר את הסיווג הנוכחי עם confidence נמוך.
 
 החזר מערך JSON בלבד (כבלוק הטקסט האחרון), בפורמט:
-[{{"index": 0, "category": "שם הקטגוריה", "confidence": 0.9, "reason": "הסבר קצר בעברית"}}, ...]
+[{{"index": 0, "category": "שם הקטגוריה", "confidence": 0.9, "reason": "הסבר קצר בעברית", "evidence": "מה העסק לפי החיפוש, במשפט קצר"}}, ...]
 
 בתי העסק:
 {merchants}"""
@@ -133,18 +150,22 @@ AUDIT_PROMPT_TEMPLATE = """בדוק את הסיווג הנוכחי של בתי 
 _AUDIT_CACHE: dict[tuple[str, str], dict] = {}
 
 
-def audit_merchants(items: list[dict], on_progress=None) -> Optional[list[dict]]:
+def audit_merchants(items: list[dict], on_progress=None, via_batch: bool = False) -> Optional[list[dict]]:
     """Web-verified audit of already-categorized merchants, one by one.
 
     Same discipline as the categorizer's phase 2: small batches, a web search
     per merchant is MANDATORY, and a response with no search activity is
     discarded (those merchants get no verdict and will be retried later, so
-    an unverified opinion never lands). Verdicts are cached per
-    (merchant, current category) — the sweep converges to zero cost.
+    an unverified opinion never lands). Merchants with search evidence from
+    an earlier phase are the exception: they are verified against it without
+    the search tool. Verdicts are cached per (merchant, current category) —
+    the sweep converges to zero cost.
 
     Args:
         items: [{merchant, current, issuer, count, total}, ...]
         on_progress: optional callback(done, total) — merchants processed.
+        via_batch: send the chunks through the Message Batches API (blocks
+            until the batch ends — background jobs only).
 
     Returns:
         [{index, category, confidence, reason}, ...] or None if AI unavailable.
@@ -160,6 +181,7 @@ def audit_merchants(items: list[dict], on_progress=None) -> Optional[list[dict]]
             cached_out.append({**v, "index": i})
         else:
             fresh.append((i, it))
+    ai_metrics.count_cache('audit', len(cached_out), len(fresh))
     if not fresh:
         if on_progress:
             on_progress(len(items), len(items))
@@ -177,86 +199,113 @@ def audit_merchants(items: list[dict], on_progress=None) -> Optional[list[dict]]
         logger.info("AI audit skipped: web search disabled")
         return cached_out
 
-    batch_size = max(1, int(os.environ.get('AI_SEARCH_BATCH', '5')))
     per_merchant = max(1, int(os.environ.get('AI_WEB_SEARCH_MAX', '2')))
-    out: list[dict] = []
-    done = len(cached_out)
+    out: dict[int, dict] = {}  # original index → verdict
+    progressed: set[int] = set()  # original indices answered or given up
     total = len(items)
     if on_progress:
-        on_progress(done, total)
+        on_progress(len(cached_out), total)
 
-    for b_start in range(0, len(fresh), batch_size):
-        batch = fresh[b_start:b_start + batch_size]
+    def _params(batch: list[tuple[int, dict]], searching: bool = True, tier_model: Optional[str] = None) -> dict:
         lines = []
         for j, (_, it) in enumerate(batch):
             issuer = f", ענף לפי חברת האשראי: {it['issuer']}" if it.get('issuer') else ""
             lines.append(
                 f"{j}. \"{it['merchant']}\" — סיווג נוכחי: {it['current']}{issuer}, "
                 f"{it.get('count', 1)} עסקאות, {round(float(it.get('total', 0)))} ₪"
+                f"{_evidence_hint(it['merchant'])}"
             )
         user_prompt = AUDIT_PROMPT_TEMPLATE.format(merchants="\n".join(lines))
-        try:
-            response = client.messages.create(
-                model=model,
-                max_tokens=4096,
-                system=AUDIT_SYSTEM,
-                messages=[{"role": "user", "content": user_prompt}],
-                tools=[{
-                    "type": "web_search_20250305",
-                    "name": "web_search",
-                    "max_uses": per_merchant * len(batch) + 1,
-                }],
-            )
-        except Exception as e:
-            # No searchless fallback — an unverified verdict is worse than none.
-            logger.warning(f"AI audit batch failed, skipping: {e}")
-            done += len(batch)
-            if on_progress:
-                on_progress(done, total)
-            continue
-
-        if not _response_searched(response):
-            logger.warning("AI audit answered without searching; discarding %d verdicts", len(batch))
-            done += len(batch)
-            if on_progress:
-                on_progress(done, total)
-            continue
-
-        try:
-            results = _parse_json_array(_response_text(response))
-        except Exception as e:
-            logger.warning(f"AI audit JSON parse error: {e}")
-            done += len(batch)
-            if on_progress:
-                on_progress(done, total)
-            continue
-
-        for item in results:
-            idx = item.get("index")
+        if searching:
+            user_prompt = _with_search_budget(user_prompt, _search_budget(per_merchant, len(batch)))
+        params = {
+            "model": tier_model or model,
+            "max_tokens": 4096,
+            "system": _system(AUDIT_SYSTEM),
+            "messages": [{"role": "user", "content": user_prompt}],
+        }
+        if searching:
+            params["tools"] = _web_search_tool(per_merchant)
+        return params
+
+    def _answers(batch: list[tuple[int, dict]], searching: bool) -> _Answers:
+        def _verdict(idx: int, item: dict) -> None:
             cat = str(item.get("category", "")).strip()
-            if idx is None or cat not in VALID_CATEGORIES:
-                continue
-            idx = int(idx)
-            if not (0 <= idx < len(batch)):
-                continue
+            if cat not in VALID_CATEGORIES:
+                return
             try:
                 conf = min(1.0, max(0.0, float(item.get("confidence", 0.5))))
             except (TypeError, ValueError):
                 conf = 0.5
             orig_i, it = batch[idx]
+            if searching:
+                _remember_evidence(it['merchant'], item, fallback=str(item.get("reason", "")))
             verdict = {
                 "category": cat,
                 "confidence": conf,
                 "reason": str(item.get("reason", "")).strip(),
             }
             _AUDIT_CACHE[(it['merchant'], it['current'])] = verdict
-            out.append({**verdict, "index": orig_i})
-        done += len(batch)
-        if on_progress:
-            on_progress(done, total)
+            out[orig_i] = {**verdict, "index": orig_i}
+            _progressed([orig_i])
+        return _Answers(len(batch), _verdict, require_search=searching,
+                        search_budget=_search_budget(per_merchant, len(batch)) if searching else None)
+
+    def _apply(batch: list[tuple[int, dict]], response, call, searching: bool = True):
+        return _answers(batch, searching).settle(batch, response, call, "audit")
+
+    def _run(batch: list[tuple[int, dict]], searching: bool = True, tier_model: Optional[str] = None):
+        phase = 'audit_escalate' if tier_model else 'audit' if searching else 'audit_evidence'
+        params = _params(batch, searching, tier_model)
+        call = ai_metrics.Call(phase, params["model"], len(batch))
+        answers = _answers(batch, searching)
+        try:
+            response = _create(client, call, answers, **params)
+        except Exception as e:
+            # No searchless fallback — an unverified verdict is worse than none.
+            logger.warning(f"AI audit batch failed, skipping: {e}")
+            rest = answers.unanswered(batch)
+            return ('drop', rest) if len(rest) < len(batch) else 'drop'
+        return answers.settle(batch, response, call, "audit")
+
+    def _dispatch(phase, chunk_items, bounds, searching=True, tier_model=None, on_done=None):
+        if via_batch:
+            _run_message_batches(
+                client, phase, chunk_items, bounds[1],
+                lambda b: _params(b, searching, tier_model),
+                lambda b, response, call: _apply(b, response, call, searching), on_done)
+        else:
+            _run_batches(phase, chunk_items, *bounds,
+                         lambda b: _run(b, searching, tier_model), on_done)
+
+    def _progressed(orig_indices) -> None:
+        before = len(progressed)
+        progressed.update(orig_indices)
+        if on_progress and len(progressed) > before:
+            on_progress(len(cached_out) + len(progressed), total)
+
+    def _done(batch, ok):
+        _progressed(i for i, _ in batch)
+
+    # Merchants a previous search already described are verified against that
+    # evidence without the search tool; the rest are searched.
+    known = [f for f in fresh if _evidence_for(f[1]['merchant'])]
+    unsearched = [f for f in fresh if not _evidence_for(f[1]['merchant'])]
+    if known:
+        ai_metrics.count_evidence('audit', len(known))
+        _dispatch('audit_evidence', known, (20, 50), searching=False, on_done=_done)
+    _dispatch('audit', unsearched, _search_batch_bounds(), on_done=_done)
+
+    # Verdicts the model itself is unsure of go to the larger model, when one
+    # is configured; its verdict replaces the first one.
+    escalation_model, threshold = _escalation()
+    uncertain = [(i, it) for i, it in fresh if i in out and out[i]["confidence"] < threshold]
+    ai_metrics.count_tier('audit', len(out) - len(uncertain), len(uncertain))
+    if uncertain:
+        _dispatch('audit_escalate', uncertain, _search_batch_bounds(), tier_model=escalation_model)
 
     logger.info(f"AI audit: {len(out)} fresh web-verified verdicts (+{len(cached_out)} cached)")
-    return cached_out + out
+    return cached_out + [out[i] for i in sorted(out)]
 
 
 def _get_client():
@@ -266,19 +315,334 @@ def _get_client():
         return None
     try:
         import anthropic
-        return anthropic.Anthropic(api_key=api_key)
+        # Retries are ours (_create): counted in the metrics and backed off
+        # with jitter, instead of the SDK's silent ones on top.
+        return anthropic.Anthropic(api_key=api_key, max_retries=0)
     except Exception as e:
         logger.warning(f"Failed to create Anthropic client: {e}")
         return None
 
 
+# Rate-limit / overload / transient server statuses worth retrying (529 is
+# Anthropic's "overloaded").
+_TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+_sleep = time.sleep
+
+
+def _is_transient(e: Exception) -> bool:
+    status = getattr(e, 'status_code', None)
+    if status is not None:
+        return status in _TRANSIENT_STATUS
+    return type(e).__name__ in ('APIConnectionError', 'APITimeoutError', 'OverloadedError', 'RateLimitError')
+
+
+def _backoff_delay(attempt: int, e: Exception) -> float:
+    """Jittered exponential backoff, never shorter than the server's retry-after."""
+    base = float(os.environ.get('AI_BACKOFF_BASE', '1.0'))
+    cap = float(os.environ.get('AI_BACKOFF_MAX', '30'))
+    delay = min(cap, base * (2 ** attempt))
+    delay = random.uniform(delay / 2, delay)
+    headers = getattr(getattr(e, 'response', None), 'headers', None) or {}
+    try:
+        retry_after = float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        retry_after = 0.0
+    return max(delay, min(retry_after, cap))
+
+
+def _streams(client) -> bool:
+    return (os.environ.get('AI_STREAM', '1') != '0'
+            and hasattr(getattr(client, 'messages', None), 'stream'))
+
+
+def _stream(client, answers: '_Answers', kwargs: dict):
+    """client.messages.stream, feeding `answers` as blocks and text arrive.
+
+    A search past the batch's budget ends the stream; what arrived so far is
+    returned as the response.
+    """
+    with client.messages.stream(**kwargs) as stream:
+        for event in stream:
+            kind = getattr(event, 'type', '')
+            if kind == 'content_block_start':
+                answers.block(getattr(event.content_block, 'type', ''))
+                if answers.over_budget():
+                    # Leaving the block closes the connection: no more searches.
+                    return stream.current_message_snapshot
+            elif kind == 'content_block_delta' and getattr(event.delta, 'type', '') == 'text_delta':
+                answers.text(event.delta.text)
+        return stream.get_final_message()
+
+
+def _create(client, call: 'ai_metrics.Call', answers: Optional['_Answers'] = None, **kwargs):
+    """client.messages.create, recorded on `call` (latency, tokens, searches).
+
+    With `answers`, the response is streamed (unless AI_STREAM=0 or the
+    client can't) and each answer is applied the moment its array element
+    is complete. Rate-limit and overload errors are retried up to
+    AI_MAX_RETRIES times (default 4) with jittered exponential backoff;
+    anything else, or the last failure, is raised to the caller. Each attempt
+    starts `answers` afresh; elements an earlier attempt already applied stay
+    answered.
+    """
+    max_retries = max(0, int(os.environ.get('AI_MAX_RETRIES', '4')))
+    retries = 0
+    while True:
+        if answers is not None:
+            answers.restart()
+        try:
+            if answers is not None and _streams(client):
+                response = _stream(client, answers, kwargs)
+            else:
+                response = client.messages.create(**kwargs)
+        except Exception as e:
+            if retries < max_retries and _is_transient(e):
+                delay = _backoff_delay(retries, e)
+                logger.info("AI %s call: transient error (%s), retry %d in %.1fs",
+                            call.record["phase"], type(e).__name__, retries + 1, delay)
+                _sleep(delay)
+                retries += 1
+                continue
+            call.fail(e, retries)
+            raise
+        call.finish(response, retries)
+        return response
+
+
+def _truncated(response) -> bool:
+    """Did the answer hit max_tokens (so the JSON array is cut off)?"""
+    return getattr(response, 'stop_reason', None) == 'max_tokens'
+
+
+class _BatchSizer:
+    """Adaptive (AIMD) batch size for one kind of AI call.
+
+    Grows by one after every two clean batches that finish within the latency
+    target; halves on an error, a truncated or unusable answer, or a slow
+    batch. Shared by concurrent runs (the pipeline), hence the lock.
+    """
+
+    def __init__(self, initial: int, ceiling: int, target_seconds: float):
+        self.ceiling = max(1, ceiling)
+        self.size = min(max(1, initial), self.ceiling)
+        self.target_seconds = target_seconds
+        self._streak = 0
+        self._lock = threading.Lock()
+
+    def next_size(self) -> int:
+        with self._lock:
+            return self.size
+
+    def observe(self, ok: bool, seconds: float) -> None:
+        with self._lock:
+            if not ok or seconds > self.target_seconds:
+                self.size = max(1, self.size // 2)
+                self._streak = 0
+                return
+            self._streak += 1
+            if self._streak >= 2:
+                self.size = min(self.ceiling, self.size + 1)
+                self._streak = 0
+
+
+# phase → its sizer, so what one run learns carries over to the next.
+_BATCH_SIZERS: dict[str, _BatchSizer] = {}
+_BATCH_SIZERS_LOCK = threading.Lock()
+
+
+def _batch_sizer(phase: str, initial: int, ceiling: int) -> _BatchSizer:
+    with _BATCH_SIZERS_LOCK:
+        sizer = _BATCH_SIZERS.get(phase)
+        if sizer is None:
+            target = float(os.environ.get('AI_BATCH_TARGET_SECONDS', '60'))
+            sizer = _BATCH_SIZERS[phase] = _BatchSizer(initial, ceiling, target)
+        return sizer
+
+
+def _search_batch_bounds() -> tuple[int, int]:
+    """(initial, ceiling) for web-search batches: AI_SEARCH_BATCH / AI_SEARCH_BATCH_MAX."""
+    initial = max(1, int(os.environ.get('AI_SEARCH_BATCH', '5')))
+    ceiling = max(initial, int(os.environ.get('AI_SEARCH_BATCH_MAX', '10')))
+    return initial, ceiling
+
+
+# Provider-side prompt caching. The cached prefix is tools + system, so both
+# must be byte-identical across batches: the system prompts are constants
+# (everything per-batch or per-session lives in the user message), and
+# web-search max_uses is pinned to the batch ceiling instead of the batch
+# size. That makes max_uses only a hard cap: the batch's own budget
+# (per merchant × merchants in it) goes in the user message and is enforced
+# on the answer (_Answers). Reads/writes show up per phase as
+# cache_read/cache_write tokens.
+# Prompts shorter than the model's minimum cacheable length are simply not
+# cached. AI_PROMPT_CACHE=0 turns the markers off.
+def _system(text: str):
+    if os.environ.get('AI_PROMPT_CACHE', '1') == '0':
+        return text
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+
+def _web_search_tool(per_merchant: int) -> list[dict]:
+    return [{
+        "type": "web_search_20250305",
+        "name": "web_search",
+        "max_uses": per_merchant * _search_batch_bounds()[1] + 1,
+    }]
+
+
+def _search_budget(per_merchant: int, batch_size: int) -> int:
+    return per_merchant * batch_size
+
+
+def _with_search_budget(prompt: str, budget: int) -> str:
+    return f"{prompt}\n\nתקציב חיפוש: עד {budget} חיפושים לכל הרשימה יחד."
+
+
+def _outcome(result, batch: list) -> tuple[str, list]:
+    """run_batch's 'status' or (status, rest) → (status, rest)."""
+    if isinstance(result, tuple):
+        return result
+    return result, ([] if result == 'ok' else batch)
+
+
+def _run_batches(phase: str, items: list, initial: int, ceiling: int, run_batch, on_done=None) -> None:
+    """Feed `items` to run_batch in adaptively sized batches.
+
+    run_batch(batch) returns 'ok', 'split' (truncated / unparseable /
+    unsearched — retry as two halves) or 'drop' (the call itself failed after
+    its retries — give up on the batch), or (status, rest) when part of the
+    batch was answered before that: the answered part is done, and only
+    `rest` is split or given up. on_done(batch, ok) is called once per
+    (part of a) batch that is finished, successfully or not; a single item
+    that still fails is given up.
+    """
+    sizer = _batch_sizer(phase, initial, ceiling)
+    retry: deque = deque()
+    pos = 0
+    while retry or pos < len(items):
+        if retry:
+            batch = retry.popleft()
+        else:
+            batch = items[pos:pos + sizer.next_size()]
+            pos += len(batch)
+        t0 = time.perf_counter()
+        status, rest = _outcome(run_batch(batch), batch)
+        sizer.observe(status == 'ok', time.perf_counter() - t0)
+        if len(rest) < len(batch) and on_done:
+            on_done([x for x in batch if x not in rest], True)
+        if status == 'split' and len(rest) < len(batch):
+            retry.appendleft(rest)  # progress was made — retry the rest whole
+            continue
+        if status == 'split' and len(rest) > 1:
+            mid = len(rest) // 2
+            retry.appendleft(rest[mid:])
+            retry.appendleft(rest[:mid])
+            continue
+        if on_done and rest:
+            on_done(rest, status == 'ok')
+
+
+def _run_message_batches(client, phase: str, items: list, size: int, build, apply, on_done=None) -> None:
+    """Message Batches counterpart of _run_batches, for the background jobs.
+
+    Chunks of `size` are built with `build(chunk)` → messages.create kwargs
+    and all submitted as ONE batch; each result goes to
+    `apply(chunk, response, call)` → 'ok' | 'split' | 'drop', exactly like an
+    interactive run. Split halves are submitted together in the next round
+    (AI_BATCH_ROUNDS, default 2); `on_done(chunk, ok)` as in _run_batches.
+    """
+    rounds = max(1, int(os.environ.get('AI_BATCH_ROUNDS', '2')))
+    pending = [items[i:i + size] for i in range(0, len(items), max(1, size))]
+    for round_n in range(rounds):
+        if not pending:
+            return
+        requests: dict[str, dict] = {}
+        calls: dict[str, tuple[list, ai_metrics.Call]] = {}
+        for n, chunk in enumerate(pending):
+            custom_id = f"{phase}-{round_n}-{n}"
+            requests[custom_id] = build(chunk)
+            calls[custom_id] = (chunk, ai_metrics.Call(
+                phase, requests[custom_id]["model"], len(chunk), batched=True))
+        try:
+            results = ai_batches.run(client, requests)
+        except Exception as e:
+            logger.warning(f"AI {phase} message batch failed: {e}")
+            for chunk, call in calls.values():
+                call.fail(e)
+                if on_done:
+                    on_done(chunk, False)
+            return
+        pending = []
+        for custom_id, (chunk, call) in calls.items():
+            response = results.get(custom_id)
+            if response is None:
+                call.fail(RuntimeError("request failed inside the batch"))
+                status, rest = 'drop', chunk
+            else:
+                call.finish(response)
+                status, rest = _outcome(apply(chunk, response, call), chunk)
+            if len(rest) < len(chunk) and on_done:
+                on_done([x for x in chunk if x not in rest], True)
+            if status == 'split' and rest and round_n + 1 < rounds:
+                if len(rest) > 1 and len(rest) == len(chunk):
+                    mid = len(rest) // 2
+                    pending += [rest[:mid], rest[mid:]]
+                else:
+                    pending.append(rest)
+            elif on_done and rest:
+                on_done(rest, status == 'ok')
+
+
 # Per-process cache: base description → resolved category (or 'שונות' for a
 # miss). The dashboard re-runs restore-session on every cold-start recovery,
 # always over the same leftover "שונות" rows. Caching means a warm backend asks
 # Claude about each distinct merchant at most once, instead of on every load.
+# Backed by the opt-in durable cache (ai_cache, AI_CACHE_FILE) across restarts.
 _CACHE: dict[str, str] = {}
 
 
+def _warm(bases) -> dict[str, str]:
+    """Pull durable-cache entries for `bases` into _CACHE; returns the merchant
+    knowledge base's verdicts for those still unresolved.
+
+    Verdicts are not the AI's own answers: they stay out of _CACHE (and so
+    out of the durable cache and the knowledge base's AI vote).
+    """
+    missing = [b for b in dict.fromkeys(bases) if b and b not in _CACHE]
+    if missing:
+        _CACHE.update(ai_cache.lookup(missing))
+    if not merchant_kb.enabled():
+        return {}
+    unresolved = [b for b in dict.fromkeys(bases) if b and _CACHE.get(b) in (None, 'שונות')]
+    if not unresolved:
+        return {}
+    hits = {b: v["category"] for b, v in merchant_kb.lookup(unresolved).items()
+            if v["category"] in VALID_CATEGORIES}
+    ai_metrics.count_cache('knowledge_base', len(hits), len(unresolved) - len(hits))
+    return hits
+
+
+def cached_categories(descriptions: list[str], local: Optional[set] = None) -> dict[int, str]:
+    """index → category for descriptions already resolved (warm or durable
+    cache, or the merchant knowledge base), without calling the AI — a dict
+    lookup per unique merchant.
+
+    What /restore-session applies inline, so the first paint is categorized
+    and /ai-categorize only carries genuinely new merchants. Bases answered by
+    the knowledge base are added to `local` (when given), like local
+    classifier guesses: applied, not persisted as rules.
+    """
+    bases = [_base_desc(d) for d in descriptions]
+    shared = _warm(bases)
+    if local is not None:
+        local.update(shared)
+    unique = {b for b in bases if b}
+    found = {b: shared.get(b) or _CACHE.get(b) for b in unique}
+    found = {b: c for b, c in found.items() if c not in (None, 'שונות')}
+    ai_metrics.count_cache('restore', len(found), len(unique) - len(found))
+    return {i: found[b] for i, b in enumerate(bases) if b in found}
+
+
 def _parse_json_array(text: str) -> list:
     """Parse the model's JSON array, tolerating markdown fences and prose."""
     text = text.strip()
@@ -298,6 +662,175 @@ def _parse_json_array(text: str) -> list:
         return json.loads(text[start:end + 1])
 
 
+class _ArrayItems:
+    """Incremental parser for the model's answer: the complete top-level
+    objects of the first JSON array in a text stream, each as soon as its
+    closing brace arrives. Prose before the array (even with [bracketed]
+    asides) is skipped; `closed` turns True once the array ends."""
+
+    def __init__(self):
+        self.items: list[dict] = []
+        self.closed = False
+        self._buf = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_str = False
+        self._escaped = False
+        self._obj_start: Optional[int] = None
+        self._junk = False  # non-object content at array level → not our array
+
+    def feed(self, text: str) -> list[dict]:
+        """Consume more text; returns the objects completed by it."""
+        new: list[dict] = []
+        if self.closed or not text:
+            return new
+        self._buf += text
+        buf, i = self._buf, self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_str:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_str = False
+            elif self._depth == 0:
+                if ch == '[':
+                    self._depth, self._junk = 1, False
+            elif ch == '"':
+                self._in_str = True
+                if self._depth == 1:
+                    self._junk = True
+            elif ch in '[{':
+                if self._depth == 1:
+                    if ch == '{':
+                        self._obj_start = i
+                    else:
+                        self._junk = True
+                self._depth += 1
+            elif ch in ']}':
+                self._depth -= 1
+                if self._depth == 1 and ch == '}' and self._obj_start is not None:
+                    try:
+                        obj = json.loads(buf[self._obj_start:i + 1])
+                    except json.JSONDecodeError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        new.append(obj)
+                    self._obj_start = None
+                elif self._depth == 0:
+                    if self._junk and not (self.items or new):
+                        pass  # a bracketed aside in prose — keep looking
+                    else:
+                        self.closed = True
+                        i += 1
+                        break
+            elif self._depth == 1 and not ch.isspace() and ch != ',':
+                self._junk = True
+            i += 1
+        self._pos = i
+        self.items.extend(new)
+        return new
+
+
+class _Answers:
+    """Answer sink of one call: every array element is applied once
+    (`apply_item(index, item)`), as soon as it parses — live while streaming,
+    and again from the final text for anything not yet seen.
+
+    With `require_search`, nothing is applied unless the response searched.
+    With `search_budget`, a response that searches more than that is cut
+    off: the elements that completed are kept and the rest retried.
+    """
+
+    def __init__(self, size: int, apply_item, require_search: bool = False,
+                 search_budget: Optional[int] = None):
+        self.size = size
+        self.apply_item = apply_item
+        self.require_search = require_search
+        self.search_budget = search_budget
+        self.answered: set[int] = set()
+        self.searched = False
+        self.searches = 0
+        self._parser = _ArrayItems()
+
+    def restart(self) -> None:
+        """A new attempt at the call: its text and searches start over."""
+        self.searched = False
+        self.searches = 0
+        self._parser = _ArrayItems()
+
+    def block(self, block_type: str) -> None:
+        if block_type in ('server_tool_use', 'web_search_tool_result'):
+            self.searched = True
+        if block_type == 'server_tool_use':
+            self.searches += 1
+
+    def over_budget(self, searches: Optional[int] = None) -> bool:
+        n = self.searches if searches is None else searches
+        return self.search_budget is not None and n > self.search_budget
+
+    def text(self, delta: str) -> None:
+        for item in self._parser.feed(delta):
+            if self.searched or not self.require_search:
+                self.item(item)
+
+    def item(self, item: dict) -> None:
+        try:
+            idx = int(item.get("index"))
+        except (TypeError, ValueError):
+            return
+        if 0 <= idx < self.size and idx not in self.answered:
+            self.answered.add(idx)
+            self.apply_item(idx, item)
+
+    def settle(self, chunk: list, response, call, label: str):
+        """Apply the finished response → 'ok' | ('split', unanswered items).
+
+        Unsearched answers (when required) are discarded whole, bar elements
+        an earlier, searching attempt already applied. A truncated,
+        unparseable or over-budget answer keeps the elements that did
+        complete; only the rest of the chunk is retried.
+        """
+        if self.require_search and not _response_searched(response):
+            rest = self.unanswered(chunk)
+            logger.warning("AI %s answered without searching; discarding %d answers", label, len(rest))
+            call.discard(len(rest))
+            return ('split', rest) if len(rest) < len(chunk) else 'split'
+        self.searched = True
+        searches = _response_searches(response)
+        cut = _truncated(response) or self.over_budget(searches)
+        if self.over_budget(searches):
+            logger.warning("AI %s used %d web searches, over its budget of %d",
+                           label, searches, self.search_budget)
+        text = _response_text(response)
+        parser = _ArrayItems()
+        parser.feed(text)
+        items = parser.items
+        if not parser.closed and not cut:
+            try:
+                items = [it for it in _parse_json_array(text) if isinstance(it, dict)]
+                parser.closed = True
+            except Exception as e:
+                logger.warning(f"AI {label} JSON parse error: {e}")
+        for item in items:
+            self.item(item)
+        if parser.closed and not cut:
+            return 'ok'
+        rest = [x for i, x in enumerate(chunk) if i not in self.answered]
+        if not rest:
+            return 'ok'
+        logger.warning("AI %s answer %s after %d/%d merchants; retrying the rest",
+                       label, "cut off" if cut else "unparseable",
+                       len(chunk) - len(rest), len(chunk))
+        call.discard(len(rest))
+        return 'split', rest
+
+    def unanswered(self, chunk: list) -> list:
+        return [x for i, x in enumerate(chunk) if i not in self.answered]
+
+
 def _response_text(response) -> str:
     return "".join(
         getattr(b, "text", "") for b in response.content
@@ -305,6 +838,16 @@ def _response_text(response) -> str:
     ).strip()
 
 
+def _response_searches(response) -> int:
+    """Web searches the response ran (usage, else its server_tool_use blocks)."""
+    blocks = sum(1 for b in response.content if getattr(b, "type", "") == "server_tool_use")
+    usage = getattr(getattr(response, "usage", None), "server_tool_use", None)
+    try:
+        return max(blocks, int(getattr(usage, "web_search_requests", 0) or 0))
+    except (TypeError, ValueError):
+        return blocks
+
+
 def _response_searched(response) -> bool:
     """Did the model actually use web search in this response?"""
     return any(
@@ -313,119 +856,245 @@ def _response_searched(response) -> bool:
     )
 
 
+# Per-process cache: merchant → what a web search said the business is, as
+# summarized by the model in its "evidence" field. Filled only from responses
+# that actually searched (categorize phase 2, audit, subcategorize phase 2);
+# every later prompt about the merchant carries it, and those merchants are
+# answered without the web-search tool.
+_EVIDENCE: dict[str, str] = {}
+_EVIDENCE_MAX_CHARS = 300
+
+
+def _evidence_key(name: str) -> str:
+    return " ".join(_base_desc(name).lower().split())
+
+
+def _evidence_for(name: str) -> str:
+    return _EVIDENCE.get(_evidence_key(name), "")
+
+
+def _remember_evidence(name: str, item: dict, fallback: str = "") -> None:
+    """Keep the evidence of a searched answer (or `fallback`, e.g. its reason)."""
+    text = " ".join(str(item.get("evidence") or fallback or "").split())
+    if text:
+        _EVIDENCE[_evidence_key(name)] = text[:_EVIDENCE_MAX_CHARS]
+
+
+def _evidence_hint(name: str) -> str:
+    evidence = _evidence_for(name)
+    return _EVIDENCE_HINT.format(evidence) if evidence else ""
+
+
 def _merchant_line(i: int, m: dict) -> str:
-    """One numbered prompt line: merchant name + issuer-sector hint if known."""
+    """One numbered prompt line: merchant name + issuer-sector and search hints."""
     hint = f" (ענף לפי חברת האשראי: {m['issuer']})" if m.get('issuer') else ""
-    return f"{i}. {m['base']}{hint}"
+    return f"{i}. {m['base']}{hint}{_evidence_hint(m['base'])}"
+
+
+def _confidence(item: dict, default: float = 1.0) -> float:
+    """The answer's 0–1 confidence; `default` when the model gave none."""
+    try:
+        return min(1.0, max(0.0, float(item.get("confidence", default))))
+    except (TypeError, ValueError):
+        return default
 
 
-def _classify_known(client, model: str, merchants: list[dict], progress=None) -> tuple[dict[str, str], list[dict]]:
+def _escalation() -> tuple[Optional[str], float]:
+    """(larger model, search-tier threshold) — (None, 0.0) when escalation is off.
+
+    Tiered flow: a no-search pass accepts answers at or above
+    AI_KNOWN_THRESHOLD; the rest are web-searched, and searched answers below
+    AI_SEARCH_THRESHOLD (or missing) are asked once more of
+    AI_ESCALATION_MODEL. Without an escalation model every searched answer is
+    final, as before.
+    """
+    escalation_model = os.environ.get('AI_ESCALATION_MODEL', '').strip()
+    if not escalation_model:
+        return None, 0.0
+    return escalation_model, float(os.environ.get('AI_SEARCH_THRESHOLD', '0.6'))
+
+
+def _classify_known(client, model: str, merchants: list[dict], progress=None, on_resolved=None) -> tuple[dict[str, str], list[dict]]:
     """Phase 1: no web search. Returns (resolved base→category, unknown bases).
 
     Merchants the model cannot identify with certainty come back as unknown —
-    the prompt forbids guessing from the name.
+    the prompt forbids guessing from the name — as do answers below
+    AI_KNOWN_THRESHOLD confidence. `on_resolved({base: category})` is called
+    for every hit as soon as its answer has parsed. Whatever a truncated or
+    unparseable chunk did not answer is retried (split); what a failed call
+    did not answer goes to phase 2.
     """
     resolved: dict[str, str] = {}
-    unknown: list[str] = []
-    chunk_size = 100
-    for start in range(0, len(merchants), chunk_size):
-        chunk = merchants[start:start + chunk_size]
+    unknown: list[dict] = []
+    threshold = float(os.environ.get('AI_KNOWN_THRESHOLD', '0.7'))
+
+    def _run(chunk: list[dict]):
+        def _answer(idx: int, item: dict) -> None:
+            m = chunk[idx]
+            cat = str(item.get("category", "")).strip()
+            if (item.get("unknown") or cat not in VALID_CATEGORIES or cat == 'שונות'
+                    or _confidence(item) < threshold):
+                unknown.append(m)
+                return
+            resolved[m["base"]] = cat
+            if on_resolved:
+                on_resolved({m["base"]: cat})
+            if progress:
+                progress(len(resolved))
+
         tx_lines = "\n".join(_merchant_line(i, m) for i, m in enumerate(chunk))
+        call = ai_metrics.Call('categorize_known', model, len(chunk))
+        answers = _Answers(len(chunk), _answer)
         try:
-            response = client.messages.create(
+            response = _create(
+                client, call, answers,
                 model=model,
                 max_tokens=4096,
-                system=PHASE1_SYSTEM,
+                system=_system(PHASE1_SYSTEM),
                 messages=[{"role": "user", "content": PHASE1_USER_TEMPLATE.format(transactions=tx_lines)}],
             )
-            results = _parse_json_array(_response_text(response))
         except Exception as e:
             logger.warning(f"AI phase-1 (known merchants) failed: {e}")
+            rest = answers.unanswered(chunk)
+            return ('drop', rest) if len(rest) < len(chunk) else 'drop'
+        outcome = answers.settle(chunk, response, call, "phase-1")
+        if outcome == 'ok':
+            unknown.extend(answers.unanswered(chunk))  # merchants the model skipped
+        return outcome
+
+    def _done(chunk, ok):
+        if not ok:
             unknown.extend(chunk)
-            continue
 
-        answered: dict[int, str] = {}
-        for item in results:
-            idx = item.get("index")
-            if idx is None or item.get("unknown"):
-                continue
-            cat = str(item.get("category", "")).strip()
-            if cat in VALID_CATEGORIES and cat != 'שונות':
-                answered[int(idx)] = cat
-        for i, m in enumerate(chunk):
-            if i in answered:
-                resolved[m["base"]] = answered[i]
-            else:
-                unknown.append(m)
-        if progress:
-            progress(len(resolved))
+    _run_batches('categorize_known', merchants, 100, 100, _run, _done)
     return resolved, unknown
 
 
-def _classify_via_search(client, model: str, merchants: list[dict], progress=None) -> dict[str, str]:
+def _classify_via_search(client, model: str, merchants: list[dict], progress=None, on_resolved=None,
+                         phase: str = 'categorize_search', threshold: float = 0.0,
+                         ambiguous: Optional[list[dict]] = None) -> dict[str, str]:
     """Phase 2: web search is mandatory. Returns resolved base→category.
 
-    Small batches so every merchant gets search budget. A response with no
-    search activity is discarded — those merchants stay unresolved rather than
-    receiving a name-based guess.
+    Small, adaptively sized batches so every merchant gets search budget. A
+    response with no search activity is discarded — those merchants are
+    retried in smaller batches, and stay unresolved rather than receiving a
+    name-based guess if even a single-merchant call won't search.
+    `on_resolved({base: category})` is called for every hit as soon as its
+    answer has parsed (streamed, when the client supports it).
+
+    With `ambiguous` given, searched merchants answered below `threshold` (or
+    not at all) are appended to it instead of resolved — each with its
+    tentative answer under "tentative" — for the escalation tier.
     """
     resolved: dict[str, str] = {}
-    batch_size = max(1, int(os.environ.get('AI_SEARCH_BATCH', '5')))
     per_merchant = max(1, int(os.environ.get('AI_WEB_SEARCH_MAX', '2')))
-    for start in range(0, len(merchants), batch_size):
-        batch = merchants[start:start + batch_size]
+
+    counted: set[str] = set()  # bases already reported to `progress`
+
+    def _count(batch: list[dict]) -> None:
+        fresh = [m["base"] for m in batch if m["base"] not in counted]
+        counted.update(fresh)
+        if progress and fresh:
+            progress(len(fresh))
+
+    def _run(batch: list[dict]):
+        def _answer(idx: int, item: dict) -> None:
+            m = batch[idx]
+            _remember_evidence(m["base"], item)
+            cat = str(item.get("category", "")).strip()
+            if cat in VALID_CATEGORIES and cat != 'שונות':
+                if ambiguous is not None and _confidence(item) < threshold:
+                    ambiguous.append({**m, "tentative": cat})
+                else:
+                    resolved[m["base"]] = cat
+                    if on_resolved:
+                        on_resolved({m["base"]: cat})
+            elif ambiguous is not None:
+                ambiguous.append({**m, "tentative": None})
+            _count([m])
+
         tx_lines = "\n".join(_merchant_line(i, m) for i, m in enumerate(batch))
+        call = ai_metrics.Call(phase, model, len(batch))
+        budget = _search_budget(per_merchant, len(batch))
+        answers = _Answers(len(batch), _answer, require_search=True, search_budget=budget)
         try:
-            response = client.messages.create(
+            response = _create(
+                client, call, answers,
                 model=model,
                 max_tokens=4096,
-                system=PHASE2_SYSTEM,
-                messages=[{"role": "user", "content": PHASE2_USER_TEMPLATE.format(transactions=tx_lines)}],
-                tools=[{
-                    "type": "web_search_20250305",
-                    "name": "web_search",
-                    "max_uses": per_merchant * len(batch) + 1,
-                }],
+                system=_system(PHASE2_SYSTEM),
+                messages=[{"role": "user", "content": _with_search_budget(
+                    PHASE2_USER_TEMPLATE.format(transactions=tx_lines), budget)}],
+                tools=_web_search_tool(per_merchant),
             )
         except Exception as e:
             # Web search unavailable (account/model restriction) or API error.
             # Do NOT fall back to searchless guessing — these merchants were
             # already established as unknown; a guess would be fabricated.
             logger.warning(f"AI phase-2 (web search) failed, leaving batch uncategorized: {e}")
-            if progress:
-                progress(len(batch))
-            continue
+            rest = answers.unanswered(batch)
+            return ('drop', rest) if len(rest) < len(batch) else 'drop'
+        outcome = answers.settle(batch, response, call, "phase-2")
+        if outcome == 'ok' and ambiguous is not None:
+            ambiguous.extend({**m, "tentative": None} for m in answers.unanswered(batch))
+        return outcome
 
-        if not _response_searched(response):
-            logger.warning(
-                "AI phase-2 answered without searching; discarding %d answers", len(batch)
-            )
-            if progress:
-                progress(len(batch))
-            continue
+    def _done(batch, ok):
+        _count(batch)
 
-        try:
-            results = _parse_json_array(_response_text(response))
-        except Exception as e:
-            logger.warning(f"AI phase-2 JSON parse error: {e}")
-            if progress:
-                progress(len(batch))
-            continue
-
-        for item in results:
-            idx = item.get("index")
-            cat = str(item.get("category", "")).strip()
-            if idx is None:
-                continue
-            idx = int(idx)
-            if 0 <= idx < len(batch) and cat in VALID_CATEGORIES and cat != 'שונות':
-                resolved[batch[idx]["base"]] = cat
-        if progress:
-            progress(len(batch))
+    _run_batches(phase, merchants, *_search_batch_bounds(), _run, _done)
     return resolved
 
 
-def categorize_transactions(descriptions: list[str], issuers: Optional[list] = None, on_progress=None) -> Optional[dict[int, str]]:
+def _escalate(client, escalation_model: str, ambiguous: list[dict], on_resolved=None) -> dict[str, str]:
+    """Tier 3: searched-but-uncertain merchants, asked again of the larger model.
+
+    Its answer wins; where it has none the search tier's tentative answer
+    stands, so escalating never loses a category.
+    """
+    if not ambiguous:
+        return {}
+    logger.info("Escalating %d uncertain merchants to %s", len(ambiguous), escalation_model)
+    resolved = _classify_via_search(
+        client, escalation_model, ambiguous, on_resolved=on_resolved, phase='categorize_escalate')
+    fallback = {
+        m["base"]: m["tentative"] for m in ambiguous
+        if m.get("tentative") and m["base"] not in resolved
+    }
+    if fallback and on_resolved:
+        on_resolved(fallback)
+    ai_metrics.count_tier('categorize_escalate', len(resolved), 0)
+    return {**fallback, **resolved}
+
+
+def _by_entity(to_query: list[dict], bases: list[str]) -> tuple[list[dict], dict[str, list[str]], dict[str, str]]:
+    """Fold to_query by merchant entity (merchant_resolver).
+
+    Returns the merchants still to ask (one per entity), {asked base: its
+    folded aliases}, and {base: category} for those whose entity a cached
+    base of this same call already resolved.
+    """
+    if not to_query:
+        return to_query, {}, {}
+    ids = merchant_resolver.resolve(b for b in bases if b)
+    known = {ids[b]: _CACHE[b] for b in ids if _CACHE.get(b) not in (None, 'שונות')}
+    reps: dict[str, dict] = {}
+    aliases: dict[str, list[str]] = {}
+    siblings: dict[str, str] = {}
+    for m in to_query:
+        entity = ids[m["base"]]
+        if entity in known:
+            siblings[m["base"]] = known[entity]
+        elif entity in reps:
+            aliases.setdefault(reps[entity]["base"], []).append(m["base"])
+        else:
+            reps[entity] = m
+    return list(reps.values()), aliases, siblings
+
+
+def categorize_transactions(descriptions: list[str], issuers: Optional[list] = None, on_progress=None,
+                            on_resolved=None, session_id: Optional[str] = None,
+                            local: Optional[set] = None) -> Optional[dict[int, str]]:
     """
     Categorize transaction descriptions using Claude AI.
 
@@ -434,6 +1103,17 @@ def categorize_transactions(descriptions: list[str], issuers: Optional[list] = N
     `issuers` is given (parallel to `descriptions`), each merchant's
     card-company sector (ענף_מקור) is passed to Claude as a hint. Returns a
     dict mapping index → category name, or None if AI is unavailable.
+
+    `on_resolved(base→category)` streams resolutions as they land — cache hits
+    first, then every phase-1 chunk and phase-2 batch — so a caller can
+    publish them to the session before the whole run finishes.
+
+    With AI_LOCAL_CLASSIFIER on, the local classifier answers first, from the
+    shared corpus plus `session_id`'s own rules. Its answers are unverified
+    guesses: they are applied and returned like the rest, but never cached
+    or learned from, and their bases are added to `local` (when given) so
+    the caller doesn't persist them as rules. Merchant knowledge base
+    verdicts are handled the same way.
     """
     if not descriptions:
         return {}
@@ -446,16 +1126,61 @@ def categorize_transactions(descriptions: list[str], issuers: Optional[list] = N
     # Collapse to unique base merchants (installment suffix stripped), serving
     # cached resolutions first.
     bases = [_base_desc(d) for d in descriptions]
+    shared = _warm(bases)
+    if local is not None:
+        local.update(shared)
     to_query: list[dict] = []
     seen: set[str] = set()
     for i, b in enumerate(bases):
-        if b and b not in _CACHE and b not in seen:
+        if b and b not in _CACHE and b not in shared and b not in seen:
             seen.add(b)
             issuer = None
             if issuers and i < len(issuers) and issuers[i]:
                 issuer = str(issuers[i]).strip() or None
             to_query.append({"base": b, "issuer": issuer})
 
+    ai_metrics.count_cache('categorize', len({b for b in bases if b}) - len(to_query), len(to_query))
+    if on_resolved:
+        cached_hits = {
+            b: shared.get(b) or _CACHE[b] for b in dict.fromkeys(bases)
+            if b and (shared.get(b) or _CACHE.get(b)) not in (None, 'שונות')
+        }
+        if cached_hits:
+            on_resolved(cached_hits)
+
+    # One query per merchant entity: branches, cities and Hebrew/Latin
+    # spellings of one business are answered once and fanned out — from a
+    # resolved sibling in this same call when there is one.
+    to_query, aliases, siblings = _by_entity(to_query, bases)
+    ai_metrics.count_entities('categorize', len(siblings) + sum(len(a) for a in aliases.values()))
+    if siblings:
+        _CACHE.update(siblings)
+        if on_resolved:
+            on_resolved(siblings)
+
+    def _fan(resolved: dict[str, str]) -> dict[str, str]:
+        return {**resolved, **{a: c for b, c in resolved.items() for a in aliases.get(b, ())}}
+
+    if aliases and on_resolved:
+        _publish = on_resolved
+
+        def on_resolved(resolved):
+            _publish(_fan(resolved))
+
+    # Confident local answers (char n-gram kNN over past resolutions, this
+    # session's rules and the catalog) never reach Claude — nor the caches.
+    guessed: dict[str, str] = {}
+    if to_query and local_classifier.enabled():
+        guessed = _fan(local_classifier.classify(to_query, scope=session_id))
+        ai_metrics.count_cache('local_classifier', len(guessed), len(to_query) - len(guessed))
+        if guessed:
+            if local is not None:
+                local.update(guessed)
+            if on_resolved:
+                on_resolved(guessed)
+            to_query = [m for m in to_query if m["base"] not in guessed]
+            logger.info("Local classifier resolved %d merchants without Claude", len(guessed))
+
     model = os.environ.get('AI_MODEL', 'claude-haiku-4-5-20251001')
     use_search = os.environ.get('AI_WEB_SEARCH', '1') != '0'
 
@@ -468,17 +1193,32 @@ def categorize_transactions(descriptions: list[str], issuers: Optional[list] = N
                 on_progress(min(done_n, total), total)
 
         _emit(0)
+        with_evidence = sum(1 for m in to_query if _evidence_for(m["base"]))
+        if with_evidence and use_search:
+            ai_metrics.count_evidence('categorize', with_evidence)
         resolved, unknown = _classify_known(
             client, model, to_query,
             progress=lambda resolved_n: _emit(resolved_n),
+            on_resolved=on_resolved,
         )
         finalized["n"] = len(resolved)
+        # Evidence is only a hint: a merchant phase 1 still couldn't place
+        # with it is searched like any other unknown, not dropped.
+        ai_metrics.count_tier('categorize_known', len(resolved), len(unknown))
         if unknown:
             if use_search:
                 def _batch_done(batch_n):
                     finalized["n"] += batch_n
                     _emit(finalized["n"])
-                resolved.update(_classify_via_search(client, model, unknown, progress=_batch_done))
+                escalation_model, threshold = _escalation()
+                ambiguous: Optional[list[dict]] = [] if escalation_model else None
+                searched = _classify_via_search(
+                    client, model, unknown, progress=_batch_done, on_resolved=on_resolved,
+                    threshold=threshold, ambiguous=ambiguous)
+                resolved.update(searched)
+                if ambiguous is not None:
+                    ai_metrics.count_tier('categorize_search', len(searched), len(ambiguous))
+                    resolved.update(_escalate(client, escalation_model, ambiguous, on_resolved))
             else:
                 logger.info(
                     "AI web search disabled; %d unrecognized merchants stay שונות", len(unknown)
@@ -486,7 +1226,15 @@ def categorize_transactions(descriptions: list[str], issuers: Optional[list] = N
         _emit(total)
         # Remember hits AND misses so we never re-query the same merchant.
         for m in to_query:
-            _CACHE[m["base"]] = resolved.get(m["base"], 'שונות')
+            for b in (m["base"], *aliases.get(m["base"], ())):
+                _CACHE[b] = resolved.get(m["base"], 'שונות')
+        ai_cache.store(_fan(resolved))
+        merchant_kb.record_ai(_fan(resolved))
+        # Claude's answers become training examples for the local classifier.
+        local_classifier.learn(
+            resolved.items(), issuers={m["base"]: m["issuer"] for m in to_query},
+            valid=VALID_CATEGORIES,
+        )
         via_search = sum(1 for m in unknown if m["base"] in resolved)
         logger.info(
             "AI categorized %d/%d unique merchants (%d known directly, %d via web search)",
@@ -495,7 +1243,7 @@ def categorize_transactions(descriptions: list[str], issuers: Optional[list] = N
 
     mapping: dict[int, str] = {}
     for i, b in enumerate(bases):
-        cat = _CACHE.get(b)
+        cat = guessed.get(b) or shared.get(b) or _CACHE.get(b)
         if cat and cat != 'שונות':
             mapping[i] = cat
     return mapping
@@ -518,7 +1266,8 @@ SUBCAT_KNOWN_SYSTEM = f"""אתה מערכת לפילוח בתי עסק לתתי-
 
 {SUBCAT_RULES_COMMON}
 4. שייך בית עסק רק אם אתה מזהה אותו בוודאות — רשת/מותג מוכר, או שהתיאור עצמו אומר מה סוג העסק. אסור לשייך לפי צליל השם: אם אינך בטוח מהו העסק — החזר {{"index": N, "unknown": true}} והוא ייבדק באינטרנט בשלב נפרד.
-5. החזר תמיד JSON תקין בלבד (כבלוק הטקסט האחרון בתשובה):
+5. {_EVIDENCE_RULE}
+6. החזר תמיד JSON תקין בלבד (כבלוק הטקסט האחרון בתשובה):
    [{{"index": 0, "subcategory": "שם"}}, {{"index": 1, "unknown": true}}, ...]"""
 
 SUBCAT_SEARCH_SYSTEM = f"""אתה מערכת לפילוח בתי עסק לתתי-קטגוריות בדשבורד פיננסי ישראלי. בתי העסק ברשימה כבר זוהו כלא-מוכרים — אסור לשייך אותם מהשם בלבד.
@@ -526,7 +1275,7 @@ SUBCAT_SEARCH_SYSTEM = f"""אתה מערכת לפילוח בתי עסק לתתי
 {SUBCAT_RULES_COMMON}
 4. עבור כל בית עסק אתה חייב לבצע חיפוש אינטרנט לפני השיוך (למשל: "<שם העסק> ישראל"). שייך לפי מה שמצאת: אם יש אינדיקציה סבירה — בחר את תת-הקטגוריה הקרובה ביותר (או צור מתאימה); החזר "" (ריק) רק כשאין שום מידע.
 5. החזר תמיד JSON תקין בלבד (כבלוק הטקסט האחרון בתשובה):
-   [{{"index": 0, "subcategory": "שם או ריק"}}, ...]"""
+   [{{"index": 0, "subcategory": "שם או ריק", "evidence": "{_EVIDENCE_FIELD}"}}, ...]"""
 
 SUBCAT_USER_TEMPLATE = """קטגוריית-האב: {category}
 
@@ -550,11 +1299,13 @@ def _valid_subcategory(sub: str, category: str) -> str:
 def _subcat_lines(items: list[dict]) -> str:
     return "\n".join(
         f"{i}. \"{it['merchant']}\" — {it.get('count', 1)} עסקאות, {round(float(it.get('total', 0)))} ₪"
+        f"{_evidence_hint(it['merchant'])}"
         for i, it in enumerate(items)
     )
 
 
-def suggest_subcategories(category: str, items: list[dict], existing: list[str]) -> Optional[list[dict]]:
+def suggest_subcategories(category: str, items: list[dict], existing: list[str],
+                          via_batch: bool = False, on_resolved=None) -> Optional[list[dict]]:
     """Group a category's unsubcategorized merchants into subcategories.
 
     Claude may reuse an existing subcategory or CREATE a new one (a short
@@ -568,6 +1319,11 @@ def suggest_subcategories(category: str, items: list[dict], existing: list[str])
         category: the parent category (all merchants already belong to it).
         items: [{merchant, count, total}, ...]
         existing: subcategory names already available for this parent.
+        via_batch: send each phase through the Message Batches API (blocks
+            until the batch ends — background jobs only). Names minted by one
+            chunk are then not offered to the chunks of the same batch.
+        on_resolved: optional callback(index, subcategory), called for every
+            fresh assignment as soon as its answer has parsed.
 
     Returns:
         [{index, subcategory}, ...] (subcategory may be ''), or None if AI is
@@ -591,6 +1347,24 @@ def suggest_subcategories(category: str, items: list[dict], existing: list[str])
             to_query.append(i)
         else:
             resolved[i] = cached
+    ai_metrics.count_cache('subcategorize', len(items) - len(to_query), len(to_query))
+    # Subcategories the merchant knowledge base is confident about, under
+    # this same parent category.
+    if to_query and merchant_kb.enabled():
+        known = merchant_kb.lookup(items[i]['merchant'] for i in to_query)
+        from_kb: dict[int, str] = {}
+        for i in to_query:
+            verdict = known.get(items[i]['merchant'])
+            if verdict and verdict["category"] == category:
+                sub = _valid_subcategory(verdict["subcategory"], category)
+                if sub:
+                    from_kb[i] = sub
+        ai_metrics.count_cache('knowledge_base', len(from_kb), len(to_query) - len(from_kb))
+        resolved.update(from_kb)
+        to_query = [i for i in to_query if i not in from_kb]
+    with_evidence = sum(1 for i in to_query if _evidence_for(items[i]['merchant']))
+    if with_evidence and use_search:
+        ai_metrics.count_evidence('subcategorize', with_evidence)
 
     # Names created in earlier batches are offered to later ones, so one run
     # can't mint synonyms for the same type of business.
@@ -601,85 +1375,110 @@ def suggest_subcategories(category: str, items: list[dict], existing: list[str])
 
     # ── Phase 1: no web search, certain merchants only ──
     unknown: list[int] = []
-    chunk_size = 100
-    for start in range(0, len(to_query), chunk_size):
-        chunk = to_query[start:start + chunk_size]
-        chunk_items = [items[i] for i in chunk]
+
+    def _known_params(chunk: list[int]) -> dict:
+        return {
+            "model": model,
+            "max_tokens": 8192,
+            "system": _system(SUBCAT_KNOWN_SYSTEM),
+            "messages": [{"role": "user", "content": SUBCAT_USER_TEMPLATE.format(
+                category=category, existing=_existing_str(),
+                merchants=_subcat_lines([items[i] for i in chunk]))}],
+        }
+
+    def _assign(orig_i: int, sub: str) -> None:
+        resolved[orig_i] = sub
+        if sub not in known_names:
+            known_names.append(sub)
+        if on_resolved:
+            on_resolved(orig_i, sub)
+
+    def _known_answers(chunk: list[int]) -> _Answers:
+        def _answer(local_i: int, item: dict) -> None:
+            sub = "" if item.get("unknown") else _valid_subcategory(item.get("subcategory", ""), category)
+            if sub:
+                _assign(chunk[local_i], sub)
+            else:
+                unknown.append(chunk[local_i])
+        return _Answers(len(chunk), _answer)
+
+    def _known_settle(chunk: list[int], answers: _Answers, response, call):
+        outcome = answers.settle(chunk, response, call, "subcategory phase-1")
+        if outcome == 'ok':
+            unknown.extend(answers.unanswered(chunk))  # merchants the model skipped
+        return outcome
+
+    def _known_apply(chunk: list[int], response, call):
+        return _known_settle(chunk, _known_answers(chunk), response, call)
+
+    def _run_known(chunk: list[int]):
+        call = ai_metrics.Call('subcategorize_known', model, len(chunk))
+        answers = _known_answers(chunk)
         try:
-            response = client.messages.create(
-                model=model,
-                max_tokens=8192,
-                system=SUBCAT_KNOWN_SYSTEM,
-                messages=[{"role": "user", "content": SUBCAT_USER_TEMPLATE.format(
-                    category=category, existing=_existing_str(), merchants=_subcat_lines(chunk_items))}],
-            )
-            results = _parse_json_array(_response_text(response))
+            response = _create(client, call, answers, **_known_params(chunk))
         except Exception as e:
             logger.warning(f"AI subcategory phase-1 failed: {e}")
+            rest = answers.unanswered(chunk)
+            return ('drop', rest) if len(rest) < len(chunk) else 'drop'
+        return _known_settle(chunk, answers, response, call)
+
+    def _known_done(chunk, ok):
+        if not ok:
             unknown.extend(chunk)
-            continue
 
-        answered: dict[int, str] = {}
-        for item in results:
-            idx = item.get("index")
-            if idx is None or item.get("unknown"):
-                continue
-            sub = _valid_subcategory(item.get("subcategory", ""), category)
-            if sub:
-                answered[int(idx)] = sub
-        for local_i, orig_i in enumerate(chunk):
-            if local_i in answered:
-                resolved[orig_i] = answered[local_i]
-                if answered[local_i] not in known_names:
-                    known_names.append(answered[local_i])
-            else:
-                unknown.append(orig_i)
+    if via_batch:
+        _run_message_batches(client, 'subcategorize_known', to_query, 100,
+                             _known_params, _known_apply, _known_done)
+    else:
+        _run_batches('subcategorize_known', to_query, 100, 100, _run_known, _known_done)
 
     # ── Phase 2: web search mandatory for the unrecognized merchants ──
+    # (including any phase 1 couldn't place despite earlier search evidence)
     if unknown and use_search:
-        batch_size = max(1, int(os.environ.get('AI_SEARCH_BATCH', '5')))
         per_merchant = max(1, int(os.environ.get('AI_WEB_SEARCH_MAX', '2')))
-        for start in range(0, len(unknown), batch_size):
-            batch = unknown[start:start + batch_size]
-            batch_items = [items[i] for i in batch]
+
+        def _search_params(batch: list[int]) -> dict:
+            return {
+                "model": model,
+                "max_tokens": 4096,
+                "system": _system(SUBCAT_SEARCH_SYSTEM),
+                "messages": [{"role": "user", "content": _with_search_budget(SUBCAT_USER_TEMPLATE.format(
+                    category=category, existing=_existing_str(),
+                    merchants=_subcat_lines([items[i] for i in batch])),
+                    _search_budget(per_merchant, len(batch)))}],
+                "tools": _web_search_tool(per_merchant),
+            }
+
+        def _search_answers(batch: list[int]) -> _Answers:
+            def _answer(local_i: int, item: dict) -> None:
+                _remember_evidence(items[batch[local_i]]['merchant'], item)
+                sub = _valid_subcategory(item.get("subcategory", ""), category)
+                if sub:
+                    _assign(batch[local_i], sub)
+            return _Answers(len(batch), _answer, require_search=True,
+                            search_budget=_search_budget(per_merchant, len(batch)))
+
+        def _search_apply(batch: list[int], response, call):
+            return _search_answers(batch).settle(batch, response, call, "subcategory phase-2")
+
+        def _run_search(batch: list[int]):
+            call = ai_metrics.Call('subcategorize_search', model, len(batch))
+            answers = _search_answers(batch)
             try:
-                response = client.messages.create(
-                    model=model,
-                    max_tokens=4096,
-                    system=SUBCAT_SEARCH_SYSTEM,
-                    messages=[{"role": "user", "content": SUBCAT_USER_TEMPLATE.format(
-                        category=category, existing=_existing_str(), merchants=_subcat_lines(batch_items))}],
-                    tools=[{
-                        "type": "web_search_20250305",
-                        "name": "web_search",
-                        "max_uses": per_merchant * len(batch) + 1,
-                    }],
-                )
+                response = _create(client, call, answers, **_search_params(batch))
             except Exception as e:
                 # No searchless fallback — these merchants were already
                 # established as unknown; a guess would be fabricated.
                 logger.warning(f"AI subcategory phase-2 failed, leaving batch unassigned: {e}")
-                continue
-            if not _response_searched(response):
-                logger.warning("AI subcategory phase-2 answered without searching; discarding %d answers", len(batch))
-                continue
-            try:
-                results = _parse_json_array(_response_text(response))
-            except Exception as e:
-                logger.warning(f"AI subcategory phase-2 JSON parse error: {e}")
-                continue
-            for item in results:
-                idx = item.get("index")
-                if idx is None:
-                    continue
-                idx = int(idx)
-                if not (0 <= idx < len(batch)):
-                    continue
-                sub = _valid_subcategory(item.get("subcategory", ""), category)
-                if sub:
-                    resolved[batch[idx]] = sub
-                    if sub not in known_names:
-                        known_names.append(sub)
+                rest = answers.unanswered(batch)
+                return ('drop', rest) if len(rest) < len(batch) else 'drop'
+            return answers.settle(batch, response, call, "subcategory phase-2")
+
+        if via_batch:
+            _run_message_batches(client, 'subcategorize_search', unknown, _search_batch_bounds()[1],
+                                 _search_params, _search_apply)
+        else:
+            _run_batches('subcategorize_search', unknown, *_search_batch_bounds(), _run_search)
     elif unknown:
         logger.info("AI web search disabled; %d unrecognized merchants stay unsubcategorized", len(unknown))
 
@@ -687,6 +1486,7 @@ def suggest_subcategories(category: str, items: list[dict], existing: list[str])
     # never re-queries the same merchant for the same category.
     for i in to_query:
         _SUBCAT_CACHE[(category, items[i]['merchant'])] = resolved.get(i, '')
+    merchant_kb.record_ai({items[i]['merchant']: resolved.get(i, '') for i in to_query}, category=category)
 
     out = [{"index": i, "subcategory": resolved.get(i, '')} for i in range(len(items))]
     logger.info(
@@ -0,0 +1,140 @@
+"""
+Per-session AI event channel, streamed to the browser as Server-Sent Events.
+
+The AI endpoints run in FastAPI's threadpool (or pipeline worker threads) and
+call `publish()`; GET /ai-events holds one `stream()` per open EventSource.
+Events carry a per-session sequence number as their SSE id, and the last
+EVENT_BACKLOG events are kept so a reconnecting client (Last-Event-ID) picks
+up exactly where it left off. In-memory like `sessions` — a cold start simply
+begins a new sequence. A channel goes when its session is deleted (`drop`),
+or after AI_EVENTS_IDLE_SECONDS without events or subscribers.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Optional
+
+EVENT_BACKLOG = 256
+# Keep-alive comment interval; also keeps idle-timeout proxies from cutting
+# the connection between AI batches.
+HEARTBEAT_SECONDS = 15.0
+# A stream closes after this long; EventSource reconnects on its own with
+# Last-Event-ID, so nothing is lost and no connection lives forever.
+MAX_STREAM_SECONDS = float(os.environ.get('AI_EVENTS_MAX_SECONDS', '300'))
+# Channels of sessions nobody publishes to or listens on are swept after this
+# long — e.g. a late event from a run whose session was already deleted.
+IDLE_SECONDS = float(os.environ.get('AI_EVENTS_IDLE_SECONDS', '3600'))
+_SWEEP_SECONDS = 60.0
+
+
+class _Channel:
+    __slots__ = ('seq', 'backlog', 'listeners', 'used')
+
+    def __init__(self):
+        self.seq = 0
+        self.backlog: deque = deque(maxlen=EVENT_BACKLOG)
+        self.listeners: set = set()
+        self.used = time.monotonic()
+
+
+_CHANNELS: dict[str, _Channel] = {}
+_GUARD = threading.Lock()
+_last_sweep = time.monotonic()
+
+
+def _channel(session_id: str) -> _Channel:
+    # Called under _GUARD.
+    global _last_sweep
+    now = time.monotonic()
+    if now - _last_sweep > _SWEEP_SECONDS:
+        _last_sweep = now
+        for sid in [sid for sid, ch in _CHANNELS.items() if not ch.listeners and now - ch.used > IDLE_SECONDS]:
+            del _CHANNELS[sid]
+    ch = _CHANNELS.get(session_id)
+    if ch is None:
+        ch = _CHANNELS.setdefault(session_id, _Channel())
+    ch.used = now
+    return ch
+
+
+def drop(session_id: str) -> None:
+    """Forget a deleted session's channel; its open streams end."""
+    with _GUARD:
+        ch = _CHANNELS.pop(session_id, None)
+        listeners = list(ch.listeners) if ch else []
+    for loop, queue in listeners:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+        except RuntimeError:
+            pass
+
+
+def publish(session_id: str, event: str, data: dict) -> int:
+    """Record an event for session_id and wake every open stream. Thread-safe.
+
+    Returns the event's sequence number.
+    """
+    with _GUARD:
+        ch = _channel(session_id)
+        ch.seq += 1
+        item = (ch.seq, event, data)
+        ch.backlog.append(item)
+        listeners = list(ch.listeners)
+    for loop, queue in listeners:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # The stream's loop is gone; its finally-block unregisters it.
+            pass
+    return item[0]
+
+
+def format_event(seq: int, event: str, data: dict) -> str:
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def stream(
+    session_id: str,
+    last_event_id: Optional[int] = None,
+    snapshot: Optional[dict] = None,
+) -> AsyncIterator[str]:
+    """SSE text for one subscriber.
+
+    With last_event_id, first replays the backlog after it; otherwise (a fresh
+    subscriber) starts with `snapshot` as a "progress" event so the meter is
+    right immediately. Then live events, keep-alives, and a clean close after
+    MAX_STREAM_SECONDS.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    listener = (loop, queue)
+    with _GUARD:
+        ch = _channel(session_id)
+        ch.listeners.add(listener)
+        seq = ch.seq
+        replay = [it for it in ch.backlog if last_event_id is not None and it[0] > last_event_id]
+    try:
+        yield "retry: 3000\n\n"
+        if last_event_id is None and snapshot is not None:
+            yield format_event(seq, 'progress', snapshot)
+        for item in replay:
+            yield format_event(*item)
+        deadline = loop.time() + MAX_STREAM_SECONDS
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                item = await asyncio.wait_for(queue.get(), min(HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:   # channel dropped
+                return
+            yield format_event(*item)
+    finally:
+        with _GUARD:
+            ch.listeners.discard(listener)
@@ -0,0 +1,78 @@
+"""
+Background jobs for AI runs that outlive the request that started them —
+the Message Batches mode of /ai-audit and /ai-subcategorize-all, where a
+batch can take minutes to hours to end.
+
+`submit()` returns the job at once; a small worker pool (AI_JOB_WORKERS, a
+worker_pools.WorkerPool) runs it in the submitter's contextvars, so AI
+metrics stay attributed to the session. Status and result are read back with `get()` (GET /ai-jobs/{id})
+and every state change is published on the session's event stream as a
+"job" event. In-memory and per-process like the sessions themselves.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from . import ai_events, worker_pools
+
+logger = logging.getLogger(__name__)
+
+MAX_JOBS = 200  # finished jobs beyond this are forgotten, oldest first
+
+_POOL = worker_pools.WorkerPool('ai-job', int(os.environ.get('AI_JOB_WORKERS', '2')))
+_LOCK = threading.Lock()
+_JOBS: "OrderedDict[str, dict]" = OrderedDict()
+
+
+def _public(job: dict) -> dict:
+    return {k: v for k, v in job.items() if not k.startswith('_')}
+
+
+def _update(job: dict, **fields) -> None:
+    with _LOCK:
+        job.update(fields)
+        view = _public(job)
+    ai_events.publish(job["session_id"], "job", {k: v for k, v in view.items() if k != "result"})
+
+
+def _prune() -> None:
+    finished = [jid for jid, j in _JOBS.items() if j["status"] in ("done", "failed")]
+    while len(_JOBS) > MAX_JOBS and finished:
+        _JOBS.pop(finished.pop(0), None)
+
+
+def submit(kind: str, session_id: str, fn: Callable[[], dict]) -> dict:
+    """Queue `fn()` (returns the JSON result) as a job; returns its public view."""
+    job = {
+        "id": uuid.uuid4().hex, "kind": kind, "session_id": session_id,
+        "status": "queued", "created_at": round(time.time(), 3),
+        "finished_at": None, "result": None, "error": None,
+    }
+    with _LOCK:
+        _JOBS[job["id"]] = job
+        _prune()
+    _POOL.submit(_run, job, fn)
+    return _public(job)
+
+
+def _run(job: dict, fn: Callable[[], dict]) -> None:
+    _update(job, status="running")
+    try:
+        result = fn()
+    except Exception as e:
+        # HTTPException carries its message in .detail
+        error = str(getattr(e, 'detail', '') or e) or type(e).__name__
+        logger.warning("AI job %s (%s) failed: %s", job["id"], job["kind"], error)
+        _update(job, status="failed", error=error, finished_at=round(time.time(), 3))
+        return
+    _update(job, status="done", result=result, finished_at=round(time.time(), 3))
+
+
+def get(job_id: str) -> Optional[dict]:
+    with _LOCK:
+        job = _JOBS.get(job_id)
+        return _public(job) if job is not None else None
@@ -0,0 +1,352 @@
+"""
+Instrumentation for Claude calls: one structured record per request,
+aggregated into counters and histograms for GET /internal/metrics.
+
+Every messages.create in ai_categorizer goes through a `Call`:
+
+    call = ai_metrics.Call('categorize_search', model, len(batch))
+    response = _create(client, call, ...)   # times it, reads usage, records
+    if not _response_searched(response):
+        call.discard(len(batch))            # answers thrown away
+
+Records carry model, phase, batch size, input/output (and prompt-cache)
+tokens, web-search count, latency, retries, discarded answers and an
+estimated USD cost. Cache hits/misses of the per-process result caches are
+counted separately (`count_cache`), as are merchants answered from cached
+web-search evidence instead of a new search (`count_evidence`), merchant
+names folded into another name's entity (`count_entities`), and how many
+answers each tier of the tiered flow accepted or escalated (`count_tier`).
+Records are attributed to the session set
+by `session_scope`, so the spend of one restore can be read back per session;
+the snapshot names sessions only by `session_ref` — a session id is the
+credential for the session's data.
+In-memory and per-process like the caches themselves.
+"""
+import contextvars
+import hashlib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+# USD per million tokens (input, output), matched by longest model-id prefix.
+# Estimates for the dashboard — the invoice is the source of truth.
+MODEL_PRICES: dict[str, tuple[float, float]] = {
+    'claude-haiku-4-5': (1.00, 5.00),
+    'claude-3-5-haiku': (0.80, 4.00),
+    'claude-sonnet-4': (3.00, 15.00),
+    'claude-3-7-sonnet': (3.00, 15.00),
+    'claude-opus-4-5': (5.00, 25.00),
+    'claude-opus-4': (15.00, 75.00),
+}
+WEB_SEARCH_PRICE = 10.00 / 1000        # USD per search
+CACHE_WRITE_MULTIPLIER = 1.25          # prompt-cache write vs base input price
+CACHE_READ_MULTIPLIER = 0.10           # prompt-cache read vs base input price
+BATCH_MULTIPLIER = 0.50                # Message Batches API vs interactive tokens
+
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2500, 5000, 10000, 20000, 40000, 80000)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+RECENT_CALLS = 200
+TRACKED_SESSIONS = 50
+
+_current_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    'ai_metrics_session', default=None)
+
+
+@contextmanager
+def session_scope(session_id: Optional[str]):
+    """Attribute the Claude calls made inside the block to session_id."""
+    token = _current_session.set(session_id)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, web_searches: int = 0,
+                  cache_write_tokens: int = 0, cache_read_tokens: int = 0, batch: bool = False) -> float:
+    """Estimated USD for one call; 0 for models missing from MODEL_PRICES.
+
+    `batch` prices the tokens at the Message Batches discount.
+    """
+    prefix = max((p for p in MODEL_PRICES if model.startswith(p)), key=len, default=None)
+    if prefix is None:
+        return web_searches * WEB_SEARCH_PRICE
+    p_in, p_out = MODEL_PRICES[prefix]
+    tokens = (
+        input_tokens * p_in
+        + cache_write_tokens * p_in * CACHE_WRITE_MULTIPLIER
+        + cache_read_tokens * p_in * CACHE_READ_MULTIPLIER
+        + output_tokens * p_out
+    ) / 1_000_000
+    return tokens * (BATCH_MULTIPLIER if batch else 1.0) + web_searches * WEB_SEARCH_PRICE
+
+
+class _Histogram:
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> dict:
+        labels = [f"le_{b}" for b in self.bounds] + ["+Inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.count,
+            "sum": round(self.sum, 2),
+            "avg": round(self.sum / self.count, 2) if self.count else 0.0,
+        }
+
+
+_COUNTER_FIELDS = (
+    'calls', 'errors', 'input_tokens', 'output_tokens', 'cache_write_tokens',
+    'cache_read_tokens', 'web_searches', 'retries', 'discarded',
+)
+
+
+def _counters() -> dict:
+    out = {f: 0 for f in _COUNTER_FIELDS}
+    out['cost_usd'] = 0.0
+    return out
+
+
+_LOCK = threading.Lock()
+_TOTALS: dict = _counters()
+_PHASES: dict[str, dict] = {}
+_MODELS: dict[str, dict] = {}
+_SESSIONS: dict[str, dict] = {}
+_CACHE_STATS: dict[str, dict] = {}
+_EVIDENCE_STATS: dict[str, int] = {}
+_TIER_STATS: dict[str, dict] = {}
+_ENTITY_STATS: dict[str, int] = {}
+_RECENT: deque = deque(maxlen=RECENT_CALLS)
+
+
+def _phase(phase: str) -> dict:
+    p = _PHASES.get(phase)
+    if p is None:
+        p = _PHASES[phase] = {
+            **_counters(),
+            "latency_ms": _Histogram(LATENCY_BUCKETS_MS),
+            "input_tokens_hist": _Histogram(TOKEN_BUCKETS),
+            "output_tokens_hist": _Histogram(TOKEN_BUCKETS),
+            "batch_size": _Histogram(BATCH_BUCKETS),
+        }
+    return p
+
+
+def _session(session_id: str) -> dict:
+    s = _SESSIONS.get(session_id)
+    if s is None:
+        if len(_SESSIONS) >= TRACKED_SESSIONS:
+            _SESSIONS.pop(next(iter(_SESSIONS)))
+        s = _SESSIONS[session_id] = {**_counters(), "latency_ms": 0.0}
+    return s
+
+
+def _add(target: dict, record: dict) -> None:
+    for f in _COUNTER_FIELDS:
+        target[f] += record.get(f, 0)
+    target['cost_usd'] += record.get('cost_usd', 0.0)
+
+
+def _usage_int(obj, name: str) -> int:
+    try:
+        return int(getattr(obj, name, 0) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class Call:
+    """One Claude request: fill it via finish()/fail(), then optionally discard().
+
+    `batched` marks a request answered through the Message Batches API; its
+    latency is the wait for the whole batch.
+    """
+
+    def __init__(self, phase: str, model: str, batch_size: int, batched: bool = False):
+        self.record: dict = {
+            "phase": phase, "model": model, "batch_size": batch_size, "batched": batched,
+            "session": _current_session.get(), "ts": round(time.time(), 3),
+            "latency_ms": 0.0, "retries": 0, "discarded": 0, "error": None,
+            **{f: 0 for f in ('input_tokens', 'output_tokens', 'cache_write_tokens',
+                              'cache_read_tokens', 'web_searches')},
+            "cost_usd": 0.0,
+        }
+        self._t0 = time.perf_counter()
+
+    def finish(self, response, retries: int = 0) -> None:
+        """Record a completed request from its response.usage."""
+        r = self.record
+        r["latency_ms"] = round((time.perf_counter() - self._t0) * 1000, 1)
+        r["retries"] = retries
+        usage = getattr(response, 'usage', None)
+        r["input_tokens"] = _usage_int(usage, 'input_tokens')
+        r["output_tokens"] = _usage_int(usage, 'output_tokens')
+        r["cache_write_tokens"] = _usage_int(usage, 'cache_creation_input_tokens')
+        r["cache_read_tokens"] = _usage_int(usage, 'cache_read_input_tokens')
+        searches = _usage_int(getattr(usage, 'server_tool_use', None), 'web_search_requests')
+        if not searches:
+            # Usage without server_tool_use (older API / fakes): count the calls.
+            searches = sum(
+                1 for b in getattr(response, 'content', None) or []
+                if getattr(b, 'type', '') == 'server_tool_use'
+            )
+        r["web_searches"] = searches
+        r["cost_usd"] = round(estimate_cost(
+            r["model"], r["input_tokens"], r["output_tokens"], searches,
+            r["cache_write_tokens"], r["cache_read_tokens"], r["batched"]), 6)
+        self._commit()
+
+    def fail(self, error: BaseException, retries: int = 0) -> None:
+        """Record a request that raised."""
+        r = self.record
+        r["latency_ms"] = round((time.perf_counter() - self._t0) * 1000, 1)
+        r["retries"] = retries
+        r["error"] = type(error).__name__
+        self._commit()
+
+    def discard(self, n: int) -> None:
+        """The call's n answers were thrown away (e.g. no web search happened)."""
+        self.record["discarded"] += n
+        with _LOCK:
+            for target in self._targets():
+                target["discarded"] += n
+
+    def _targets(self) -> list[dict]:
+        r = self.record
+        targets = [_TOTALS, _phase(r["phase"]), _MODELS.setdefault(r["model"], _counters())]
+        if r["session"]:
+            targets.append(_session(r["session"]))
+        return targets
+
+    def _commit(self) -> None:
+        r = self.record
+        with _LOCK:
+            for target in self._targets():
+                _add(target, {**r, "calls": 1, "errors": 1 if r["error"] else 0})
+            p = _phase(r["phase"])
+            p["latency_ms"].observe(r["latency_ms"])
+            p["batch_size"].observe(r["batch_size"])
+            if not r["error"]:
+                p["input_tokens_hist"].observe(r["input_tokens"])
+                p["output_tokens_hist"].observe(r["output_tokens"])
+            if r["session"]:
+                _session(r["session"])["latency_ms"] += r["latency_ms"]
+            _RECENT.append(r)
+
+
+def count_cache(kind: str, hits: int, misses: int) -> None:
+    """Result-cache lookups of one run.
+
+    kind: categorize | audit | subcategorize | restore | local_classifier | knowledge_base
+    """
+    if not hits and not misses:
+        return
+    with _LOCK:
+        c = _CACHE_STATS.setdefault(kind, {"hits": 0, "misses": 0})
+        c["hits"] += hits
+        c["misses"] += misses
+
+
+def count_evidence(kind: str, merchants: int) -> None:
+    """Merchants kept out of a web-search call because a search already described them."""
+    if merchants <= 0:
+        return
+    with _LOCK:
+        _EVIDENCE_STATS[kind] = _EVIDENCE_STATS.get(kind, 0) + merchants
+
+
+def count_entities(kind: str, merchants: int) -> None:
+    """Merchant names folded into another name's entity, so not looked up on their own."""
+    if merchants <= 0:
+        return
+    with _LOCK:
+        _ENTITY_STATS[kind] = _ENTITY_STATS.get(kind, 0) + merchants
+
+
+def count_tier(tier: str, accepted: int, escalated: int) -> None:
+    """Answers a tier kept vs passed on to the next tier (tier: phase name)."""
+    if not accepted and not escalated:
+        return
+    with _LOCK:
+        t = _TIER_STATS.setdefault(tier, {"accepted": 0, "escalated": 0})
+        t["accepted"] += accepted
+        t["escalated"] += escalated
+
+
+def _rounded(counters: dict) -> dict:
+    out = {k: (round(v, 6) if k == 'cost_usd' else round(v, 1) if isinstance(v, float) else v)
+           for k, v in counters.items()}
+    # Share of prompt tokens served from the provider's prompt cache
+    # (input_tokens counts only the uncached remainder).
+    prompt = counters['input_tokens'] + counters['cache_write_tokens'] + counters['cache_read_tokens']
+    out['cached_input_ratio'] = round(counters['cache_read_tokens'] / prompt, 4) if prompt else 0.0
+    return out
+
+
+def session_ref(session_id: str) -> str:
+    """The name a session goes by in the snapshot: a hash, not the id."""
+    return hashlib.sha256(session_id.encode('utf-8')).hexdigest()[:16]
+
+
+def _public(record: dict) -> dict:
+    out = dict(record)
+    if out.get("session"):
+        out["session"] = session_ref(out["session"])
+    return out
+
+
+def snapshot(recent: int = 50) -> dict:
+    """Everything recorded so far, JSON-ready, sessions by session_ref."""
+    with _LOCK:
+        phases = {
+            name: {k: (v.to_dict() if isinstance(v, _Histogram) else v) for k, v in p.items()}
+            for name, p in _PHASES.items()
+        }
+        return {
+            "totals": _rounded(_TOTALS),
+            "phases": {name: _rounded(p) for name, p in phases.items()},
+            "models": {m: _rounded(c) for m, c in _MODELS.items()},
+            "cache": {k: dict(v) for k, v in _CACHE_STATS.items()},
+            "evidence": {
+                "searches_saved": sum(_EVIDENCE_STATS.values()),
+                "by_kind": dict(_EVIDENCE_STATS),
+            },
+            "entities": {
+                "lookups_saved": sum(_ENTITY_STATS.values()),
+                "by_kind": dict(_ENTITY_STATS),
+            },
+            "tiers": {k: dict(v) for k, v in _TIER_STATS.items()},
+            "sessions": {session_ref(s): _rounded(c) for s, c in _SESSIONS.items()},
+            "recent": [_public(r) for r in list(_RECENT)[-recent:]] if recent > 0 else [],
+        }
+
+
+def reset() -> None:
+    """Drop everything recorded (tests, or after reading a baseline)."""
+    global _TOTALS
+    with _LOCK:
+        _TOTALS = _counters()
+        _PHASES.clear()
+        _MODELS.clear()
+        _SESSIONS.clear()
+        _CACHE_STATS.clear()
+        _EVIDENCE_STATS.clear()
+        _TIER_STATS.clear()
+        _ENTITY_STATS.clear()
+        _RECENT.clear()
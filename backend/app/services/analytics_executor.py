@@ -0,0 +1,337 @@
+"""
+Optional process-pool executor for the heaviest analytics, over session
+frames kept in shared memory.
+
+worker_pools keeps pandas off the event loop, but its threads share one GIL,
+so the server still does one core's worth of pandas at a time. With
+ANALYTICS_PROCESSES=N (default 0 = off) the endpoints that go through
+`run()` — category snapshot, recurring detection, Excel export — execute in
+N worker processes instead, and `starmap()` spreads independent jobs such as
+the files of a batch upload across them.
+
+The session frame is not pickled per request. Instead it is copied into
+POSIX shared memory once per session generation (the routes bump a
+session's generation whenever they write it): numeric, bool and datetime
+columns as their raw buffers, every other column as int32 factorize codes,
+plus one pickled block with those columns' uniques. A request then sends
+only a small SharedFrame handle; a worker attaches the blocks, rebuilds the
+frame (numeric columns zero-copy) and keeps it until a newer generation of
+that session arrives. Blocks are unlinked once superseded and no request is
+using them; at most ANALYTICS_SHARED_SESSIONS (default 16) sessions stay
+published.
+
+Off — or when the process pool breaks — `run()` calls fn in the calling
+thread, on the session frame itself.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def workers() -> int:
+    return max(0, int(os.environ.get('ANALYTICS_PROCESSES', '0')))
+
+
+def enabled() -> bool:
+    return workers() > 0
+
+
+@dataclass(frozen=True)
+class SharedColumn:
+    name: Any
+    block: str
+    kind: str            # 'raw' — the column's own buffer; 'codes' — factorize codes
+    dtype: Any           # the column's dtype, restored on attach
+    buffer_dtype: str    # numpy dtype of the shared buffer
+
+
+@dataclass(frozen=True)
+class SharedFrame:
+    """Picklable handle to a frame published in shared memory."""
+    key: str
+    generation: int
+    length: int
+    columns: tuple
+    index: Optional[SharedColumn]     # None for a default RangeIndex
+    uniques_block: Optional[str]
+    uniques_size: int
+
+
+def _write_block(arr: np.ndarray) -> SharedMemory:
+    shm = SharedMemory(create=True, size=max(1, arr.nbytes))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+    return shm
+
+
+def _share_column(name, s: pd.Series, blocks: list, uniques: dict) -> SharedColumn:
+    dtype = s.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufmM':
+        arr, kind = np.ascontiguousarray(s.to_numpy()), 'raw'
+    else:
+        codes, uniq = pd.factorize(s, use_na_sentinel=True)
+        arr, kind = codes.astype(np.int32, copy=False), 'codes'
+        uniques[len(blocks)] = getattr(uniq, 'array', uniq)   # an array: Index.take ignores allow_fill
+    shm = _write_block(arr)
+    blocks.append(shm)
+    return SharedColumn(name, shm.name, kind, dtype, arr.dtype.str)
+
+
+def share_frame(key: str, generation: int, df: pd.DataFrame) -> tuple[SharedFrame, list]:
+    """Copy df into shared-memory blocks; returns (handle, blocks).
+
+    The caller owns the blocks (close + unlink them when done).
+    """
+    blocks: list[SharedMemory] = []
+    uniques: dict[int, Any] = {}
+    try:
+        columns = tuple(_share_column(name, df.iloc[:, i], blocks, uniques)
+                        for i, name in enumerate(df.columns))
+        index = None
+        if not df.index.equals(pd.RangeIndex(len(df))):
+            index = _share_column(df.index.name, df.index.to_series(), blocks, uniques)
+        uniques_block, uniques_size = None, 0
+        if uniques:
+            payload = np.frombuffer(pickle.dumps(
+                {blocks[i].name: u for i, u in uniques.items()}, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+            shm = _write_block(payload)
+            blocks.append(shm)
+            uniques_block, uniques_size = shm.name, payload.nbytes
+    except Exception:
+        _free(blocks)
+        raise
+    return SharedFrame(key, generation, len(df), columns, index, uniques_block, uniques_size), blocks
+
+
+def _attach_block(name: str) -> SharedMemory:
+    # Workers only borrow the parent's blocks. Registering them with the
+    # resource tracker would have it unlink them behind the parent's back.
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def attach_frame(handle: SharedFrame) -> tuple[pd.DataFrame, list]:
+    """Rebuild the frame behind `handle`; returns (df, attached blocks).
+
+    Numeric columns are views on the shared buffers; keep the blocks open
+    for as long as the frame is in use. Missing values in object columns
+    come back as NaN, whichever NA they were.
+    """
+    blocks: list[SharedMemory] = []
+    uniques: dict = {}
+    if handle.uniques_block:
+        shm = _attach_block(handle.uniques_block)
+        blocks.append(shm)
+        uniques = pickle.loads(bytes(shm.buf[:handle.uniques_size]))
+
+    def _column(col: SharedColumn):
+        shm = _attach_block(col.block)
+        blocks.append(shm)
+        arr = np.ndarray((handle.length,), dtype=np.dtype(col.buffer_dtype), buffer=shm.buf)
+        if col.kind == 'raw':
+            return pd.Series(arr, dtype=col.dtype, copy=False, name=col.name)
+        values = uniques[col.block].take(arr, allow_fill=True)
+        return pd.Series(values, dtype=col.dtype, name=col.name)
+
+    data = {i: _column(col) for i, col in enumerate(handle.columns)}
+    df = pd.DataFrame(data, copy=False)
+    df.columns = pd.Index([col.name for col in handle.columns])
+    if handle.index is not None:
+        df.index = pd.Index(_column(handle.index), name=handle.index.name)
+    return df, blocks
+
+
+def _free(blocks: list) -> None:
+    for shm in blocks:
+        try:
+            shm.close()
+            shm.unlink()
+        except (FileNotFoundError, BufferError):
+            pass
+
+
+# ── parent side ──────────────────────────────────────────────────────────────
+
+class _Published:
+    __slots__ = ('handle', 'blocks', 'users', 'stale')
+
+    def __init__(self, handle: SharedFrame, blocks: list):
+        self.handle, self.blocks, self.users, self.stale = handle, blocks, 0, False
+
+
+_LOCK = threading.Lock()
+_PUBLISHED: "OrderedDict[str, _Published]" = OrderedDict()   # session key → newest generation
+_RETIRED: list[_Published] = []                             # superseded, still in use
+_EXECUTOR: Optional[ProcessPoolExecutor] = None
+
+
+def _max_sessions() -> int:
+    return max(1, int(os.environ.get('ANALYTICS_SHARED_SESSIONS', '16')))
+
+
+def _retire(pub: _Published) -> None:
+    """Caller holds _LOCK."""
+    pub.stale = True
+    if pub.users:
+        _RETIRED.append(pub)
+    else:
+        _free(pub.blocks)
+
+
+def _acquire(key: str, generation: int, df: pd.DataFrame) -> _Published:
+    with _LOCK:
+        pub = _PUBLISHED.get(key)
+        if pub is not None and pub.handle.generation == generation:
+            _PUBLISHED.move_to_end(key)
+            pub.users += 1
+            return pub
+    handle, blocks = share_frame(key, generation, df)
+    fresh = _Published(handle, blocks)
+    with _LOCK:
+        pub = _PUBLISHED.get(key)
+        if pub is not None and pub.handle.generation >= generation:
+            # Another request published it meanwhile.
+            _free(blocks)
+            fresh = pub
+        else:
+            if pub is not None:
+                _retire(pub)
+            _PUBLISHED[key] = fresh
+            while len(_PUBLISHED) > _max_sessions():
+                _retire(_PUBLISHED.popitem(last=False)[1])
+        _PUBLISHED.move_to_end(key)
+        fresh.users += 1
+        return fresh
+
+
+def _release(pub: _Published) -> None:
+    with _LOCK:
+        pub.users -= 1
+        if pub.stale and not pub.users:
+            _RETIRED.remove(pub)
+            _free(pub.blocks)
+
+
+def forget(key: str) -> None:
+    """Drop a session's shared copy (the session was deleted)."""
+    with _LOCK:
+        pub = _PUBLISHED.pop(key, None)
+        if pub is not None:
+            _retire(pub)
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _EXECUTOR
+    with _LOCK:
+        if _EXECUTOR is None:
+            # spawn, not fork: the server process runs threads.
+            _EXECUTOR = ProcessPoolExecutor(max_workers=workers(), mp_context=multiprocessing.get_context('spawn'))
+        return _EXECUTOR
+
+
+def run(fn: Callable, key: str, generation: int, df: pd.DataFrame, *args):
+    """fn(df, *args) — in a worker process over the shared copy of session
+    `key` at `generation` when enabled, else right here on df itself.
+
+    fn must be a module-level function and its result picklable.
+    """
+    global _EXECUTOR
+    if not enabled():
+        return fn(df, *args)
+    pub = _acquire(key, generation, df)
+    try:
+        return _executor().submit(_call, pub.handle, fn, args).result()
+    except BrokenProcessPool:
+        logger.warning("Analytics process pool broke; running %s in-thread", getattr(fn, '__name__', fn))
+        with _LOCK:
+            _EXECUTOR = None
+        return fn(df, *args)
+    finally:
+        _release(pub)
+
+
+def starmap(fn: Callable, arg_tuples) -> list:
+    """[fn(*args) for args in arg_tuples] — spread across the worker
+    processes when enabled, else in turn in the calling thread.
+
+    For independent jobs whose arguments are cheap to pickle (e.g. the
+    files of a batch upload); fn must be a module-level function.
+    """
+    global _EXECUTOR
+    arg_tuples = list(arg_tuples)
+    if enabled() and len(arg_tuples) > 1:
+        try:
+            return list(_executor().map(_apply, [fn] * len(arg_tuples), arg_tuples))
+        except BrokenProcessPool:
+            logger.warning("Analytics process pool broke; running %s in-thread", getattr(fn, '__name__', fn))
+            with _LOCK:
+                _EXECUTOR = None
+    return [fn(*args) for args in arg_tuples]
+
+
+def _apply(fn: Callable, args: tuple):
+    return fn(*args)
+
+
+def shutdown() -> None:
+    """Stop the workers and unlink every published block."""
+    global _EXECUTOR
+    with _LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+        for pub in [*_PUBLISHED.values(), *_RETIRED]:
+            _free(pub.blocks)
+        _PUBLISHED.clear()
+        _RETIRED.clear()
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown)
+
+
+# ── worker side ──────────────────────────────────────────────────────────────
+
+_ATTACHED: "OrderedDict[str, tuple[int, pd.DataFrame, list]]" = OrderedDict()
+_WORKER_CACHE = 8
+
+
+def _call(handle: SharedFrame, fn: Callable, args: tuple):
+    cached = _ATTACHED.get(handle.key)
+    if cached is None or cached[0] != handle.generation:
+        if cached is not None:
+            _detach(_ATTACHED.pop(handle.key))
+        df, blocks = attach_frame(handle)
+        cached = _ATTACHED[handle.key] = (handle.generation, df, blocks)
+        while len(_ATTACHED) > _WORKER_CACHE:
+            _detach(_ATTACHED.popitem(last=False)[1])
+    _ATTACHED.move_to_end(handle.key)
+    # A shallow copy: fn may add columns without touching the cached frame.
+    return fn(cached[1].copy(deep=False), *args)
+
+
+def _detach(entry: tuple) -> None:
+    _, df, blocks = entry
+    del df
+    for shm in blocks:
+        try:
+            shm.close()
+        except BufferError:
+            pass  # a view is still alive somewhere; the mapping goes with it
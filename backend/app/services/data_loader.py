@@ -1,21 +1,210 @@
 """
 Data loading functions for transaction files
 """
+import codecs
+import csv
+import importlib.util
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Iterator, NamedTuple, Optional, Union
+
 import pandas as pd
-from typing import Dict
 
 from .isracard_pdf_parser import parse_isracard_pdf
 
 
-def load_transaction_file(file_path: str) -> pd.DataFrame:
-    """Load transaction file (Excel, CSV, or Isracard PDF)"""
+# Workbook sheets that summarize the transaction sheets rather than list them.
+SUMMARY_SHEETS = ('סיכום', 'Summary', 'תקציר')
+
+
+def _rewind(source) -> None:
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+def excel_engine() -> Optional[str]:
+    """The pandas engine for Excel uploads.
+
+    EXCEL_ENGINE if set; else calamine (python-calamine, Rust — several times
+    faster than openpyxl) when installed; else None, pandas' own choice
+    (openpyxl for .xlsx, xlrd for .xls).
+    """
+    forced = os.environ.get('EXCEL_ENGINE', '').strip().lower()
+    if forced:
+        return forced
+    return 'calamine' if importlib.util.find_spec('python_calamine') else None
+
+
+def _read_sheet(content: bytes, sheet: str, engine: Optional[str]) -> pd.DataFrame:
+    return pd.read_excel(io.BytesIO(content), sheet_name=sheet, header=None, engine=engine)
+
+
+def _read_excel(source: Union[str, BinaryIO], engine: Optional[str]) -> pd.DataFrame:
+    """Every transaction sheet of a workbook, stacked, as raw rows (header=None).
+
+    Sheet names come from the workbook index alone — openpyxl opens it
+    read-only — so summary sheets are skipped without being parsed. With
+    calamine, whose workbook open is cheap, several sheets are read
+    concurrently, each from its own handle; openpyxl reads them in turn from
+    the one open workbook.
+    """
+    with pd.ExcelFile(source, engine=engine) as excel_file:
+        sheets = excel_file.sheet_names
+        relevant = [s for s in sheets if s not in SUMMARY_SHEETS] or sheets[:1]
+
+        if engine == 'calamine' and len(relevant) > 1:
+            _rewind(source)
+            if isinstance(source, str):
+                with open(source, 'rb') as f:
+                    content = f.read()
+            else:
+                content = source.read()
+            with ThreadPoolExecutor(max_workers=min(4, len(relevant))) as pool:
+                frames = list(pool.map(lambda s: _try_sheet(_read_sheet, content, s, engine), relevant))
+        else:
+            frames = [_try_sheet(excel_file.parse, s, header=None) for s in relevant]
+
+    dfs = [df for df in frames if df is not None and not df.empty]
+    if not dfs:
+        raise ValueError("No valid data found in file")
+    return pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0]
+
+
+def _try_sheet(read, *args, **kwargs) -> Optional[pd.DataFrame]:
+    # An unreadable sheet (chart sheet, corrupt range) is skipped, not fatal.
+    try:
+        return read(*args, **kwargs)
+    except Exception:
+        return None
+
+
+# Encodings Israeli bank/card CSV exports come in, in fallback order.
+CSV_ENCODINGS = ('utf-8', 'utf-8-sig', 'windows-1255', 'iso-8859-8')
+CSV_DELIMITERS = (',', ';', '\t', '|')
+_CSV_SAMPLE_BYTES = 64 * 1024
+_BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+class CsvFormat(NamedTuple):
+    encoding: str
+    delimiter: str
+    width: int       # fields in the widest sampled row
+    uniform: bool    # every sampled row has that many fields
+
+
+def sniff_encoding(sample: bytes) -> str:
+    """The encoding of a CSV, judged from its first bytes.
+
+    A BOM decides outright. Otherwise UTF-8 if the sample decodes as UTF-8
+    (a character cut off at the sample's end is fine), else a Hebrew
+    codepage: windows-1255 — a superset of ISO-8859-8's letters — unless the
+    sample uses a byte windows-1255 leaves undefined.
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        sample.decode('windows-1255')
+        return 'windows-1255'
+    except UnicodeDecodeError:
+        return 'iso-8859-8'
+
+
+def sniff_csv(sample: bytes, complete: bool = False) -> CsvFormat:
+    """Encoding, delimiter and row width of a CSV from a byte sample.
+
+    The delimiter is the candidate that splits the most sampled rows into
+    the same number (> 1) of fields. `complete` says the sample is the whole
+    file; otherwise its last, possibly cut-off, line is ignored.
+    """
+    encoding = sniff_encoding(sample)
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample, final=complete)
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not complete and len(lines) > 1:
+        lines = lines[:-1]
+
+    best, best_score = (',', [1]), -1
+    for delimiter in CSV_DELIMITERS:
+        counts = [len(row) for row in csv.reader(lines, delimiter=delimiter)] or [1]
+        modal = max(set(counts), key=counts.count)
+        score = counts.count(modal) if modal > 1 else 0
+        if score > best_score:
+            best, best_score = (delimiter, counts), score
+    delimiter, counts = best
+    return CsvFormat(encoding, delimiter, max(counts), len(set(counts)) == 1)
+
+
+def _csv_format(source: Union[str, BinaryIO]) -> CsvFormat:
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            sample = f.read(_CSV_SAMPLE_BYTES + 1)
+    else:
+        _rewind(source)
+        sample = source.read(_CSV_SAMPLE_BYTES + 1)
+    if not sample.strip():
+        raise ValueError("Could not read CSV file with any encoding")
+    return sniff_csv(sample[:_CSV_SAMPLE_BYTES], complete=len(sample) <= _CSV_SAMPLE_BYTES)
+
+
+def iter_csv_chunks(source: Union[str, BinaryIO], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """The raw rows of a CSV (as _read_csv reads them), `chunk_rows` at a
+    time. A stream can't be re-read in another encoding halfway through, so
+    bytes the sniffed encoding can't decode are replaced instead."""
+    fmt = _csv_format(source)
+    _rewind(source)
+    with pd.read_csv(source, encoding=fmt.encoding, encoding_errors='replace', sep=fmt.delimiter,
+                     header=None, names=range(fmt.width), chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+def _read_csv(source: Union[str, BinaryIO]) -> pd.DataFrame:
+    """Raw rows (header=None) of a CSV, decoded and parsed once.
+
+    Encoding, delimiter and width come from a sample (sniff_csv). Rows are
+    read `width` fields wide, so a title line above the header with fewer
+    fields doesn't break parsing; finding the header row stays
+    clean_dataframe's job. Uniform files go through the pyarrow engine when
+    pyarrow is installed. Should the sniffed encoding fail past the sample,
+    the other CSV_ENCODINGS are tried in turn.
+    """
+    fmt = _csv_format(source)
+    options = dict(sep=fmt.delimiter, header=None, names=range(fmt.width))
+    pyarrow = fmt.uniform and importlib.util.find_spec('pyarrow') is not None
+    for encoding in (fmt.encoding, *(e for e in CSV_ENCODINGS if e != fmt.encoding)):
+        if pyarrow:
+            try:
+                _rewind(source)
+                return pd.read_csv(source, encoding=encoding, engine='pyarrow', **options)
+            except Exception:
+                pass  # e.g. a row wider than the sample's: the C engine reports it properly
+        try:
+            _rewind(source)
+            return pd.read_csv(source, encoding=encoding, **options)
+        except (UnicodeDecodeError, pd.errors.EmptyDataError):
+            continue
+    raise ValueError("Could not read CSV file with any encoding")
+
+
+def load_transaction_file(source: Union[str, BinaryIO], filename: Optional[str] = None) -> pd.DataFrame:
+    """Load transaction file (Excel, CSV, or Isracard PDF).
+
+    `source` is a path, or a readable binary file object — e.g. an upload's
+    spooled file, parsed in place — whose format `filename` names.
+    """
+    file_path = (filename if filename is not None else str(source)).lower()
     if file_path.endswith('.pdf'):
         # Isracard exports statements as PDF (Excel export isn't offered for
         # all card types). Parse into a DataFrame, then re-emit as the raw
         # positional layout the rest of the pipeline (clean_dataframe →
         # process_data) expects: a header row of Hebrew column names with
         # an empty title row before it so detect_header_row finds it.
-        parsed = parse_isracard_pdf(file_path)
+        parsed = parse_isracard_pdf(source)
         if parsed.empty:
             raise ValueError("No transactions extracted from PDF")
         header = list(parsed.columns)
@@ -23,57 +212,13 @@ def load_transaction_file(file_path: str) -> pd.DataFrame:
         return pd.DataFrame(rows)
 
     if file_path.endswith('.xlsx') or file_path.endswith('.xls'):
-        # Try to load all sheets and combine
-        excel_file = None
         try:
-            excel_file = pd.ExcelFile(file_path)
-            sheets = excel_file.sheet_names
-            
-            # Filter relevant sheets (skip empty or summary sheets)
-            relevant_sheets = [s for s in sheets if s not in ['סיכום', 'Summary', 'תקציר']]
-            
-            if not relevant_sheets:
-                relevant_sheets = sheets[:1]  # Take first sheet if no relevant found
-            
-            # Load and combine sheets
-            dfs = []
-            for sheet in relevant_sheets:
-                try:
-                    df = pd.read_excel(excel_file, sheet_name=sheet, header=None)
-                    if not df.empty:
-                        dfs.append(df)
-                except Exception:
-                    continue
-            
-            if not dfs:
-                raise ValueError("No valid data found in file")
-            
-            # Combine all sheets
-            result = pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0]
-            
-            # Explicitly close the ExcelFile to release the file handle
-            excel_file.close()
-            excel_file = None
-            
-            return result
+            return _read_excel(source, excel_engine())
         except Exception as e:
-            if excel_file is not None:
-                try:
-                    excel_file.close()
-                except:
-                    pass
             raise ValueError(f"Error loading Excel file: {str(e)}")
-    
+
     elif file_path.endswith('.csv'):
-        # Try different encodings
-        encodings = ['utf-8', 'utf-8-sig', 'windows-1255', 'iso-8859-8']
-        for encoding in encodings:
-            try:
-                df = pd.read_csv(file_path, encoding=encoding, header=None)
-                return df
-            except (UnicodeDecodeError, pd.errors.EmptyDataError):
-                continue
-        raise ValueError("Could not read CSV file with any encoding")
+        return _read_csv(source)
     
     else:
-        raise ValueError(f"Unsupported file format: {file_path}")
+        raise ValueError(f"Unsupported file format: {filename or source}")
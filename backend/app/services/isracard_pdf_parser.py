@@ -161,8 +161,9 @@ def _extract_tx(tokens: list[str], in_domestic: bool) -> Optional[dict]:
     }
 
 
-def parse_isracard_pdf(path: str) -> pd.DataFrame:
-    """Parse an Isracard PDF statement into a DataFrame matching the MAX schema."""
+def parse_isracard_pdf(path) -> pd.DataFrame:
+    """Parse an Isracard PDF statement (a path or a binary file object) into a
+    DataFrame matching the MAX schema."""
     try:
         import pdfplumber
     except ImportError as e:
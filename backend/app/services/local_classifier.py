@@ -0,0 +1,221 @@
+"""
+Local, CPU-only merchant classifier that answers before Claude is asked.
+
+Character n-gram TF-IDF over the merchant descriptor (Hebrew and Latin alike)
+plus the card company's sector (ענף_מקור) as an extra feature, classified by
+weighted k-nearest-neighbours over a labelled corpus:
+
+  - the keyword catalog (KEYWORD_TO_CATEGORY) as seed examples,
+  - every merchant Claude resolved (phase 1 or web-verified phase 2) —
+    shared, like the AI result cache they also land in,
+  - the user's merchant rules seen on /restore-session (which is where past
+    AI resolutions live durably) — private: they are learned into that
+    session's own corpus (`scope`) and answer only for that session.
+
+A prediction is used only when the nearest neighbour is genuinely close
+(AI_LOCAL_MIN_SIMILARITY) AND the neighbours agree (AI_LOCAL_THRESHOLD);
+anything less falls through to Claude. Its answers are unverified guesses:
+the categorizer keeps them out of the AI caches and reports them separately
+so they are never saved as rules, and so never fed back into the corpus.
+Opt-in with AI_LOCAL_CLASSIFIER=1. Per-process like the AI caches — a cold
+start re-learns from the next restore's rules.
+"""
+import heapq
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from typing import Iterable, Optional
+
+from ..core.constants import KEYWORD_TO_CATEGORY
+
+_NGRAMS = (2, 3, 4)
+_NEIGHBOURS = 5
+_NEIGHBOUR_BAND = 0.6
+_ISSUER_PREFIX = '\x00issuer:'
+# Digits (branch numbers, terminal ids) and punctuation carry no category signal.
+_NOISE = re.compile(r'[^a-z\u0590-\u05ff]+')
+
+
+def _features(text: str, issuer: Optional[str] = None) -> Counter:
+    norm = ' ' + _NOISE.sub(' ', str(text).lower()).strip() + ' '
+    grams: Counter = Counter()
+    if norm.strip():
+        for n in _NGRAMS:
+            for i in range(len(norm) - n + 1):
+                grams[norm[i:i + n]] += 1
+    if issuer:
+        grams[_ISSUER_PREFIX + str(issuer).strip()] += 1
+    return grams
+
+
+class LocalClassifier:
+    """TF-IDF weighted kNN over character n-grams (cosine similarity)."""
+
+    def __init__(self, examples: list[tuple[str, Optional[str], str]]):
+        """examples: [(descriptor, issuer or None, category), ...]"""
+        self.labels: list[str] = []
+        docs: list[Counter] = []
+        for text, issuer, cat in examples:
+            f = _features(text, issuer)
+            if f:
+                docs.append(f)
+                self.labels.append(cat)
+        n_docs = len(docs)
+        df: Counter = Counter()
+        for f in docs:
+            df.update(f.keys())
+        self.idf = {t: math.log((n_docs + 1) / (c + 1)) + 1.0 for t, c in df.items()}
+        self.postings: dict[str, list[tuple[int, float]]] = defaultdict(list)
+        for doc_id, f in enumerate(docs):
+            weights = self._weigh(f)
+            for t, w in weights.items():
+                self.postings[t].append((doc_id, w))
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def _weigh(self, f: Counter) -> dict[str, float]:
+        weights = {
+            t: (1.0 + math.log(tf)) * self.idf[t]
+            for t, tf in f.items() if t in self.idf
+        }
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {t: w / norm for t, w in weights.items()} if norm else {}
+
+    def predict(self, text: str, issuer: Optional[str] = None) -> tuple[Optional[str], float, float]:
+        """(category, agreement among the k nearest, similarity of the nearest)."""
+        query = self._weigh(_features(text, issuer))
+        if not query:
+            return None, 0.0, 0.0
+        scores: dict[int, float] = defaultdict(float)
+        for t, w in query.items():
+            for doc_id, dw in self.postings.get(t, ()):
+                scores[doc_id] += w * dw
+        if not scores:
+            return None, 0.0, 0.0
+        nearest = heapq.nlargest(_NEIGHBOURS, scores.items(), key=lambda kv: kv[1])
+        top = nearest[0][1]
+        votes: dict[str, float] = defaultdict(float)
+        for doc_id, sim in nearest:
+            # Only neighbours comparable to the nearest one get a say; a tail
+            # of weak bigram overlaps would otherwise dilute a clear match.
+            if sim >= top * _NEIGHBOUR_BAND:
+                votes[self.labels[doc_id]] += sim
+        best = max(votes, key=votes.get)
+        total = sum(votes.values())
+        return best, (votes[best] / total if total else 0.0), top
+
+
+# Learned examples: (normalized descriptor, issuer) → category — Claude's
+# answers (shared) and each session's rules (by scope). The catalog seeds are
+# added at build time; a learned label overrides a seed, a rule overrides both.
+_LEARNED: dict[tuple[str, Optional[str]], str] = {}
+_SCOPED: OrderedDict[str, dict[tuple[str, Optional[str]], str]] = OrderedDict()
+# Built models by scope (None: the shared corpus alone), rebuilt lazily.
+_MODELS: OrderedDict[Optional[str], LocalClassifier] = OrderedDict()
+_LOCK = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.environ.get('AI_LOCAL_CLASSIFIER', '0') == '1'
+
+
+def _max_scopes() -> int:
+    return max(1, int(os.environ.get('AI_LOCAL_SESSIONS', '64')))
+
+
+def learn(pairs: Iterable[tuple[str, str]], issuers: Optional[dict] = None,
+          valid: Optional[Iterable[str]] = None, scope: Optional[str] = None) -> int:
+    """Add labelled merchants (descriptor, category). Returns how many were new.
+
+    `issuers` optionally maps descriptor → issuer sector. Only categories in
+    `valid` (when given) are learned, and never שונות. With a `scope` (the
+    session id) the examples go into that session's corpus only; the least
+    recently used scopes beyond AI_LOCAL_SESSIONS (default 64) are dropped.
+    """
+    valid_set = set(valid) if valid is not None else None
+    added = 0
+    with _LOCK:
+        if scope is None:
+            target = _LEARNED
+        else:
+            target = _SCOPED.setdefault(scope, {})
+            _SCOPED.move_to_end(scope)
+            while len(_SCOPED) > _max_scopes():
+                _MODELS.pop(_SCOPED.popitem(last=False)[0], None)
+        for text, cat in pairs:
+            text = str(text or '').strip()
+            if not text or not cat or cat == 'שונות':
+                continue
+            if valid_set is not None and cat not in valid_set:
+                continue
+            issuer = (issuers or {}).get(text)
+            key = (text.lower(), str(issuer).strip() if issuer else None)
+            if target.get(key) != cat:
+                target[key] = cat
+                added += 1
+        if added:
+            # Rebuilt lazily on the next classify(); shared examples are in
+            # every scope's model.
+            if scope is None:
+                _MODELS.clear()
+            else:
+                _MODELS.pop(scope, None)
+    return added
+
+
+def forget(scope: str) -> None:
+    """Drop a session's corpus (the session was deleted)."""
+    with _LOCK:
+        _SCOPED.pop(scope, None)
+        _MODELS.pop(scope, None)
+
+
+def _model(scope: Optional[str]) -> LocalClassifier:
+    with _LOCK:
+        if scope not in _SCOPED:
+            scope = None
+        model = _MODELS.get(scope)
+        if model is None:
+            learned = {**_LEARNED, **(_SCOPED[scope] if scope is not None else {})}
+            learned_texts = {text for text, _ in learned}
+            examples = [
+                (kw, None, cat) for kw, cat in KEYWORD_TO_CATEGORY.items()
+                if kw not in learned_texts
+            ]
+            examples += [(text, issuer, cat) for (text, issuer), cat in learned.items()]
+            model = _MODELS[scope] = LocalClassifier(examples)
+            while len(_MODELS) > 8:
+                _MODELS.popitem(last=False)
+        _MODELS.move_to_end(scope)
+        return model
+
+
+def classify(merchants: list[dict], scope: Optional[str] = None) -> dict[str, str]:
+    """Confident local answers for [{base, issuer}, ...] → {base: category}.
+
+    `scope` adds that session's own rules to the shared corpus. Merchants
+    below the similarity / agreement thresholds are left out — the caller
+    sends those to Claude.
+    """
+    if not merchants or not enabled():
+        return {}
+    threshold = float(os.environ.get('AI_LOCAL_THRESHOLD', '0.8'))
+    min_sim = float(os.environ.get('AI_LOCAL_MIN_SIMILARITY', '0.75'))
+    model = _model(scope)
+    out: dict[str, str] = {}
+    for m in merchants:
+        cat, agreement, sim = model.predict(m["base"], m.get("issuer"))
+        if cat and agreement >= threshold and sim >= min_sim:
+            out[m["base"]] = cat
+    return out
+
+
+def reset() -> None:
+    """Forget everything learned (tests)."""
+    with _LOCK:
+        _LEARNED.clear()
+        _SCOPED.clear()
+        _MODELS.clear()
@@ -0,0 +1,187 @@
+"""
+Server-side merchant knowledge base: merchant → category/subcategory
+decisions pooled across users, so a business one user already settled is
+not web-searched again for the next.
+
+Opt-in: set MERCHANT_KB_FILE to a JSON file path. Votes come from two places:
+
+  - rule payloads: every rule a /restore-session carries that the user made
+    (source 'user', catalog categories only — custom ones are personal) is
+    one vote by that restore's `voter`, stored as a hash. AI answers the
+    dashboard saved as rules don't vote: they would count the AI twice. A
+    voter has one vote per merchant, replaced when the rule changes, so
+    repeated restores don't inflate counts. Restores with no voter don't
+    vote.
+  - AI verdicts: the categorizer's and subcategorizer's resolutions, as one
+    shared 'ai' vote per merchant. It counts in the confidence (for or
+    against the leading category) but never toward MERCHANT_KB_MIN_VOTES.
+
+`voter` is whatever the client sends, not a verified identity, hence the
+high bar: lookup() answers only when the leading category has at least
+MERCHANT_KB_MIN_VOTES user votes (default 5) and MERCHANT_KB_MIN_CONFIDENCE
+(default 0.75) of all votes; the subcategory is the leading one among the
+votes for that category. Verdicts are applied but never cached or returned
+as AI resolutions, so they don't come back as rules.
+
+Merchants are keyed by merchant_resolver.canonical_key, so branches and
+spellings of one business pool their votes. The AI layer consults it right
+after its caches — so after the keyword catalog, before any Claude call.
+Loaded once, lazily; rewritten atomically when a vote changes. Without
+MERCHANT_KB_FILE every call is a no-op.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+from typing import Iterable, Optional
+
+from . import merchant_resolver
+
+logger = logging.getLogger(__name__)
+
+AI_VOTER = 'ai'
+
+_LOCK = threading.Lock()
+# file path → {merchant key: {voter: [category, subcategory or None]}}
+_LOADED: dict[str, dict[str, dict[str, list]]] = {}
+
+
+def _path() -> Optional[str]:
+    return os.environ.get('MERCHANT_KB_FILE') or None
+
+
+def enabled() -> bool:
+    return _path() is not None
+
+
+def _min_votes() -> int:
+    return max(1, int(os.environ.get('MERCHANT_KB_MIN_VOTES', '5')))
+
+
+def _min_confidence() -> float:
+    return float(os.environ.get('MERCHANT_KB_MIN_CONFIDENCE', '0.75'))
+
+
+def _voter_id(voter: str) -> str:
+    """Stored voter id: a user id never lands on disk as-is."""
+    return hashlib.sha256(voter.encode('utf-8')).hexdigest()[:16]
+
+
+def _entries(path: str) -> dict[str, dict[str, list]]:
+    """The file's entries, read on first use (caller holds _LOCK)."""
+    entries = _LOADED.get(path)
+    if entries is None:
+        entries = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                entries = {
+                    str(k): {str(v): list(vote)[:2] for v, vote in votes.items()}
+                    for k, votes in data.items() if k and isinstance(votes, dict)
+                }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Merchant knowledge base {path} unreadable, starting empty: {e}")
+        _LOADED[path] = entries
+    return entries
+
+
+def _write(path: str, entries: dict) -> None:
+    try:
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.merchant-kb-', suffix='.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Could not write merchant knowledge base {path}: {e}")
+
+
+def _vote(votes: Iterable[tuple[str, str, str, Optional[str]]]) -> None:
+    """Record (merchant, voter id, category, subcategory) votes."""
+    path = _path()
+    if path is None:
+        return
+    with _LOCK:
+        entries = _entries(path)
+        changed = False
+        for merchant, voter, category, sub in votes:
+            key = merchant_resolver.canonical_key(merchant)
+            if not key:
+                continue
+            ballot = entries.setdefault(key, {})
+            if voter == AI_VOTER and sub is None:
+                # A category verdict keeps the subcategory verdict given
+                # under the same category.
+                prev = ballot.get(voter)
+                sub = prev[1] if prev and prev[0] == category else None
+            if ballot.get(voter) != [category, sub]:
+                ballot[voter] = [category, sub]
+                changed = True
+        if changed:
+            _write(path, entries)
+
+
+def record_rules(voter: Optional[str], rules: Iterable[tuple[str, str, Optional[str]]]) -> None:
+    """One user's rules as votes: (merchant, category, subcategory or None)."""
+    if not voter or not enabled():
+        return
+    vid = _voter_id(voter)
+    _vote((m, vid, c, s or None) for m, c, s in rules if m and c)
+
+
+def record_ai(resolved: dict[str, str], category: Optional[str] = None) -> None:
+    """AI verdicts: {merchant: category}, or {merchant: subcategory} of
+    `category` when given. Misses ('שונות', '') are not votes."""
+    if not enabled():
+        return
+    if category is None:
+        _vote((m, AI_VOTER, c, None) for m, c in resolved.items() if c and c != 'שונות')
+    else:
+        _vote((m, AI_VOTER, category, s) for m, s in resolved.items() if s)
+
+
+def _verdict(ballot: dict[str, list]) -> Optional[dict]:
+    users = Counter(vote[0] for voter, vote in ballot.items() if voter != AI_VOTER)
+    if not users:
+        return None
+    (category, votes), = users.most_common(1)
+    agreeing = votes + (1 if ballot.get(AI_VOTER, [None])[0] == category else 0)
+    confidence = agreeing / len(ballot)
+    if votes < _min_votes() or confidence < _min_confidence():
+        return None
+    subs = Counter(vote[1] for vote in ballot.values() if vote[0] == category and vote[1])
+    return {
+        "category": category,
+        "subcategory": subs.most_common(1)[0][0] if subs else None,
+        "votes": votes,
+        "confidence": round(confidence, 3),
+    }
+
+
+def lookup(merchants: Iterable[str]) -> dict[str, dict]:
+    """{merchant: {category, subcategory, votes, confidence}} for the given
+    merchants the knowledge base is confident about."""
+    path = _path()
+    if path is None:
+        return {}
+    out: dict[str, dict] = {}
+    with _LOCK:
+        entries = _entries(path)
+        for m in dict.fromkeys(merchants):
+            ballot = entries.get(merchant_resolver.canonical_key(m)) if m else None
+            verdict = _verdict(ballot) if ballot else None
+            if verdict:
+                out[m] = verdict
+    return out
+
+
+def reset() -> None:
+    """Forget loaded files (tests); the next lookup re-reads from disk."""
+    with _LOCK:
+        _LOADED.clear()
@@ -0,0 +1,166 @@
+"""
+Merchant entity resolution on top of normalize_merchant.
+
+normalize_merchant only removes installment suffixes, processor prefixes,
+whitespace and case, so one business still shows up as several merchants:
+"שופרסל דיל 123", "שופרסל דיל רמת גן", "SHUFERSAL ONLINE". Each would be
+asked of the AI separately, grouped separately and need its own rule. Here:
+
+  - canonical_key(): branch codes ("123", "#45", "סניף ..."), trailing city
+    names and corporate/web noise ("בע"מ", "ONLINE", "LTD") are stripped;
+    what is left is the key, spelled as it is. Other scripts and spellings
+    only meet through the explicit alias table ("SHUFERSAL" → "שופרסל") —
+    sound-alike names are not the same business (MAX / MIX, SUPER / ספר).
+    Per name, cached.
+  - resolve() / entity_ids(): clusters a set of names — a key that extends another key
+    present in the same set by whole words ("שופרסל דיל" → "שופרסל") joins it,
+    as long as that shorter key is a distinctive brand (not made of generic
+    words only, like "קפה" or "בית קפה", and at least _MIN_BRAND letters).
+
+Used for merchant rules (a rule's exact merchant still wins over its
+entity), AI lookups (one query per entity, fanned out to its names) and
+merchant aggregation. MERCHANT_RESOLUTION=0 falls back to normalize_merchant.
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Iterable
+
+import pandas as pd
+
+_MIN_BRAND = 4  # letters a one-word key needs to absorb longer names
+
+# A branch / store code: a trailing number of 3+ digits ("שופרסל דיל 123"),
+# "#45", "No. 7", or "סניף" with whatever follows. Short numbers stay — they
+# are usually part of the name ("גלריה 39").
+_BRANCH = re.compile(r'(?:\s*(?:#|no\.?\s*)\d+|\s+\d{3,}|\s+סניף\b.*)\s*$', re.IGNORECASE)
+_WEB = re.compile(r'^www\.|\.(?:co\.il|com|net|org|io)\b')
+_NOISE_WORDS = {
+    'בע"מ', 'בעמ', 'בע״מ', 'online', 'ltd', 'inc', 'co', 'com', 'il', 'israel', 'isr', 'www',
+}
+_CITIES = (
+    'תל אביב', 'תל-אביב', 'ת"א', 'תא', 'רמת גן', 'ירושלים', 'חיפה', 'באר שבע', 'ראשון לציון',
+    'ראשל"צ', 'פתח תקווה', 'פתח תקוה', 'פ"ת', 'נתניה', 'חולון', 'בני ברק', 'אשדוד', 'אשקלון',
+    'הרצליה', 'כפר סבא', 'רעננה', 'רחובות', 'גבעתיים', 'מודיעין', 'בת ים', 'הוד השרון',
+    'רמת השרון', 'קריית אונו', 'נס ציונה', 'יבנה', 'עפולה', 'נהריה', 'אילת', 'טבריה', 'כרמיאל',
+    'רמלה', 'לוד', 'ראש העין', 'קיסריה', 'tel aviv', 'tel-aviv', 'tlv', 'ramat gan', 'jerusalem',
+    'haifa', 'beer sheva', 'rishon lezion', 'rishon', 'petah tikva', 'netanya', 'holon',
+    'herzliya', 'herzliya pituach', 'kfar saba', 'raanana', 'rehovot', 'eilat', 'ashdod',
+)
+_CITY_SUFFIX = re.compile(
+    r'(?:[\s\-/,]+(?:' + '|'.join(re.escape(c) for c in sorted(_CITIES, key=len, reverse=True)) + r'))+\s*$',
+    re.IGNORECASE,
+)
+# Leading words that describe a kind of business, not a brand.
+_GENERIC = {
+    'מסעדת', 'מסעדה', 'קפה', 'בית', 'חנות', 'מכולת', 'סופר', 'מרכז', 'מספרת', 'מאפיית', 'מאפיה',
+    'מאפייה', 'פיצה', 'פיצרית', 'פיצריה', 'בר', 'גן', 'מכון', 'מרפאת', 'מרפאה', 'קליניקת', 'סטודיו',
+    'חברת', 'רשת', 'דוכן', 'קיוסק', 'מעדניית', 'בוטיק', 'משרד', 'מוסך', 'תחנת', 'מלון', 'the', 'cafe',
+    'caffe', 'coffee', 'restaurant', 'pizza', 'bar', 'studio', 'shop', 'store', 'super', 'mr', 'dr',
+}
+
+# Latin spellings of chains, as card descriptors print them → the key of
+# the Hebrew name. Matched on the leading words of a stripped name.
+_ALIASES = {
+    'shufersal': 'שופרסל', 'rami levy': 'רמי לוי', 'yochananof': 'יוחננוף', 'victory': 'ויקטורי',
+    'osher ad': 'אושר עד', 'super pharm': 'סופר פארם', 'superpharm': 'סופר פארם', 'wolt': 'וולט',
+    'ikea': 'איקאה', 'castro': 'קסטרו', 'aroma': 'ארומה', 'cofix': 'קופיקס', 'mcdonalds': 'מקדונלדס',
+    'sonol': 'סונול', 'delek': 'דלק', 'paz': 'פז', 'hamashbir': 'המשביר',
+}
+_WORD = re.compile(r'[a-z0-9א-ת]+')
+
+
+def enabled() -> bool:
+    return os.environ.get('MERCHANT_RESOLUTION', '1') != '0'
+
+
+def _normalize(desc) -> str:
+    from .data_processor import normalize_merchant  # data_processor imports the AI layer
+    return normalize_merchant(desc)
+
+
+def _strip(name: str) -> str:
+    """Branch codes, trailing cities and noise words off a normalized name."""
+    name = _WEB.sub(' ', name).strip() or name
+    while True:
+        words = name.split(' ')
+        if len(words) > 1 and words[-1].strip('.-,') in _NOISE_WORDS:
+            stripped = ' '.join(words[:-1])
+        else:
+            stripped = _CITY_SUFFIX.sub('', _BRANCH.sub('', name)).strip(' -/,')
+        if not stripped or stripped == name:
+            return name
+        name = stripped
+
+
+def canonical_key(desc) -> str:
+    """Per-name entity key (no clustering); '' for an empty name."""
+    return _canonical_key(str(desc or '')) if enabled() else _normalize(desc)
+
+
+@lru_cache(maxsize=65536)
+def _canonical_key(desc: str) -> str:
+    norm = _normalize(desc)
+    if not norm:
+        return norm
+    words = _WORD.findall(_strip(norm))
+    for n in range(len(words), 0, -1):
+        alias = _ALIASES.get(' '.join(words[:n]))
+        if alias:
+            return ' '.join([alias, *words[n:]])
+    return ' '.join(words) or norm
+
+
+def _brand(key: str) -> bool:
+    """Can `key` absorb longer keys that start with it?"""
+    words = key.split(' ')
+    if any(w.isdigit() for w in words) or all(w in _GENERIC for w in words):
+        return False
+    return not (len(words) == 1 and len(words[0]) < _MIN_BRAND)
+
+
+def cluster(keys: Iterable[str]) -> dict[str, str]:
+    """{key: entity} over a set of canonical keys (see module docstring)."""
+    keys = set(keys)
+    out: dict[str, str] = {}
+    for key in sorted(keys, key=len):
+        words = key.split(' ')
+        entity = key
+        for n in range(1, len(words)):
+            prefix = ' '.join(words[:n])
+            if prefix in keys and _brand(prefix):
+                entity = out.get(prefix, prefix)
+                break
+        out[key] = entity
+    return out
+
+
+def resolve(names: Iterable[str], extra: Iterable[str] = ()) -> dict[str, str]:
+    """{name: entity id} — canonical keys clustered over `names` (plus
+    `extra` names, e.g. the merchants of rules matched against them)."""
+    keys = {n: canonical_key(n) for n in dict.fromkeys(names)}
+    if not enabled():
+        return keys
+    entities = cluster(set(keys.values()) | {canonical_key(e) for e in extra})
+    return {n: entities[k] for n, k in keys.items()}
+
+
+def entity_ids(names: pd.Series, extra: Iterable[str] = ()) -> pd.Series:
+    """resolve() over a column, once per distinct name, aligned with names.index."""
+    names = names.astype(str)
+    return names.map(resolve(pd.unique(names), extra))
+
+
+def entities_of(names: pd.Series, merchants: Iterable[str]) -> tuple[pd.Series, set[str]]:
+    """entity_ids(names) and the entity ids of `merchants`, clustered
+    together — "which rows belong to these merchants' businesses"."""
+    names = names.astype(str)
+    merchants = [m for m in merchants if m]
+    ids = resolve([*pd.unique(names), *merchants])
+    return names.map(ids), {ids[m] for m in merchants}
+
+
+def folded(names: Iterable[str], ids: Iterable[str]) -> int:
+    """How many normalize_merchant merchants resolution folded away."""
+    return len({_normalize(n) for n in names} - {''}) - len(set(ids) - {''})
+
@@ -0,0 +1,107 @@
+"""
+Chunked ingestion for very large CSV statements.
+
+A multi-year bank export (עו"ש) can run to hundreds of thousands of rows.
+Read whole, its raw object frame, the cleaned copy and process_data's
+working copy are all alive at once. `ingest_csv` instead reads
+UPLOAD_CHUNK_ROWS rows at a time (default 50,000), cleans and processes each
+chunk, and keeps only the session's own columns, so peak memory is one raw
+chunk plus the compact result. Carried across chunks:
+
+  - the header row and the detected columns, from the first chunk
+  - the sign evidence (SignEvidence): whether the file's amounts are
+    already signed is a whole-file question, so chunks keep the file's
+    signs and the convention is applied once at the end
+  - nothing else row-level: like a whole-file upload, identical rows within
+    one file are kept (two equal charges on one day are real)
+
+Ids are assigned over the combined frame, and the AI pass runs once on it.
+/upload switches to this path for CSVs over UPLOAD_STREAM_BYTES (default
+8 MB); Excel and PDF files are read whole.
+"""
+import os
+from typing import BinaryIO, Union
+
+import pandas as pd
+
+from .data_loader import iter_csv_chunks
+from .data_processor import (
+    SignEvidence, apply_ai_categories, apply_sign_convention, derive_subcategory, drop_junk_rows, process_data,
+)
+from ..utils.validators import detect_header_row, detect_transaction_columns
+
+# What process_data produces that a session uses; the file's own columns are dropped.
+SESSION_COLUMNS = (
+    'תאריך', 'תאריך_חיוב', 'סכום', 'תיאור', 'קטגוריה', 'קטגוריה_משנה', 'ענף_מקור',
+    'סכום_מוחלט', 'חודש', 'יום_בשבוע', 'חודש_חיוב', 'הערות', '_is_bank_row', 'id',
+)
+
+
+class MissingColumns(ValueError):
+    """The file has no date, amount or description column."""
+
+
+def stream_threshold() -> int:
+    return int(os.environ.get('UPLOAD_STREAM_BYTES', str(8 * 1024 * 1024)))
+
+
+def chunk_rows() -> int:
+    return max(1000, int(os.environ.get('UPLOAD_CHUNK_ROWS', '50000')))
+
+
+def should_stream(source: Union[str, BinaryIO], filename: str) -> bool:
+    """A CSV larger than UPLOAD_STREAM_BYTES."""
+    if not filename.lower().endswith('.csv'):
+        return False
+    if isinstance(source, str):
+        return os.path.getsize(source) > stream_threshold()
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(position)
+    return size > stream_threshold()
+
+
+def ingest_csv(source: Union[str, BinaryIO], categorize: bool = True, rows: int = 0) -> pd.DataFrame:
+    """The processed transactions of a CSV statement, built chunk by chunk.
+
+    Same rows, amounts and categories as clean_dataframe + process_data on
+    the whole file, in the compact SESSION_COLUMNS. Empty if nothing valid;
+    raises MissingColumns if the first chunk lacks the required columns.
+    """
+    header = columns = signs = None
+    parts = []
+    for raw in iter_csv_chunks(source, rows or chunk_rows()):
+        if header is None:
+            # As clean_dataframe: the header row is found in the first rows.
+            header_row = detect_header_row(raw)
+            if header_row > 0:
+                header = [str(c).strip() for c in raw.iloc[header_row]]
+                raw = raw.iloc[header_row + 1:]
+            else:
+                header = [str(c).strip() for c in raw.columns]
+        raw.columns = header
+        chunk = drop_junk_rows(raw)
+        del raw
+        if columns is None:
+            if chunk.empty:
+                continue
+            columns = detect_transaction_columns(chunk.dropna(axis=1, how='all'))
+            date_col, amount_col, desc_col, _, billing_date_col = columns
+            if not date_col or not amount_col or not desc_col:
+                raise MissingColumns(
+                    f"Required columns not found. Found columns: {list(chunk.dropna(axis=1, how='all').columns)}")
+            signs = SignEvidence(amount_col, bool(billing_date_col))
+        processed = process_data(chunk, *columns, categorize=False, signs=signs)
+        if not processed.empty:
+            parts.append(processed[[c for c in SESSION_COLUMNS if c in processed.columns]])
+
+    if not parts:
+        return pd.DataFrame()
+    df = pd.concat(parts, ignore_index=True)
+    df['סכום'] = apply_sign_convention(df['סכום'], df['תיאור'], flip=signs.charges_are_positive())
+    df['_is_bank_row'] = signs.is_bank_statement()
+    df['id'] = df.index.astype(int)
+    if categorize:
+        apply_ai_categories(df)
+        derive_subcategory(df)
+    return df
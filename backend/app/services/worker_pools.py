@@ -0,0 +1,123 @@
+"""
+Bounded worker pools for CPU-bound request work, kept apart from the AI.
+
+Most endpoints are synchronous pandas over a whole session frame. Run on
+the event loop, one heavy request stalls every other; run on the shared
+AnyIO threadpool, they compete with the sync AI endpoints, which hold their
+threads for as long as Claude takes. Instead:
+
+  - INTERACTIVE (CPU_POOL_INTERACTIVE_WORKERS, default 4): the read-only
+    GET endpoints behind the charts and tables — short, latency-sensitive.
+  - HEAVY (CPU_POOL_HEAVY_WORKERS, default 2): uploads, restores, exports —
+    long, so they can't occupy every interactive worker.
+
+The AI keeps its own: the sync AI endpoints use the AnyIO threadpool, and
+background jobs use ai_jobs' pool (a WorkerPool too). Each pool admits at
+most CPU_POOL_MAX_QUEUE waiting tasks (default 256) and raises PoolFull past
+that. Submitted work runs in the submitter's contextvars. Queue depth,
+wait and run time per pool are read back with `snapshot()`
+(GET /internal/metrics → "pools").
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class PoolFull(RuntimeError):
+    """The pool's wait queue is at its bound."""
+
+
+class WorkerPool:
+    """A ThreadPoolExecutor with a bounded wait queue and queue-depth stats."""
+
+    def __init__(self, name: str, workers: int, max_queue: Optional[int] = None):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._stats = {"completed": 0, "failed": 0, "rejected": 0, "max_queued": 0,
+                       "wait_ms_sum": 0.0, "wait_ms_max": 0.0, "run_ms_sum": 0.0, "run_ms_max": 0.0}
+        _POOLS[name] = self
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) in the caller's context; raises PoolFull."""
+        with self._lock:
+            if self.max_queue is not None and self._queued >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise PoolFull(f"{self.name} pool queue is full ({self._queued} waiting)")
+            self._queued += 1
+            self._stats["max_queued"] = max(self._stats["max_queued"], self._queued)
+        ctx = contextvars.copy_context()
+        future = self._executor.submit(ctx.run, self._timed, time.perf_counter(), fn, args, kwargs)
+        future.add_done_callback(self._dequeue_cancelled)
+        return future
+
+    def _dequeue_cancelled(self, future: Future) -> None:
+        # Only a task that never started can be cancelled (client gone).
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Await fn(*args, **kwargs) on the pool without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def _timed(self, queued_at: float, fn: Callable, args: tuple, kwargs: dict):
+        started = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._observe("wait_ms", (started - queued_at) * 1000)
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._stats["completed" if ok else "failed"] += 1
+                self._observe("run_ms", (time.perf_counter() - started) * 1000)
+
+    def _observe(self, name: str, ms: float) -> None:
+        self._stats[f"{name}_sum"] += ms
+        self._stats[f"{name}_max"] = max(self._stats[f"{name}_max"], ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            queued, running = self._queued, self._running
+        done = s["completed"] + s["failed"]
+        return {
+            "workers": self.workers, "max_queue": self.max_queue,
+            "queued": queued, "running": running, "max_queued": s["max_queued"],
+            "completed": s["completed"], "failed": s["failed"], "rejected": s["rejected"],
+            "wait_ms_avg": round(s["wait_ms_sum"] / done, 2) if done else 0.0,
+            "wait_ms_max": round(s["wait_ms_max"], 2),
+            "run_ms_avg": round(s["run_ms_sum"] / done, 2) if done else 0.0,
+            "run_ms_max": round(s["run_ms_max"], 2),
+        }
+
+
+_POOLS: dict[str, WorkerPool] = {}
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, str(default)))
+
+
+_MAX_QUEUE = _env_int('CPU_POOL_MAX_QUEUE', 256)
+INTERACTIVE = WorkerPool('interactive', _env_int('CPU_POOL_INTERACTIVE_WORKERS', 4), _MAX_QUEUE)
+HEAVY = WorkerPool('heavy', _env_int('CPU_POOL_HEAVY_WORKERS', 2), _MAX_QUEUE)
+
+
+def snapshot() -> dict:
+    """{pool name: stats} for every WorkerPool created in this process."""
+    return {name: pool.stats() for name, pool in _POOLS.items()}
@@ -1,9 +1,10 @@
 """
 Data validation and detection functions
 """
+import numpy as np
 import pandas as pd
 import re
-from typing import Optional
+from typing import Dict, Optional
 
 
 def detect_header_row(df: pd.DataFrame) -> int:
@@ -75,11 +76,77 @@ def clean_amount(value) -> float:
         return 0.0
 
 
+# Longer cells (notes, descriptions probed by detect_amount_column) are
+# parsed one by one, so the fixed-width text array below stays small.
+_AMOUNT_TEXT_WIDTH = 64
+
+
+def _parse_amount_text(text: np.ndarray) -> np.ndarray:
+    """clean_amount's steps, in order, as elementwise string ops (np.char)
+    over a unicode array."""
+    text = np.char.strip(text)
+    for mark in ('₪', 'NIS', 'nis'):
+        text = np.char.replace(text, mark, '')
+    text = np.char.strip(text)
+    negative = (np.char.find(text, '-') >= 0) | (np.char.find(text, '−') >= 0)
+    text = np.char.strip(np.char.replace(np.char.replace(text, '-', ''), '−', ''))
+
+    # Only cells with something besides digits and separators need the regex.
+    other = ~np.char.isdecimal(np.char.replace(np.char.replace(text, '.', ''), ',', ''))
+    if other.any():
+        text[other] = [re.sub(r'[^\d.,]', '', t) for t in text[other].tolist()]
+
+    # 1.000,00 and 12,50 read the comma as the decimal point; any other comma
+    # (1,000.00, 1,250) is a thousands separator.
+    comma, dot = np.char.rfind(text, ','), np.char.rfind(text, '.')
+    european = (dot >= 0) & (comma > dot)
+    decimal_comma = (comma >= 0) & (dot < 0) & (np.char.str_len(text) - comma - 1 == 2)
+    text = np.where(european, np.char.replace(text, '.', ''), text)
+    text = np.where(european | decimal_comma, np.char.replace(text, ',', '.'), np.char.replace(text, ',', ''))
+
+    # Digits and dots are left: float() takes them with one dot at most and a
+    # digit somewhere; anything else (empty, '1.2.3', '.') is 0.0.
+    dots = np.char.count(text, '.')
+    valid = (dots <= 1) & (np.char.str_len(text) > dots)
+    values = np.zeros(len(text), dtype='float64')
+    values[valid] = text[valid].astype(object).astype('float64')
+    return np.where(negative & valid, -values, values)
+
+
+def parse_amounts(series: pd.Series) -> pd.Series:
+    """clean_amount over a column, vectorized: float64, same index.
+
+    Numeric columns are cast directly. Otherwise each distinct value is
+    parsed once (statements repeat amounts): numbers pass straight through,
+    and text goes through clean_amount's steps as array-wide string ops —
+    ₪/NIS, ASCII/unicode/trailing minus, 1.000,00 / 1,000.00 / 12,50.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64').fillna(0.0)
+
+    codes, uniques = pd.factorize(series.astype(object))
+    uniques = np.asarray(uniques, dtype=object)
+    parsed = np.zeros(len(uniques), dtype='float64')
+    numeric = np.fromiter((isinstance(v, (int, float)) for v in uniques), dtype=bool, count=len(uniques))
+    parsed[numeric] = [float(v) for v in uniques[numeric]]
+
+    text = np.array([str(v) for v in uniques[~numeric]], dtype=object)
+    long = np.fromiter((len(t) > _AMOUNT_TEXT_WIDTH for t in text), dtype=bool, count=len(text))
+    values = np.zeros(len(text), dtype='float64')
+    values[long] = [clean_amount(t) for t in text[long]]
+    if (~long).any():
+        values[~long] = _parse_amount_text(text[~long].astype(str))
+    parsed[~numeric] = values
+
+    return pd.Series(np.where(codes >= 0, parsed[codes] if len(parsed) else 0.0, 0.0),
+                     index=series.index, name=series.name)
+
+
 def has_valid_amounts(df: pd.DataFrame, col: str) -> bool:
     if col not in df.columns:
         return False
     try:
-        values = df[col].apply(clean_amount)
+        values = parse_amounts(df[col])
         return (values.abs().sum() > 0)
     except:
         return False
@@ -118,45 +185,117 @@ def find_column(df: pd.DataFrame, keywords: list) -> Optional[str]:
     return None
 
 
-def parse_dates(series: pd.Series) -> pd.Series:
-    """פרסור תאריכים בפורמטים שונים עם טיפול בשגיאות"""
-    if series.empty:
-        return pd.Series(dtype='datetime64[ns]')
+def detect_transaction_columns(df: pd.DataFrame) -> tuple:
+    """(date, amount, description, category, billing date) columns of a
+    cleaned statement; any may be None."""
+    date_col = find_column(df, ['תאריך עסקה', 'תאריך', 'date', 'Date'])
+    amount_col = detect_amount_column(df)
+    desc_col = find_column(df, ['שם בית העסק', 'שם בית עסק', 'תיאור', 'תיאור התנועה', 'description', 'merchant'])
+    cat_col = find_column(df, ['קטגוריה', 'category', 'Category'])
+    billing_date_col = find_column(df, ['תאריך חיוב', 'תאריך_חיוב', 'Billing Date', 'billing date', 'תאריך חיוב:', 'יום ערך'])
+    return date_col, amount_col, desc_col, cat_col, billing_date_col
 
-    # If already datetime dtype, return directly (no string conversion needed)
-    if pd.api.types.is_datetime64_any_dtype(series):
-        return pd.to_datetime(series, errors='coerce')
 
-    # Check if values are native datetime/Timestamp objects (common from Excel)
-    sample = series.dropna().head(5)
-    if len(sample) > 0:
-        from datetime import datetime as _dt
-        if all(isinstance(v, (pd.Timestamp, _dt)) for v in sample):
-            return pd.to_datetime(series, errors='coerce')
+# String date formats, in priority order; %Y-%m-%d %H:%M:%S first — it
+# matches stringified Excel datetime objects.
+DATE_FORMATS = ['%Y-%m-%d %H:%M:%S', '%d-%m-%Y', '%d/%m/%Y', '%Y-%m-%d', '%d.%m.%Y', '%Y/%m/%d', '%m/%d/%Y']
+# Earlier formats that accept some of the same strings as a later one
+# ('05/06/2026'); where both do, the earlier one wins.
+_DATE_FORMAT_SHADOWS = {'%m/%d/%Y': ('%d/%m/%Y',)}
+_DATE_SAMPLE = 20
+# Date column header → the format its values had last time.
+_date_format_cache: Dict[str, str] = {}
 
-    # String-based parsing with explicit formats
-    # %Y-%m-%d %H:%M:%S first — matches stringified Excel datetime objects
-    formats = ['%Y-%m-%d %H:%M:%S', '%d-%m-%Y', '%d/%m/%Y', '%Y-%m-%d', '%d.%m.%Y', '%Y/%m/%d', '%m/%d/%Y']
-    result = pd.Series([pd.NaT] * len(series), index=series.index)
 
-    # ניקוי ערכים לפני פרסור
-    cleaned_series = series.astype(str).str.strip()
+def _to_datetime(values: pd.Series, fmt: str) -> Optional[pd.Series]:
+    try:
+        return pd.to_datetime(values, format=fmt, errors='coerce')
+    except Exception:
+        return None
 
-    for fmt in formats:
+
+def _infer_date_format(strings: pd.Series, column) -> Optional[str]:
+    """The format of a column's date strings, from a sample of them: the
+    column's cached format if it still fits, else the first of DATE_FORMATS
+    that parses the whole sample (and None if none does)."""
+    sample = strings[strings.notna() & ~strings.isin(['nan', 'NaT', 'None', ''])].head(_DATE_SAMPLE)
+    if sample.empty:
+        return None
+    cached = _date_format_cache.get(column) if isinstance(column, str) else None
+    for fmt in ([cached] if cached else []) + DATE_FORMATS:
+        parsed = _to_datetime(sample, fmt)
+        if parsed is not None and parsed.notna().all():
+            if isinstance(column, str):
+                if len(_date_format_cache) >= 256:
+                    _date_format_cache.clear()
+                _date_format_cache[column] = fmt
+            return fmt
+    return None
+
+
+def _parse_date_strings(strings: pd.Series, fmt: Optional[str]) -> pd.Series:
+    """DATE_FORMATS tried in turn on what's still unparsed, then dayfirst
+    inference on the rest. An inferred `fmt` is tried first: apart from its
+    shadows, re-checked here, no earlier format takes the strings it does."""
+    result = pd.Series([pd.NaT] * len(strings), index=strings.index)
+    if fmt is not None:
+        parsed = _to_datetime(strings, fmt)
+        if parsed is not None:
+            for earlier in _DATE_FORMAT_SHADOWS.get(fmt, ()):
+                preferred = _to_datetime(strings[parsed.notna()], earlier)
+                if preferred is not None:
+                    preferred = preferred.dropna()
+                    parsed[preferred.index] = preferred
+            result[parsed.notna()] = parsed[parsed.notna()]
+
+    for other in DATE_FORMATS:
         mask = result.isna()
         if not mask.any():
             break
-        try:
-            result[mask] = pd.to_datetime(cleaned_series[mask], format=fmt, errors='coerce')
-        except Exception:
+        if other == fmt:
             continue
+        parsed = _to_datetime(strings[mask], other)
+        if parsed is not None:
+            result[mask] = parsed
 
     # ניסיון אחרון עם dayfirst
     if result.isna().any():
         try:
             remaining_mask = result.isna()
-            result[remaining_mask] = pd.to_datetime(cleaned_series[remaining_mask], dayfirst=True, errors='coerce')
+            result[remaining_mask] = pd.to_datetime(strings[remaining_mask], dayfirst=True, errors='coerce')
         except Exception:
             pass
 
     return result
+
+
+def parse_dates(series: pd.Series) -> pd.Series:
+    """פרסור תאריכים בפורמטים שונים עם טיפול בשגיאות
+
+    Strings are parsed once per distinct value — a statement repeats the
+    same few hundred dates — and mapped back to the rows. The column's
+    format is inferred from a sample (and cached by column name) and tried
+    first; the result is the same as trying DATE_FORMATS in order.
+    """
+    if series.empty:
+        return pd.Series(dtype='datetime64[ns]')
+
+    # If already datetime dtype, return directly (no string conversion needed)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.to_datetime(series, errors='coerce')
+
+    # Check if values are native datetime/Timestamp objects (common from Excel)
+    sample = series.dropna().head(5)
+    if len(sample) > 0:
+        from datetime import datetime as _dt
+        if all(isinstance(v, (pd.Timestamp, _dt)) for v in sample):
+            return pd.to_datetime(series, errors='coerce')
+
+    # ניקוי ערכים לפני פרסור
+    cleaned_series = series.astype(str).str.strip()
+    codes, uniques = pd.factorize(cleaned_series, use_na_sentinel=False)
+    strings = pd.Series(uniques)
+    parsed = _parse_date_strings(strings, _infer_date_format(strings, series.name))
+    result = parsed.take(codes)
+    result.index = series.index
+    return result
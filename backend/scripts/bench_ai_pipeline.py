@@ -0,0 +1,167 @@
+"""Load-test the AI endpoints offline against recorded Claude answers.
+
+scripts/fake_anthropic.py serves scripts/fixtures/ai_pipeline_replay.json
+over HTTP (Replay responder), so the real anthropic SDK — streaming, retries
+and all — runs the real routes with no key and no network. Every session
+holds `--scale` branch variants ("<name> #k") of each recorded merchant, all
+still שונות; `--sessions` of them are driven concurrently through
+/restore-session → /ai-categorize → /ai-audit → /ai-subcategorize-all,
+twice: a cold pass, then a warm pass over fresh sessions of the same data
+(what the caches are for).
+
+    cd backend && python scripts/bench_ai_pipeline.py [--sessions 4] [--scale 3]
+        [--latency-scale 0.01] [--error-rate 0.05] [--truncate-rate 0.05]
+
+Per pass and endpoint: wall time (median / max over sessions), API calls,
+peak concurrent API requests, result-cache hit ratio; plus categorize
+accuracy against the recorded truth and the faults injected.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.api import routes  # noqa: E402
+from app.services import ai_categorizer, ai_metrics  # noqa: E402
+from scripts.fake_anthropic import FakeAnthropic, Replay  # noqa: E402
+
+DEFAULT_FIXTURE = Path(__file__).resolve().parent / 'fixtures' / 'ai_pipeline_replay.json'
+ENDPOINTS = ('ai-categorize', 'ai-audit', 'ai-subcategorize-all')
+
+_PHASE_BY_SYSTEM = {
+    ai_categorizer.PHASE1_SYSTEM: 'categorize_known',
+    ai_categorizer.PHASE2_SYSTEM: 'categorize_search',
+    ai_categorizer.SUBCAT_KNOWN_SYSTEM: 'subcategorize_known',
+    ai_categorizer.SUBCAT_SEARCH_SYSTEM: 'subcategorize_search',
+}
+
+
+def phase_of(params: dict) -> str:
+    """Which categorizer phase sent this request (by its system prompt)."""
+    system = params.get('system')
+    text = system[0]['text'] if isinstance(system, list) else system
+    if text == ai_categorizer.AUDIT_SYSTEM:
+        return 'audit' if 'tools' in params else 'audit_evidence'
+    return _PHASE_BY_SYSTEM[text]
+
+
+def session_rows(fixture: dict, scale: int) -> list[dict]:
+    rows = []
+    for k in range(1, scale + 1):
+        for m in fixture['merchants']:
+            for day in (3, 17):
+                rows.append({
+                    'id': len(rows) + 1, 'תאריך': f'2026-06-{day:02d}', 'תיאור': f"{m['name']} #{k}",
+                    'קטגוריה': 'שונות', 'סכום': -round(40 + 7 * len(rows) % 300, 2),
+                })
+    return rows
+
+
+def _cache_ratio(cache: dict) -> float:
+    hits = sum(c['hits'] for c in cache.values())
+    total = hits + sum(c['misses'] for c in cache.values())
+    return hits / total if total else 0.0
+
+
+def _accuracy(fixture: dict, sids: list[str]) -> float:
+    truth = {m['name']: m['category'] for m in fixture['merchants']}
+    right = total = 0
+    for sid in sids:
+        df = routes.sessions[sid]
+        for desc, cat in zip(df['תיאור'], df['קטגוריה']):
+            total += 1
+            right += truth.get(str(desc).rsplit(' #', 1)[0]) == cat
+    return right / total if total else 0.0
+
+
+def run(fixture: dict, sessions: int = 4, scale: int = 3, latency_scale: float = 0.01,
+        error_rate: float = 0.0, truncate_rate: float = 0.0, seed: int = 0) -> dict:
+    """Both passes over `sessions` concurrent sessions; returns the report."""
+    client = TestClient(app)
+    rows = session_rows(fixture, scale)
+    replay = Replay(fixture, phase_of, latency_scale=latency_scale,
+                    error_rate=error_rate, truncate_rate=truncate_rate, seed=seed)
+    env = {'ANTHROPIC_API_KEY': os.environ.get('ANTHROPIC_API_KEY') or 'replay',
+           'AI_MODEL': fixture['model'], 'AI_WEB_SEARCH': '1', 'AI_ESCALATION_MODEL': None}
+    saved = {k: os.environ.get(k) for k in (*env, 'ANTHROPIC_BASE_URL')}
+    report: dict = {'merchants': len(fixture['merchants']) * scale, 'sessions': sessions, 'passes': {}}
+    for cache in (ai_categorizer._CACHE, ai_categorizer._AUDIT_CACHE, ai_categorizer._SUBCAT_CACHE,
+                  ai_categorizer._EVIDENCE, ai_categorizer._BATCH_SIZERS):
+        cache.clear()
+    try:
+        with FakeAnthropic(replay) as fake, ThreadPoolExecutor(max_workers=sessions) as pool:
+            for k, v in {**env, 'ANTHROPIC_BASE_URL': fake.url}.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+            for label in ('cold', 'warm'):
+                sids = list(pool.map(lambda _: client.post(
+                    '/api/restore-session', json={'transactions': rows}).json()['session_id'], range(sessions)))
+                stages = {}
+                for endpoint in ENDPOINTS:
+                    ai_metrics.reset()
+                    fake.max_in_flight = 0
+                    sent = len(fake.requests)
+
+                    def _one(sid, endpoint=endpoint):
+                        t0 = time.perf_counter()
+                        resp = client.post(f'/api/{endpoint}', json={'session_id': sid, 'limit': 200,
+                                                                     'limit_per_category': 200})
+                        resp.raise_for_status()
+                        return time.perf_counter() - t0
+
+                    walls = list(pool.map(_one, sids))
+                    snap = ai_metrics.snapshot(recent=0)
+                    stages[endpoint] = {
+                        'wall_s_median': statistics.median(walls), 'wall_s_max': max(walls),
+                        'calls': len(fake.requests) - sent, 'peak_concurrency': fake.max_in_flight,
+                        'cache_hit_ratio': _cache_ratio(snap['cache']),
+                        'cost_usd': snap['totals']['cost_usd'],
+                    }
+                    if endpoint == 'ai-categorize':
+                        stages[endpoint]['accuracy'] = _accuracy(fixture, sids)
+                report['passes'][label] = stages
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+    report['faults'] = dict(replay.faults)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('fixture', nargs='?', type=Path, default=DEFAULT_FIXTURE)
+    parser.add_argument('--sessions', type=int, default=4)
+    parser.add_argument('--scale', type=int, default=3, help='branch variants per recorded merchant')
+    parser.add_argument('--latency-scale', type=float, default=0.01, help='x recorded latency (0 = none)')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--truncate-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    fixture = json.loads(args.fixture.read_text(encoding='utf-8'))
+    r = run(fixture, args.sessions, args.scale, args.latency_scale,
+            args.error_rate, args.truncate_rate, args.seed)
+    print(f"{r['merchants']} merchants x {r['sessions']} concurrent sessions, "
+          f"faults injected: {r['faults']['errors']} errors, {r['faults']['truncated']} truncated")
+    for label, stages in r['passes'].items():
+        for endpoint, s in stages.items():
+            extra = f"  accuracy {s['accuracy']:.0%}" if 'accuracy' in s else ''
+            print(f"{label:>4} {endpoint:>20}: {s['wall_s_median']:6.2f} s median  {s['wall_s_max']:6.2f} s max  "
+                  f"{s['calls']:4d} calls  peak {s['peak_concurrency']:2d} in flight  "
+                  f"cache {s['cache_hit_ratio']:4.0%}  ${s['cost_usd']:.4f}{extra}")
+
+
+if __name__ == '__main__':
+    main()
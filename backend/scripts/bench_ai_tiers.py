@@ -0,0 +1,136 @@
+"""Replay recorded Claude answers through the categorizer: two-phase vs tiered.
+
+scripts/fixtures/ai_tier_replay.json holds, per merchant, the answer each tier
+gave (no-search pass, web-search pass, larger model) plus the latency and
+token usage recorded per call. A fake client replays them, so both flows run
+the real categorize_transactions orchestration and are compared on latency,
+estimated cost (ai_metrics) and accuracy against the labelled truth:
+
+    cd backend && python scripts/bench_ai_tiers.py [fixture.json]
+
+  two-phase  every no-search answer accepted, every searched answer final
+  tiered     AI_KNOWN_THRESHOLD / AI_SEARCH_THRESHOLD gates + AI_ESCALATION_MODEL
+"""
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services import ai_categorizer, ai_metrics  # noqa: E402
+
+DEFAULT_FIXTURE = Path(__file__).resolve().parent / 'fixtures' / 'ai_tier_replay.json'
+_LINE = re.compile(r'^(\d+)\. (.+)$')
+
+
+class ReplayClient:
+    """Answers messages.create from the fixture; accumulates recorded latency."""
+
+    def __init__(self, fixture: dict):
+        self.fixture = fixture
+        self.by_name = {m['name']: m for m in fixture['merchants']}
+        self.latency_ms = 0.0
+        self.messages = SimpleNamespace(create=self._create)
+
+    def _tier(self, kwargs) -> str:
+        if 'tools' not in kwargs:
+            return 'known'
+        return 'escalate' if kwargs['model'] == self.fixture['models']['escalation'] else 'search'
+
+    def _merchants(self, prompt: str) -> list[dict]:
+        out = []
+        for line in prompt.splitlines():
+            m = _LINE.match(line.strip())
+            if not m:
+                continue
+            # Longest fixture name the line starts with (hints follow the name).
+            name = max((n for n in self.by_name if m.group(2).startswith(n)), key=len, default=None)
+            out.append(self.by_name.get(name, {'name': m.group(2)}))
+        return out
+
+    def _create(self, **kwargs):
+        tier = self._tier(kwargs)
+        merchants = self._merchants(kwargs['messages'][0]['content'])
+        answers = []
+        for i, m in enumerate(merchants):
+            rec = m.get(tier) or m.get('search') or {'category': 'שונות'}
+            answers.append({'index': i, **rec})
+        usage = self.fixture['usage'][{'known': 'categorize_known', 'search': 'categorize_search',
+                                       'escalate': 'categorize_escalate'}[tier]]
+        n = len(merchants)
+        self.latency_ms += usage['latency_ms'] + usage['latency_ms_per_merchant'] * n
+        searches = usage.get('searches_per_merchant', 0) * n
+        blocks = [SimpleNamespace(type='server_tool_use')] if searches else []
+        blocks.append(SimpleNamespace(type='text', text=json.dumps(answers, ensure_ascii=False)))
+        return SimpleNamespace(
+            content=blocks, stop_reason='end_turn',
+            usage=SimpleNamespace(
+                input_tokens=usage['input_tokens'] + usage['input_tokens_per_merchant'] * n,
+                output_tokens=usage['output_tokens_per_merchant'] * n,
+                server_tool_use=SimpleNamespace(web_search_requests=searches),
+            ),
+        )
+
+
+def _reset_caches() -> None:
+    ai_categorizer._CACHE.clear()
+    ai_categorizer._EVIDENCE.clear()
+    ai_categorizer._BATCH_SIZERS.clear()
+    ai_metrics.reset()
+
+
+def run(fixture: dict, env: dict) -> dict:
+    """One categorize run over the fixture's merchants under `env`."""
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update({k: v for k, v in env.items() if v is not None})
+    for k, v in env.items():
+        if v is None:
+            os.environ.pop(k, None)
+    client = ReplayClient(fixture)
+    get_client = ai_categorizer._get_client
+    ai_categorizer._get_client = lambda: client
+    _reset_caches()
+    try:
+        names = [m['name'] for m in fixture['merchants']]
+        result = ai_categorizer.categorize_transactions(names)
+        totals = ai_metrics.snapshot(recent=0)['totals']
+    finally:
+        ai_categorizer._get_client = get_client
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+    correct = sum(1 for i, m in enumerate(fixture['merchants']) if result.get(i) == m['truth'])
+    return {
+        'calls': totals['calls'],
+        'latency_s': client.latency_ms / 1000,
+        'cost_usd': totals['cost_usd'],
+        'web_searches': totals['web_searches'],
+        'accuracy': correct / len(fixture['merchants']),
+    }
+
+
+def main() -> None:
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FIXTURE
+    fixture = json.loads(path.read_text(encoding='utf-8'))
+    common = {'ANTHROPIC_API_KEY': os.environ.get('ANTHROPIC_API_KEY') or 'replay',
+              'AI_MODEL': fixture['models']['base'], 'AI_LOCAL_CLASSIFIER': '0', 'AI_WEB_SEARCH': '1'}
+    flows = {
+        'two-phase': {**common, 'AI_KNOWN_THRESHOLD': '0', 'AI_ESCALATION_MODEL': None},
+        'tiered': {**common, 'AI_KNOWN_THRESHOLD': '0.7', 'AI_SEARCH_THRESHOLD': '0.6',
+                   'AI_ESCALATION_MODEL': fixture['models']['escalation']},
+    }
+    ai_categorizer._sleep = lambda s: None
+    print(f"{len(fixture['merchants'])} merchants from {path.name}")
+    for label, env in flows.items():
+        r = run(fixture, env)
+        print(f"{label:>10}: {r['calls']:3d} calls  {r['latency_s']:7.1f} s  ${r['cost_usd']:.4f}  "
+              f"{r['web_searches']:3d} searches  accuracy {r['accuracy']:.0%}")
+
+
+if __name__ == '__main__':
+    main()
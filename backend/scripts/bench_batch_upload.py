@@ -0,0 +1,91 @@
+"""Time a year of card statements: 12 uploads vs one /upload/batch.
+
+Builds 12 synthetic monthly exports — MAX and Isracard Excel layouts,
+alternating, each overlapping the previous month by a few rows — and times:
+
+  per-file     _process_upload on each file in turn (the old client flow:
+               one /upload per file, merged by the client afterwards)
+  batch        _process_batch in-thread (ANALYTICS_PROCESSES=0)
+  batch x N    _process_batch over N worker processes
+
+The AI is off (no API key), so this measures parsing and processing only.
+
+    cd backend && python scripts/bench_batch_upload.py [rows_per_file] [processes]
+"""
+import io
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.pop('ANTHROPIC_API_KEY', None)
+os.environ['AI_LOCAL_CLASSIFIER'] = '0'
+
+import pandas as pd  # noqa: E402
+from app.api import routes  # noqa: E402
+from app.services import analytics_executor  # noqa: E402
+
+MAX_HEADER = ['תאריך עסקה', 'שם בית העסק', 'קטגוריה', '4 ספרות אחרונות של כרטיס האשראי', 'סוג עסקה',
+              'סכום חיוב', 'מטבע חיוב', 'סכום עסקה מקורי', 'מטבע עסקה מקורי', 'תאריך חיוב', 'הערות']
+ISRACARD_HEADER = ['תאריך רכישה', 'שם בית עסק', 'סכום עסקה', 'מטבע עסקה', 'סכום חיוב', 'מטבע חיוב',
+                   "מס' שובר", 'פירוט נוסף']
+
+
+def _month(rng: random.Random, month: int, n: int) -> list[tuple]:
+    merchants = [f'עסק מספר {i}' for i in range(400)] + ['שופרסל דיל', 'פז יבנה', 'נטפליקס', 'סונול']
+    return [(pd.Timestamp(2025, month, rng.randint(1, 28)), rng.choice(merchants), round(rng.uniform(5, 900), 2))
+            for _ in range(n)]
+
+
+def _xlsx(rows: list[tuple], isracard: bool) -> bytes:
+    if isracard:
+        body = [[d.strftime('%d/%m/%Y'), m, a, '₪', a, '₪', str(abs(hash(m)) % 10**7), ''] for d, m, a in rows]
+        table = [['', '', '', '', '', '', '', ''], ISRACARD_HEADER] + body
+    else:
+        billing = rows[0][0].replace(day=10) + pd.offsets.MonthBegin(1)
+        body = [[d.strftime('%d-%m-%Y'), m, 'שונות', '1234', 'רגילה', a, '₪', a, '₪',
+                 billing.strftime('%d-%m-%Y'), ''] for d, m, a in rows]
+        table = [['כל המשתמשים (1)'] + [''] * 10, [''] * 11, MAX_HEADER] + body
+    buf = io.BytesIO()
+    pd.DataFrame(table).to_excel(buf, header=False, index=False)
+    return buf.getvalue()
+
+
+def _files(rows_per_file: int) -> list[tuple[bytes, str]]:
+    rng = random.Random(0)
+    files, previous = [], []
+    for month in range(1, 13):
+        rows = _month(rng, month, rows_per_file) + previous[-5:]   # overlap with last month
+        isracard = month % 2 == 0
+        files.append((_xlsx(rows, isracard), f"{'isracard' if isracard else 'max'}-2025-{month:02d}.xlsx"))
+        previous = rows
+    return files
+
+
+def _per_file(files) -> int:
+    return sum(len(routes._process_upload(io.BytesIO(content), name)) for content, name in files)
+
+
+def _batch(files) -> int:
+    return len(routes._process_batch(files)[0])
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    processes = sys.argv[2] if len(sys.argv) > 2 else str(min(12, os.cpu_count() or 1))
+    files = _files(rows)
+    runs = [('per-file', '0', _per_file), ('batch', '0', _batch), (f'batch x {processes}', processes, _batch)]
+    for label, workers, fn in runs:
+        os.environ['ANALYTICS_PROCESSES'] = workers
+        if workers != '0':
+            fn(files[:max(2, int(workers))])   # spawn and warm the workers outside the timing
+        t0 = time.perf_counter()
+        count = fn(files)
+        print(f'{label:>12}: {(time.perf_counter() - t0) * 1000:9.1f} ms  ({count} transactions, {len(files)} files)')
+    analytics_executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
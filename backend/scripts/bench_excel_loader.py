@@ -0,0 +1,58 @@
+"""Time Excel ingestion (load_transaction_file) per engine.
+
+Builds a card-statement workbook — several transaction sheets plus a
+summary sheet — and reads it with every available engine:
+
+  openpyxl   pandas' default for .xlsx, sheets read in turn
+  calamine   python-calamine (if installed), sheets read concurrently
+
+    cd backend && python scripts/bench_excel_loader.py [rows_per_sheet] [sheets]
+"""
+import io
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pandas as pd  # noqa: E402
+from app.services.data_loader import load_transaction_file  # noqa: E402
+
+HEADER = ['תאריך עסקה', 'שם בית העסק', 'קטגוריה', 'סכום חיוב', 'מטבע חיוב', 'סכום עסקה מקורי', 'תאריך חיוב']
+
+
+def _workbook(rows: int, sheets: int) -> bytes:
+    rng = random.Random(0)
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf) as writer:
+        for s in range(sheets):
+            body = [[f'{rng.randint(1, 28):02d}-06-2026', f'עסק מספר {rng.randint(0, 999)}', 'שונות',
+                     round(rng.uniform(5, 900), 2), '₪', round(rng.uniform(5, 900), 2), '10-07-2026']
+                    for _ in range(rows)]
+            pd.DataFrame([['כל המשתמשים'] + [''] * 6, HEADER] + body).to_excel(
+                writer, sheet_name=f'כרטיס {s + 1}', header=False, index=False)
+        pd.DataFrame([['סה"כ', rows * sheets]]).to_excel(writer, sheet_name='סיכום', header=False, index=False)
+    return buf.getvalue()
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    sheets = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    content = _workbook(rows, sheets)
+    engines = ['openpyxl']
+    try:
+        import python_calamine  # noqa: F401
+        engines.append('calamine')
+    except ImportError:
+        print('python-calamine not installed — openpyxl only')
+    for engine in engines:
+        os.environ['EXCEL_ENGINE'] = engine
+        t0 = time.perf_counter()
+        df = load_transaction_file(io.BytesIO(content), 'statement.xlsx')
+        print(f'{engine:>9}: {(time.perf_counter() - t0) * 1000:9.1f} ms  ({len(df)} rows, {sheets} sheets)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Time merchant aggregation (/ai-audit, AI subcategorizer) on a synthetic frame.
+
+Compares the vectorized aggregate_merchants + catalog_hits against the old
+per-row iterrows loop:
+
+    cd backend && python scripts/bench_merchant_aggregation.py [rows]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pandas as pd  # noqa: E402
+from app.core.constants import KEYWORD_TO_CATEGORY  # noqa: E402
+from app.services.data_processor import (  # noqa: E402
+    aggregate_merchants, catalog_hits, normalize_merchant,
+)
+
+
+def _frame(n: int) -> pd.DataFrame:
+    rng = random.Random(0)
+    merchants = [f'עסק מספר {i}' for i in range(3000)] + list(KEYWORD_TO_CATEGORY)[:500]
+    return pd.DataFrame({
+        'תיאור': [rng.choice(merchants) + (f' (תשלום {rng.randint(1, 6)}/6)' if rng.random() < 0.1 else '')
+                  for _ in range(n)],
+        'קטגוריה': [rng.choice(['מזון', 'שונות', 'פנאי', 'תחבורה']) for _ in range(n)],
+        'סכום': [-round(rng.uniform(5, 900), 2) for _ in range(n)],
+        'ענף_מקור': [rng.choice([None, 'מזון ומשקאות', 'פנאי']) for _ in range(n)],
+    })
+
+
+def _row_loop(df: pd.DataFrame) -> int:
+    merchants: dict[str, dict] = {}
+    for _, row in df.iterrows():
+        raw = str(row.get('תיאור', '')).strip()
+        key = normalize_merchant(raw)
+        if not key or any(kw in raw.lower() for kw in KEYWORD_TO_CATEGORY):
+            continue
+        m = merchants.setdefault(key, {"count": 0, "total": 0.0, "_names": {}, "_cats": {}})
+        m["count"] += 1
+        m["total"] += abs(float(row.get('סכום', 0) or 0))
+        m["_names"][raw] = m["_names"].get(raw, 0) + 1
+        cat = str(row.get('קטגוריה'))
+        m["_cats"][cat] = m["_cats"].get(cat, 0) + 1
+    return len(merchants)
+
+
+def _vectorized(df: pd.DataFrame) -> int:
+    return len(aggregate_merchants(df[~catalog_hits(df['תיאור'])]))
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = _frame(n)
+    for label, fn in (('vectorized', _vectorized), ('iterrows', _row_loop)):
+        t0 = time.perf_counter()
+        merchants = fn(df)
+        print(f'{label:>10}: {(time.perf_counter() - t0) * 1000:9.1f} ms  ({merchants} merchants, {n} rows)')
+
+
+if __name__ == '__main__':
+    main()
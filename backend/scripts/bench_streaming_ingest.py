@@ -0,0 +1,61 @@
+"""Peak memory and time of a large bank-statement CSV: whole vs streamed.
+
+    cd backend && python scripts/bench_streaming_ingest.py [rows] [chunk_rows]
+
+whole     load_transaction_file → clean_dataframe → process_data
+streamed  streaming_ingest.ingest_csv
+
+Peaks are traced allocations (tracemalloc; numpy reports its buffers), which
+slows both runs several-fold.
+The AI is off (no API key).
+"""
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.pop('ANTHROPIC_API_KEY', None)
+os.environ['AI_LOCAL_CLASSIFIER'] = '0'
+
+from app.services import streaming_ingest  # noqa: E402
+from app.services.data_loader import load_transaction_file  # noqa: E402
+from app.services.data_processor import clean_dataframe, process_data  # noqa: E402
+from app.utils.validators import detect_transaction_columns  # noqa: E402
+
+
+def _csv(rows: int) -> bytes:
+    rng = random.Random(0)
+    lines = ['תנועות בחשבון', 'תאריך,תיאור התנועה,אסמכתא,סכום,יתרה']
+    for i in range(rows):
+        amount = round(rng.uniform(-900, -5), 2) if rng.random() < 0.9 else round(rng.uniform(100, 9000), 2)
+        lines.append(f'{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{2020 + i * 6 // rows},'
+                     f'{rng.choice(["משכורת", "העברה", "כרטיס"])} {rng.randint(0, 2000)},{i},{amount},{rng.uniform(0, 1e5):.2f}')
+    return '\n'.join(lines).encode('windows-1255')
+
+
+def _whole(content: bytes):
+    df = clean_dataframe(load_transaction_file(io.BytesIO(content), 'bank.csv'))
+    return process_data(df, *detect_transaction_columns(df))
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    chunk = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    content = _csv(rows)
+    for label, fn in (('whole', _whole), ('streamed', lambda c: streaming_ingest.ingest_csv(io.BytesIO(c), rows=chunk))):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        df = fn(content)
+        elapsed = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'{label:>9}: {elapsed * 1000:9.1f} ms  peak {peak / 2**20:7.1f} MiB  ({len(df)} rows)')
+        del df
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+"""Local fake of the Anthropic Messages + Message Batches HTTP API.
+
+Answers come from a Python `responder(params) -> message dict` (see
+`message()`), so the real anthropic SDK can be pointed at it through
+ANTHROPIC_BASE_URL — in tests and benchmarks, no network and no key needed:
+
+    with FakeAnthropic(responder) as fake:
+        os.environ['ANTHROPIC_BASE_URL'] = fake.url
+        ...
+        fake.requests      # every messages.create params, in order
+        fake.batches       # {batch id: [request, ...]}
+
+Served endpoints: POST /v1/messages, POST /v1/messages/batches,
+GET /v1/messages/batches/{id}, GET /v1/messages/batches/{id}/results,
+POST /v1/messages/batches/{id}/cancel. A request with "stream": true is
+answered as server-sent events (see `sse_events`). A batch reports in_progress for
+`polls_until_ended` retrieves, then ended; a responder that raises turns that
+request into an "errored" batch result (or an error status for /v1/messages:
+FakeError's, else 500).
+
+`Replay` is a ready-made responder over recorded fixtures, with latency,
+529 errors and truncation injected at configurable rates.
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+
+class FakeError(Exception):
+    """Raised by a responder to answer with an API error (e.g. 429, 529)."""
+
+    _TYPES = {400: 'invalid_request_error', 429: 'rate_limit_error', 529: 'overloaded_error'}
+
+    def __init__(self, status: int = 529, text: str = 'Overloaded'):
+        super().__init__(text)
+        self.status = status
+        self.error_type = self._TYPES.get(status, 'api_error')
+
+
+def message(text: str, searched: bool = False, input_tokens: int = 100, output_tokens: int = 20,
+            model: str = 'claude-haiku-4-5-20251001', stop_reason: str = 'end_turn') -> dict:
+    """A Messages API response body whose last text block is `text`."""
+    content = []
+    if searched:
+        content += [
+            {"type": "server_tool_use", "id": "srvtoolu_fake", "name": "web_search", "input": {"query": "?"}},
+            {"type": "web_search_tool_result", "tool_use_id": "srvtoolu_fake", "content": []},
+        ]
+    content.append({"type": "text", "text": text})
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:12]}", "type": "message", "role": "assistant", "model": model,
+        "content": content, "stop_reason": stop_reason, "stop_sequence": None,
+        "usage": {
+            "input_tokens": input_tokens, "output_tokens": output_tokens,
+            "server_tool_use": {"web_search_requests": 1 if searched else 0},
+        },
+    }
+
+
+def sse_events(msg: dict, chunk_chars: int = 16) -> str:
+    """A message body replayed as the Messages streaming event sequence,
+    text delivered in `chunk_chars`-sized deltas."""
+    def event(kind: str, data: dict) -> str:
+        return f"event: {kind}\ndata: {json.dumps({'type': kind, **data}, ensure_ascii=False)}\n\n"
+
+    usage = msg["usage"]
+    out = [event("message_start", {"message": {
+        **msg, "content": [], "stop_reason": None,
+        "usage": {"input_tokens": usage.get("input_tokens", 0), "output_tokens": 0},
+    }})]
+    for i, block in enumerate(msg["content"]):
+        if block["type"] == "text":
+            out.append(event("content_block_start", {"index": i, "content_block": {"type": "text", "text": ""}}))
+            text = block["text"]
+            for start in range(0, len(text), chunk_chars):
+                out.append(event("content_block_delta", {"index": i, "delta": {
+                    "type": "text_delta", "text": text[start:start + chunk_chars]}}))
+        else:
+            out.append(event("content_block_start", {"index": i, "content_block": block}))
+        out.append(event("content_block_stop", {"index": i}))
+    out.append(event("message_delta", {
+        "delta": {"stop_reason": msg["stop_reason"], "stop_sequence": None}, "usage": usage}))
+    out.append(event("message_stop", {}))
+    return "".join(out)
+
+
+_LINE = re.compile(r'^(\d+)\. "?(.+)$')
+
+
+class Replay:
+    """Responder replaying recorded per-merchant answers (see
+    fixtures/ai_pipeline_replay.json) with the recorded latency and usage.
+
+    `phase_of(params)` names the phase of a request (a key of the fixture's
+    "usage" and of each merchant record). Prompt lines are matched to the
+    longest recorded name they start with, so "<name> #7" replays <name>.
+    Faults are drawn from a seeded RNG: `error_rate` answers 529, and
+    `truncate_rate` cuts the answer short with stop_reason max_tokens.
+    `latency_scale` scales the recorded latency (0 = answer at once).
+    """
+
+    def __init__(self, fixture: dict, phase_of: Callable[[dict], str], latency_scale: float = 0.0,
+                 error_rate: float = 0.0, truncate_rate: float = 0.0, seed: int = 0):
+        self.fixture = fixture
+        self.phase_of = phase_of
+        self.latency_scale = latency_scale
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.by_name = {m['name']: m for m in fixture['merchants']}
+        self._names = sorted(self.by_name, key=len, reverse=True)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.faults = {'errors': 0, 'truncated': 0}
+
+    def _record(self, line: str) -> dict:
+        name = next((n for n in self._names if line.startswith(n)), None)
+        return self.by_name.get(name, {})
+
+    def _draw(self) -> tuple[bool, bool, float]:
+        with self._lock:
+            error = self._rng.random() < self.error_rate
+            truncate = not error and self._rng.random() < self.truncate_rate
+            cut = self._rng.uniform(0.3, 0.9)
+            if error:
+                self.faults['errors'] += 1
+            if truncate:
+                self.faults['truncated'] += 1
+        return error, truncate, cut
+
+    def __call__(self, params: dict) -> dict:
+        phase = self.phase_of(params)
+        usage = self.fixture['usage'][phase]
+        prompt = params['messages'][0]['content']
+        lines = [m.group(2) for m in (_LINE.match(ln.strip()) for ln in prompt.splitlines()) if m]
+        n = len(lines)
+        error, truncate, cut = self._draw()
+        if self.latency_scale:
+            time.sleep(self.latency_scale * (usage['latency_ms'] + usage['latency_ms_per_merchant'] * n) / 1000)
+        if error:
+            raise FakeError(529)
+        # Phases may share recorded answers ("answers"); a line carrying the
+        # fixture's evidence marker is answered as recorded for the phase that
+        # found the evidence ("answers_with_evidence").
+        marker = self.fixture.get('evidence_marker')
+        answers = []
+        for i, line in enumerate(lines):
+            source = usage.get('answers', phase)
+            if marker and marker in line:
+                source = usage.get('answers_with_evidence', source)
+            answers.append({'index': i, **(self._record(line).get(source) or {'unknown': True})})
+        text = json.dumps(answers, ensure_ascii=False)
+        if truncate:
+            text = text[:int(len(text) * cut)]
+        searches = usage.get('searches_per_merchant', 0) * n if 'tools' in params else 0
+        msg = message(text, searched=bool(searches), model=params.get('model', 'claude-haiku-4-5-20251001'),
+                      input_tokens=usage['input_tokens'] + usage['input_tokens_per_merchant'] * n,
+                      output_tokens=usage['output_tokens_per_merchant'] * n,
+                      stop_reason='max_tokens' if truncate else 'end_turn')
+        msg['usage']['server_tool_use']['web_search_requests'] = searches
+        return msg
+
+
+_BATCH_PATH = re.compile(r'^/v1/messages/batches/([\w-]+)(/results|/cancel)?$')
+
+
+class FakeAnthropic:
+    """Threaded HTTP server on 127.0.0.1; use as a context manager."""
+
+    def __init__(self, responder: Callable[[dict], dict], polls_until_ended: int = 1, port: int = 0):
+        self.responder = responder
+        self.polls_until_ended = polls_until_ended
+        self.requests: list[dict] = []
+        self.batches: dict[str, list[dict]] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0  # peak concurrent /v1/messages requests
+        self._polls: dict[str, int] = {}
+        self._canceled: set[str] = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> 'FakeAnthropic':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _answer(self, params: dict) -> dict:
+        with self._lock:
+            self.requests.append(params)
+        return self.responder(params)
+
+    def _batch(self, batch_id: str) -> dict:
+        ended = batch_id in self._canceled or self._polls.get(batch_id, 0) >= self.polls_until_ended
+        n = len(self.batches[batch_id])
+        return {
+            "id": batch_id, "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else n, "succeeded": n if ended else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": "2026-01-01T00:00:00Z", "expires_at": "2026-01-02T00:00:00Z",
+            "ended_at": "2026-01-01T00:01:00Z" if ended else None,
+            "archived_at": None, "cancel_initiated_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def _results(self, batch_id: str) -> str:
+        lines = []
+        for req in self.batches[batch_id]:
+            try:
+                result = {"type": "succeeded", "message": self._answer(req["params"])}
+            except Exception as e:
+                result = {"type": "errored", "error": {"type": "error", "error": {
+                    "type": "api_error", "message": str(e)}}}
+            lines.append(json.dumps({"custom_id": req["custom_id"], "result": result}, ensure_ascii=False))
+        return "\n".join(lines) + "\n"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body, content_type='application/json'):
+                data = (body if isinstance(body, str) else json.dumps(body, ensure_ascii=False)).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _json(self) -> dict:
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def do_POST(self):
+                path = self.path.split('?')[0]
+                if path == '/v1/messages':
+                    with fake._lock:
+                        fake.in_flight += 1
+                        fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                    try:
+                        params = self._json()
+                        msg = fake._answer(params)
+                        if params.get("stream"):
+                            return self._send(200, sse_events(msg), 'text/event-stream')
+                        return self._send(200, msg)
+                    except Exception as e:
+                        return self._send(getattr(e, 'status', 500), {"type": "error", "error": {
+                            "type": getattr(e, 'error_type', 'api_error'), "message": str(e)}})
+                    finally:
+                        with fake._lock:
+                            fake.in_flight -= 1
+                if path == '/v1/messages/batches':
+                    batch_id = f"msgbatch_{uuid.uuid4().hex[:12]}"
+                    with fake._lock:
+                        fake.batches[batch_id] = self._json()["requests"]
+                    return self._send(200, fake._batch(batch_id))
+                m = _BATCH_PATH.match(path)
+                if m and m.group(2) == '/cancel' and m.group(1) in fake.batches:
+                    fake._canceled.add(m.group(1))
+                    return self._send(200, fake._batch(m.group(1)))
+                self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": path}})
+
+            def do_GET(self):
+                m = _BATCH_PATH.match(self.path.split('?')[0])
+                if not m or m.group(1) not in fake.batches:
+                    return self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+                batch_id = m.group(1)
+                if m.group(2) == '/results':
+                    return self._send(200, fake._results(batch_id), 'application/x-jsonl')
+                with fake._lock:
+                    fake._polls[batch_id] = fake._polls.get(batch_id, 0) + 1
+                self._send(200, fake._batch(batch_id))
+
+        return Handler
+
+
+def main() -> None:
+    """Serve until Ctrl-C, answering every request with an empty JSON array."""
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    with FakeAnthropic(lambda params: message('[]'), port=port) as fake:
+        print(f"fake Anthropic API on {fake.url} (ANTHROPIC_BASE_URL)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Message Batches mode of /ai-audit and /ai-subcategorize-all.
+
+The real anthropic SDK talks to scripts/fake_anthropic.py (a local HTTP fake
+of the Messages + Message Batches API) via ANTHROPIC_BASE_URL. These tests pin:
+  - mode="batch" returns a job id at once; the job submits ONE message batch
+    per round, polls it, and its result is the endpoint's usual body
+  - subcategorize-all jobs apply assignments to the live session
+  - batched calls are recorded at the batch discount
+  - a request that errored inside the batch leaves its merchants unresolved
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.api import routes  # noqa: E402
+from app.services import ai_batches, ai_categorizer, ai_metrics  # noqa: E402
+from scripts.fake_anthropic import FakeAnthropic, message  # noqa: E402
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state(monkeypatch):
+    for cache in ("_CACHE", "_AUDIT_CACHE", "_SUBCAT_CACHE", "_EVIDENCE", "_BATCH_SIZERS"):
+        monkeypatch.setattr(ai_categorizer, cache, {})
+    monkeypatch.setattr(ai_batches, "_sleep", lambda s: None)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("AI_MODEL", "claude-haiku-4-5-20251001")
+    monkeypatch.delenv("AI_ESCALATION_MODEL", raising=False)
+    ai_metrics.reset()
+    yield
+    ai_metrics.reset()
+
+
+def _restore(rows):
+    resp = client.post("/api/restore-session", json={"transactions": rows})
+    assert resp.status_code == 200, resp.text
+    return resp.json()["session_id"]
+
+
+def _wait_for_job(job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/ai-jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def _merchants(params):
+    return [line for line in params["messages"][0]["content"].splitlines() if line[:1].isdigit()]
+
+
+def test_audit_batch_mode_runs_as_job(monkeypatch):
+    def responder(params):
+        assert params["tools"][0]["type"] == "web_search_20250305"
+        verdicts = [{"index": i, "category": "טיפוח", "confidence": 0.9, "reason": "מספרה"}
+                    for i in range(len(_merchants(params)))]
+        return message(json.dumps(verdicts, ensure_ascii=False), searched=True,
+                       input_tokens=1000, output_tokens=100)
+
+    sid = _restore([
+        {"id": 1, "תאריך": "2026-06-05", "תיאור": "רונית עיצובים", "קטגוריה": "קניות", "סכום": -150.0},
+        {"id": 2, "תאריך": "2026-06-06", "תיאור": "אבי סטייל", "קטגוריה": "קניות", "סכום": -90.0},
+    ])
+    with FakeAnthropic(responder, polls_until_ended=2) as fake:
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", fake.url)
+        resp = client.post("/api/ai-audit", json={"session_id": sid, "mode": "batch"})
+        assert resp.status_code == 200, resp.text
+        job = _wait_for_job(resp.json()["job_id"])
+
+    assert job["status"] == "done", job
+    proposals = job["result"]["proposals"]
+    assert {p["proposed_category"] for p in proposals} == {"טיפוח"}
+    assert len(proposals) == 2
+    # One batch, both merchants in it; nothing went through /v1/messages.
+    assert [len(reqs) for reqs in fake.batches.values()] == [1]
+    assert len(fake.requests) == 1
+
+    recent = ai_metrics.snapshot()["recent"]
+    assert recent[0]["batched"] is True and recent[0]["session"] == ai_metrics.session_ref(sid)
+    # haiku 4.5 at half price: (1000 * $1 + 100 * $5) / 1M / 2, plus one search
+    assert recent[0]["cost_usd"] == pytest.approx((1000 + 500) / 1e6 / 2 + 0.01)
+
+
+def test_subcategorize_all_batch_mode_applies_assignments(monkeypatch):
+    def responder(params):
+        assert "tools" not in params  # phase 1 answers everything here
+        n = len(_merchants(params))
+        return message(json.dumps([{"index": i, "subcategory": "מעדניות"} for i in range(n)],
+                                  ensure_ascii=False))
+
+    sid = _restore([
+        {"id": 1, "תאריך": "2026-06-05", "תיאור": "מעדניית הגליל", "קטגוריה": "אוכל", "סכום": -200.0},
+        {"id": 2, "תאריך": "2026-06-09", "תיאור": "מעדנייה בשוק", "קטגוריה": "אוכל", "סכום": -60.0},
+    ])
+    with FakeAnthropic(responder) as fake:
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", fake.url)
+        resp = client.post("/api/ai-subcategorize-all", json={"session_id": sid, "mode": "batch"})
+        job = _wait_for_job(resp.json()["job_id"])
+
+    assert job["status"] == "done", job
+    assert {a["subcategory"] for a in job["result"]["assignments"]} == {"מעדניות"}
+    assert set(routes.sessions[sid]["קטגוריה_משנה"]) == {"מעדניות"}
+    assert len(fake.batches) == 1
+
+
+def test_errored_batch_request_leaves_merchants_unresolved(monkeypatch):
+    def responder(params):
+        raise RuntimeError("overloaded")
+
+    with FakeAnthropic(responder) as fake:
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", fake.url)
+        out = ai_categorizer.audit_merchants(
+            [{"merchant": "עסק עלום", "current": "שונות", "count": 1, "total": 10.0}], via_batch=True)
+    assert out == []
+    assert ("עסק עלום", "שונות") not in ai_categorizer._AUDIT_CACHE
+    assert ai_metrics.snapshot()["totals"]["errors"] == 1
+
+
+def test_unknown_mode_rejected():
+    sid = _restore([{"id": 1, "תאריך": "2026-06-05", "תיאור": "x", "קטגוריה": "קניות", "סכום": -1.0}])
+    resp = client.post("/api/ai-audit", json={"session_id": sid, "mode": "overnight"})
+    assert resp.status_code == 400
@@ -0,0 +1,109 @@
+"""Cached AI resolutions applied inline by /restore-session.
+
+Restore never calls the AI, but merchants it already resolved — in the
+per-process cache or the durable AI_CACHE_FILE — are a dict lookup away.
+These tests pin:
+  - warm-cache hits are applied on restore and returned in ai_categorized
+  - cached misses ('שונות') and rows pinned by this restore are left alone;
+    a snapshot's stale _locked flag doesn't count as a pin
+  - resolutions survive a restart through AI_CACHE_FILE; misses are not
+    written there
+"""
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.api import routes  # noqa: E402
+from app.services import ai_cache, ai_categorizer, local_classifier  # noqa: E402
+from app.services.data_processor import txn_fingerprint  # noqa: E402
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state(monkeypatch):
+    monkeypatch.setattr(ai_categorizer, "_CACHE", {})
+    monkeypatch.setattr(ai_categorizer, "_EVIDENCE", {})
+    monkeypatch.setattr(ai_categorizer, "_BATCH_SIZERS", {})
+    monkeypatch.delenv("AI_CACHE_FILE", raising=False)
+    monkeypatch.setenv("AI_LOCAL_CLASSIFIER", "0")
+    local_classifier.reset()
+    ai_cache.reset()
+    yield
+    ai_cache.reset()
+    local_classifier.reset()
+
+
+def _restore(rows, overrides=None):
+    body = {"transactions": rows}
+    if overrides:
+        body["transaction_overrides"] = overrides
+    resp = client.post("/api/restore-session", json=body)
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def _category(sid, desc):
+    df = routes.sessions[sid]
+    return df.loc[df["תיאור"] == desc, "קטגוריה"].tolist()
+
+
+def test_restore_applies_warm_cache_hits():
+    ai_categorizer._CACHE.update({"עסק אלף": "בילויים", "עסק בית": "שונות"})
+    body = _restore([
+        {"id": 1, "תאריך": "2026-06-05", "תיאור": "עסק אלף (תשלום 2/3)", "קטגוריה": "שונות", "סכום": -120.0},
+        {"id": 2, "תאריך": "2026-06-06", "תיאור": "עסק בית", "קטגוריה": "שונות", "סכום": -40.0},
+    ])
+    sid = body["session_id"]
+    assert _category(sid, "עסק אלף (תשלום 2/3)") == ["בילויים"]
+    assert _category(sid, "עסק בית") == ["שונות"]
+    assert body["ai_categorized"] == [{"merchant": "עסק אלף (תשלום 2/3)", "category": "בילויים"}]
+
+
+def test_restore_cache_follows_this_restores_pins():
+    ai_categorizer._CACHE.update({"עסק אלף": "בילויים", "עסק בית": "בילויים"})
+    pinned = txn_fingerprint("2026-06-06", -40.0, "עסק בית")
+    body = _restore([
+        # Locked in an old snapshot, but no longer pinned.
+        {"id": 1, "תאריך": "2026-06-05", "תיאור": "עסק אלף", "קטגוריה": "שונות", "סכום": -120.0,
+         "_locked": True},
+        {"id": 2, "תאריך": "2026-06-06", "תיאור": "עסק בית", "קטגוריה": "שונות", "סכום": -40.0},
+    ], overrides=[{"txn_key": pinned, "category": "שונות"}])
+    sid = body["session_id"]
+    assert _category(sid, "עסק אלף") == ["בילויים"]
+    assert _category(sid, "עסק בית") == ["שונות"]
+    assert body["ai_categorized"] == [{"merchant": "עסק אלף", "category": "בילויים"}]
+    assert routes.sessions[sid]["_locked"].tolist() == [False, True]
+
+
+def test_resolutions_survive_restart_via_cache_file(monkeypatch, tmp_path):
+    cache_file = tmp_path / "ai-cache.json"
+    monkeypatch.setenv("AI_CACHE_FILE", str(cache_file))
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+
+    def create(**kwargs):
+        answers = [{"index": 0, "category": "בילויים"}, {"index": 1, "unknown": True}]
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=json.dumps(answers))])
+
+    fake = SimpleNamespace(messages=SimpleNamespace(create=create))
+    monkeypatch.setattr(ai_categorizer, "_get_client", lambda: fake)
+    monkeypatch.setenv("AI_WEB_SEARCH", "0")
+    assert ai_categorizer.categorize_transactions(["עסק אלף", "עסק בית"]) == {0: "בילויים"}
+    assert json.loads(cache_file.read_text(encoding="utf-8")) == {"עסק אלף": "בילויים"}
+
+    # A restarted backend: empty process cache, no AI at all.
+    monkeypatch.setattr(ai_categorizer, "_CACHE", {})
+    monkeypatch.setattr(ai_categorizer, "_get_client", lambda: None)
+    ai_cache.reset()
+    body = _restore([
+        {"id": 1, "תאריך": "2026-06-05", "תיאור": "עסק אלף", "קטגוריה": "שונות", "סכום": -120.0},
+    ])
+    assert _category(body["session_id"], "עסק אלף") == ["בילויים"]
+    assert body["ai_categorized"] == [{"merchant": "עסק אלף", "category": "בילויים"}]
@@ -6,6 +6,8 @@ The Anthropic client is faked — these tests pin the orchestration contract:
   - phase 2 answers are discarded when the model didn't actually search
   - installment suffixes are stripped so all installments resolve together
   - resolutions are cached per base merchant
+  - what a search found is reused by later phases instead of searching again
+  - tiers: low-confidence answers escalate (no-search → search → larger model)
 """
 import json
 
@@ -55,7 +57,12 @@ def _fresh_state(monkeypatch):
     monkeypatch.setattr(ai_categorizer, "_CACHE", {})
     monkeypatch.setattr(ai_categorizer, "_SUBCAT_CACHE", {})
     monkeypatch.setattr(ai_categorizer, "_AUDIT_CACHE", {})
+    monkeypatch.setattr(ai_categorizer, "_BATCH_SIZERS", {})
+    monkeypatch.setattr(ai_categorizer, "_EVIDENCE", {})
+    monkeypatch.setattr(ai_categorizer, "_sleep", lambda s: None)
     monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("AI_LOCAL_CLASSIFIER", "0")
+    monkeypatch.delenv("AI_ESCALATION_MODEL", raising=False)
 
 
 def _install(monkeypatch, handler):
@@ -264,3 +271,167 @@ def test_phase2_api_error_keeps_merchant_uncategorized(monkeypatch):
     # No searchless-guess fallback: the merchant stays שונות
     assert categorize_transactions(["עסק לא ידוע"]) == {}
     assert ai_categorizer._CACHE["עסק לא ידוע"] == "שונות"
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_rate_limit_is_retried_with_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(ai_categorizer, "_sleep", sleeps.append)
+    attempts = {"n": 0}
+
+    def handler(kwargs):
+        attempts["n"] += 1
+        if attempts["n"] <= 2:
+            raise _StatusError(429 if attempts["n"] == 1 else 529)
+        return _text_response([{"index": 0, "category": "אוכל"}])
+
+    _install(monkeypatch, handler)
+    assert categorize_transactions(["שופרסל אקספרס"]) == {0: "אוכל"}
+    assert attempts["n"] == 3
+    assert len(sleeps) == 2 and sleeps[1] > 0
+
+
+def test_truncated_search_batch_keeps_complete_answers(monkeypatch):
+    monkeypatch.setenv("AI_SEARCH_BATCH", "4")
+    names = ["עסק א", "עסק ב", "עסק ג", "עסק ד"]
+    batches = []
+
+    def handler(kwargs):
+        if "tools" not in kwargs:
+            return _text_response([{"index": i, "unknown": True} for i in range(4)])
+        lines = [ln for ln in kwargs["messages"][0]["content"].splitlines() if ln[:1].isdigit()]
+        batches.append([ln.split('. ', 1)[1] for ln in lines])
+        response = _text_response(
+            [{"index": i, "category": "קניות"} for i in range(len(lines))], searched=True)
+        if len(lines) > 2:
+            # max_tokens cuts the answer off inside the third element.
+            text = response.content[-1].text
+            response.content[-1].text = text[:text.index('{"index": 2') + 12]
+            response.stop_reason = "max_tokens"
+        return response
+
+    _install(monkeypatch, handler)
+    result = categorize_transactions(names)
+    assert result == {0: "קניות", 1: "קניות", 2: "קניות", 3: "קניות"}
+    # The two complete answers are kept; only the cut-off rest is retried.
+    assert batches == [names, ["עסק ג", "עסק ד"]]
+
+
+def test_batch_sizer_grows_on_clean_batches_and_halves_on_trouble():
+    sizer = ai_categorizer._BatchSizer(initial=4, ceiling=6, target_seconds=10)
+    for _ in range(6):
+        sizer.observe(True, 1.0)
+    assert sizer.next_size() == 6           # +1 per two clean batches, capped
+    sizer.observe(False, 1.0)
+    assert sizer.next_size() == 3           # error / truncation → halve
+    sizer.observe(True, 30.0)
+    assert sizer.next_size() == 1           # too slow → halve
+
+
+def test_search_evidence_is_reused_instead_of_searching_again(monkeypatch):
+    # Categorize phase 2 searches the merchant once; subcategorization and the
+    # audit then get that evidence in the prompt and make no search call.
+    def handler(kwargs):
+        if kwargs["system"][0]["text"] == ai_categorizer.PHASE1_SYSTEM:
+            return _text_response([{"index": 0, "unknown": True}])
+        if kwargs["system"][0]["text"] == ai_categorizer.PHASE2_SYSTEM:
+            return _text_response([{"index": 0, "category": "חוגים וספורט",
+                                    "evidence": "סטודיו ליוגה ופילאטיס ברמת גן"}], searched=True)
+        assert "tools" not in kwargs
+        assert "סטודיו ליוגה ופילאטיס ברמת גן" in kwargs["messages"][0]["content"]
+        if kwargs["system"][0]["text"] == ai_categorizer.AUDIT_SYSTEM:
+            return _text_response([{"index": 0, "category": "חוגים וספורט", "confidence": 0.9,
+                                    "reason": "לפי החיפוש הקודם"}])
+        return _text_response([{"index": 0, "subcategory": "סטודיו"}])
+
+    client = _install(monkeypatch, handler)
+    assert categorize_transactions(["אומנגה סטודיו (תשלום 2/3)"]) == {0: "חוגים וספורט"}
+    assert len(client.messages.calls) == 2
+
+    out = ai_categorizer.suggest_subcategories(
+        "חוגים וספורט", [{"merchant": "אומנגה סטודיו", "count": 3, "total": 900.0}], [])
+    assert out == [{"index": 0, "subcategory": "סטודיו"}]
+    verdicts = ai_categorizer.audit_merchants(
+        [{"merchant": "אומנגה סטודיו", "current": "חוגים וספורט", "count": 3, "total": 900.0}])
+    assert [v["category"] for v in verdicts] == ["חוגים וספורט"]
+    assert len(client.messages.calls) == 4
+
+
+def test_evidence_merchant_left_unknown_is_searched_again(monkeypatch):
+    # Evidence is a hint to phase 1; a merchant it still can't place goes to
+    # the search phase rather than silently staying unassigned.
+    ai_categorizer._EVIDENCE[ai_categorizer._evidence_key("עסק עלום")] = "אין מידע ברור על העסק"
+
+    def handler(kwargs):
+        if "tools" not in kwargs:
+            return _text_response([{"index": 0, "unknown": True}])
+        if kwargs["system"][0]["text"] == ai_categorizer.PHASE2_SYSTEM:
+            return _text_response([{"index": 0, "category": "קניות"}], searched=True)
+        return _text_response([{"index": 0, "subcategory": "חנויות"}], searched=True)
+
+    client = _install(monkeypatch, handler)
+    out = ai_categorizer.suggest_subcategories(
+        "קניות", [{"merchant": "עסק עלום", "count": 1, "total": 10.0}], [])
+    assert out == [{"index": 0, "subcategory": "חנויות"}]
+    assert categorize_transactions(["עסק עלום"]) == {0: "קניות"}
+    assert [("tools" in c) for c in client.messages.calls] == [False, True, False, True]
+
+
+def test_low_confidence_known_answer_escalates_to_search(monkeypatch):
+    def handler(kwargs):
+        if "tools" not in kwargs:
+            return _text_response([{"index": 0, "category": "אוכל", "confidence": 0.95},
+                                   {"index": 1, "category": "קניות", "confidence": 0.4}])
+        assert "בוטיק לילך" in kwargs["messages"][0]["content"]
+        assert "שופרסל" not in kwargs["messages"][0]["content"]
+        return _text_response([{"index": 0, "category": "קניות", "confidence": 0.9}], searched=True)
+
+    client = _install(monkeypatch, handler)
+    assert categorize_transactions(["שופרסל", "בוטיק לילך"]) == {0: "אוכל", 1: "קניות"}
+    assert len(client.messages.calls) == 2
+
+
+def test_uncertain_search_answers_escalate_to_larger_model(monkeypatch):
+    monkeypatch.setenv("AI_ESCALATION_MODEL", "claude-sonnet-4-5")
+
+    def handler(kwargs):
+        if "tools" not in kwargs:
+            return _text_response([{"index": i, "unknown": True} for i in range(3)])
+        if kwargs["model"] != "claude-sonnet-4-5":
+            return _text_response([
+                {"index": 0, "category": "טיפוח", "confidence": 0.9},
+                {"index": 1, "category": "קניות", "confidence": 0.3},
+                {"index": 2, "category": "בילויים", "confidence": 0.2},
+            ], searched=True)
+        content = kwargs["messages"][0]["content"]
+        assert "סלון דנה" not in content and "עסק ב" in content and "עסק ג" in content
+        # The larger model settles one; the other keeps the tentative answer.
+        return _text_response([{"index": 0, "category": "אירועים ומתנות"}], searched=True)
+
+    client = _install(monkeypatch, handler)
+    result = categorize_transactions(["סלון דנה", "עסק ב", "עסק ג"])
+    assert result == {0: "טיפוח", 1: "אירועים ומתנות", 2: "בילויים"}
+    assert [c["model"] for c in client.messages.calls][-1] == "claude-sonnet-4-5"
+    assert len(client.messages.calls) == 3
+
+
+def test_uncertain_audit_verdict_escalates(monkeypatch):
+    monkeypatch.setenv("AI_ESCALATION_MODEL", "claude-sonnet-4-5")
+
+    def handler(kwargs):
+        if kwargs["model"] == "claude-sonnet-4-5":
+            return _text_response([{"index": 0, "category": "טיפוח", "confidence": 0.85,
+                                    "reason": "מכון יופי"}], searched=True)
+        return _text_response([{"index": 0, "category": "קניות", "confidence": 0.3,
+                                "reason": "לא ברור"}], searched=True)
+
+    _install(monkeypatch, handler)
+    out = ai_categorizer.audit_merchants(
+        [{"merchant": "ביוטי רום", "current": "קניות", "count": 2, "total": 300.0}])
+    assert out == [{"index": 0, "category": "טיפוח", "confidence": 0.85, "reason": "מכון יופי"}]
+    assert ai_categorizer._AUDIT_CACHE[("ביוטי רום", "קניות")]["category"] == "טיפוח"
@@ -0,0 +1,145 @@
+"""/ai-events — Server-Sent Events for AI progress and results.
+
+The AI calls are mocked; these tests pin the streaming contract:
+  - a fresh subscriber starts with the current progress snapshot
+  - a reconnect with Last-Event-ID replays exactly the missed events
+  - per-batch category and per-category subcategory assignments are pushed
+  - events published from a worker thread reach a live subscriber
+  - a session's channel goes with the session (or once idle), ending its streams
+"""
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.api import routes  # noqa: E402
+from app.services import ai_events  # noqa: E402
+
+client = TestClient(app)
+
+
+def _restore(rows):
+    resp = client.post("/api/restore-session", json={"transactions": rows})
+    assert resp.status_code == 200, resp.text
+    return resp.json()["session_id"]
+
+
+def _events(body: str) -> list[tuple[int, str, dict]]:
+    out = []
+    for block in body.split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in block.splitlines()
+            if line and not line.startswith(":") and ": " in line
+        )
+        if "event" in fields:
+            out.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return out
+
+
+def _read(sid, last_event_id=None):
+    headers = {"Last-Event-ID": str(last_event_id)} if last_event_id is not None else {}
+    resp = client.get("/api/ai-events", params={"sessionId": sid}, headers=headers)
+    assert resp.status_code == 200, resp.text
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    return _events(resp.text)
+
+
+ROWS = [
+    {"id": 1, "תאריך": "2026-06-05", "תיאור": "מעדניית הגליל", "קטגוריה": "אוכל", "סכום": -200.0},
+    {"id": 2, "תאריך": "2026-06-10", "תיאור": "עסק עלום", "קטגוריה": "שונות", "סכום": -90.0},
+]
+
+
+def test_pipeline_streams_progress_and_assignments(monkeypatch):
+    monkeypatch.setattr(ai_events, "MAX_STREAM_SECONDS", 0.2)
+    sid = _restore(ROWS)
+
+    def fake_categorize(descs, issuers=None, on_progress=None, on_resolved=None, **kwargs):
+        on_progress(1, 1)
+        on_resolved({"עסק עלום": "טכנולוגיה"})
+        return {0: "טכנולוגיה"}
+
+    def fake_suggest(category, items, existing, **kwargs):
+        return [{"index": i, "subcategory": f"תת {category}"} for i in range(len(items))]
+
+    monkeypatch.setattr(routes, "categorize_transactions", fake_categorize)
+    monkeypatch.setattr(routes, "suggest_subcategories", fake_suggest)
+    assert client.post("/api/ai-pipeline", json={"session_id": sid}).status_code == 200
+
+    # Fresh subscriber: only the snapshot of where the run ended.
+    fresh = _read(sid)
+    assert [(e, d["stage"]) for _, e, d in fresh] == [("progress", "done")]
+
+    # Reconnect from the start: the whole run, in order.
+    events = _read(sid, last_event_id=0)
+    ids = [i for i, _, _ in events]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    kinds = [e for _, e, _ in events]
+    assert kinds[0] == "progress" and events[-1][2]["stage"] == "done"
+    categorized = [d for _, e, d in events if e == "categorized"]
+    assert categorized == [{"assignments": [{"merchant": "עסק עלום", "category": "טכנולוגיה"}]}]
+    subcats = {d["category"]: d["assignments"] for _, e, d in events if e == "subcategorized"}
+    assert set(subcats) == {"אוכל", "טכנולוגיה"}
+    assert subcats["טכנולוגיה"][0]["subcategory"] == "תת טכנולוגיה"
+
+    # Resuming mid-stream replays only what came after.
+    tail = _read(sid, last_event_id=ids[-2])
+    assert [i for i, _, _ in tail] == [ids[-1]]
+
+
+def test_live_subscriber_receives_thread_published_events(monkeypatch):
+    monkeypatch.setattr(ai_events, "MAX_STREAM_SECONDS", 2)
+
+    async def consume():
+        chunks = []
+        gen = ai_events.stream("live-session", snapshot={"stage": "idle"})
+        async for chunk in gen:
+            chunks.append(chunk)
+            if chunk.startswith("id:") and "progress" in chunk and len(chunks) == 2:
+                # Subscribed — now publish from another thread.
+                threading.Thread(target=ai_events.publish, args=(
+                    "live-session", "categorized", {"assignments": []})).start()
+            if "event: categorized" in chunk:
+                await gen.aclose()
+                break
+        return chunks
+
+    chunks = asyncio.run(consume())
+    assert chunks[0].startswith("retry:")
+    assert "event: progress" in chunks[1]
+    assert "event: categorized" in chunks[-1]
+
+
+def test_channels_go_with_their_session(monkeypatch):
+    sid = _restore(ROWS)
+    ai_events.publish(sid, "progress", {"stage": "done"})
+    assert sid in ai_events._CHANNELS
+    client.delete("/api/session", params={"sessionId": sid})
+    assert sid not in ai_events._CHANNELS
+
+    # A late event for a gone session leaves a channel that is swept once idle.
+    ai_events.publish(sid, "progress", {"stage": "done"})
+    monkeypatch.setattr(ai_events, "IDLE_SECONDS", 0)
+    monkeypatch.setattr(ai_events, "_last_sweep", 0)
+    ai_events.publish("other-session", "progress", {"stage": "idle"})
+    assert sid not in ai_events._CHANNELS
+
+
+def test_dropped_channel_ends_its_streams(monkeypatch):
+    monkeypatch.setattr(ai_events, "MAX_STREAM_SECONDS", 5)
+
+    async def consume():
+        chunks = []
+        async for chunk in ai_events.stream("dropped-session", snapshot={"stage": "idle"}):
+            chunks.append(chunk)
+            if len(chunks) == 2:
+                threading.Thread(target=ai_events.drop, args=("dropped-session",)).start()
+        return chunks
+
+    chunks = asyncio.run(asyncio.wait_for(consume(), 3))
+    assert len(chunks) == 2
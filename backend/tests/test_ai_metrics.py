@@ -0,0 +1,160 @@
+"""Per-call Claude instrumentation and GET /internal/metrics.
+
+The Anthropic client is faked (with a `usage` block like the real SDK's);
+these tests pin what one categorize run records:
+  - a record per call with phase, model, batch size, tokens, searches, cost
+  - answers discarded for not searching are counted on the call and phase
+  - result-cache hits/misses and per-session attribution, sessions named
+    by a hash of their id
+  - the endpoint is off unless INTERNAL_METRICS_TOKEN is set, and needs it
+  - searches saved by reusing earlier search evidence
+  - prompt caching: a stable, cache-marked prefix and cached vs uncached tokens
+"""
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import ai_categorizer, ai_metrics  # noqa: E402
+from app.services.ai_categorizer import categorize_transactions  # noqa: E402
+
+client = TestClient(app)
+
+
+def _response(payload, searched=False, input_tokens=1200, output_tokens=80):
+    blocks = []
+    if searched:
+        blocks += [SimpleNamespace(type="server_tool_use"), SimpleNamespace(type="web_search_tool_result")]
+    blocks.append(SimpleNamespace(type="text", text=json.dumps(payload, ensure_ascii=False)))
+    usage = SimpleNamespace(
+        input_tokens=input_tokens, output_tokens=output_tokens,
+        server_tool_use=SimpleNamespace(web_search_requests=2 if searched else 0),
+    )
+    return SimpleNamespace(content=blocks, usage=usage)
+
+
+class _FakeClient:
+    def __init__(self, handler):
+        self.messages = SimpleNamespace(create=lambda **kw: handler(kw))
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state(monkeypatch):
+    monkeypatch.setattr(ai_categorizer, "_CACHE", {})
+    monkeypatch.setattr(ai_categorizer, "_BATCH_SIZERS", {})
+    monkeypatch.setattr(ai_categorizer, "_EVIDENCE", {})
+    monkeypatch.setattr(ai_categorizer, "_sleep", lambda s: None)
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("AI_LOCAL_CLASSIFIER", "0")
+    monkeypatch.setenv("AI_MODEL", "claude-haiku-4-5-20251001")
+    ai_metrics.reset()
+    yield
+    ai_metrics.reset()
+
+
+def test_categorize_run_is_recorded_per_call(monkeypatch):
+    def handler(kwargs):
+        if "tools" not in kwargs:
+            return _response([{"index": 0, "category": "אוכל"}, {"index": 1, "unknown": True},
+                              {"index": 2, "unknown": True}])
+        # Phase 2 answers without searching → discarded.
+        return _response([{"index": 0, "category": "אופנה"}], searched=False, input_tokens=300)
+
+    monkeypatch.setattr(ai_categorizer, "_get_client", lambda: _FakeClient(handler))
+    monkeypatch.setenv("AI_SEARCH_BATCH", "5")
+    with ai_metrics.session_scope("s-1"):
+        categorize_transactions(["שופרסל", "בוטיק א", "בוטיק ב"])
+        categorize_transactions(["שופרסל"])  # served from the result cache
+
+    snap = ai_metrics.snapshot()
+    # The unsearched batch of two is split and each half retried once.
+    known, search, *retried = snap["recent"]
+    assert (known["phase"], known["batch_size"], known["input_tokens"]) == ("categorize_known", 3, 1200)
+    assert (search["phase"], search["batch_size"], search["discarded"]) == ("categorize_search", 2, 2)
+    assert [r["batch_size"] for r in retried] == [1, 1]
+    assert known["session"] == search["session"] == ai_metrics.session_ref("s-1") != "s-1"
+    # haiku 4.5: $1/M in, $5/M out
+    assert known["cost_usd"] == pytest.approx((1200 * 1 + 80 * 5) / 1e6)
+
+    assert snap["totals"]["calls"] == 4
+    assert snap["totals"]["input_tokens"] == 1200 + 3 * 300
+    assert snap["phases"]["categorize_search"]["discarded"] == 4
+    assert snap["phases"]["categorize_known"]["latency_ms"]["count"] == 1
+    assert snap["cache"]["categorize"] == {"hits": 1, "misses": 3}
+    assert snap["sessions"][ai_metrics.session_ref("s-1")]["calls"] == 4
+    assert "s-1" not in json.dumps(snap)
+
+
+def test_failed_call_counts_as_error(monkeypatch):
+    def handler(kwargs):
+        raise RuntimeError("overloaded")
+
+    monkeypatch.setattr(ai_categorizer, "_get_client", lambda: _FakeClient(handler))
+    monkeypatch.setenv("AI_WEB_SEARCH", "0")
+    categorize_transactions(["עסק כלשהו"])
+    snap = ai_metrics.snapshot()
+    assert snap["totals"]["errors"] == 1
+    assert snap["recent"][0]["error"] == "RuntimeError"
+
+
+def test_metrics_endpoint_exposes_snapshot(monkeypatch):
+    ai_metrics.Call("audit", "claude-haiku-4-5-20251001", 5).finish(
+        _response([], searched=True, input_tokens=5000, output_tokens=400))
+    assert client.get("/api/internal/metrics").status_code == 404   # off unless configured
+    monkeypatch.setenv("INTERNAL_METRICS_TOKEN", "ops-secret")
+    assert client.get("/api/internal/metrics").status_code == 403
+    assert client.get("/api/internal/metrics", headers={"X-Metrics-Token": "guess"}).status_code == 403
+    resp = client.get("/api/internal/metrics", params={"recent": 0}, headers={"X-Metrics-Token": "ops-secret"})
+    assert resp.status_code == 200, resp.text
+    ai = resp.json()["ai"]
+    assert ai["recent"] == []
+    audit = ai["phases"]["audit"]
+    assert audit["web_searches"] == 2
+    assert audit["input_tokens_hist"]["buckets"]["le_8000"] == 1
+    assert ai["models"]["claude-haiku-4-5-20251001"]["calls"] == 1
+
+
+def test_searches_saved_by_evidence_are_reported(monkeypatch):
+    ai_categorizer._EVIDENCE[ai_categorizer._evidence_key("בוטיק א")] = "חנות בגדי נשים בחיפה"
+
+    def handler(kwargs):
+        return _response([{"index": 0, "category": "קניות", "confidence": 0.8, "reason": "חנות בגדים"}])
+
+    monkeypatch.setattr(ai_categorizer, "_get_client", lambda: _FakeClient(handler))
+    ai_categorizer.audit_merchants([{"merchant": "בוטיק א", "current": "קניות", "count": 1, "total": 99.0}])
+    snap = ai_metrics.snapshot()
+    assert snap["evidence"] == {"searches_saved": 1, "by_kind": {"audit": 1}}
+    assert snap["phases"]["audit_evidence"]["web_searches"] == 0
+    assert "audit" not in snap["phases"]
+
+
+def test_prompt_prefix_is_stable_and_cache_reads_are_reported(monkeypatch):
+    seen = []
+
+    def handler(kwargs):
+        if "tools" not in kwargs:
+            return _response([{"index": i, "unknown": True} for i in range(3)])
+        seen.append((kwargs["system"], kwargs["tools"]))
+        first = len(seen) == 1
+        resp = _response([{"index": 0, "category": "קניות"}], searched=True, input_tokens=400)
+        resp.usage.cache_creation_input_tokens = 1500 if first else 0
+        resp.usage.cache_read_input_tokens = 0 if first else 1500
+        return resp
+
+    monkeypatch.setattr(ai_categorizer, "_get_client", lambda: _FakeClient(handler))
+    monkeypatch.setenv("AI_SEARCH_BATCH", "2")
+    categorize_transactions(["בוטיק א", "בוטיק ב", "בוטיק ג"])
+
+    # Batches of 2 and 1 share the exact same system blocks and tools.
+    assert len(seen) == 2 and seen[0] == seen[1]
+    system, _ = seen[0]
+    assert system[0]["cache_control"] == {"type": "ephemeral"}
+    search = ai_metrics.snapshot()["phases"]["categorize_search"]
+    assert (search["cache_write_tokens"], search["cache_read_tokens"]) == (1500, 1500)
+    assert search["cached_input_ratio"] == round(1500 / (800 + 3000), 4)
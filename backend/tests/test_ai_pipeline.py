@@ -0,0 +1,190 @@
+"""/ai-pipeline — categorize and subcategorize as one pipelined run.
+
+Both AI calls are mocked; these tests pin the orchestration contract:
+  - categories that already have unsubcategorized rows are subcategorized
+    without waiting for the categorizer
+  - every categorize batch lands in the live session as it resolves, and the
+    categories it touched are then subcategorized
+  - the response carries both the category and the subcategory assignments,
+    the categories only for rows the run actually moved
+  - a session replaced during the run keeps its new frame
+  - /ai-categorize likewise: a merchant edited after its answer landed keeps
+    the edit and is not reported for rule persistence
+"""
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.api import routes  # noqa: E402
+
+client = TestClient(app)
+
+
+def _restore(rows):
+    resp = client.post("/api/restore-session", json={"transactions": rows})
+    assert resp.status_code == 200, resp.text
+    return resp.json()["session_id"]
+
+
+ROWS = [
+    {"id": 1, "תאריך": "2026-06-05", "תיאור": "מעדניית הגליל", "קטגוריה": "אוכל", "סכום": -200.0},
+    {"id": 2, "תאריך": "2026-06-09", "תיאור": "ברוזה תל אביב", "קטגוריה": "בילויים", "סכום": -300.0},
+    {"id": 3, "תאריך": "2026-06-10", "תיאור": "עסק עלום", "קטגוריה": "שונות", "סכום": -90.0},
+    {"id": 4, "תאריך": "2026-06-11", "תיאור": "עסק עלום", "קטגוריה": "שונות", "סכום": -10.0},
+]
+
+
+def test_pipeline_subcategorizes_while_categorizing(monkeypatch):
+    sid = _restore(ROWS)
+    food_started = threading.Event()
+    calls = []
+
+    def fake_categorize(descs, issuers=None, on_progress=None, on_resolved=None, **kwargs):
+        # The already-final category is subcategorized without waiting for us.
+        assert food_started.wait(5)
+        on_resolved({"עסק עלום": "טכנולוגיה"})
+        # Published to the live session before the run returns.
+        df = routes.sessions[sid]
+        assert set(df.loc[df["id"].isin([3, 4]), "קטגוריה"]) == {"טכנולוגיה"}
+        return {i: "טכנולוגיה" for i, d in enumerate(descs)}
+
+    def fake_suggest(category, items, existing, **kwargs):
+        calls.append((category, [it["merchant"] for it in items]))
+        if category == "אוכל":
+            food_started.set()
+        return [{"index": i, "subcategory": f"תת {category}"} for i in range(len(items))]
+
+    monkeypatch.setattr(routes, "categorize_transactions", fake_categorize)
+    monkeypatch.setattr(routes, "suggest_subcategories", fake_suggest)
+    resp = client.post("/api/ai-pipeline", json={"session_id": sid})
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+
+    assert {c for c, _ in calls} == {"אוכל", "בילויים", "טכנולוגיה"}
+    assert ("טכנולוגיה", ["עסק עלום"]) in calls
+    assert data["ai_categorized"] == [
+        {"merchant": "עסק עלום", "category": "טכנולוגיה"},
+        {"merchant": "עסק עלום", "category": "טכנולוגיה"},
+    ]
+    by_merchant = {a["merchant"]: a for a in data["assignments"]}
+    assert by_merchant["עסק עלום"]["subcategory"] == "תת טכנולוגיה"
+    assert by_merchant["עסק עלום"]["count"] == 2
+
+    txns = client.get("/api/transactions", params={"sessionId": sid, "page_size": 100}).json()["transactions"]
+    by_id = {t["id"]: t for t in txns}
+    assert by_id[1]["קטגוריה_משנה"] == "תת אוכל"
+    assert by_id[2]["קטגוריה_משנה"] == "תת בילויים"
+    assert by_id[3]["קטגוריה_משנה"] == "תת טכנולוגיה"
+    assert routes.AI_PROGRESS[sid]["stage"] == "done"
+
+
+def test_pipeline_category_landing_mid_run_is_requeued(monkeypatch):
+    # A merchant lands in a category whose subcategory run is in flight: the
+    # category runs again afterwards (never twice at once).
+    sid = _restore(ROWS[:1] + ROWS[2:])
+    in_flight = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fake_categorize(descs, issuers=None, on_progress=None, on_resolved=None, **kwargs):
+        assert in_flight.wait(5)
+        on_resolved({"עסק עלום": "אוכל"})
+        release.set()
+        return {i: "אוכל" for i in range(len(descs))}
+
+    def fake_suggest(category, items, existing, **kwargs):
+        calls.append([it["merchant"] for it in items])
+        if len(calls) == 1:
+            in_flight.set()
+            assert release.wait(5)
+        return [{"index": i, "subcategory": "מעדניות"} for i in range(len(items))]
+
+    monkeypatch.setattr(routes, "categorize_transactions", fake_categorize)
+    monkeypatch.setattr(routes, "suggest_subcategories", fake_suggest)
+    resp = client.post("/api/ai-pipeline", json={"session_id": sid})
+    assert resp.status_code == 200, resp.text
+    assert calls == [["מעדניית הגליל"], ["עסק עלום"]]
+    assert {a["merchant"] for a in resp.json()["assignments"]} == {"מעדניית הגליל", "עסק עלום"}
+
+
+def test_pipeline_reports_only_applied_rows_and_keeps_replaced_session(monkeypatch):
+    sid = _restore(ROWS)
+
+    def fake_categorize(descs, issuers=None, on_progress=None, on_resolved=None, **kwargs):
+        df = routes.sessions[sid]
+        df.loc[df["id"] == 4, "קטגוריה"] = "אוכל"   # edited by the user mid-run
+        on_resolved({"עסק עלום": "טכנולוגיה"})
+        return {i: "טכנולוגיה" for i, d in enumerate(descs)}
+
+    monkeypatch.setattr(routes, "categorize_transactions", fake_categorize)
+    monkeypatch.setattr(routes, "suggest_subcategories", lambda *a, **kw: [])
+    data = client.post("/api/ai-pipeline", json={"session_id": sid}).json()
+    assert data["ai_categorized"] == [{"merchant": "עסק עלום", "category": "טכנולוגיה"}]
+
+    # A restore replacing the session mid-run is not overwritten by the run.
+    sid = _restore(ROWS)
+
+    replacement = routes.sessions[sid].copy()
+
+    def replacing_categorize(descs, issuers=None, on_progress=None, on_resolved=None, **kwargs):
+        routes.sessions[sid] = replacement
+        on_resolved({"עסק עלום": "טכנולוגיה"})
+        return {}
+
+    monkeypatch.setattr(routes, "categorize_transactions", replacing_categorize)
+    data = client.post("/api/ai-pipeline", json={"session_id": sid}).json()
+    assert data["ai_categorized"] == []
+    assert routes.sessions[sid] is replacement
+    assert not (replacement["קטגוריה"] == "טכנולוגיה").any()
+
+
+def test_pipeline_applies_but_does_not_report_local_guesses(monkeypatch):
+    sid = _restore(ROWS)
+
+    def fake_categorize(descs, issuers=None, on_progress=None, on_resolved=None, local=None, **kwargs):
+        local.add("עסק עלום")   # answered by the local classifier
+        on_resolved({"עסק עלום": "טכנולוגיה"})
+        return {i: "טכנולוגיה" for i, d in enumerate(descs)}
+
+    monkeypatch.setattr(routes, "categorize_transactions", fake_categorize)
+    monkeypatch.setattr(routes, "suggest_subcategories", lambda *a, **kw: [])
+    data = client.post("/api/ai-pipeline", json={"session_id": sid}).json()
+    assert data["ai_categorized"] == []
+    df = routes.sessions[sid]
+    assert (df["קטגוריה"] == "טכנולוגיה").sum() == 2
+
+
+def test_categorize_keeps_edits_made_mid_run(monkeypatch):
+    sid = _restore(ROWS)
+
+    def fake_categorize(descs, issuers=None, on_progress=None, on_resolved=None, **kwargs):
+        on_resolved({"עסק עלום": "קניות"})
+        asyncio.run(routes.update_merchant_category(routes.UpdateMerchantCategoryRequest(
+            session_id=sid, merchant="עסק עלום", category="בילויים")))
+        return {i: "קניות" for i, d in enumerate(descs)}
+
+    monkeypatch.setattr(routes, "categorize_transactions", fake_categorize)
+    data = client.post("/api/ai-categorize", json={"session_id": sid}).json()
+    assert data["ai_categorized"] == []
+    df = routes.sessions[sid]
+    assert df.loc[df["תיאור"] == "עסק עלום", "קטגוריה"].tolist() == ["בילויים", "בילויים"]
+
+    # A session replaced mid-run gets none of the run's answers.
+    sid = _restore(ROWS)
+    replacement = routes.sessions[sid].copy()
+
+    def replacing_categorize(descs, issuers=None, on_progress=None, on_resolved=None, **kwargs):
+        routes.sessions[sid] = replacement
+        on_resolved({"עסק עלום": "קניות"})
+        return {i: "קניות" for i, d in enumerate(descs)}
+
+    monkeypatch.setattr(routes, "categorize_transactions", replacing_categorize)
+    data = client.post("/api/ai-categorize", json={"session_id": sid}).json()
+    assert data == {"success": False, "ai_categorized": []}
+    assert routes.sessions[sid] is replacement
+    assert not (replacement["קטגוריה"] == "קניות").any()
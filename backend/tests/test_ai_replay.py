@@ -0,0 +1,43 @@
+"""The offline AI benchmark (scripts/bench_ai_pipeline.py) end to end.
+
+Recorded answers are replayed by the fake Anthropic server with 529s and
+truncated answers injected; the real routes run against it. Pins:
+  - every merchant still lands on its recorded category despite the faults
+  - the warm pass over the same data makes no API calls at all
+  - concurrent sessions really overlap at the API
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services import ai_categorizer, ai_metrics, local_classifier  # noqa: E402
+from scripts import bench_ai_pipeline  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state(monkeypatch):
+    for cache in ("_CACHE", "_AUDIT_CACHE", "_SUBCAT_CACHE", "_EVIDENCE", "_BATCH_SIZERS"):
+        monkeypatch.setattr(ai_categorizer, cache, {})
+    monkeypatch.setattr(ai_categorizer, "_sleep", lambda s: None)
+    monkeypatch.setenv("AI_LOCAL_CLASSIFIER", "0")
+    local_classifier.reset()
+    yield
+    ai_metrics.reset()
+    local_classifier.reset()
+
+
+def test_replayed_pipeline_survives_faults_and_warms_up():
+    fixture = json.loads(bench_ai_pipeline.DEFAULT_FIXTURE.read_text(encoding="utf-8"))
+    report = bench_ai_pipeline.run(fixture, sessions=2, scale=1, latency_scale=0.002,
+                                   error_rate=0.1, truncate_rate=0.2, seed=3)
+
+    assert report["faults"]["errors"] and report["faults"]["truncated"]
+    cold, warm = report["passes"]["cold"], report["passes"]["warm"]
+    assert cold["ai-categorize"]["accuracy"] == 1.0
+    assert max(stage["peak_concurrency"] for stage in cold.values()) >= 2
+    assert all(stage["calls"] == 0 for stage in warm.values())
+    assert warm["ai-categorize"]["accuracy"] == 1.0
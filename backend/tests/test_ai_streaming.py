@@ -0,0 +1,214 @@
+"""Streamed AI answers: each merchant's answer is applied the moment its JSON
+array element is complete.
+
+The real anthropic SDK streams from scripts/fake_anthropic.py. These tests pin:
+  - the incremental parser yields complete objects only, skips prose and
+    [bracketed] asides, and knows when the array is closed
+  - calls are streamed, and on_resolved fires once per merchant, in answer
+    order, before the call returns
+  - a truncated answer keeps every element that completed; only the rest is
+    asked again
+  - a search past the batch's budget (stated in the user message) cuts the
+    stream; the rest is retried in smaller batches with smaller budgets
+  - a stream that fails mid-way is retried from a clean slate: nothing the
+    retry says is applied before it searches on its own
+  - AI_STREAM=0 falls back to plain messages.create
+"""
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace as NS
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services import ai_categorizer, ai_metrics, local_classifier  # noqa: E402
+from app.services.ai_categorizer import _ArrayItems, categorize_transactions  # noqa: E402
+from scripts.fake_anthropic import FakeAnthropic, message  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state(monkeypatch):
+    for cache in ("_CACHE", "_EVIDENCE", "_BATCH_SIZERS"):
+        monkeypatch.setattr(ai_categorizer, cache, {})
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("AI_MODEL", "claude-haiku-4-5-20251001")
+    monkeypatch.delenv("AI_ESCALATION_MODEL", raising=False)
+    monkeypatch.delenv("AI_STREAM", raising=False)
+    monkeypatch.setenv("AI_LOCAL_CLASSIFIER", "0")
+    local_classifier.reset()
+    ai_metrics.reset()
+    yield
+    ai_metrics.reset()
+    local_classifier.reset()
+
+
+def _lines(params):
+    return [ln.split('. ', 1)[1] for ln in params["messages"][0]["content"].splitlines() if ln[:1].isdigit()]
+
+
+def test_parser_yields_objects_as_they_complete():
+    parser = _ArrayItems()
+    assert parser.feed('Checked [see sources]. ```json\n[{"index": 0, "category": "אוכל"}') == [
+        {"index": 0, "category": "אוכל"}]
+    assert parser.feed(', {"index": 1, "reason": "a } in [text]"') == []
+    assert parser.feed('}]\n```') == [{"index": 1, "reason": "a } in [text]"}]
+    assert parser.closed
+    assert len(parser.items) == 2
+
+    empty = _ArrayItems()
+    empty.feed("[]")
+    assert empty.closed and empty.items == []
+
+
+def test_streamed_answers_resolve_one_by_one(monkeypatch):
+    names = ["עסק אלף", "עסק בית", "עסק גימל"]
+
+    def responder(params):
+        return message(json.dumps(
+            [{"index": i, "category": "אוכל"} for i in range(len(_lines(params)))],
+            ensure_ascii=False), input_tokens=400, output_tokens=60)
+
+    landed = []
+    with FakeAnthropic(responder) as fake:
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", fake.url)
+        result = categorize_transactions(names, on_resolved=landed.append)
+
+    assert result == {0: "אוכל", 1: "אוכל", 2: "אוכל"}
+    assert landed == [{name: "אוכל"} for name in names]
+    assert fake.requests[0]["stream"] is True
+    recent = ai_metrics.snapshot()["recent"][0]
+    assert (recent["input_tokens"], recent["output_tokens"]) == (400, 60)
+
+
+def test_truncated_stream_retries_only_unanswered(monkeypatch):
+    names = ["עסק א", "עסק ב", "עסק ג"]
+    asked = []
+
+    def responder(params):
+        lines = _lines(params)
+        asked.append(lines)
+        text = json.dumps([{"index": i, "category": "קניות"} for i in range(len(lines))], ensure_ascii=False)
+        if len(lines) == 3:
+            # max_tokens hit in the middle of the last element
+            return message(text[:text.index('{"index": 2') + 5], stop_reason="max_tokens")
+        return message(text)
+
+    with FakeAnthropic(responder) as fake:
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", fake.url)
+        result = categorize_transactions(names)
+
+    assert result == {0: "קניות", 1: "קניות", 2: "קניות"}
+    assert asked == [names, ["עסק ג"]]
+
+
+def _searching(text: str, searches: int) -> dict:
+    msg = message(text, searched=True)
+    blocks = []
+    for n in range(searches):
+        blocks += [
+            {"type": "server_tool_use", "id": f"srvtoolu_{n}", "name": "web_search", "input": {"query": "?"}},
+            {"type": "web_search_tool_result", "tool_use_id": f"srvtoolu_{n}", "content": []},
+        ]
+    msg["content"] = blocks + msg["content"][-1:]
+    msg["usage"]["server_tool_use"]["web_search_requests"] = searches
+    return msg
+
+
+def test_search_budget_is_per_batch_and_enforced(monkeypatch):
+    monkeypatch.setenv("AI_SEARCH_BATCH", "4")
+    monkeypatch.setenv("AI_WEB_SEARCH_MAX", "1")
+    names = ["עסק א", "עסק ב", "עסק ג", "עסק ד"]
+    searched = []
+
+    def responder(params):
+        lines = _lines(params)
+        answers = json.dumps([{"index": i, "category": "קניות"} for i in range(len(lines))], ensure_ascii=False)
+        if "tools" not in params:
+            return message(json.dumps([{"index": i, "unknown": True} for i in range(len(lines))]))
+        budget = int(params["messages"][0]["content"].rsplit("עד ", 1)[1].split()[0])
+        searched.append((lines, budget, params["tools"][0]["max_uses"]))
+        # The whole batch searches past its budget; halves stay within theirs.
+        return _searching(answers, len(lines) + 1 if len(lines) == 4 else len(lines))
+
+    with FakeAnthropic(responder) as fake:
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", fake.url)
+        result = categorize_transactions(names)
+
+    assert result == {i: "קניות" for i in range(4)}
+    assert [(lines, budget) for lines, budget, _ in searched] == [
+        (names, 4), (names[:2], 2), (names[2:], 2)]
+    # The tool definition itself (cached prefix) never changes.
+    assert len({max_uses for _, _, max_uses in searched}) == 1
+    calls = [r for r in ai_metrics.snapshot()["recent"] if r["phase"] == "categorize_search"]
+    assert [r["web_searches"] for r in calls][1:] == [2, 2]
+
+
+class _Overloaded(Exception):
+    status_code = 529
+
+
+class _ScriptedStream:
+    """messages.stream context whose events come from a script; an exception
+    in the script is raised where it stands, mid-stream."""
+
+    def __init__(self, script):
+        self.script = script
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        for step in self.script:
+            if isinstance(step, Exception):
+                raise step
+            if step in ("server_tool_use", "web_search_tool_result"):
+                yield NS(type="content_block_start", content_block=NS(type=step))
+            else:
+                yield NS(type="content_block_delta", delta=NS(type="text_delta", text=step))
+
+    def get_final_message(self):
+        blocks = [NS(type=s) for s in self.script if s in ("server_tool_use", "web_search_tool_result")]
+        text = "".join(s for s in self.script if s not in ("server_tool_use", "web_search_tool_result"))
+        return NS(content=blocks + [NS(type="text", text=text)], stop_reason="end_turn", usage=None)
+
+
+def test_stream_failing_mid_way_retries_from_a_clean_slate(monkeypatch):
+    monkeypatch.setattr(ai_categorizer, "_sleep", lambda s: None)
+    names = ["עסק א", "עסק ב"]
+    scripts = [
+        # Searches, answers merchant 0, then the connection drops mid-element.
+        ["server_tool_use", "web_search_tool_result",
+         '[{"index": 0, "category": "קניות"}, {"index": 1, "cat', _Overloaded("overloaded")],
+        # The retry answers merchant 1 without searching: discarded.
+        ['[{"index": 1, "category": "אוכל"}]'],
+        ["server_tool_use", "web_search_tool_result", '[{"index": 0, "category": "בילויים"}]'],
+    ]
+    asked = []
+
+    def stream(**params):
+        if "tools" not in params:
+            return _ScriptedStream(['[{"index": 0, "unknown": true}, {"index": 1, "unknown": true}]'])
+        asked.append(_lines(params))
+        return _ScriptedStream(scripts.pop(0))
+
+    client = NS(messages=NS(stream=stream))
+    monkeypatch.setattr(ai_categorizer, "_get_client", lambda: client)
+    landed = []
+    result = categorize_transactions(names, on_resolved=landed.append)
+
+    assert result == {0: "קניות", 1: "בילויים"}
+    assert landed == [{"עסק א": "קניות"}, {"עסק ב": "בילויים"}]
+    assert asked == [names, names, ["עסק ב"]]
+
+
+def test_stream_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("AI_STREAM", "0")
+    with FakeAnthropic(lambda params: message('[{"index": 0, "category": "אוכל"}]')) as fake:
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", fake.url)
+        assert categorize_transactions(["עסק אלף"]) == {0: "אוכל"}
+    assert "stream" not in fake.requests[0]
@@ -42,7 +42,7 @@ def test_ai_subcategorize_groups_applies_and_reports(monkeypatch):
     sid = _restore(ROWS)
     captured = {}
 
-    def fake_suggest(category, items, existing):
+    def fake_suggest(category, items, existing, **kwargs):
         captured["category"] = category
         captured["merchants"] = [it["merchant"] for it in items]
         captured["existing"] = existing
@@ -77,7 +77,7 @@ def test_ai_subcategorize_groups_applies_and_reports(monkeypatch):
 
 def test_ai_subcategorize_empty_suggestion_leaves_rows_alone(monkeypatch):
     sid = _restore(ROWS)
-    monkeypatch.setattr(routes, "suggest_subcategories", lambda c, i, e: [{"index": 0, "subcategory": ""}])
+    monkeypatch.setattr(routes, "suggest_subcategories", lambda c, i, e, **kw: [{"index": 0, "subcategory": ""}])
     resp = client.post("/api/ai-subcategorize", json={"session_id": sid, "category": "אוכל"})
     assert resp.status_code == 200
     assert resp.json()["assignments"] == []
@@ -100,7 +100,7 @@ def test_ai_subcategorize_all_sweeps_every_category(monkeypatch):
     sid = _restore(ROWS)
     calls = []
 
-    def fake_suggest(category, items, existing):
+    def fake_suggest(category, items, existing, **kwargs):
         calls.append((category, [it["merchant"] for it in items]))
         return [{"index": 0, "subcategory": "תת אוטומטית"}]
 
@@ -0,0 +1,115 @@
+"""Heavy analytics in worker processes over shared-memory session frames.
+
+With ANALYTICS_PROCESSES set, category-snapshot, recurring detection and
+the Excel export run in a process pool; the session frame is published to
+shared memory once per write instead of being pickled per request. These
+tests pin:
+  - a frame round-trips through shared memory with its dtypes, NaNs and
+    index intact
+  - the endpoints answer exactly as they do in-thread
+  - a write to the session (reassignment or an in-place edit under the
+    session lock) republishes it; deleting the session unlinks its blocks
+"""
+import sys
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.api import routes  # noqa: E402
+from app.services import analytics_executor  # noqa: E402
+
+client = TestClient(app)
+
+ROWS = [
+    {"id": i, "תאריך": f"2026-{m:02d}-0{d}", "חודש": f"{m:02d}/2026", "תיאור": desc, "קטגוריה": cat,
+     "סכום": amount}
+    for i, (m, d, desc, cat, amount) in enumerate([
+        (4, 3, "עסק אלף", "בילויים", -49.9), (5, 3, "עסק אלף", "בילויים", -49.9),
+        (6, 3, "עסק אלף", "בילויים", -49.9), (6, 5, "עסק בית", "קניות", -310.0),
+        (5, 7, "עסק בית", "קניות", -120.0), (6, 8, "משכורת", "הכנסה", 9000.0),
+    ])
+]
+
+
+@pytest.fixture
+def processes(monkeypatch):
+    monkeypatch.setenv("ANALYTICS_PROCESSES", "1")
+    yield
+    analytics_executor.shutdown()
+
+
+def _restore():
+    resp = client.post("/api/restore-session", json={"transactions": ROWS})
+    assert resp.status_code == 200, resp.text
+    return resp.json()["session_id"]
+
+
+def _answers(sid):
+    snapshot = client.get("/api/charts/v2/category-snapshot", params={"sessionId": sid, "month_from": "05/2026"})
+    recurring = client.get("/api/analytics/recurring", params={"sessionId": sid})
+    export = client.get("/api/export", params={"sessionId": sid, "category": "קניות"})
+    assert snapshot.status_code == recurring.status_code == export.status_code == 200
+    return snapshot.json(), recurring.json(), pd.read_excel(BytesIO(export.content))
+
+
+def test_frame_round_trips_through_shared_memory():
+    df = pd.DataFrame({
+        "amount": [1.5, np.nan, -3.0],
+        "when": pd.to_datetime(["2026-01-01", None, "2026-03-01"]),
+        "text": ["א", None, "א"],
+        "flag": [True, False, True],
+        "mixed": [1, "x", np.nan],
+        "cat": pd.Categorical(["a", "b", "a"]),
+    }, index=[7, 3, 9])
+    handle, blocks = analytics_executor.share_frame("k", 1, df)
+    try:
+        back, attached = analytics_executor.attach_frame(handle)
+        pd.testing.assert_frame_equal(back, df)
+        del back
+        for shm in attached:
+            shm.close()
+    finally:
+        analytics_executor._free(blocks)
+
+
+def test_process_pool_matches_in_thread(processes, monkeypatch):
+    sid = _restore()
+    in_process = _answers(sid)
+    monkeypatch.setenv("ANALYTICS_PROCESSES", "0")
+    in_thread = _answers(sid)
+    assert in_process[:2] == in_thread[:2]
+    pd.testing.assert_frame_equal(in_process[2], in_thread[2])
+    assert len(in_thread[2]) == 2
+
+
+def test_writes_republish_and_delete_unlinks(processes):
+    sid = _restore()
+    _answers(sid)
+    first = analytics_executor._PUBLISHED[sid].handle
+
+    df = routes.sessions[sid]
+    generation = routes.sessions.generation(sid)
+    with routes._session_lock(sid):
+        pass  # a read-only use is not a write
+    assert routes.sessions.generation(sid) == generation
+
+    lock = routes._session_lock(sid)
+    with lock:
+        df.loc[df["תיאור"] == "עסק בית", "קטגוריה"] = "אוכל"
+        lock.wrote()
+    snapshot, _, _ = _answers(sid)
+    assert "אוכל" in {c["name"] for c in snapshot["categories"]}
+    assert analytics_executor._PUBLISHED[sid].handle.generation > first.generation
+
+    client.delete("/api/session", params={"sessionId": sid})
+    assert sid not in analytics_executor._PUBLISHED
+    assert sid not in routes.SESSION_LOCKS
+    with pytest.raises(FileNotFoundError):
+        analytics_executor._attach_block(first.columns[0].block)
@@ -0,0 +1,83 @@
+"""Row filtering in clean_dataframe (drop_junk_rows).
+
+These tests pin:
+  - the vectorized filter keeps exactly the rows the per-row version kept,
+    over fuzzed raw frames: mixed cell types, nulls, keywords in any case,
+    inside longer text or split across adjacent cells, duplicate headers
+  - clean_dataframe on a raw statement drops the summary and empty rows
+"""
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.data_processor import SUMMARY_KEYWORDS, clean_dataframe, drop_junk_rows  # noqa: E402
+
+
+def _per_row(df: pd.DataFrame) -> pd.DataFrame:
+    # The filter as it was written before vectorizing, kept as the reference.
+    def is_valid_row(row):
+        row_str = ' '.join([str(x).lower() for x in row if pd.notna(x)])
+        if any(k in row_str for k in SUMMARY_KEYWORDS):
+            return False
+        if row.isnull().sum() > len(row) * 0.8:
+            return False
+        return True
+
+    return df[df.apply(is_valid_row, axis=1)].reset_index(drop=True)
+
+
+_WORDS = ['סופר', 'דלק', 'סך', 'הכל', 'TOTAL', 'Total:', 'סה"כ לחיוב', 'יתרה', 'יתרת', 'סיכום חודשי',
+          'subtotal', 'שופרסל', 'paypal *x', '', ' ']
+
+
+def _cell(rng: random.Random):
+    roll = rng.random()
+    if roll < 0.3:
+        return rng.choice([None, np.nan, pd.NaT])
+    if roll < 0.45:
+        return round(rng.uniform(-500, 500), 2)
+    if roll < 0.5:
+        return pd.Timestamp(2026, rng.randint(1, 12), rng.randint(1, 28))
+    return ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(1, 2)))
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_matches_per_row_filter(seed):
+    rng = random.Random(seed)
+    width = rng.randint(1, 7)
+    df = pd.DataFrame([[_cell(rng) for _ in range(width)] for _ in range(400)])
+    df[width] = [rng.uniform(0, 100) if rng.random() < 0.7 else np.nan for _ in range(len(df))]
+    if seed % 2:
+        df.columns = ['תאריך'] * len(df.columns)   # duplicate headers
+    pd.testing.assert_frame_equal(drop_junk_rows(df.copy()), _per_row(df))
+
+
+def test_split_keyword_and_typed_columns():
+    df = pd.DataFrame({
+        'a': ['סך', 'סך', 'קניה', None, 'x'],
+        'b': [1.0, np.nan, 2.0, np.nan, np.nan],
+        'c': ['הכל', 'הכל', 'TOTAL', None, None],
+    })
+    # 'סך 1.0 הכל' isn't a summary row; 'סך הכל' (null skipped) and 'total' are.
+    assert drop_junk_rows(df)['a'].tolist() == ['סך', 'x']
+    pd.testing.assert_frame_equal(drop_junk_rows(df), _per_row(df))
+
+
+def test_clean_dataframe_drops_summary_and_empty_rows():
+    raw = pd.DataFrame([
+        ['פירוט עסקאות', None, None],
+        ['תאריך', 'שם בית העסק', 'סכום'],
+        ['01/06/2026', 'סופר', '12.5'],
+        [None, None, None],
+        ['02/06/2026', 'דלק', '200'],
+        ['סה"כ', None, '212.5'],
+    ])
+    df = clean_dataframe(raw)
+    assert list(df.columns) == ['תאריך', 'שם בית העסק', 'סכום']
+    assert df['שם בית העסק'].tolist() == ['סופר', 'דלק']
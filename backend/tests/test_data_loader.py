@@ -0,0 +1,91 @@
+"""load_transaction_file: the raw-rows readers behind every upload.
+
+These tests pin:
+  - Excel: calamine (when installed) and the openpyxl fallback read the same
+    raw rows; every transaction sheet is stacked and summary sheets are
+    skipped; EXCEL_ENGINE forces an engine
+  - CSV: encoding (BOM, UTF-8, Hebrew codepages), delimiter and row width
+    are sniffed from a sample and the file is parsed once; a short title
+    line above the header doesn't break parsing
+"""
+import io
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services import data_loader  # noqa: E402
+from app.services.data_loader import load_transaction_file  # noqa: E402
+
+ROWS = [
+    ["פירוט עסקאות", None, None],
+    ["תאריך עסקה", "שם בית העסק", "סכום חיוב"],
+    ["05/06/2026", "עסק אלף", 120.5],
+    ["06/06/2026", "עסק בית", 40],
+]
+
+ENGINES = ["openpyxl"] + (["calamine"] if data_loader.excel_engine() == "calamine" else [])
+
+
+def _workbook() -> bytes:
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf) as writer:
+        for sheet, rows in (("כרטיס 1", ROWS), ("סיכום", [["סה\"כ", 160.5]]), ("כרטיס 2", ROWS[1:])):
+            pd.DataFrame(rows).to_excel(writer, sheet_name=sheet, header=False, index=False)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_excel_engines_read_the_same_rows(monkeypatch, engine):
+    monkeypatch.setenv("EXCEL_ENGINE", engine)
+    df = load_transaction_file(io.BytesIO(_workbook()), "card.xlsx")
+    assert df[1].tolist()[1:] == ["שם בית העסק", "עסק אלף", "עסק בית", "שם בית העסק", "עסק אלף", "עסק בית"]
+    assert "סה\"כ" not in df[0].tolist()
+
+    monkeypatch.setenv("EXCEL_ENGINE", "openpyxl")
+    pd.testing.assert_frame_equal(df, load_transaction_file(io.BytesIO(_workbook()), "card.xlsx"))
+
+
+def test_engine_choice(monkeypatch):
+    monkeypatch.delenv("EXCEL_ENGINE", raising=False)
+    monkeypatch.setattr(data_loader.importlib.util, "find_spec", lambda name: None)
+    assert data_loader.excel_engine() is None
+    monkeypatch.setenv("EXCEL_ENGINE", "OpenPyXL")
+    assert data_loader.excel_engine() == "openpyxl"
+
+
+CSV_LINES = ["פירוט עסקאות", "תאריך עסקה,שם בית העסק,סכום חיוב", "05/06/2026,\"עסק אלף, סניף 2\",120.50",
+             "06/06/2026,עסק בית,40"]
+
+
+@pytest.mark.parametrize("encoding, expected", [
+    ("utf-8", "utf-8"), ("utf-8-sig", "utf-8-sig"), ("windows-1255", "windows-1255"), ("utf-16", "utf-16"),
+])
+def test_csv_encoding_is_sniffed_once(monkeypatch, encoding, expected):
+    content = "\n".join(CSV_LINES).encode(encoding)
+    assert data_loader.sniff_csv(content, complete=True) == (expected, ",", 3, False)
+
+    calls = []
+    read_csv = pd.read_csv
+    monkeypatch.setattr(data_loader.pd, "read_csv", lambda *a, **kw: calls.append(kw) or read_csv(*a, **kw))
+    df = load_transaction_file(io.BytesIO(content), "card.csv")
+    assert len(calls) == 1
+    assert df[0].tolist() == ["פירוט עסקאות", "תאריך עסקה", "05/06/2026", "06/06/2026"]
+    assert df[1].tolist()[1:] == ["שם בית העסק", "עסק אלף, סניף 2", "עסק בית"]
+
+
+@pytest.mark.parametrize("delimiter", [";", "\t", "|"])
+def test_csv_delimiter_is_sniffed(delimiter):
+    content = "\n".join(line.replace(",", delimiter) for line in CSV_LINES[1:2] + ["05/06/2026,עסק אלף,120.50"])
+    df = load_transaction_file(io.BytesIO(content.encode("utf-8")), "card.csv")
+    assert df.values.tolist() == [["תאריך עסקה", "שם בית העסק", "סכום חיוב"], ["05/06/2026", "עסק אלף", "120.50"]]
+
+
+def test_hebrew_codepage_without_windows_1255_bytes_and_empty_file():
+    assert data_loader.sniff_encoding("עסק".encode("iso-8859-8")) == "windows-1255"
+    assert data_loader.sniff_encoding(b"\xe0\x81") == "iso-8859-8"   # 0x81 is undefined in windows-1255
+    with pytest.raises(ValueError, match="Could not read CSV"):
+        load_transaction_file(io.BytesIO(b"\n\n"), "card.csv")
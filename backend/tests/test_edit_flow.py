@@ -7,14 +7,18 @@
   and /restore-session re-applies notes passed back in.
 - /categories/catalog?sessionId=... surfaces every subcategory in use, so a
   name created once stays pickable.
+- Edits write into the session under its lock, so they wait for an AI write
+  in progress instead of interleaving with it.
 """
 import sys
+import threading
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from fastapi.testclient import TestClient  # noqa: E402
 from app.main import app  # noqa: E402
+from app.api import routes  # noqa: E402
 from app.services.data_processor import txn_fingerprint  # noqa: E402
 
 client = TestClient(app)
@@ -135,3 +139,23 @@ def test_bulk_move_unchecked_applies_merchant_wide():
     assert rows[1]["קטגוריה"] == "הוצאות משתנות"
     assert rows[2]["קטגוריה"] == "הוצאות משתנות"
     assert rows[3]["קטגוריה"] == "שונות"
+
+
+def test_edits_wait_for_the_session_lock():
+    sid = _restore(BIT_ROWS)
+    edited = threading.Event()
+
+    def _edit():
+        client.post("/api/merchants/category", json={
+            "session_id": sid, "merchant": "עסק אחר לגמרי", "category": "בילויים",
+        })
+        edited.set()
+
+    with routes._session_lock(sid):
+        worker = threading.Thread(target=_edit)
+        worker.start()
+        assert not edited.wait(0.3)
+        assert _rows(sid)[3]["קטגוריה"] == "שונות"
+    worker.join(5)
+    assert edited.is_set()
+    assert _rows(sid)[3]["קטגוריה"] == "בילויים"
@@ -0,0 +1,146 @@
+"""Local char n-gram kNN classifier that answers before Claude.
+
+The Anthropic client is faked; these tests pin:
+  - a close variant of a learned merchant is classified locally, with no
+    Claude call; the guess is reported as local and never cached
+  - unfamiliar merchants fall through to Claude, whose answers are learned
+  - rules on /restore-session feed that session's corpus only, and local
+    guesses are not returned by /ai-categorize to be saved as rules
+  - it is off unless AI_LOCAL_CLASSIFIER=1
+"""
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import ai_categorizer, local_classifier  # noqa: E402
+from app.services.ai_categorizer import categorize_transactions  # noqa: E402
+from app.services.local_classifier import LocalClassifier  # noqa: E402
+
+client = TestClient(app)
+
+
+class _FakeClient:
+    def __init__(self, handler):
+        self.calls = []
+
+        def create(**kwargs):
+            self.calls.append(kwargs)
+            return handler(kwargs)
+        self.messages = SimpleNamespace(create=create)
+
+
+def _text(payload):
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=json.dumps(payload, ensure_ascii=False))])
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state(monkeypatch):
+    monkeypatch.setattr(ai_categorizer, "_CACHE", {})
+    monkeypatch.setattr(ai_categorizer, "_BATCH_SIZERS", {})
+    monkeypatch.setattr(ai_categorizer, "_EVIDENCE", {})
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("AI_LOCAL_CLASSIFIER", "1")
+    local_classifier.reset()
+    yield
+    local_classifier.reset()
+
+
+def test_knn_prefers_close_variants_and_reports_confidence():
+    model = LocalClassifier([
+        ("מאפיית אבולעפיה", None, "אוכל"),
+        ("מאפיית אבולעפיה יפו", None, "אוכל"),
+        ("מוסך רמת החייל", None, "רכב"),
+    ])
+    cat, agreement, sim = model.predict("מאפיית אבולעפיה 12")
+    assert cat == "אוכל" and agreement > 0.6 and sim > 0.8
+    cat, _, sim = model.predict("xyz")
+    assert cat is None or sim < 0.3
+
+
+def test_learned_merchant_variant_skips_claude(monkeypatch):
+    local_classifier.learn(
+        [("גלידריית הפינה תל אביב", "אוכל"), ("גלידריית הפינה חיפה", "אוכל")],
+        valid=ai_categorizer.VALID_CATEGORIES,
+    )
+
+    def handler(kwargs):
+        return _text([{"index": 0, "category": "קניות"}])
+
+    fake = _FakeClient(handler)
+    monkeypatch.setattr(ai_categorizer, "_get_client", lambda: fake)
+    resolved, guessed = [], set()
+    result = categorize_transactions(
+        ["גלידריית הפינה", "חנות כלבו עלומה"], on_resolved=resolved.append, local=guessed)
+    assert result == {0: "אוכל", 1: "קניות"}
+    # Only the unfamiliar merchant was sent to Claude.
+    assert len(fake.calls) == 1
+    assert "גלידריית הפינה" not in fake.calls[0]["messages"][0]["content"]
+    assert {"גלידריית הפינה": "אוכל"} in resolved
+    # An unverified guess: reported as local, not cached as an AI answer.
+    assert guessed == {"גלידריית הפינה"}
+    assert "גלידריית הפינה" not in ai_categorizer._CACHE
+    assert ai_categorizer._CACHE["חנות כלבו עלומה"] == "קניות"
+    # Claude's answer is now part of the corpus.
+    assert local_classifier.classify([{"base": "חנות כלבו עלומה 3"}]) == {"חנות כלבו עלומה 3": "קניות"}
+
+
+@pytest.mark.parametrize("setting", [None, "0"])
+def test_disabled_sends_everything_to_claude(monkeypatch, setting):
+    if setting is None:
+        monkeypatch.delenv("AI_LOCAL_CLASSIFIER")   # opt-in: off by default
+    else:
+        monkeypatch.setenv("AI_LOCAL_CLASSIFIER", setting)
+    local_classifier.learn([("גלידריית הפינה תל אביב", "אוכל")])
+    fake = _FakeClient(lambda kwargs: _text([{"index": 0, "category": "אוכל"}]))
+    monkeypatch.setattr(ai_categorizer, "_get_client", lambda: fake)
+    categorize_transactions(["גלידריית הפינה תל אביב"])
+    assert len(fake.calls) == 1
+
+
+def test_restore_rules_feed_the_corpus():
+    resp = client.post("/api/restore-session", json={
+        "transactions": [
+            {"id": 1, "תאריך": "2026-06-05", "תיאור": "סטודיו פילאטיס גבעתיים", "קטגוריה": "שונות", "סכום": -300.0},
+        ],
+        "category_rules": [
+            {"merchant": "סטודיו פילאטיס גבעתיים", "category": "חוגים וספורט"},
+            {"merchant": "עסק כלשהו", "category": "קטגוריה לא קיימת"},
+        ],
+    })
+    assert resp.status_code == 200, resp.text
+    sid = resp.json()["session_id"]
+    # Only the rule with a catalog category is learned — into this session's
+    # corpus, not the shared one.
+    assert set(local_classifier._SCOPED[sid].values()) == {"חוגים וספורט"}
+    assert not local_classifier._LEARNED
+    variant = [{"base": "סטודיו פילאטיס גבעתיים 2"}]
+    assert local_classifier.classify(variant, scope=sid) == {"סטודיו פילאטיס גבעתיים 2": "חוגים וספורט"}
+    assert local_classifier.classify(variant, scope="another-session") == {}
+    assert local_classifier.classify(variant) == {}
+
+    client.delete("/api/session", params={"sessionId": sid})
+    assert sid not in local_classifier._SCOPED
+
+
+def test_local_guesses_are_not_returned_for_rules(monkeypatch):
+    resp = client.post("/api/restore-session", json={
+        "transactions": [
+            {"id": 1, "תאריך": "2026-06-05", "תיאור": "גלידריית הפינה 7", "קטגוריה": "שונות", "סכום": -30.0},
+            {"id": 2, "תאריך": "2026-06-06", "תיאור": "ZRQ TRADING", "קטגוריה": "שונות", "סכום": -90.0},
+        ],
+        "category_rules": [{"merchant": "גלידריית הפינה תל אביב", "category": "אוכל"}],
+    })
+    sid = resp.json()["session_id"]
+    fake = _FakeClient(lambda kwargs: _text([{"index": 0, "category": "קניות"}]))
+    monkeypatch.setattr(ai_categorizer, "_get_client", lambda: fake)
+    data = client.post("/api/ai-categorize", json={"session_id": sid}).json()
+    assert data["ai_categorized"] == [{"merchant": "ZRQ TRADING", "category": "קניות"}]
+    txns = client.get("/api/transactions", params={"sessionId": sid}).json()["transactions"]
+    assert {t["id"]: t["קטגוריה"] for t in txns} == {1: "אוכל", 2: "קניות"}
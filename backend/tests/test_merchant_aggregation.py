@@ -0,0 +1,103 @@
+"""aggregate_merchants / catalog_hits — vectorized merchant grouping.
+
+/ai-audit and the AI subcategorizer used to walk every row with iterrows();
+both now group on canonical merchant codes. These tests pin the vectorized
+version to the old per-row loop (kept here as the reference):
+  - same keys, same first-appearance order
+  - representative name / current category = most frequent, ties → first seen
+  - count, Σ|amount|, first usable issuer sector
+  - catalog_hits == "any catalog keyword is a substring of the lowered name"
+"""
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pandas as pd  # noqa: E402
+from app.core.constants import KEYWORD_TO_CATEGORY  # noqa: E402
+from app.services.data_processor import (  # noqa: E402
+    aggregate_merchants, catalog_hits, normalize_merchant,
+)
+
+
+def _reference(df):
+    merchants = {}
+    for _, row in df.iterrows():
+        raw = str(row.get('תיאור', '')).strip()
+        key = normalize_merchant(raw)
+        if not key:
+            continue
+        cat = str(row.get('קטגוריה', 'שונות'))
+        m = merchants.setdefault(key, {
+            "merchant": raw, "current": cat, "count": 0, "total": 0.0,
+            "issuer": None, "_names": {}, "_cats": {},
+        })
+        m["count"] += 1
+        m["total"] += abs(float(row.get('סכום', 0) or 0))
+        m["_names"][raw] = m["_names"].get(raw, 0) + 1
+        m["_cats"][cat] = m["_cats"].get(cat, 0) + 1
+        if not m["issuer"]:
+            issuer = row.get('ענף_מקור')
+            if issuer is not None and str(issuer).strip() and str(issuer).lower() not in ('nan', 'none'):
+                m["issuer"] = str(issuer).strip()
+    for m in merchants.values():
+        m["merchant"] = max(m["_names"], key=m["_names"].get)
+        m["current"] = max(m["_cats"], key=m["_cats"].get)
+        del m["_names"], m["_cats"]
+    return merchants
+
+
+def _random_frame(n, seed):
+    rng = random.Random(seed)
+    bases = ['שופרסל דיל', 'ארומה תל אביב', 'PAYPAL *SPOTIFY', 'מעדניית הגליל',
+             'Wolt', 'חנות הפרחים של רותי', 'פז יבנה', 'מוסך השלום', '  ', 'ZARA']
+    cats = ['מזון', 'אוכל', 'שונות', 'תחבורה', 'פנאי']
+    issuers = [None, '', 'nan', 'מזון ומשקאות', ' רכב ', 'None']
+    rows = []
+    for _ in range(n):
+        desc = rng.choice(bases)
+        if rng.random() < 0.3:
+            desc += f' (תשלום {rng.randint(1, 3)}/3)'
+        if rng.random() < 0.2:
+            desc = desc.upper()
+        rows.append({
+            'תיאור': desc,
+            'קטגוריה': rng.choice(cats),
+            'סכום': round(rng.uniform(-500, 100), 2),
+            'ענף_מקור': rng.choice(issuers),
+        })
+    return pd.DataFrame(rows)
+
+
+def test_aggregate_matches_row_loop():
+    for seed in range(5):
+        df = _random_frame(400, seed)
+        got = aggregate_merchants(df)
+        want = _reference(df)
+        assert list(got.index) == list(want)
+        for key, m in want.items():
+            row = got.loc[key]
+            assert row['merchant'] == m['merchant']
+            assert row['current'] == m['current']
+            assert int(row['count']) == m['count']
+            assert abs(float(row['total']) - m['total']) < 1e-6
+            assert row['issuer'] == m['issuer']
+
+
+def test_aggregate_empty_frame():
+    got = aggregate_merchants(pd.DataFrame(columns=['תיאור', 'קטגוריה', 'סכום']))
+    assert got.empty
+    assert list(got.columns) == ['merchant', 'current', 'count', 'total', 'issuer']
+
+
+def test_catalog_hits_matches_substring_scan():
+    sample = list(KEYWORD_TO_CATEGORY)[:40]
+    names = pd.Series(
+        [f'xx {k.upper()} yy' for k in sample]
+        + ['מעדניית הגליל', 'unknown shop', 'a.b*c(d)', '']
+    )
+    got = catalog_hits(names).tolist()
+    want = [any(kw in n.lower() for kw in KEYWORD_TO_CATEGORY) for n in names]
+    assert got == want
+    assert any(got) and not all(got)
@@ -0,0 +1,134 @@
+"""The opt-in server-side merchant knowledge base (MERCHANT_KB_FILE).
+
+Rules the users made, carried by /restore-session, and AI verdicts vote per
+merchant entity; a confident majority is applied before any Claude call.
+These tests pin (with MERCHANT_KB_MIN_VOTES=2; the default bar is 5):
+  - one user's rules alone are not enough; two agreeing users are, and the
+    answer reaches a third user's restore (branch variants included) —
+    applied, but neither cached nor returned to be saved as a rule
+  - repeated restores by one user don't inflate the votes; disagreement
+    drops the merchant below the confidence bar
+  - the AI's verdict never counts toward the bar, and AI answers saved as
+    rules (or rules of unknown origin) don't vote at all
+  - subcategories come from the same votes, with no Claude call
+  - voter ids are stored hashed
+"""
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.api import routes  # noqa: E402
+from app.services import ai_cache, ai_categorizer, ai_metrics, local_classifier, merchant_kb  # noqa: E402
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def kb_file(monkeypatch, tmp_path):
+    path = tmp_path / "merchant-kb.json"
+    for cache in ("_CACHE", "_SUBCAT_CACHE", "_EVIDENCE", "_BATCH_SIZERS"):
+        monkeypatch.setattr(ai_categorizer, cache, {})
+    monkeypatch.setenv("MERCHANT_KB_FILE", str(path))
+    monkeypatch.setenv("MERCHANT_KB_MIN_VOTES", "2")
+    monkeypatch.delenv("AI_CACHE_FILE", raising=False)
+    monkeypatch.setenv("AI_LOCAL_CLASSIFIER", "0")
+    local_classifier.reset()
+    merchant_kb.reset()
+    ai_cache.reset()
+    ai_metrics.reset()
+    yield path
+    merchant_kb.reset()
+    local_classifier.reset()
+    ai_metrics.reset()
+
+
+def _restore(desc, rules=None, voter=None):
+    resp = client.post("/api/restore-session", json={
+        "transactions": [{"id": 1, "תאריך": "2026-06-05", "תיאור": desc, "קטגוריה": "שונות", "סכום": -80.0}],
+        "category_rules": rules or [], "voter": voter,
+    })
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def _rule(merchant, category, source="user", **extra):
+    return {"merchant": merchant, "category": category, "source": source, **extra}
+
+
+def test_agreeing_users_resolve_the_merchant_for_others(kb_file):
+    rule = [_rule("זיגזג תל אביב", "קניות")]
+    _restore("זיגזג תל אביב", rule, voter="user-1")
+    _restore("זיגזג תל אביב", rule, voter="user-1")
+    assert merchant_kb.lookup(["זיגזג 1234"]) == {}
+
+    _restore("זיגזג רמת גן", [_rule("זיגזג רמת גן", "קניות")], voter="user-2")
+    body = _restore("זיגזג 1234", voter="user-3")
+    df = routes.sessions[body["session_id"]]
+    assert df["קטגוריה"].tolist() == ["קניות"]
+    # A verdict is applied, not handed back to be saved as user-3's rule.
+    assert body["ai_categorized"] == []
+    assert "זיגזג 1234" not in ai_categorizer._CACHE
+    assert merchant_kb.lookup(["זיגזג 1234"])["זיגזג 1234"] == {
+        "category": "קניות", "subcategory": None, "votes": 2, "confidence": 1.0}
+    assert ai_metrics.snapshot(recent=0)["cache"]["knowledge_base"]["hits"] >= 1
+
+    stored = json.loads(kb_file.read_text(encoding="utf-8"))
+    assert "user-1" not in kb_file.read_text(encoding="utf-8")
+    assert len(stored["זיגזג"]) == 2
+
+
+def test_default_bar_is_five_users(monkeypatch):
+    monkeypatch.delenv("MERCHANT_KB_MIN_VOTES")
+    for n in range(4):
+        _restore("זיגזג", [_rule("זיגזג", "קניות")], voter=f"user-{n}")
+    assert merchant_kb.lookup(["זיגזג"]) == {}
+    _restore("זיגזג", [_rule("זיגזג", "קניות")], voter="user-4")
+    assert merchant_kb.lookup(["זיגזג"])["זיגזג"]["votes"] == 5
+
+
+def test_disagreement_falls_below_confidence():
+    for voter, cat in (("a", "קניות"), ("b", "קניות"), ("c", "בילויים")):
+        _restore("זיגזג", [_rule("זיגזג", cat)], voter=voter)
+    assert merchant_kb.lookup(["זיגזג"]) == {}
+
+
+def test_ai_verdict_and_its_copies_do_not_vote(monkeypatch):
+    def create(**kwargs):
+        answers = [{"index": 0, "category": "בילויים"}]
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=json.dumps(answers))])
+
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("AI_WEB_SEARCH", "0")
+    monkeypatch.setattr(ai_categorizer, "_get_client",
+                        lambda: SimpleNamespace(messages=SimpleNamespace(create=create)))
+    ai_categorizer.categorize_transactions(["עסק אלף"])
+    # The dashboard saving the AI's answer as rules adds nothing.
+    _restore("עסק אלף", [_rule("עסק אלף", "בילויים", source="ai")], voter="user-1")
+    _restore("עסק אלף", [_rule("עסק אלף", "בילויים", source=None)], voter="user-2")
+    assert merchant_kb.lookup(["עסק אלף"]) == {}
+    # One real rule plus the AI is still one vote short.
+    _restore("עסק אלף", [_rule("עסק אלף", "בילויים")], voter="user-1")
+    assert merchant_kb.lookup(["עסק אלף"]) == {}
+    _restore("עסק אלף", [_rule("עסק אלף", "בילויים")], voter="user-2")
+    assert merchant_kb.lookup(["עסק אלף 5521"])["עסק אלף 5521"]["votes"] == 2
+
+
+def test_subcategory_from_votes_without_claude(monkeypatch):
+    rule = _rule("עסק אלף", "בילויים", subcategory="מסעדות")
+    _restore("עסק אלף", [rule], voter="user-1")
+    _restore("עסק אלף", [rule], voter="user-2")
+
+    def create(**kwargs):
+        raise AssertionError("Claude must not be called")
+
+    monkeypatch.setattr(ai_categorizer, "_get_client",
+                        lambda: SimpleNamespace(messages=SimpleNamespace(create=create)))
+    items = [{"merchant": "עסק אלף סניף 3", "count": 1, "total": 80.0}]
+    assert ai_categorizer.suggest_subcategories("בילויים", items, []) == [{"index": 0, "subcategory": "מסעדות"}]
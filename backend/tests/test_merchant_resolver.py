@@ -0,0 +1,145 @@
+"""Merchant entity resolution (merchant_resolver) and where it is used.
+
+normalize_merchant is left alone (bank-sync mirrors it); the resolver sits on
+top. These tests pin:
+  - branch codes, trailing cities and noise words are stripped, and Hebrew /
+    Latin spellings of a name share a key only through the alias table
+  - generic lead words (one or several) and short names never merge
+    different businesses, nor do sound-alike names
+  - a rule covers its merchant's entity, but a closer rule wins
+  - the AI is asked once per entity, and the lookups saved are counted
+  - /merchants groups by entity
+  - MERCHANT_RESOLUTION=0 falls back to normalize_merchant
+"""
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import ai_categorizer, ai_metrics, local_classifier, merchant_resolver  # noqa: E402
+from app.services.data_processor import normalize_merchant  # noqa: E402
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_state(monkeypatch):
+    monkeypatch.setattr(ai_categorizer, "_CACHE", {})
+    monkeypatch.setattr(ai_categorizer, "_EVIDENCE", {})
+    monkeypatch.setattr(ai_categorizer, "_BATCH_SIZERS", {})
+    monkeypatch.delenv("MERCHANT_RESOLUTION", raising=False)
+    monkeypatch.setenv("AI_LOCAL_CLASSIFIER", "0")
+    local_classifier.reset()
+    ai_metrics.reset()
+    yield
+    ai_metrics.reset()
+    local_classifier.reset()
+
+
+def _restore(rows, rules=None):
+    resp = client.post("/api/restore-session", json={"transactions": rows, "category_rules": rules or []})
+    assert resp.status_code == 200, resp.text
+    return resp.json()["session_id"]
+
+
+def _row(i, desc, amount=-50.0):
+    return {"id": i, "תאריך": f"2026-06-{i:02d}", "תיאור": desc, "קטגוריה": "שונות", "סכום": amount}
+
+
+def test_branches_cities_and_spellings_share_a_key():
+    keys = {merchant_resolver.canonical_key(n) for n in (
+        "זיגזג תל אביב", "זיגזג 1234", "זיגזג רמת גן", 'זיגזג בע"מ', "זיגזג ONLINE",
+    )}
+    assert keys == {"זיגזג"}
+    keys = {merchant_resolver.canonical_key(n) for n in (
+        "שופרסל רמת גן", "SHUFERSAL 1234", "SHUFERSAL ONLINE", "www.shufersal.co.il",
+    )}
+    assert keys == {"שופרסל"}
+    assert merchant_resolver.canonical_key("RAMI LEVY 123") == merchant_resolver.canonical_key("רמי לוי")
+    assert merchant_resolver.canonical_key("עסק אלף סניף 3") == merchant_resolver.canonical_key("עסק אלף 5521")
+    # Short numbers are part of the name, not a branch code.
+    assert merchant_resolver.canonical_key("גלריה 39") != merchant_resolver.canonical_key("גלריה")
+
+
+@pytest.mark.parametrize("names", [
+    ("MAX", "MIX"),
+    ("BOOKING.COM", "BAKING"),
+    ("MANGO", "MINING CO", "מנגו"),
+    ("SUPER", "ספר"),
+    ("LEBANON", "LABAN", "לבנה"),
+])
+def test_sound_alike_names_stay_apart(names):
+    assert len({merchant_resolver.canonical_key(n) for n in names}) == len(names)
+    assert len(set(merchant_resolver.resolve(names).values())) == len(names)
+
+
+def test_generic_and_short_names_stay_apart():
+    ids = merchant_resolver.resolve(["קפה", "קפה נחת", "קפה שקד", "ארומה", "רומא", "מרכז הפרחים", "מרכז הדפוס"])
+    assert len(set(ids.values())) == 7
+    # Several generic words are still no brand.
+    ids = merchant_resolver.resolve(["בית קפה", "בית קפה לנדוור", "בית קפה ארומה"])
+    assert len(set(ids.values())) == 3
+    # A distinctive brand does absorb its longer names.
+    ids = merchant_resolver.resolve(["זיגזג", "זיגזג פלוס", "זיגזג פלוס רמת גן"])
+    assert set(ids.values()) == {"זיגזג"}
+
+
+def test_rule_covers_entity_but_closer_rule_wins():
+    rows = [_row(1, "זיגזג 1234"), _row(2, 'זיגזג בע"מ'), _row(3, "זיגזג פלוס"),
+            _row(4, "זיגזג פלוס רמת גן"), _row(5, "עסק בית")]
+    rules = [{"merchant": "זיגזג", "category": "קניות"},
+             {"merchant": "זיגזג פלוס", "category": "בילויים"}]
+    sid = _restore(rows, rules)
+    tx = client.get("/api/transactions", params={"sessionId": sid, "page": 1, "pageSize": 100}).json()
+    by_desc = {t["תיאור"]: t["קטגוריה"] for t in tx["transactions"]}
+    assert by_desc["זיגזג 1234"] == "קניות"
+    assert by_desc['זיגזג בע"מ'] == "קניות"
+    assert by_desc["זיגזג פלוס"] == "בילויים"
+    assert by_desc["זיגזג פלוס רמת גן"] == "בילויים"
+    assert by_desc["עסק בית"] == "שונות"
+
+
+def test_ai_is_asked_once_per_entity(monkeypatch):
+    prompts = []
+
+    def create(**kwargs):
+        prompts.append(kwargs["messages"][0]["content"])
+        answers = [{"index": 0, "category": "בילויים"}]
+        return SimpleNamespace(content=[SimpleNamespace(type="text", text=json.dumps(answers))])
+
+    monkeypatch.setattr(ai_categorizer, "_get_client",
+                        lambda: SimpleNamespace(messages=SimpleNamespace(create=create)))
+    monkeypatch.setenv("AI_WEB_SEARCH", "0")
+    descs = ["עסק אלף 5521", "עסק אלף סניף 3", "עסק אלף (תשלום 2/4)"]
+    assert ai_categorizer.categorize_transactions(descs) == {0: "בילויים", 1: "בילויים", 2: "בילויים"}
+    assert len(prompts) == 1
+    assert sum("עסק אלף" in line for line in prompts[0].splitlines()) == 1
+    assert ai_metrics.snapshot(recent=0)["entities"] == {"lookups_saved": 2, "by_kind": {"categorize": 2}}
+
+    # A new branch of an entity resolved earlier in the same call costs nothing.
+    prompts.clear()
+    assert ai_categorizer.categorize_transactions(["עסק אלף 5521", "עסק אלף 7788"]) == {0: "בילויים", 1: "בילויים"}
+    assert prompts == []
+
+
+def test_merchants_endpoint_groups_by_entity():
+    sid = _restore([_row(1, "SHUFERSAL 1234", -100.0), _row(2, "שופרסל רמת גן", -40.0),
+                    _row(3, "שופרסל רמת גן", -60.0), _row(4, "עסק בית", -150.0)])
+    merchants = client.get("/api/merchants", params={"sessionId": sid}).json()["merchants"]
+    assert merchants == [
+        {"name": "שופרסל רמת גן", "total": 200.0, "count": 3, "average": 66.67},
+        {"name": "עסק בית", "total": 150.0, "count": 1, "average": 150.0},
+    ]
+
+
+def test_resolution_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("MERCHANT_RESOLUTION", "0")
+    for name in ("ZIGZAG 1234", "זיגזג רמת גן"):
+        assert merchant_resolver.canonical_key(name) == normalize_merchant(name)
+    assert len(set(merchant_resolver.resolve(["זיגזג", "זיגזג פלוס"]).values())) == 2
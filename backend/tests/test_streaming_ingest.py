@@ -0,0 +1,89 @@
+"""Chunked ingestion of large CSV statements (streaming_ingest).
+
+These tests pin:
+  - streamed in small chunks, a statement yields the same rows, amounts,
+    categories and ids as processing the whole file — for a credit-card
+    file (charges flipped negative) and a bank statement (signs kept),
+    where the sign decision needs evidence from beyond the first chunk
+  - the session keeps only its own columns
+  - /upload streams CSVs above UPLOAD_STREAM_BYTES and still rejects a file
+    without the required columns
+"""
+import io
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.api import routes  # noqa: E402
+from app.services import ai_categorizer, streaming_ingest  # noqa: E402
+from app.services.data_loader import load_transaction_file  # noqa: E402
+from app.services.data_processor import clean_dataframe, process_data  # noqa: E402
+from app.utils.validators import detect_transaction_columns  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _no_ai(monkeypatch):
+    monkeypatch.setattr(ai_categorizer, "_get_client", lambda: None)
+    monkeypatch.setenv("AI_LOCAL_CLASSIFIER", "0")
+
+
+def _card_csv(rows=300) -> bytes:
+    lines = ["פירוט עסקאות", "תאריך עסקה,שם בית העסק,סכום חיוב,תאריך חיוב"]
+    lines += [f"{i % 28 + 1:02d}/06/2026,עסק {i % 40},{(i % 90) + 0.5:.2f},10/07/2026" for i in range(rows)]
+    lines += ["05/06/2026,עסק החזר,-30,10/07/2026", 'סה"כ,,99999,']
+    return "\n".join(lines).encode("utf-8")
+
+
+def _bank_csv(rows=300) -> bytes:
+    # Credits first, then debits; only the salary in the last chunk marks it
+    # as already signed — a chunk on its own would look like a card file.
+    lines = ["תנועות בחשבון", "תאריך,תיאור התנועה,סכום"]
+    lines += [f"{i % 28 + 1:02d}/05/2026,עסק {i % 40},{(i % 70) + 1 if i < rows // 2 else -(i % 70) - 1}"
+              for i in range(rows)]
+    lines += ["28/05/2026,משכורת,9000"]
+    return "\n".join(lines).encode("windows-1255")
+
+
+def _whole(content: bytes) -> pd.DataFrame:
+    df = clean_dataframe(load_transaction_file(io.BytesIO(content), "statement.csv"))
+    return process_data(df, *detect_transaction_columns(df))
+
+
+@pytest.mark.parametrize("content", [_card_csv(), _bank_csv()], ids=["card", "bank"])
+def test_streamed_matches_whole_file(content):
+    whole = _whole(content)
+    streamed = streaming_ingest.ingest_csv(io.BytesIO(content), rows=50)
+    assert list(streamed.columns) == [c for c in streaming_ingest.SESSION_COLUMNS if c in whole.columns]
+    pd.testing.assert_frame_equal(streamed, whole[streamed.columns])
+
+
+def test_sign_evidence_spans_chunks():
+    card = streaming_ingest.ingest_csv(io.BytesIO(_card_csv()), rows=50)
+    assert (card["סכום"] < 0).sum() == 300
+    assert card.loc[card["תיאור"] == "עסק החזר", "סכום"].tolist() == [30.0]
+    assert not card["_is_bank_row"].any()
+
+    bank = streaming_ingest.ingest_csv(io.BytesIO(_bank_csv()), rows=50)
+    assert (bank["סכום"] > 0).sum() == 151
+    assert bank["_is_bank_row"].all()
+
+
+def test_upload_streams_large_csvs(monkeypatch):
+    monkeypatch.setenv("UPLOAD_STREAM_BYTES", "1000")
+    calls = []
+    ingest = streaming_ingest.ingest_csv
+    monkeypatch.setattr(streaming_ingest, "ingest_csv", lambda *a, **kw: calls.append(1) or ingest(*a, **kw))
+    with TestClient(app) as client:
+        resp = client.post("/api/upload", files={"file": ("bank.csv", _bank_csv(), "text/csv")})
+        assert resp.status_code == 200, resp.text
+        assert calls and len(routes.sessions[resp.json()["session_id"]]) == 301
+
+        resp = client.post("/api/upload", files={"file": ("bad.csv", b"a,b\n" * 600, "text/csv")})
+    assert resp.status_code == 400
+    assert "Required columns not found" in resp.json()["detail"]
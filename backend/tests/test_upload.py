@@ -0,0 +1,131 @@
+"""POST /upload parses the spooled upload off the event loop.
+
+The file is read straight from the upload's spooled body — no copy on disk,
+no sleeps before deleting one — and parse/clean/process run on the
+threadpool. These tests pin:
+  - CSV (any supported encoding) and Excel uploads parse from the buffer;
+    the extension check is case-insensitive
+  - a file without the required columns is a 400
+  - while one upload is parsing, other requests on the same event loop are
+    still answered
+  - /upload/batch merges several files into one session — in-thread or in
+    worker processes — tags _source_file, drops transactions repeated
+    across files (not within one) and runs the AI once
+"""
+import io
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.api import routes  # noqa: E402
+from app.services import ai_categorizer, analytics_executor, data_processor  # noqa: E402
+
+ROWS = [
+    ["פירוט עסקאות", "", ""],
+    ["תאריך עסקה", "שם בית העסק", "סכום חיוב"],
+    ["05/06/2026", "עסק אלף", "120.50"],
+    ["06/06/2026", "עסק בית", "40"],
+]
+
+
+@pytest.fixture(autouse=True)
+def _no_ai(monkeypatch):
+    monkeypatch.setattr(ai_categorizer, "_get_client", lambda: None)
+
+
+def _csv(encoding="utf-8") -> bytes:
+    return "\n".join(",".join(r) for r in ROWS).encode(encoding)
+
+
+def _upload(client, name, content):
+    return client.post("/api/upload", files={"file": (name, content, "application/octet-stream")})
+
+
+def test_csv_and_excel_parse_from_the_upload_buffer():
+    buf = io.BytesIO()
+    pd.DataFrame(ROWS).to_excel(buf, header=False, index=False)
+    with TestClient(app) as client:
+        for name, content in (("card.csv", _csv()), ("card.csv", _csv("windows-1255")),
+                              ("card.XLSX", buf.getvalue())):
+            resp = _upload(client, name, content)
+            assert resp.status_code == 200, resp.text
+            df = routes.sessions[resp.json()["session_id"]]
+            assert sorted(df["תיאור"]) == ["עסק אלף", "עסק בית"]
+
+
+def test_missing_columns_is_a_400():
+    with TestClient(app) as client:
+        resp = _upload(client, "card.csv", b"a,b\n1,2\n")
+    assert resp.status_code == 400
+    assert "Required columns not found" in resp.json()["detail"]
+
+
+def test_parsing_does_not_block_other_requests(monkeypatch):
+    parsing, release = threading.Event(), threading.Event()
+    load = routes.load_transaction_file
+
+    def slow_load(source, filename=None):
+        parsing.set()
+        assert release.wait(5)
+        return load(source, filename)
+
+    monkeypatch.setattr(routes, "load_transaction_file", slow_load)
+    with TestClient(app) as client:
+        result = {}
+        upload = threading.Thread(target=lambda: result.update(resp=_upload(client, "card.csv", _csv())))
+        upload.start()
+        try:
+            assert parsing.wait(5)
+            # Same event loop as the blocked upload.
+            assert client.get("/health").status_code == 200
+        finally:
+            release.set()
+            upload.join(5)
+    assert result["resp"].status_code == 200
+
+
+@pytest.mark.parametrize("processes", ["0", "2"])
+def test_batch_upload_merges_files_into_one_session(monkeypatch, processes):
+    monkeypatch.setenv("ANALYTICS_PROCESSES", processes)
+    calls = []
+    monkeypatch.setattr(data_processor, "categorize_transactions",
+                        lambda descs: calls.append(list(descs)) or {})
+    june = _csv()
+    july = "\n".join(",".join(r) for r in ROWS[:2] + [
+        ["06/06/2026", "עסק בית", "40"],      # also in june's file
+        ["07/07/2026", "עסק גימל", "15"],
+        ["07/07/2026", "עסק גימל", "15"],     # a repeat within one file
+    ]).encode()
+    try:
+        with TestClient(app) as client:
+            resp = client.post("/api/upload/batch", files=[
+                ("files", ("june.csv", june, "text/csv")),
+                ("files", ("july.csv", july, "text/csv")),
+            ])
+    finally:
+        analytics_executor.shutdown()
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert body["duplicates_removed"] == 1
+    assert body["files"] == [{"name": "june.csv", "count": 2}, {"name": "july.csv", "count": 2}]
+    df = routes.sessions[body["session_id"]]
+    assert sorted(df["תיאור"]) == ["עסק אלף", "עסק בית", "עסק גימל", "עסק גימל"]
+    assert df["id"].tolist() == [0, 1, 2, 3]
+    assert len(calls) == 1
+
+
+def test_batch_upload_names_the_bad_file():
+    with TestClient(app) as client:
+        resp = client.post("/api/upload/batch", files=[
+            ("files", ("good.csv", _csv(), "text/csv")),
+            ("files", ("bad.csv", b"a,b\n1,2\n", "text/csv")),
+        ])
+    assert resp.status_code == 400
+    assert resp.json()["detail"].startswith("bad.csv: Required columns not found")
@@ -0,0 +1,127 @@
+"""Column parsers in utils.validators.
+
+These tests pin:
+  - parse_amounts gives clean_amount's value for every cell of a fuzzed
+    corpus: ₪/NIS, ASCII/unicode/trailing minus, European and US thousand
+    separators, decimal commas, unicode digits and spaces, junk, long
+    cells, nulls, and numbers mixed into text
+  - numeric columns pass straight through, nulls as 0.0
+"""
+import random
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.utils.validators import clean_amount, parse_amounts, parse_dates  # noqa: E402
+
+_PIECES = ['1', '12', '123', '1234', '0', '٣', ',', ',', '.', '.', '-', '−', '₪', 'NIS', 'nis', 'N', 'IS',
+           ' ', '\xa0', '\t', 'abc', 'סה"כ', '(', ')', '+', 'e5', '_', '²']
+
+
+def _fuzzed(rng: random.Random):
+    roll = rng.random()
+    if roll < 0.05:
+        return rng.choice([None, np.nan, pd.NaT, '', '  ', 'הערה ארוכה ' * 10 + '-12,50'])
+    if roll < 0.12:
+        return rng.choice([rng.uniform(-1e4, 1e4), rng.randint(-500, 500), True, Decimal('12.30'), float('inf')])
+    if roll < 0.5:
+        # Realistic: formatted amounts with the separators and signs statements use.
+        n = rng.uniform(0, 2e6)
+        text = rng.choice([f'{n:,.2f}', f'{n:.2f}', f'{n:,.0f}', f'{n:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.'),
+                           f'{n:.2f}'.replace('.', ','), f'{n:.1f}'.replace('.', ',')])
+        sign = rng.choice(['', '-', '−'])
+        return rng.choice([f'{sign}{text}', f'{text}{sign}', f'₪ {sign}{text}', f'{sign}{text} NIS', f' {text} ₪'])
+    return ''.join(rng.choice(_PIECES) for _ in range(rng.randint(1, 8)))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_parse_amounts_matches_clean_amount(seed):
+    rng = random.Random(seed)
+    values = [_fuzzed(rng) for _ in range(3000)]
+    values += values[:500]   # repeats go through the unique-value cache
+    series = pd.Series(values, index=range(10, 10 + len(values)), name='סכום', dtype=object)
+    expected = series.apply(clean_amount).astype('float64')
+    pd.testing.assert_series_equal(parse_amounts(series), expected)
+
+
+@pytest.mark.parametrize("value, amount", [
+    ('1.234,56', 1234.56), ('1,234.56', 1234.56), ('12,50', 12.5), ('1,250', 1250.0),
+    ('150.00-', -150.0), ('−75 ₪', -75.0), ('NIS 20', 20.0), ('1.2.3', 0.0), ('', 0.0),
+])
+def test_parse_amounts_formats(value, amount):
+    assert parse_amounts(pd.Series([value]))[0] == amount == clean_amount(value)
+
+
+def test_parse_amounts_numeric_and_string_dtypes():
+    numbers = pd.Series([1.5, np.nan, -3.0])
+    assert parse_amounts(numbers).tolist() == [1.5, 0.0, -3.0]
+    assert parse_amounts(pd.Series([1, 2], dtype='Int64')).tolist() == [1.0, 2.0]
+    strings = pd.Series(['1,000.00', None, '5-'], dtype='str')
+    assert parse_amounts(strings).tolist() == [1000.0, 0.0, -5.0]
+    assert parse_amounts(pd.Series([], dtype=object)).empty
+
+
+def _sequential_dates(series: pd.Series) -> pd.Series:
+    # parse_dates' string path as it was: every format on the whole column.
+    formats = ['%Y-%m-%d %H:%M:%S', '%d-%m-%Y', '%d/%m/%Y', '%Y-%m-%d', '%d.%m.%Y', '%Y/%m/%d', '%m/%d/%Y']
+    result = pd.Series([pd.NaT] * len(series), index=series.index)
+    cleaned_series = series.astype(str).str.strip()
+    for fmt in formats:
+        mask = result.isna()
+        if not mask.any():
+            break
+        try:
+            result[mask] = pd.to_datetime(cleaned_series[mask], format=fmt, errors='coerce')
+        except Exception:
+            continue
+    if result.isna().any():
+        try:
+            remaining_mask = result.isna()
+            result[remaining_mask] = pd.to_datetime(cleaned_series[remaining_mask], dayfirst=True, errors='coerce')
+        except Exception:
+            pass
+    return result
+
+
+_DATE_LAYOUTS = ['{d:02d}/{m:02d}/{y}', '{d}/{m}/{y}', '{m:02d}/{d:02d}/{y}', '{d:02d}-{m:02d}-{y}', '{y}-{m:02d}-{d:02d}',
+                 '{y}-{m:02d}-{d:02d} 00:00:00', '{d:02d}.{m:02d}.{y}', '{y}/{m:02d}/{d:02d}', '{d} June {y}',
+                 ' {d:02d}/{m:02d}/{y} ', '{d:02d}/{m:02d}/{y2:02d}']
+
+
+def _fuzzed_dates(rng: random.Random, layouts) -> list:
+    values = []
+    for _ in range(2000):
+        roll = rng.random()
+        if roll < 0.05:
+            values.append(rng.choice([None, np.nan, '', 'לא ידוע', '31/02/2026', '13/25/2026']))
+            continue
+        y = rng.randint(2019, 2026)
+        values.append(rng.choice(layouts).format(d=rng.randint(1, 31 if rng.random() < 0.2 else 28),
+                                                 m=rng.randint(1, 12), y=y, y2=y % 100))
+    return values
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_parse_dates_matches_sequential_formats(seed):
+    rng = random.Random(seed)
+    # Single-layout columns (the common case, format inferred) and mixed ones.
+    layouts = [rng.choice(_DATE_LAYOUTS)] if seed % 2 else rng.sample(_DATE_LAYOUTS, 3)
+    series = pd.Series(_fuzzed_dates(rng, layouts), index=range(5, 2005), name='תאריך עסקה', dtype=object)
+    for _ in range(2):   # second call starts from the cached format
+        pd.testing.assert_series_equal(parse_dates(series), _sequential_dates(series))
+
+
+def test_parse_dates_day_first_beats_inferred_month_first():
+    # The sample is month-first only ('12/31/2025'), but a date both formats
+    # accept is read day-first, as the ordered formats would.
+    series = pd.Series(['12/31/2025'] * 25 + ['05/06/2026'], name='תאריך')
+    parsed = parse_dates(series)
+    assert parsed.iloc[0] == pd.Timestamp(2025, 12, 31)
+    assert parsed.iloc[-1] == pd.Timestamp(2026, 6, 5)
+    pd.testing.assert_series_equal(parsed, _sequential_dates(series))
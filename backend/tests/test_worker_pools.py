@@ -0,0 +1,91 @@
+"""CPU-bound endpoints run on bounded worker pools, apart from the AI.
+
+These tests pin:
+  - a slow restore (heavy pool) doesn't hold up chart reads (interactive
+    pool), nor the event loop
+  - a pool's wait queue is bounded: past it the pool raises PoolFull and an
+    endpoint answers 503 with Retry-After
+  - /internal/metrics reports every pool's queue depth and timings,
+    including the AI pools
+"""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.api import routes  # noqa: E402
+from app.services import worker_pools  # noqa: E402
+
+ROWS = [
+    {"id": 1, "תאריך": "2026-06-05", "תיאור": "עסק אלף", "קטגוריה": "בילויים", "סכום": -120.0},
+    {"id": 2, "תאריך": "2026-06-06", "תיאור": "עסק בית", "קטגוריה": "קניות", "סכום": -40.0},
+]
+
+
+def _restore(client):
+    resp = client.post("/api/restore-session", json={"transactions": ROWS})
+    assert resp.status_code == 200, resp.text
+    return resp.json()["session_id"]
+
+
+def test_slow_restore_does_not_block_chart_reads(monkeypatch):
+    with TestClient(app) as client:
+        sid = _restore(client)
+        entered, release = threading.Event(), threading.Event()
+        heuristic = routes.apply_trip_window_heuristic
+
+        def slow(df):
+            entered.set()
+            assert release.wait(5)
+            return heuristic(df)
+
+        monkeypatch.setattr(routes, "apply_trip_window_heuristic", slow)
+        restore = threading.Thread(target=lambda: _restore(client))
+        restore.start()
+        try:
+            assert entered.wait(5)
+            assert worker_pools.HEAVY.stats()["running"] >= 1
+            resp = client.get("/api/charts/v2/donut", params={"sessionId": sid})
+            assert resp.status_code == 200
+        finally:
+            release.set()
+            restore.join(5)
+
+
+def test_full_queue_is_rejected(monkeypatch):
+    pool = worker_pools.WorkerPool("test-bounded", 1, max_queue=1)
+    try:
+        release = threading.Event()
+        running = pool.submit(release.wait, 5)
+        waiting = pool.submit(lambda: "queued")
+        with pytest.raises(worker_pools.PoolFull):
+            pool.submit(lambda: "rejected")
+        release.set()
+        assert running.result(5) and waiting.result(5) == "queued"
+        stats = pool.stats()
+        assert (stats["completed"], stats["rejected"], stats["max_queued"], stats["queued"]) == (2, 1, 1, 0)
+    finally:
+        worker_pools._POOLS.pop("test-bounded", None)
+
+    monkeypatch.setattr(worker_pools.INTERACTIVE, "max_queue", 0)
+    resp = TestClient(app).get("/api/charts/v2/donut", params={"sessionId": "nope"})
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+
+
+def test_metrics_report_every_pool(monkeypatch):
+    monkeypatch.setenv("INTERNAL_METRICS_TOKEN", "ops-secret")
+    client = TestClient(app)
+    sid = _restore(client)
+    before = worker_pools.INTERACTIVE.stats()["completed"]
+    client.get("/api/charts/v2/donut", params={"sessionId": sid})
+    pools = client.get("/api/internal/metrics", headers={"X-Metrics-Token": "ops-secret"}).json()["pools"]
+    assert {"interactive", "heavy", "ai-job", "ai-requests"} <= set(pools)
+    assert pools["interactive"]["completed"] == before + 1
+    assert pools["interactive"]["workers"] == worker_pools.INTERACTIVE.workers
+    assert {"queued", "running", "max_queued", "wait_ms_avg", "run_ms_max"} <= set(pools["heavy"])
@@ -29,6 +29,7 @@ export default function Layout({ children }: LayoutProps) {
   // Background-AI progress pill: null = hidden.
   const [aiStatus, setAiStatus] = useState<{ label: string; done?: boolean } | null>(null)
   const aiPollRef = useRef<ReturnType<typeof setInterval> | null>(null)
+  const aiEventsRef = useRef<(() => void) | null>(null)
   // Block rendering children until a stale session_id is verified/restored
   const [sessionValidating, setSessionValidating] = useState(() => {
     const params = new URLSearchParams(window.location.search)
@@ -106,7 +107,7 @@ export default function Layout({ children }: LayoutProps) {
           if (rewrites.length) {
             Promise.allSettled(
               rewrites.map((r) =>
-                supabaseApi.upsertCategorySubrule(user.id, r.merchant, r.category, r.subcategory || ''),
+                supabaseApi.upsertCategorySubrule(user.id, r.merchant, r.category, r.subcategory || '', r.source ?? null),
               ),
             ).catch(() => {})
           }
@@ -122,13 +123,18 @@ export default function Layout({ children }: LayoutProps) {
               .catch(() => {}) // best-effort; backend ignores them regardless
           }
           const validRules = effectiveRules.filter((r) => isValidRuleCategory(r.category, customNames))
-          return transactionsApi.restoreSession(transactions, validRules, overrides, customNames, notes)
+          return transactionsApi.restoreSession(transactions, validRules, overrides, customNames, notes, user.id)
         })
         .then(response => {
           if (response?.success && response.session_id) {
             // Preserve current page path when restoring session
             const currentPath = window.location.pathname
             navigate(`${currentPath}?session_id=${response.session_id}`, { replace: true })
+            // Merchants the backend already had cached AI answers for were
+            // applied inline — persist them like any other AI resolution.
+            if (response.ai_categorized?.length) {
+              supabaseApi.upsertCategoryRules(user.id, response.ai_categorized, 'ai').catch(() => {})
+            }
             // The slow AI fallback (Claude + web search) runs in the
             // background — restore no longer waits for it, so the app paints
             // immediately. Resolved merchants are persisted as rules so each
@@ -167,44 +173,63 @@ export default function Layout({ children }: LayoutProps) {
   // ── Fully automatic background AI chain ──────────────────────────────
   // categorize (שונות → web-verified categories) → subcategorize everything →
   // audit (second opinion, auto-applied only where the keyword catalog is
-  // silent and confidence is high). A floating pill shows live progress from
-  // GET /ai-progress so it's visible that cataloging is running / finished.
+  // silent and confidence is high). A floating pill shows live progress
+  // pushed over GET /ai-events (SSE), and widgets refresh as each batch lands;
+  // if the stream can't open, the pill falls back to polling /ai-progress.
   const runAiChain = useCallback(async (sessionId: string, userId: string) => {
+    const showProgress = (p: { stage: string; done: number; total: number; detail: string }) => {
+      if (p.stage === 'categorizing') {
+        setAiStatus({ label: p.total ? `מסווג עסקים… ${p.done}/${p.total}` : 'מסווג עסקים…' })
+      } else if (p.stage === 'subcategorizing') {
+        setAiStatus({ label: `מפלח תתי-קטגוריות… ${Math.min(p.done + 1, p.total)}/${p.total}${p.detail ? ` · ${p.detail}` : ''}` })
+      } else if (p.stage === 'auditing') {
+        setAiStatus({ label: p.total ? `מאמת סיווגים מול האינטרנט… ${p.done}/${p.total}` : 'מאמת סיווגים מול האינטרנט…' })
+      }
+    }
     const poll = async () => {
       try {
-        const p = await transactionsApi.aiProgress(sessionId)
-        if (p.stage === 'categorizing') {
-          setAiStatus({ label: p.total ? `מסווג עסקים… ${p.done}/${p.total}` : 'מסווג עסקים…' })
-        } else if (p.stage === 'subcategorizing') {
-          setAiStatus({ label: `מפלח תתי-קטגוריות… ${p.done + 1}/${p.total}${p.detail ? ` · ${p.detail}` : ''}` })
-        } else if (p.stage === 'auditing') {
-          setAiStatus({ label: p.total ? `מאמת סיווגים מול האינטרנט… ${p.done}/${p.total}` : 'מאמת סיווגים מול האינטרנט…' })
-        }
+        showProgress(await transactionsApi.aiProgress(sessionId))
       } catch { /* progress is cosmetic */ }
     }
+    // Batches land in the live session as they resolve; coalesce the
+    // refresh so a burst of batches re-renders the widgets once.
+    let refreshTimer: ReturnType<typeof setTimeout> | null = null
+    const refreshSoon = () => {
+      if (refreshTimer) return
+      refreshTimer = setTimeout(() => {
+        refreshTimer = null
+        window.dispatchEvent(new CustomEvent('ai-categorized'))
+      }, 500)
+    }
     setAiStatus({ label: 'מסווג עסקים…' })
-    aiPollRef.current = setInterval(poll, 2000)
+    aiEventsRef.current = transactionsApi.aiEvents(sessionId, {
+      onProgress: showProgress,
+      onCategorized: (a) => { if (a.length) refreshSoon() },
+      onSubcategorized: (_c, a) => { if (a.length) refreshSoon() },
+      onError: () => {
+        aiEventsRef.current = null
+        if (!aiPollRef.current) aiPollRef.current = setInterval(poll, 2000)
+      },
+    })
     try {
-      // 1) categories for whatever is still שונות (unknowns web-verified)
+      // 1+2) categories for whatever is still שונות (unknowns web-verified)
+      // and subcategories for every category, pipelined server-side: a
+      // category is subcategorized as soon as its merchants are final.
       try {
-        const ai = await transactionsApi.aiCategorize(sessionId)
-        if (ai.ai_categorized?.length) {
-          supabaseApi.upsertCategoryRules(userId, ai.ai_categorized).catch(() => {})
-          window.dispatchEvent(new CustomEvent('ai-categorized'))
+        const res = await transactionsApi.aiPipeline(sessionId)
+        if (res.ai_categorized?.length) {
+          supabaseApi.upsertCategoryRules(userId, res.ai_categorized, 'ai').catch(() => {})
         }
-      } catch { /* AI is an enhancement — never block the app on it */ }
-
-      // 2) subcategories for every category, automatically
-      try {
-        const res = await transactionsApi.aiSubcategorizeAll(sessionId)
         const assignments = res.assignments ?? []
         for (const a of assignments) {
           await supabaseApi
-            .upsertCategorySubrule(userId, a.merchant, a.category, a.subcategory)
+            .upsertCategorySubrule(userId, a.merchant, a.category, a.subcategory, 'ai')
             .catch(() => {})
         }
-        if (assignments.length) window.dispatchEvent(new CustomEvent('ai-categorized'))
-      } catch { /* ignore */ }
+        if (res.ai_categorized?.length || assignments.length) {
+          window.dispatchEvent(new CustomEvent('ai-categorized'))
+        }
+      } catch { /* AI is an enhancement — never block the app on it */ }
 
       // 3) exhaustive web verification: every merchant the keyword catalog
       // doesn't govern gets a mandatory web-searched verdict, batch after
@@ -228,14 +253,14 @@ export default function Layout({ children }: LayoutProps) {
             try {
               await transactionsApi.setMerchantCategory(sessionId, pr.merchant, pr.proposed_category)
               await supabaseApi
-                .upsertCategoryRule(userId, pr.merchant, pr.proposed_category)
+                .upsertCategoryRule(userId, pr.merchant, pr.proposed_category, 'ai')
                 .catch(() => {})
             } catch { /* per-merchant best effort */ }
           }
           // Pin web-confirmed merchants so they are never re-verified.
           const verified = res.verified ?? []
           if (verified.length) {
-            await supabaseApi.upsertCategoryRules(userId, verified).catch(() => {})
+            await supabaseApi.upsertCategoryRules(userId, verified, 'ai').catch(() => {})
           }
           if (applicable.length || verified.length) {
             window.dispatchEvent(new CustomEvent('ai-categorized'))
@@ -258,14 +283,17 @@ export default function Layout({ children }: LayoutProps) {
       } catch { /* ignore */ }
     } finally {
       if (aiPollRef.current) { clearInterval(aiPollRef.current); aiPollRef.current = null }
+      if (aiEventsRef.current) { aiEventsRef.current(); aiEventsRef.current = null }
+      if (refreshTimer) clearTimeout(refreshTimer)
       setAiStatus({ label: 'הקיטלוג הסתיים ✓', done: true })
       setTimeout(() => setAiStatus(null), 6000)
     }
   }, [])
 
-  // Clear the poller on unmount.
+  // Close the event stream / poller on unmount.
   useEffect(() => () => {
     if (aiPollRef.current) clearInterval(aiPollRef.current)
+    if (aiEventsRef.current) aiEventsRef.current()
   }, [])
 
   const toggleSidebar = useCallback(() => {
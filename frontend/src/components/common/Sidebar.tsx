@@ -128,26 +128,27 @@ export default function Sidebar({
     setError(null)
 
     try {
-      // Upload all files, tag each transaction with its source file name
+      // Upload all files in one request; the backend tags each transaction
+      // with its source file name and drops repeats across files
       const allTransactions: unknown[] = []
 
-      for (let i = 0; i < files.length; i++) {
-        setUploadStatus(files.length === 1
-          ? 'מעלה קובץ...'
-          : `מעלה קובץ ${i + 1} מ-${files.length}...`)
-        const response = await transactionsApi.uploadFile(files[i])
-        if (response.success && response.session_id) {
-          const data = await transactionsApi.getTransactions(
-            response.session_id,
-            { page: 1, page_size: 50000 }
-          )
-          // Tag each transaction with its source file name
-          const tagged = (data.transactions as unknown as Record<string, unknown>[]).map(tx => ({
-            ...tx,
-            _source_file: files[i].name,
-          }))
-          allTransactions.push(...tagged)
-        }
+      setUploadStatus(files.length === 1
+        ? 'מעלה קובץ...'
+        : `מעלה ${files.length} קבצים...`)
+      const response = files.length === 1
+        ? await transactionsApi.uploadFile(files[0])
+        : await transactionsApi.uploadFiles(files)
+      if (response.success && response.session_id) {
+        const data = await transactionsApi.getTransactions(
+          response.session_id,
+          { page: 1, page_size: 50000 }
+        )
+        // A single /upload isn't tagged server-side
+        const tagged = (data.transactions as unknown as Record<string, unknown>[]).map(tx => ({
+          _source_file: files[0].name,
+          ...tx,
+        }))
+        allTransactions.push(...tagged)
       }
 
       if (allTransactions.length > 0) {
@@ -159,7 +160,7 @@ export default function Sidebar({
         const customCats = user ? await supabaseApi.getUserCategories(user.id).catch(() => []) : []
         const notes = user ? await supabaseApi.getTransactionNotes(user.id).catch(() => []) : []
         const merged = await transactionsApi.restoreSession(
-          allTransactions, rules, overrides, customCats.map((c) => c.name), notes)
+          allTransactions, rules, overrides, customCats.map((c) => c.name), notes, user?.id)
         if (merged.success && merged.session_id) {
           const removedParts: string[] = []
           if (merged.duplicates_removed && merged.duplicates_removed > 0) {
@@ -204,7 +205,7 @@ export default function Sidebar({
       ])
       if (!transactions || transactions.length === 0) return
       const merged = await transactionsApi.restoreSession(
-        transactions as unknown[], rules, overrides, customCats.map((c) => c.name), notes)
+        transactions as unknown[], rules, overrides, customCats.map((c) => c.name), notes, user.id)
       if (merged.success && merged.session_id) {
         onFileUploaded?.(merged.session_id)
       }
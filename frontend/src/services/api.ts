@@ -72,7 +72,9 @@ export const transactionsApi = {
   /**
    * Restore a backend session from saved transaction JSON data.
    * Optionally pass user-defined merchant→category rules; the backend
-   * applies them after auto-categorization so they always win.
+   * applies them after auto-categorization so they always win. `voter`
+   * (the user id) lets those rules vote in the server's merchant knowledge
+   * base when it is enabled.
    */
   restoreSession: async (
     transactions: unknown[],
@@ -80,6 +82,7 @@ export const transactionsApi = {
     transactionOverrides: { txn_key: string; category: string; subcategory?: string | null }[] = [],
     customCategories: string[] = [],
     transactionNotes: { txn_key: string; note: string }[] = [],
+    voter?: string,
   ): Promise<FileUploadResponse> => {
     const response = await api.post<FileUploadResponse>('/api/restore-session', {
       transactions,
@@ -87,6 +90,7 @@ export const transactionsApi = {
       transaction_overrides: transactionOverrides,
       custom_categories: customCategories,
       transaction_notes: transactionNotes,
+      voter,
     });
     return response.data;
   },
@@ -137,6 +141,31 @@ export const transactionsApi = {
     return response.data;
   },
 
+  /**
+   * Categorize + subcategorize as one pipelined server-side run: categories
+   * are subcategorized (in parallel) as soon as their merchants are final, so
+   * this replaces the aiCategorize → aiSubcategorizeAll chain. Both kinds of
+   * assignments must be persisted as rules by the caller.
+   */
+  aiPipeline: async (
+    sessionId: string,
+  ): Promise<{
+    ai_categorized?: { merchant: string; category: string }[];
+    assignments: { merchant: string; category: string; subcategory: string; count: number; total: number }[];
+    remaining: number;
+  }> => {
+    const response = await api.post<{
+      ai_categorized?: { merchant: string; category: string }[];
+      assignments: { merchant: string; category: string; subcategory: string; count: number; total: number }[];
+      remaining: number;
+    }>(
+      '/api/ai-pipeline',
+      { session_id: sessionId },
+      { timeout: 300000 }, // Claude + web search across every category
+    );
+    return response.data;
+  },
+
   /**
    * Live progress of the background AI chain, for the UI meter.
    * stage: idle | categorizing | categorized | subcategorizing | done.
@@ -151,6 +180,53 @@ export const transactionsApi = {
     return response.data;
   },
 
+  /**
+   * Server-Sent Events for the session's AI runs (replaces aiProgress polling):
+   * progress changes plus each batch's category / subcategory assignments.
+   * EventSource reconnects by itself (resuming via Last-Event-ID); onError
+   * fires only if the stream never opened, so the caller can fall back to
+   * polling. Returns a function that closes the stream.
+   */
+  aiEvents: (
+    sessionId: string,
+    handlers: {
+      onProgress?: (p: { stage: string; done: number; total: number; detail: string }) => void;
+      onCategorized?: (assignments: { merchant: string; category: string }[]) => void;
+      onSubcategorized?: (
+        category: string,
+        assignments: { merchant: string; category: string; subcategory: string; count: number; total: number }[],
+      ) => void;
+      onError?: () => void;
+    },
+  ): (() => void) => {
+    if (typeof EventSource === 'undefined') {
+      handlers.onError?.();
+      return () => {};
+    }
+    const source = new EventSource(
+      `${API_BASE_URL}/api/ai-events?sessionId=${encodeURIComponent(sessionId)}`,
+    );
+    let opened = false;
+    source.onopen = () => { opened = true; };
+    source.onerror = () => {
+      if (!opened) {
+        source.close();
+        handlers.onError?.();
+      }
+    };
+    source.addEventListener('progress', (e) => {
+      handlers.onProgress?.(JSON.parse((e as MessageEvent).data));
+    });
+    source.addEventListener('categorized', (e) => {
+      handlers.onCategorized?.(JSON.parse((e as MessageEvent).data).assignments ?? []);
+    });
+    source.addEventListener('subcategorized', (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      handlers.onSubcategorized?.(data.category, data.assignments ?? []);
+    });
+    return () => source.close();
+  },
+
   /**
    * AI audit: second opinion on ALL expense merchants (not just שונות).
    * Returns proposals where Claude disagrees with the current category —
@@ -181,6 +257,29 @@ export const transactionsApi = {
     return response.data;
   },
 
+  /**
+   * Throughput variants of aiAudit / aiSubcategorizeAll: submitted through
+   * the Message Batches API as a background job (cheaper, can take long).
+   * Poll aiJob (or watch the "job" event on aiEvents) for the usual body.
+   */
+  aiBatchJob: async (
+    sessionId: string,
+    kind: 'audit' | 'subcategorize-all',
+  ): Promise<{ job_id: string; status: string }> => {
+    const response = await api.post<{ job_id: string; status: string }>(
+      kind === 'audit' ? '/api/ai-audit' : '/api/ai-subcategorize-all',
+      { session_id: sessionId, mode: 'batch' },
+    );
+    return response.data;
+  },
+
+  aiJob: async <T = unknown>(
+    jobId: string,
+  ): Promise<{ id: string; kind: string; status: 'queued' | 'running' | 'done' | 'failed'; result: T | null; error: string | null }> => {
+    const response = await api.get(`/api/ai-jobs/${encodeURIComponent(jobId)}`);
+    return response.data;
+  },
+
   /**
    * Reclassify every transaction of a merchant (canonical-key match) in the
    * live session. Caller persists the same mapping as a Supabase rule.
@@ -244,6 +343,24 @@ export const transactionsApi = {
     return response.data;
   },
 
+  /**
+   * Upload several transaction files into one session — parsed in parallel,
+   * tagged with _source_file, deduplicated across files, categorized once
+   */
+  uploadFiles: async (files: File[], signal?: AbortSignal): Promise<FileUploadResponse> => {
+    const formData = new FormData();
+    files.forEach((file) => formData.append('files', file));
+
+    const response = await api.post<FileUploadResponse>('/api/upload/batch', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+      signal,
+    });
+
+    return response.data;
+  },
+
   /**
    * Get transactions with filters
    */
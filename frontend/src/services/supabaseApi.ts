@@ -1,5 +1,21 @@
 import { supabase } from '../lib/supabase';
-import type { Income } from './types';
+import type { CategoryRule, Income, RuleSource } from './types';
+
+/**
+ * Upsert user_category_rules rows. A deployment that hasn't added the
+ * `source` column yet gets the rows without it rather than no rule at all.
+ */
+async function upsertRuleRows(rows: Record<string, unknown>[]): Promise<void> {
+  const { error } = await supabase
+    .from('user_category_rules')
+    .upsert(rows, { onConflict: 'user_id,merchant' });
+  if (!error) return;
+  if (!/source/.test(error.message)) throw error;
+  const { error: legacyErr } = await supabase
+    .from('user_category_rules')
+    .upsert(rows.map(({ source: _source, ...row }) => row), { onConflict: 'user_id,merchant' });
+  if (legacyErr) throw legacyErr;
+}
 
 export const supabaseApi = {
   // ─── Incomes ──────────────────────────────────────────────────────────
@@ -101,50 +117,44 @@ export const supabaseApi = {
    */
   getCategoryRules: async (
     userId: string,
-  ): Promise<{ merchant: string; category: string; subcategory?: string | null }[]> => {
-    const { data, error } = await supabase
-      .from('user_category_rules')
-      .select('merchant, category, subcategory')
-      .eq('user_id', userId);
-    if (error) {
-      // The `subcategory` column may be missing on a deployment that hasn't run
-      // the migration yet. Retry without it so we never silently drop ALL rules.
-      const { data: legacy, error: legacyErr } = await supabase
+  ): Promise<CategoryRule[]> => {
+    // Newest columns first: `source` and `subcategory` may be missing on a
+    // deployment that hasn't run the migrations yet. Retry without them so we
+    // never silently drop ALL rules.
+    let lastError = '';
+    for (const columns of ['merchant, category, subcategory, source', 'merchant, category, subcategory', 'merchant, category']) {
+      const { data, error } = await supabase
         .from('user_category_rules')
-        .select('merchant, category')
+        .select(columns)
         .eq('user_id', userId);
-      if (legacyErr) {
-        // Table may not exist yet on older deployments — degrade gracefully.
-        // eslint-disable-next-line no-console
-        console.warn('getCategoryRules failed:', legacyErr.message);
-        return [];
-      }
-      return legacy || [];
+      if (!error) return (data as unknown as CategoryRule[]) || [];
+      lastError = error.message;
     }
-    return data || [];
+    // Table may not exist yet on older deployments — degrade gracefully.
+    // eslint-disable-next-line no-console
+    console.warn('getCategoryRules failed:', lastError);
+    return [];
   },
 
   /**
    * Upsert one rule. Called when the user manually changes a transaction's
-   * category in the dashboard.
+   * category in the dashboard; AI-made rules pass source 'ai'.
    */
   upsertCategoryRule: async (
     userId: string,
     merchant: string,
     category: string,
+    source: RuleSource | null = 'user',
   ): Promise<void> => {
-    const { error } = await supabase
-      .from('user_category_rules')
-      .upsert(
-        { user_id: userId, merchant, category, updated_at: new Date().toISOString() },
-        { onConflict: 'user_id,merchant' },
-      );
-    if (error) throw error;
+    await upsertRuleRows([
+      { user_id: userId, merchant, category, source, updated_at: new Date().toISOString() },
+    ]);
   },
 
   upsertCategoryRules: async (
     userId: string,
     rules: { merchant: string; category: string }[],
+    source: RuleSource | null = 'user',
   ): Promise<void> => {
     const rows = rules
       .filter((r) => r.merchant && r.category)
@@ -152,13 +162,11 @@ export const supabaseApi = {
         user_id: userId,
         merchant: r.merchant,
         category: r.category,
+        source,
         updated_at: new Date().toISOString(),
       }));
     if (rows.length === 0) return;
-    const { error } = await supabase
-      .from('user_category_rules')
-      .upsert(rows, { onConflict: 'user_id,merchant' });
-    if (error) throw error;
+    await upsertRuleRows(rows);
   },
 
   /**
@@ -172,21 +180,19 @@ export const supabaseApi = {
     merchant: string,
     category: string,
     subcategory: string,
+    source: RuleSource | null = 'user',
   ): Promise<void> => {
     if (!merchant || !category) return;
-    const { error } = await supabase
-      .from('user_category_rules')
-      .upsert(
-        {
-          user_id: userId,
-          merchant,
-          category,
-          subcategory: subcategory || null,
-          updated_at: new Date().toISOString(),
-        },
-        { onConflict: 'user_id,merchant' },
-      );
-    if (error) throw error;
+    await upsertRuleRows([
+      {
+        user_id: userId,
+        merchant,
+        category,
+        subcategory: subcategory || null,
+        source,
+        updated_at: new Date().toISOString(),
+      },
+    ]);
   },
 
   deleteCategoryRule: async (userId: string, merchant: string): Promise<void> => {
@@ -71,10 +71,13 @@ export interface FileUploadResponse {
   transaction_count?: number;
   duplicates_removed?: number;
   cc_payments_removed?: number;
-  /** merchant→category assignments the AI resolved this restore (incl. via web
-   *  search), returned so the client can persist them as rules — resolving each
-   *  merchant once instead of re-querying on every load. */
+  /** merchant→category assignments the AI resolved (incl. via web search) —
+   *  on restore, the backend's cached answers applied inline — returned so the
+   *  client can persist them as rules, resolving each merchant once instead of
+   *  re-querying on every load. */
   ai_categorized?: { merchant: string; category: string }[];
+  /** /upload/batch: transactions kept per file, after cross-file dedup. */
+  files?: { name: string; count: number }[];
 }
 
 export interface SessionFileInfo {
@@ -419,8 +422,12 @@ export interface CategoryCatalog {
 }
 
 // User-defined merchant→category (+ optional subcategory) override rule
+/** Who made a rule: the user, or the AI (auto-saved). Older rows have none. */
+export type RuleSource = 'user' | 'ai'
+
 export interface CategoryRule {
   merchant: string
   category: string
   subcategory?: string | null
+  source?: RuleSource | null
 }
@@ -75,6 +75,7 @@ export interface RuleLike {
   merchant: string
   category: string
   subcategory?: string | null
+  source?: 'user' | 'ai' | null
 }
 
 /**
@@ -86,7 +87,7 @@ export function migrateRule(rule: RuleLike): RuleLike | null {
   const sub = (rule.subcategory || '').trim()
   const pair = CATEGORY_PAIR_MIGRATION[`${cat}|${sub}`]
   if (pair) {
-    return { merchant: rule.merchant, category: pair[0], subcategory: pair[1] || null }
+    return { merchant: rule.merchant, category: pair[0], subcategory: pair[1] || null, source: rule.source }
   }
   const plain = CATEGORY_MIGRATION[cat]
   if (plain) {
@@ -94,6 +95,7 @@ export function migrateRule(rule: RuleLike): RuleLike | null {
       merchant: rule.merchant,
       category: plain[0],
       subcategory: plain[1] !== null ? plain[1] || null : rule.subcategory ?? null,
+      source: rule.source,
     }
   }
   return null
@@ -115,6 +115,11 @@ CREATE TABLE IF NOT EXISTS public.user_category_rules (
 -- dashboard selects this column when loading rules).
 ALTER TABLE public.user_category_rules ADD COLUMN IF NOT EXISTS subcategory TEXT;
 
+-- Who made the rule: 'user' (a manual edit) or 'ai' (an AI answer the
+-- dashboard saved automatically). Only 'user' rules vote in the backend's
+-- merchant knowledge base; older rows (NULL) don't. Safe to re-run.
+ALTER TABLE public.user_category_rules ADD COLUMN IF NOT EXISTS source TEXT;
+
 ALTER TABLE public.user_category_rules ENABLE ROW LEVEL SECURITY;
 CREATE POLICY "Users can view own category rules" ON public.user_category_rules FOR SELECT USING (auth.uid() = user_id);
 CREATE POLICY "Users can insert own category rules" ON public.user_category_rules FOR INSERT WITH CHECK (auth.uid() = user_id);